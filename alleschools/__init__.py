@@ -2,9 +2,20 @@
 AlleSchools core package.
 
 本包提供加载 DUO/CBS 数据、计算指标以及导出结果的可复用模块。
+进程内调用：``from alleschools import compute_layer``（见 alleschools.api，按需导入）。
 """
 
 __all__ = [
+    "Result",
+    "compute_layer",
     "config",
 ]
 
+
+def __getattr__(name):
+    # 延迟导入：import alleschools（如 CLI 只读配置时）不连带加载整条流水线
+    if name in ("Result", "compute_layer"):
+        from alleschools import api
+
+        return getattr(api, name)
+    raise AttributeError(f"module 'alleschools' has no attribute {name!r}")
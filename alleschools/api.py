@@ -0,0 +1,348 @@
+from __future__ import annotations
+
+"""
+进程内库 API：compute_layer(layer, config) -> Result，结果留在内存中，默认不写任何文件。
+
+    from alleschools import compute_layer
+
+    res = compute_layer("vo", config)
+    res.columns["X_linear"]         # 列式结果（列名与导出 CSV 相同）
+    res.excluded                    # 样本不足被排除的学校
+    res.profile_indices["NT"]       # VWO profiel 指数（仅 VO）
+    res.data_quality                # 数据质量检查结果
+    res.write("csv", "points")      # 需要时再把结果交给导出器（路径同流水线，相对 data_root）
+
+与 run_po_pipeline / run_vo_pipeline 使用同一组 loader、计算与隐私处理函数，结果与流水线写出的内容一致；
+不写 run_report、运行历史与阶段缓存（cache=True 时读写 stage_cache，与流水线共用已解析的原始数据）。
+"""
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+from alleschools import config as config_mod
+from alleschools.compute import compute_po_xy, compute_vo_xy, compute_vwo_profile_indices
+from alleschools.exporters import csv_exporter, geojson_exporter, json_exporter, long_table_exporter
+from alleschools.exporters.meta_builder import build_po_meta, build_vo_meta
+from alleschools.exporters.points_exporter import export_po_points, export_vo_points
+from alleschools.exporters.search_index_exporter import export_search_index
+from alleschools.loaders import cbs_loader, duo_loader, load_vwo_central_exam_scores, vo_loader
+from alleschools.perf import PerfRecorder
+from alleschools.pipeline import (
+    DEFAULT_VO_YEAR_COLS,
+    VWO_EXAM_FILES,
+    _apply_privacy,
+    _raw_root,
+    build_vo_profile_rows,
+    layer_inputs,
+    privacy_settings,
+    vwo_year_weights,
+)
+from alleschools.quality import run_po_quality, run_vo_quality
+from alleschools.stage_cache import StageCache
+
+LAYERS = ("po", "vo")
+# Result.write 支持的导出目标
+SINKS = ("csv", "excluded", "points", "geojson", "long_table", "search_index", "meta", "profiles")
+
+_SIZE_KEY = {"po": "pupils_total", "vo": "candidates_total"}
+
+
+@dataclass
+class Result:
+    """一层的计算结果；rows 为隐私处理后的导出行，school_rows 为隐私处理前的学校级行。"""
+
+    layer: str
+    config: Dict[str, Any]
+    rows: List[Dict[str, Any]]
+    excluded: List[Dict[str, Any]]
+    school_rows: List[Dict[str, Any]]
+    privacy_suppressed: List[Dict[str, Any]] = field(default_factory=list)
+    year_facts: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict)
+    profile_indices: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    profile_years: Dict[str, Dict[str, Dict[str, float]]] = field(default_factory=dict)
+    data_quality: Optional[Dict[str, Any]] = None
+    performance: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def fieldnames(self) -> List[str]:
+        """导出 CSV 的列（随 output.include_meta_columns）。"""
+        if self.layer == "po":
+            base, extra = csv_exporter.PO_FIELDNAMES, csv_exporter.PO_META_FIELDNAMES
+        else:
+            base, extra = csv_exporter.VO_FIELDNAMES, csv_exporter.VO_META_FIELDNAMES
+        return list(base) + (list(extra) if self._output_cfg.get("include_meta_columns", True) else [])
+
+    @property
+    def columns(self) -> Dict[str, List[Any]]:
+        """列式视图：列名 -> 与 rows 等长的值列表（缺失值为 None）。"""
+        return {name: [row.get(name) for row in self.rows] for name in self.fieldnames}
+
+    @property
+    def profile_rows(self) -> Dict[str, List[Dict[str, Any]]]:
+        """VO profiel 点集（NT/NG/EM/CM），与流水线写出的 schools_profiles_*.json 相同。"""
+        if not self.profile_indices:
+            return {"NT": [], "NG": [], "EM": [], "CM": []}
+        return build_vo_profile_rows(self.rows, self.profile_indices)
+
+    @property
+    def _output_cfg(self) -> Dict[str, Any]:
+        return dict((self.config.get(self.layer) or {}).get("output") or {})
+
+    def write(self, *sinks: str, data_root: Optional[Path] = None) -> Dict[str, Path]:
+        """
+        把结果交给所选导出器（见 SINKS），路径与流水线一致（相对 data_root，缺省为配置中的 data_root）。
+        返回 sink -> 写出的文件（profiles 返回目录）。
+        """
+        unknown = [s for s in sinks if s not in SINKS]
+        if unknown:
+            raise ValueError(f"Unknown sinks {unknown}; choose from {list(SINKS)}")
+        root = Path(data_root or self.config.get("data_root") or config_mod.PROJECT_ROOT)
+        output_cfg = self._output_cfg
+        po = self.layer == "po"
+        csv_rel = Path(output_cfg.get("csv") or ("schools_xy_coords_po.csv" if po else "schools_xy_coords.csv"))
+        out_dir, stem = root / csv_rel.parent, csv_rel.stem
+        include_meta_columns = output_cfg.get("include_meta_columns", True)
+        written: Dict[str, Path] = {}
+
+        if "csv" in sinks:
+            export_csv = csv_exporter.export_po_csv if po else csv_exporter.export_vo_csv
+            export_csv(self.rows, root / csv_rel, include_meta_columns=include_meta_columns)
+            written["csv"] = root / csv_rel
+        if "excluded" in sinks:
+            default = "excluded_schools_po.json" if po else "excluded_schools.json"
+            path = root / (output_cfg.get("excluded_json") or csv_rel.parent / default)
+            json_exporter.export_json(self.excluded, path)
+            written["excluded"] = path
+        if "points" in sinks:
+            path = out_dir / f"{stem}.json"
+            (export_po_points if po else export_vo_points)(self.rows, path)
+            written["points"] = path
+        if "geojson" in sinks:
+            path = out_dir / f"{stem}_geo.json"
+            pc4_path = (output_cfg.get("pc4_centroids_path") or "").strip()
+            lookup = str(root / pc4_path) if pc4_path and not Path(pc4_path).is_absolute() else (pc4_path or None)
+            geojson_exporter.export_geojson(self.rows, path, lookup_path=lookup)
+            written["geojson"] = path
+        if "long_table" in sinks:
+            if str(output_cfg.get("long_table_mode") or "wide") == "star":
+                export_star = long_table_exporter.export_po_star_tables if po else long_table_exporter.export_vo_star_tables
+                dim, fact = out_dir / f"{stem}_long_dim.csv", out_dir / f"{stem}_long_fact.csv"
+                export_star(self.rows, self.year_facts, dim, fact, include_meta_columns=include_meta_columns)
+                written["long_table"] = dim
+            else:
+                export_long = long_table_exporter.export_po_long_table if po else long_table_exporter.export_vo_long_table
+                path = out_dir / f"{stem}_long.csv"
+                export_long(self.rows, path, include_meta_columns=include_meta_columns)
+                written["long_table"] = path
+        if "search_index" in sinks:
+            path = out_dir / f"{stem}_search.json"
+            export_search_index(self.rows, path, self.layer)
+            written["search_index"] = path
+        if "meta" in sinks:
+            path = out_dir / f"{stem}_meta.json"
+            outliers = dict((self.config.get(self.layer) or {}).get("outliers") or {})
+            build_meta = build_po_meta if po else build_vo_meta
+            meta = build_meta(root / csv_rel, row_count=len(self.rows), columns=self.fieldnames, outliers=outliers or None)
+            json_exporter.write_meta_json(meta, path)
+            written["meta"] = path
+        if "profiles" in sinks and not po:
+            for prof, rows in self.profile_rows.items():
+                if rows:
+                    csv_exporter.export_vo_profiles_csv(rows, out_dir / f"schools_profiles_{prof.lower()}.csv")
+                    json_exporter.export_json(rows, out_dir / f"schools_profiles_{prof.lower()}.json")
+            written["profiles"] = out_dir
+        return written
+
+
+def _compute_po(config: Dict[str, Any], raw_root: Path, perf: PerfRecorder, memo: StageCache) -> Dict[str, Any]:
+    po_cfg: Dict[str, Any] = dict(config.get("po") or {})
+    input_cfg: Dict[str, Any] = dict(po_cfg.get("input") or {})
+    woz_path = raw_root / (input_cfg.get("cbs_woz_csv") or "cbs_woz_per_postcode_year.csv")
+    with perf.stage("load.cbs_woz") as st:
+        woz, woz_years = memo.run(st, lambda: cbs_loader.load_woz_pc4_year(str(woz_path)), files=[woz_path])
+        st.rows_out = len(woz)
+    with perf.stage("load.duo_schooladviezen") as st:
+        schools = memo.run(
+            st, lambda: duo_loader.load_schooladviezen_po(str(raw_root)), files=layer_inputs(config, "po")[1:]
+        )
+        st.rows_out = len(schools)
+    if not schools:
+        raise FileNotFoundError(f"No PO schooladviezen data found under {raw_root}")
+
+    woz_strategy = str(dict(po_cfg.get("missing_values") or {}).get("woz_strategy") or "nearest_year")
+    outliers_cfg: Dict[str, Any] = dict(po_cfg.get("outliers") or {})
+
+    def _compute() -> tuple:
+        facts: Dict[str, List[Dict[str, Any]]] = {}
+        rows, excl = compute_po_xy(
+            schools, woz, woz_years, woz_strategy=woz_strategy, outliers=outliers_cfg or None, year_facts=facts
+        )
+        return rows, excl, facts
+
+    with perf.stage("compute.po_xy", rows_in=len(schools)) as st:
+        rows, excluded, year_facts = memo.run(
+            st,
+            _compute,
+            after=("load.cbs_woz", "load.duo_schooladviezen"),
+            config={"woz_strategy": woz_strategy, "outliers": outliers_cfg},
+        )
+        st.rows_out = len(rows)
+    return {"rows": rows, "excluded": excluded, "year_facts": year_facts, "input_cfg": input_cfg}
+
+
+def _compute_vo(config: Dict[str, Any], raw_root: Path, perf: PerfRecorder, memo: StageCache) -> Dict[str, Any]:
+    vo_cfg: Dict[str, Any] = dict(config.get("vo") or {})
+    input_cfg: Dict[str, Any] = dict(vo_cfg.get("input") or {})
+    year_cols: List[Any] = list(dict(vo_cfg.get("weights") or {}).get("year_cols") or DEFAULT_VO_YEAR_COLS)
+    min_havo_vwo_total = int(dict(vo_cfg.get("thresholds") or {}).get("min_havo_vwo_total") or 20)
+    vestigingen_csv = input_cfg.get("duo_vestigingen_vo_csv") or "duo_vestigingen_vo.csv"
+    exams_all = input_cfg.get("exams_all_csv") or "duo_examen_raw_all.csv"
+    exams_small = input_cfg.get("exams_small_csv") or "duo_examen_raw.csv"
+    with perf.stage("load.duo_vestigingen") as st:
+        brin_to_postcode = memo.run(
+            st,
+            lambda: vo_loader.load_vestigingen_postcode(str(raw_root), vestigingen_csv),
+            files=[raw_root / vestigingen_csv],
+        )
+        st.rows_out = len(brin_to_postcode)
+    with perf.stage("load.duo_exams") as st:
+        schools = memo.run(
+            st,
+            lambda: vo_loader.load_exam_schools(str(raw_root), exams_all, exams_small, year_cols),
+            config={"year_cols": year_cols},
+            files=[raw_root / exams_all, raw_root / exams_small],
+        )
+        st.rows_out = len(schools)
+    if not schools:
+        raise FileNotFoundError(f"VO input file not found under {raw_root} ({exams_all} or {exams_small})")
+
+    outliers_cfg: Dict[str, Any] = dict(vo_cfg.get("outliers") or {})
+
+    def _compute() -> tuple:
+        facts: Dict[str, List[Dict[str, Any]]] = {}
+        rows, excl = compute_vo_xy(
+            schools, brin_to_postcode, year_cols, min_havo_vwo_total, outliers=outliers_cfg or None, year_facts=facts
+        )
+        return rows, excl, facts
+
+    with perf.stage("compute.vo_xy", rows_in=len(schools)) as st:
+        rows, excluded, year_facts = memo.run(
+            st,
+            _compute,
+            after=("load.duo_vestigingen", "load.duo_exams"),
+            config={"year_cols": year_cols, "min_havo_vwo_total": min_havo_vwo_total, "outliers": outliers_cfg},
+        )
+        st.rows_out = len(rows)
+
+    year_order, year_weights = vwo_year_weights()
+    with perf.stage("load.vwo_central_exams") as st:
+        vwo_central = memo.run(
+            st,
+            lambda: load_vwo_central_exam_scores(str(raw_root), dict(VWO_EXAM_FILES)),
+            files=[raw_root / name for name in VWO_EXAM_FILES.values()],
+        )
+        st.rows_out = len(vwo_central)
+    profile_indices: Dict[str, Dict[str, float]] = {}
+    profile_years: Dict[str, Dict[str, Dict[str, float]]] = {}
+    if vwo_central:
+
+        def _compute_profiles() -> tuple:
+            per_year: Dict[str, Dict[str, Dict[str, float]]] = {}
+            indices = compute_vwo_profile_indices(
+                vwo_central, year_order=year_order, year_weights=year_weights, per_year=per_year  # type: ignore[arg-type]
+            )
+            return indices, per_year
+
+        with perf.stage("compute.vwo_profiles", rows_in=len(vwo_central)) as st:
+            profile_indices, profile_years = memo.run(
+                st, _compute_profiles, after=("load.vwo_central_exams",), config={"year_weights": year_weights}
+            )
+            st.rows_out = len(profile_indices)
+    return {
+        "rows": rows,
+        "excluded": excluded,
+        "year_facts": year_facts,
+        "profile_indices": profile_indices,
+        "profile_years": profile_years,
+        "input_cfg": input_cfg,
+    }
+
+
+def compute_layer(
+    layer: str,
+    config: Optional[Mapping[str, Any]] = None,
+    *,
+    sinks: Sequence[str] = (),
+    cache: bool = False,
+) -> Result:
+    """
+    计算一层（"po" / "vo"）的全部结果并留在内存中返回。
+
+    config:  生效配置（缺省为 build_effective_config()）
+    sinks:   需要同时写出的产物（见 SINKS），缺省不写任何文件
+    cache:   为 True 时按 stage_cache 配置复用 / 写入阶段缓存（与 CLI 流水线共享）
+    原始输入缺失时抛出 FileNotFoundError。
+    """
+    if layer not in LAYERS:
+        raise ValueError(f"layer must be one of {LAYERS}, got {layer!r}")
+    unknown = [s for s in sinks if s not in SINKS]
+    if unknown:
+        raise ValueError(f"Unknown sinks {unknown}; choose from {list(SINKS)}")
+    config = dict(config) if config is not None else config_mod.build_effective_config()
+    data_root = Path(config.get("data_root") or config_mod.PROJECT_ROOT)
+    raw_root = _raw_root(config, data_root)
+    perf = PerfRecorder.from_config(config, layer=layer, root=data_root)
+    memo = StageCache.from_config(config, layer=layer, root=data_root) if cache else StageCache(None)
+
+    core = (_compute_po if layer == "po" else _compute_vo)(config, raw_root, perf, memo)
+    size_key = _SIZE_KEY[layer]
+    min_group_size, max_detail_level = privacy_settings(config, layer)
+    school_rows = core["rows"]
+    with perf.stage("privacy", rows_in=len(school_rows)) as st:
+        rows, suppressed = memo.run(
+            st,
+            lambda: _apply_privacy(school_rows, layer, size_key, min_group_size, max_detail_level),
+            after=(f"compute.{layer}_xy",),
+            config={"max_detail_level": max_detail_level, "min_group_size": min_group_size},
+        )
+        st.rows_out = len(rows)
+
+    data_quality: Optional[Dict[str, Any]] = None
+    dq_cfg: Dict[str, Any] = dict((config.get(layer) or {}).get("data_quality") or {})
+    if dq_cfg.get("enabled", True):
+        with perf.stage("data_quality", rows_in=len(rows) + len(core["excluded"])):
+            run_quality = run_po_quality if layer == "po" else run_vo_quality
+            data_quality = run_quality(
+                rows,
+                core["excluded"],
+                raw_root,
+                core["input_cfg"],
+                max_brins_in_report=int(dq_cfg.get("max_brins_in_report") or 50),
+            )
+            if suppressed:
+                data_quality["privacy_suppressed"] = {
+                    "count": len(suppressed),
+                    "brins": [p["BRIN"] for p in suppressed[: dq_cfg.get("max_brins_in_report", 50)]],
+                }
+
+    result = Result(
+        layer=layer,
+        config=config,
+        rows=rows,
+        excluded=core["excluded"],
+        school_rows=school_rows,
+        privacy_suppressed=suppressed,
+        year_facts=core["year_facts"],
+        profile_indices=core.get("profile_indices") or {},
+        profile_years=core.get("profile_years") or {},
+        data_quality=data_quality,
+    )
+    if sinks:
+        with perf.stage("export"):
+            result.write(*sinks)
+    result.performance = perf.report()
+    return result
+
+
+__all__ = ["LAYERS", "Result", "SINKS", "compute_layer"]
@@ -14,10 +14,68 @@ from typing import Any, Dict, List, Optional
 
 from alleschools import config as config_mod
 from alleschools import etl as etl_mod
+from alleschools import history as history_mod
+from alleschools import publish as publish_mod
 from alleschools import schema_validator as sv
+from alleschools import service as service_mod
+from alleschools import sharding
+from alleschools import sweep as sweep_mod
+from alleschools import tracing
+from alleschools import watch as watch_mod
+from alleschools.compute.year_cube import parse_window
+from alleschools.perf import PerfRecorder
 from alleschools.pipeline import run_po_pipeline, run_vo_pipeline
 
 
+def _window_arg(value: str) -> str:
+    """argparse type：校验 --window 形如 2021-2024，返回规范化字符串。"""
+    try:
+        start, end = parse_window(value)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(str(exc)) from None
+    return f"{start}-{end}"
+
+
+def _add_window_option(p: argparse.ArgumentParser) -> None:
+    p.add_argument(
+        "--window",
+        type=_window_arg,
+        action="append",
+        default=None,
+        metavar="YYYY-YYYY",
+        help="Also export X/Y for this schoolyear window (e.g. 2021-2024); repeatable",
+    )
+
+
+def _shard_arg(value: str) -> tuple:
+    """argparse type：校验 --shard 形如 0/4，返回 (index, count)。"""
+    try:
+        return sharding.parse_shard(value)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(str(exc)) from exc
+
+
+def _add_profile_options(p: argparse.ArgumentParser) -> None:
+    p.add_argument(
+        "--profile-cpu",
+        action="store_true",
+        help="Wrap every pipeline stage in cProfile; write .pstats and collapsed stacks (flamegraph input)",
+    )
+    p.add_argument(
+        "--profile-mem",
+        action="store_true",
+        help="Snapshot tracemalloc around every stage; write top allocation sites by file:line",
+    )
+
+
+def _add_force_option(p: argparse.ArgumentParser) -> None:
+    p.add_argument(
+        "--force",
+        action="store_true",
+        help="Ignore the stage cache and recompute every stage (the cache is refreshed)",
+    )
+
+
 def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(prog="alleschools")
     parser.add_argument("--config", type=str, default=None, help="Path to config.yaml")
@@ -34,12 +92,29 @@ def build_parser() -> argparse.ArgumentParser:
         default=None,
         help="Override output_root (base directory for outputs)",
     )
+    parser.add_argument(
+        "--trace",
+        action="store_true",
+        help="Write a Chrome trace-event JSON of this run (spans per stage/thread, row and download counters)",
+    )
+    parser.add_argument(
+        "--trace-path",
+        type=str,
+        default=None,
+        help="Trace output path (implies --trace; defaults to tracing.path under data_root)",
+    )
 
     subparsers = parser.add_subparsers(dest="command", required=True)
 
     # 旧版语法糖：直接跑单层 ETL（保留向后兼容）
-    subparsers.add_parser("po", help="Run PO (primary schools) pipeline")
-    subparsers.add_parser("vo", help="Run VO (secondary schools) pipeline")
+    po_parser = subparsers.add_parser("po", help="Run PO (primary schools) pipeline")
+    vo_parser = subparsers.add_parser("vo", help="Run VO (secondary schools) pipeline")
+    _add_window_option(po_parser)
+    _add_window_option(vo_parser)
+    _add_profile_options(po_parser)
+    _add_profile_options(vo_parser)
+    _add_force_option(po_parser)
+    _add_force_option(vo_parser)
 
     # 新版统一入口：只 fetch 原始数据
     fetch_parser = subparsers.add_parser(
@@ -73,6 +148,32 @@ def build_parser() -> argparse.ArgumentParser:
     etl_group.add_argument("--all", action="store_true", help="Run VO + PO pipelines")
     etl_group.add_argument("--vo", action="store_true", help="Run VO pipeline only")
     etl_group.add_argument("--po", action="store_true", help="Run PO pipeline only")
+    etl_parser.add_argument(
+        "--shard",
+        type=_shard_arg,
+        default=None,
+        metavar="I/N",
+        help="Process only the BRINs in shard I of N (stable hash) and write a shard result for `merge`",
+    )
+    _add_window_option(etl_parser)
+    _add_profile_options(etl_parser)
+    _add_force_option(etl_parser)
+
+    # merge 子命令：把 etl --shard 的各分片结果合并为常规产物（与单机运行逐字节一致）
+    merge_parser = subparsers.add_parser(
+        "merge",
+        help="Combine `etl --shard i/N` results into the usual artifacts",
+    )
+    merge_group = merge_parser.add_mutually_exclusive_group()
+    merge_group.add_argument("--all", action="store_true", help="Merge VO + PO shards")
+    merge_group.add_argument("--vo", action="store_true", help="Merge VO shards only")
+    merge_group.add_argument("--po", action="store_true", help="Merge PO shards only")
+    merge_parser.add_argument(
+        "--shards-dir",
+        default=None,
+        help="Directory holding all shard results (default: shard.dir under data root)",
+    )
+    _add_profile_options(merge_parser)
 
     # 一键从 fetch -> etl（可用于本地/CI/Vercel）
     full_parser = subparsers.add_parser(
@@ -83,6 +184,9 @@ def build_parser() -> argparse.ArgumentParser:
     full_group.add_argument("--all", action="store_true", help="Fetch+ETL for both VO and PO")
     full_group.add_argument("--vo", action="store_true", help="Fetch+ETL for VO layer only")
     full_group.add_argument("--po", action="store_true", help="Fetch+ETL for PO layer only")
+    _add_window_option(full_parser)
+    _add_profile_options(full_parser)
+    _add_force_option(full_parser)
 
     # validate 子命令：对已导出的 data/meta 进行 schema 校验
     validate_parser = subparsers.add_parser(
@@ -107,28 +211,148 @@ def build_parser() -> argparse.ArgumentParser:
         default=None,
         help="Override path to meta JSON (defaults to generated path based on config)",
     )
+    _add_profile_options(validate_parser)
+
+    # sweep 子命令：一次加载原始数据，批量评估参数网格
+    sweep_parser = subparsers.add_parser(
+        "sweep",
+        help="Evaluate a grid of thresholds/weights/WOZ strategies on loaded data",
+    )
+    sweep_parser.add_argument(
+        "--layer",
+        choices=["po", "vo"],
+        required=True,
+        help="Layer to sweep (po or vo)",
+    )
+    sweep_parser.add_argument(
+        "--grid",
+        type=str,
+        default=None,
+        help="YAML/JSON file mapping parameter name -> list of values",
+    )
+    sweep_parser.add_argument(
+        "--param",
+        action="append",
+        default=None,
+        metavar="NAME=V1,V2",
+        help="Add/override one grid parameter, e.g. min_pupils_total=5,10,20; repeatable",
+    )
+
+    # publish 子命令：与上一发布版本按 BRIN 对比，写出增量补丁与版本链清单
+    publish_parser = subparsers.add_parser(
+        "publish",
+        help="Publish generated points as versioned snapshots with delta patches",
+    )
+    publish_group = publish_parser.add_mutually_exclusive_group()
+    publish_group.add_argument("--all", action="store_true", help="Publish VO + PO datasets")
+    publish_group.add_argument("--vo", action="store_true", help="Publish VO datasets only")
+    publish_group.add_argument("--po", action="store_true", help="Publish PO datasets only")
+
+    # history 子命令：查看运行历史趋势，标记偏离滚动基线的运行
+    history_parser = subparsers.add_parser(
+        "history",
+        help="Show run history trends and flag runs that deviate from the rolling baseline",
+    )
+    history_parser.add_argument("--layer", choices=["po", "vo"], default=None, help="Only show this layer")
+    history_parser.add_argument("--limit", type=int, default=20, help="Number of most recent runs to show")
+    history_parser.add_argument(
+        "--window", type=int, default=None, help="Rolling baseline size in runs (default: history.window)"
+    )
+    history_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=None,
+        help="Allowed relative deviation, e.g. 0.5 = 50%% (default: history.threshold)",
+    )
+    history_parser.add_argument("--stages", action="store_true", help="Also list per-stage timings of each run")
+    history_parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Exit with status 1 if the latest run of a shown layer is flagged",
+    )
+
+    # watch 子命令：常驻进程，原始数据 / config.yaml 变化时增量重建受影响的层
+    watch_parser = subparsers.add_parser(
+        "watch",
+        help="Poll raw data and config.yaml; incrementally rebuild the affected layers on change",
+    )
+    watch_group = watch_parser.add_mutually_exclusive_group()
+    watch_group.add_argument("--all", action="store_true", help="Watch VO + PO (default)")
+    watch_group.add_argument("--vo", action="store_true", help="Watch the VO layer only")
+    watch_group.add_argument("--po", action="store_true", help="Watch the PO layer only")
+    watch_parser.add_argument(
+        "--interval", type=float, default=None, help="Polling interval in seconds (default: watch.interval)"
+    )
+    watch_parser.add_argument(
+        "--reload-server",
+        type=str,
+        default=None,
+        metavar="PID_FILE",
+        help="Send SIGHUP to the view_xy_server whose pid is in this file when artifacts change "
+        "(start it with --pid-file; default: watch.server_pid_file)",
+    )
+
+    # serve 子命令：本地 ETL 作业服务（localhost HTTP + 有界线程池，原始数据常驻内存）
+    serve_parser = subparsers.add_parser(
+        "serve",
+        help="Run a localhost ETL job service that keeps parsed raw data warm in memory",
+    )
+    serve_parser.add_argument("--host", default=None, help="Bind address (default: service.host, 127.0.0.1)")
+    serve_parser.add_argument("--port", type=int, default=None, help="Port (default: service.port)")
+    serve_parser.add_argument(
+        "--workers", type=int, default=None, help="Jobs run concurrently (default: service.workers)"
+    )
 
     return parser
 
 
-def make_effective_config(args: argparse.Namespace) -> Dict[str, Any]:
+def _cli_overrides(args: argparse.Namespace) -> Dict[str, Any]:
     overrides: Dict[str, Any] = {}
     if args.data_root:
         overrides["data_root"] = args.data_root
     if args.output_root:
         overrides["output_root"] = args.output_root
+    if getattr(args, "window", None):
+        overrides["windows"] = list(args.window)
+    if getattr(args, "shard", None):
+        overrides["shard"] = {"index": args.shard[0], "count": args.shard[1]}
+    return overrides
 
-    config_path = None
-    if args.config:
-        from pathlib import Path
 
-        config_path = Path(args.config)
+def make_effective_config(args: argparse.Namespace) -> Dict[str, Any]:
+    overrides = _cli_overrides(args)
+    config_path = Path(args.config) if args.config else None
 
-    return config_mod.build_effective_config(
+    cfg = config_mod.build_effective_config(
         profile=args.profile,
         overrides=overrides or None,
         config_path=config_path,
     )
+    # --profile-cpu / --profile-mem：在 performance 配置上打开深度剖析（隐含 enabled）
+    profile_cpu = bool(getattr(args, "profile_cpu", False))
+    profile_mem = bool(getattr(args, "profile_mem", False))
+    if profile_cpu or profile_mem:
+        perf_cfg = dict(cfg.get("performance") or {})
+        perf_cfg.update(enabled=True)
+        if profile_cpu:
+            perf_cfg["profile_cpu"] = True
+        if profile_mem:
+            perf_cfg["profile_mem"] = True
+        cfg["performance"] = perf_cfg
+    # --force：跳过阶段缓存命中，全部重算并刷新缓存
+    if getattr(args, "force", False):
+        cfg["stage_cache"] = {**(cfg.get("stage_cache") or {}), "force": True}
+    return cfg
+
+
+def _trace_path(args: argparse.Namespace, cfg: Dict[str, Any]) -> Path:
+    """trace 输出路径：--trace-path（相对当前目录），否则 tracing.path（相对 data_root）。"""
+    if args.trace_path:
+        return Path(args.trace_path)
+    path = Path((cfg.get("tracing") or {}).get("path") or tracing.DEFAULT_TRACE_PATH)
+    if not path.is_absolute():
+        path = Path(cfg.get("data_root") or config_mod.PROJECT_ROOT) / path
+    return path
 
 
 def main(argv: Optional[List[str]] = None) -> int:
@@ -137,6 +361,18 @@ def main(argv: Optional[List[str]] = None) -> int:
 
     cfg = make_effective_config(args)
 
+    if not (args.trace or args.trace_path):
+        return _run_command(parser, args, cfg)
+    tracing.start()
+    try:
+        with tracing.span(f"cli.{args.command}", cat="cli"):
+            return _run_command(parser, args, cfg)
+    finally:
+        trace_path = tracing.stop(_trace_path(args, cfg))
+        print(f"Trace: {trace_path}")
+
+
+def _run_command(parser: argparse.ArgumentParser, args: argparse.Namespace, cfg: Dict[str, Any]) -> int:
     # 向后兼容：旧的 po / vo 子命令等价于新的 etl --po/--vo
     if args.command == "po":
         csv_path, stats = run_po_pipeline(cfg)
@@ -174,6 +410,9 @@ def main(argv: Optional[List[str]] = None) -> int:
         had_error = etl_mod.run_etl_from_cli_args(cfg, vo=vo, po=po)
         return 1 if had_error else 0
 
+    if args.command == "merge":
+        return _run_merge(parser, args, cfg)
+
     if args.command == "full":
         vo = bool(args.vo or args.all)
         po = bool(args.po or args.all)
@@ -210,9 +449,15 @@ def main(argv: Optional[List[str]] = None) -> int:
         data_path = Path(data_path_arg) if data_path_arg else default_data
         meta_path = Path(meta_path_arg) if meta_path_arg else default_meta
 
-        points = sv._load_json(data_path)  # type: ignore[attr-defined]
-        meta = sv._load_json(meta_path)  # type: ignore[attr-defined]
-        errors = sv.validate_points_against_meta(points, meta, layer=layer)
+        perf = PerfRecorder.from_config(cfg, layer=f"validate_{layer}", root=root)
+        with perf.stage("validate") as st:
+            points = sv._load_json(data_path)  # type: ignore[attr-defined]
+            meta = sv._load_json(meta_path)  # type: ignore[attr-defined]
+            errors = sv.validate_points_against_meta(points, meta, layer=layer)
+            st.rows_in = len(points) if isinstance(points, list) else None
+        perf_report = perf.report()
+        if perf_report["profile_dir"]:
+            print(f"剖析输出: {root / perf_report['profile_dir']}")
         if errors:
             # 详细错误仍输出到 stderr，保持与 schema_validator 模块一致
             sv._print_errors(errors)  # type: ignore[attr-defined]
@@ -230,11 +475,166 @@ def main(argv: Optional[List[str]] = None) -> int:
         )
         return 0
 
+    if args.command == "sweep":
+        layer = args.layer
+        try:
+            grid: Dict[str, Any] = sweep_mod.load_grid(Path(args.grid), layer) if args.grid else {}
+            for spec in args.param or []:
+                name, values = sweep_mod.parse_param_arg(spec)
+                grid[name] = values
+            out_path, result = sweep_mod.run_sweep(cfg, layer, grid)
+        except (OSError, ValueError) as exc:
+            # 网格文件缺失 / 非映射 / 无法解析、--param 格式错误：与运行失败一样给出一行错误并返回 1
+            print(f"{layer.upper()} sweep: {exc}")
+            return 1
+        if out_path is None:
+            print(f"{layer.upper()} sweep: {'; '.join(result.get('errors') or [])}")
+            return 1
+        print(
+            f"{layer.upper()} sweep: 已写入 {out_path}（{result['n_param_sets']} 组参数，"
+            f"耗时 {result['duration_seconds']}s）"
+        )
+        return 0
+
+    if args.command == "publish":
+        layers = [layer for layer, on in (("vo", args.vo), ("po", args.po)) if on or args.all]
+        manifest_path, manifest = publish_mod.run_publish(cfg, layers or ["vo", "po"])
+        for name, entry in sorted(manifest["datasets"].items()):
+            last = (entry.get("chain") or [None])[-1]
+            if last is not None and last["to"] == entry["latest"]:
+                delta = f"补丁 +{last['n_added']} -{last['n_removed']} ~{last['n_changed']}（{last['bytes']} 字节）"
+            else:
+                delta = "完整快照"
+            print(f"{name}: 版本 {entry['latest']}，{entry['n_points']} 个点，{delta}")
+        print(f"发布清单: {manifest_path}")
+        return 0
+
+    if args.command == "history":
+        return _run_history(args, cfg)
+
+    if args.command == "serve":
+        return _run_serve(args, cfg)
+
+    if args.command == "watch":
+        watch_cfg = dict(cfg.get("watch") or {})
+        layers = [layer for layer, on in (("po", args.po), ("vo", args.vo)) if on] or ["po", "vo"]
+        pid_file = args.reload_server or watch_cfg.get("server_pid_file")
+        watcher = watch_mod.Watcher(
+            lambda: make_effective_config(args),
+            layers=layers,
+            interval=args.interval or float(watch_cfg.get("interval") or watch_mod.DEFAULT_INTERVAL),
+            pid_file=Path(pid_file) if pid_file else None,
+        )
+        watcher.run()
+        return 0
+
     # 理论上不会到这里
     parser.print_help()
     return 1
 
 
+def _run_merge(parser: argparse.ArgumentParser, args: argparse.Namespace, cfg: Dict[str, Any]) -> int:
+    data_root = Path(cfg.get("data_root") or config_mod.PROJECT_ROOT)
+    shards_dir = Path(args.shards_dir) if args.shards_dir else sharding.shard_dir(cfg, data_root)
+    layers = [layer for layer, on in (("vo", args.vo), ("po", args.po)) if on or args.all] or ["vo", "po"]
+    runners = {"po": run_po_pipeline, "vo": run_vo_pipeline}
+    had_error = False
+    for layer in layers:
+        try:
+            bundles = sharding.load_bundles(shards_dir, layer)
+            csv_path, stats = runners[layer](cfg, sources=sharding.merge_sources(bundles, layer))
+        except sharding.ShardMergeError as exc:
+            parser.error(str(exc))
+        print(
+            f"{layer.upper()}: 已合并 {len(bundles)} 个分片 -> {csv_path}"
+            f"（共 {int(stats.get('n_schools', 0))} 所学校，排除 {int(stats.get('n_excluded', 0))} 所）"
+        )
+        if stats.get("run_report_path"):
+            print(f"{layer.upper()} 运行报告: {stats['run_report_path']}")
+        had_error = had_error or stats.get("summary_status") == "error"
+    return 1 if had_error else 0
+
+
+def _run_serve(args: argparse.Namespace, cfg: Dict[str, Any]) -> int:
+    service_cfg = dict(cfg.get("service") or {})
+    service = service_mod.JobService(
+        config_path=Path(args.config) if args.config else None,
+        profile=args.profile,
+        base_overrides=_cli_overrides(args),
+        workers=args.workers or int(service_cfg.get("workers") or service_mod.DEFAULT_WORKERS),
+        max_jobs=int(service_cfg.get("max_jobs") or service_mod.DEFAULT_MAX_JOBS),
+    ).start()
+    server = service_mod.make_service_server(
+        service,
+        args.host or str(service_cfg.get("host") or service_mod.DEFAULT_HOST),
+        args.port if args.port is not None else int(service_cfg.get("port") or service_mod.DEFAULT_PORT),
+    )
+    host, port = server.server_address[:2]
+    print(f"ETL 作业服务: http://{host}:{port}（{service.workers} 个工作线程；POST /jobs，GET /jobs/<id>，Ctrl-C 退出）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close(wait=False)
+    return 0
+
+
+def _run_history(args: argparse.Namespace, cfg: Dict[str, Any]) -> int:
+    settings = history_mod.history_settings(cfg)
+    window = args.window or settings["window"]
+    threshold = args.threshold if args.threshold is not None else settings["threshold"]
+    db_path: Path = settings["path"]
+    # 基线需要被展示运行之前的 window 次运行，多取一些再截断显示
+    runs = history_mod.load_runs(db_path, layer=args.layer, limit=args.limit + window * 2 if args.limit else None)
+    if not runs:
+        print(f"运行历史为空: {db_path}")
+        return 0
+    flagged = history_mod.detect_anomalies(
+        runs, window=window, threshold=threshold, min_seconds=settings["min_seconds"]
+    )
+    start = max(0, len(runs) - args.limit) if args.limit else 0
+    print(f"运行历史: {db_path}（基线 = 之前 {window} 次成功运行的中位数，阈值 {threshold:.0%}）")
+    print(f"{'id':>5}  {'layer':<5} {'started_at':<20} {'commit':<8} {'status':<7} {'duration':>9} {'trend':>7} "
+          f"{'schools':>8} {'excluded':>8}  config")
+    previous: Dict[str, Dict[str, Any]] = {}
+    for i, run in enumerate(runs):
+        prev = previous.get(run["layer"])
+        previous[run["layer"]] = run
+        if i < start:
+            continue
+        ratio = history_mod.baseline_ratio(runs, i, window)
+        print(
+            f"{run['id']:>5}  {run['layer']:<5} {str(run['started_at'] or '')[:19]:<20} "
+            f"{(run['git_commit'] or '-')[:8]:<8} {str(run['status'] or '-'):<7} "
+            f"{(run['duration_seconds'] or 0.0):>8.2f}s {(f'x{ratio:.2f}' if ratio else '-'):>7} "
+            f"{run['n_schools'] if run['n_schools'] is not None else '-':>8} "
+            f"{run['n_excluded'] if run['n_excluded'] is not None else '-':>8}  {(run['config_hash'] or '-')[:8]}"
+        )
+        if prev is not None:
+            added, removed, changed = history_mod.input_changes(prev, run)
+            if added or removed or changed:
+                print(f"         输入变化: +{len(added)} -{len(removed)} ~{len(changed)} {', '.join(changed + added)}")
+            if prev.get("config_hash") != run.get("config_hash"):
+                print("         配置已变化")
+        if args.stages:
+            for name, stage in run["stages"].items():
+                rows = stage["rows_out"] if stage["rows_out"] is not None else "-"
+                cached = "  (cached)" if stage.get("cached") else ""
+                print(f"         {name:<28} {stage['wall_seconds']:>8.3f}s  rows_out {rows}{cached}")
+        for note in flagged.get(int(run["id"]), []):
+            print(f"\033[91m         ⚠ {note}\033[0m")
+
+    if args.check:
+        latest = {run["layer"]: run for run in runs}
+        bad = [layer for layer, run in sorted(latest.items()) if int(run["id"]) in flagged]
+        if bad:
+            print(f"\033[91m❌ 最近一次运行偏离基线: {', '.join(bad)}\033[0m")
+            return 1
+    return 0
+
+
 if __name__ == "__main__":  # pragma: no cover
     raise SystemExit(main())
 
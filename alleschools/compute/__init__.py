@@ -5,17 +5,37 @@
 """
 
 from .indicators import compute_po_xy, compute_vo_xy  # noqa: F401
+from .rollup import rollup_rows, rollup_to_wide_rows  # noqa: F401
+from .quantile_sketch import QuantileSketch, clip_bounds_from_sketches  # noqa: F401
 from .vwo_scores import (  # noqa: F401
     SchoolVwoMean,
     compute_vwo_mean_latest_year,
 )
 from .vwo_profiles import compute_vwo_profile_indices  # noqa: F401
+from .year_cube import (  # noqa: F401
+    YearCube,
+    build_po_year_cube,
+    build_vo_year_cube,
+    parse_window,
+    query_xy,
+    query_xy_values,
+)
 
 __all__ = [
     "compute_po_xy",
     "compute_vo_xy",
+    "rollup_rows",
+    "rollup_to_wide_rows",
+    "QuantileSketch",
+    "clip_bounds_from_sketches",
     "SchoolVwoMean",
     "compute_vwo_mean_latest_year",
     "compute_vwo_profile_indices",
+    "YearCube",
+    "build_po_year_cube",
+    "build_vo_year_cube",
+    "parse_window",
+    "query_xy",
+    "query_xy_values",
 ]
 
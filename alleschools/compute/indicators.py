@@ -35,21 +35,57 @@ def get_woz_for_year(
     return best
 
 
+_SELECT_CUTOFF = 32
+
+
+def _select_pair(values: Sequence[float], k: int) -> Tuple[float, float]:
+    """
+    返回升序第 k 小与第 k+1 小的值（k 从 0 开始），平均 O(n)，不对整表排序。
+
+    introselect：三数取中作枢轴、按 <、=、> 三路划分，只在包含第 k 位的一侧继续；
+    迭代次数超过 2·log2(n) 时（病态枢轴）退化为对剩余部分排序，保证最坏 O(n log n)。
+    调用方需保证 k + 1 < len(values)。
+    """
+    a = list(values)
+    above: float | None = None  # 当前子表之上的最小已知值，用于取第 k+1 位
+    budget = 2 * max(len(a), 1).bit_length()
+    while True:
+        n = len(a)
+        if n <= _SELECT_CUTOFF or budget <= 0:
+            a.sort()
+            return a[k], (a[k + 1] if k + 1 < n else above)  # type: ignore[return-value]
+        budget -= 1
+        pivot = sorted((a[0], a[n // 2], a[-1]))[1]
+        lows = [v for v in a if v < pivot]
+        if k < len(lows):
+            a = lows
+            above = pivot
+            continue
+        highs = [v for v in a if v > pivot]
+        n_le = n - len(highs)
+        if k < n_le:
+            if k + 1 < n_le:
+                return pivot, pivot
+            return pivot, (min(highs) if highs else above)  # type: ignore[return-value]
+        k -= n_le
+        a = highs
+
+
 def _compute_percentile(values: Sequence[float], p: float) -> float:
-    """简单百分位数计算（0–100），用于异常值截断。"""
+    """百分位数计算（0–100，线性插值），用于异常值截断；基于选择而非全排序，平均 O(n)。"""
     if not values:
         return 0.0
-    vals = sorted(values)
     if p <= 0:
-        return vals[0]
+        return min(values)
     if p >= 100:
-        return vals[-1]
-    k = (p / 100.0) * (len(vals) - 1)
+        return max(values)
+    k = (p / 100.0) * (len(values) - 1)
     i = int(k)
     f = k - i
-    if i + 1 < len(vals):
-        return vals[i] + f * (vals[i + 1] - vals[i])
-    return vals[i]
+    if i + 1 < len(values):
+        lo, hi = _select_pair(values, i)
+        return lo + f * (hi - lo)
+    return max(values)
 
 
 def _apply_outlier_clipping(
@@ -57,11 +93,14 @@ def _apply_outlier_clipping(
     x_key: str,
     y_key: str,
     outliers: Dict[str, Any] | None,
+    bounds: Tuple[Tuple[float, float], Tuple[float, float]] | None = None,
 ) -> None:
     """
     在 rows 上就地对 X/Y 进行按百分位数的截断（winsorize）。
 
     outliers.clip_percentiles: [low, high]（例如 [1, 99]）
+    bounds: 可选的预先算好的 ((x_lo, x_hi), (y_lo, y_hi))，例如由 QuantileSketch 在流式/并行加载时得到；
+        提供时不再从 rows 收集数值计算百分位数。
     """
     if not outliers:
         return
@@ -76,15 +115,18 @@ def _apply_outlier_clipping(
     if not (0.0 <= low_p < high_p <= 100.0):
         return
 
-    x_vals = [float(r[x_key]) for r in rows if isinstance(r.get(x_key), (int, float))]
-    y_vals = [float(r[y_key]) for r in rows if isinstance(r.get(y_key), (int, float))]
-    if not x_vals and not y_vals:
-        return
+    if bounds is not None:
+        (x_lo, x_hi), (y_lo, y_hi) = bounds
+    else:
+        x_vals = [float(r[x_key]) for r in rows if isinstance(r.get(x_key), (int, float))]
+        y_vals = [float(r[y_key]) for r in rows if isinstance(r.get(y_key), (int, float))]
+        if not x_vals and not y_vals:
+            return
 
-    x_lo = _compute_percentile(x_vals, low_p) if x_vals else 0.0
-    x_hi = _compute_percentile(x_vals, high_p) if x_vals else 0.0
-    y_lo = _compute_percentile(y_vals, low_p) if y_vals else 0.0
-    y_hi = _compute_percentile(y_vals, high_p) if y_vals else 0.0
+        x_lo = _compute_percentile(x_vals, low_p) if x_vals else 0.0
+        x_hi = _compute_percentile(x_vals, high_p) if x_vals else 0.0
+        y_lo = _compute_percentile(y_vals, low_p) if y_vals else 0.0
+        y_hi = _compute_percentile(y_vals, high_p) if y_vals else 0.0
 
     for row in rows:
         if isinstance(row.get(x_key), (int, float)):
@@ -103,10 +145,15 @@ def compute_po_xy(
     woz_years: Iterable[int],
     woz_strategy: str = "nearest_year",
     outliers: Dict[str, Any] | None = None,
+    year_facts: Dict[str, List[dict]] | None = None,
 ) -> Tuple[List[dict], List[dict]]:
     """
     根据小学 Schooladviezen 与 WOZ 数据计算 X/Y。
 
+    year_facts: 可选；若提供，则就地填充 brin -> 逐年明细列表
+        （year, weight, pupils_total, vwo_equiv, vwo_share, woz_year, woz_used），
+        即加权汇总前的逐年指标，供星型长表等导出使用。
+
     返回:
         rows_out: 可直接用于写 CSV 的行列表
         excluded: 因样本过少被排除的学校列表
@@ -148,6 +195,7 @@ def compute_po_xy(
         sum_w_y_weights = 0.0
         years_used: List[str] = []
         n_years_with_woz = 0
+        facts: List[dict] = []
 
         for i, (start, end) in enumerate(SCHOOLJARS):
             key = (start, end)
@@ -165,6 +213,7 @@ def compute_po_xy(
             sum_w_x += w * x_year
 
             woz_year = WOZ_YEARS[i]
+            woz_val: float | None = None
             if pc4:
                 if woz_strategy == "nearest_year":
                     woz_val = get_woz_for_year(woz, woz_years_list, pc4, woz_year)
@@ -185,6 +234,18 @@ def compute_po_xy(
                     sum_w_y_weights += w
                     n_years_with_woz += 1
 
+            facts.append(
+                {
+                    "year": f"{start}-{end}",
+                    "weight": w,
+                    "pupils_total": total,
+                    "vwo_equiv": round(float(ydat["vwo_equiv"]), 2),
+                    "vwo_share": round(x_year, 2),
+                    "woz_year": woz_year,
+                    "woz_used": round(float(woz_val), 2) if woz_val is not None else None,
+                }
+            )
+
         x_linear = sum_w_x / sum_w if sum_w > 0 else 0.0
         y_linear = sum_w_y / sum_w_y_weights if sum_w_y_weights > 0 else 0.0
 
@@ -210,6 +271,8 @@ def compute_po_xy(
         row["has_full_woz"] = has_full_woz
         row["data_quality_flags"] = ""
         rows_out.append(row)
+        if year_facts is not None:
+            year_facts[brin] = facts
 
     if outliers:
         _apply_outlier_clipping(rows_out, "X_linear", "Y_linear", outliers)
@@ -217,17 +280,45 @@ def compute_po_xy(
     return rows_out, excluded
 
 
+def _vo_year_fact(
+    year: str,
+    weight: float,
+    hw: Dict[str, Dict[str, Any]],
+    vmbo: Dict[str, Dict[str, Any]],
+    all_kand: Dict[str, Any],
+    x_year: float | None,
+    y_year: float | None,
+) -> Dict[str, Any]:
+    """组装 VO 单校单学年的明细记录（compute_vo_xy 的 year_facts 条目）。"""
+    return {
+        "year": year,
+        "weight": weight,
+        "candidates": all_kand[year],
+        "havo_vwo_candidates": hw[year]["total"],
+        "vwo_geslaagd": hw[year]["vwo"],
+        "science_geslaagd": hw[year]["science"],
+        "vmbo_candidates": vmbo[year]["total"],
+        "vmbo_techniek": vmbo[year]["techniek"],
+        "vwo_share": round(x_year, 2) if x_year is not None else None,
+        "science_share": round(y_year, 2) if y_year is not None else None,
+    }
+
+
 def compute_vo_xy(
     schools: Dict[str, dict],
     brin_to_postcode: Dict[str, str],
     year_cols: List[Any],
     min_havo_vwo_total: int,
     outliers: Dict[str, Any] | None = None,
+    year_facts: Dict[str, List[dict]] | None = None,
 ) -> Tuple[List[dict], List[dict]]:
     """
     根据 VO 考试聚合数据计算每校 X/Y（线性与对数坐标）。
 
     year_cols: 每项 [col_kand, col_geslaagd, year_label, weight]，与 load_exam_schools 一致。
+    year_facts: 可选；若提供，则就地填充 brin -> 逐年明细列表（year, weight, 各类考生/通过人数、
+        vwo_share 与 science_share）。science_share 即当年参与加权的 Y 值：HAVO/VWO 学校为理科通过占比，
+        VMBO 学校为 techniek 考生占比。
     返回 (rows_out, excluded)。
     """
     rows_out: List[dict] = []
@@ -244,6 +335,7 @@ def compute_vo_xy(
         all_kand = data["all_kand"]
 
         years_used_vo: List[str] = []
+        facts: List[dict] = []
         if total_havo_vwo >= min_havo_vwo_total:
             sum_w = 0.0
             sum_w_x = 0.0
@@ -260,6 +352,7 @@ def compute_vo_xy(
                 sum_w += w
                 sum_w_x += w * x_year
                 sum_w_y += w * y_year
+                facts.append(_vo_year_fact(year, w, hw, vmbo, all_kand, x_year, y_year))
             x_linear = sum_w_x / sum_w if sum_w > 0 else 0.0
             y_linear = sum_w_y / sum_w if sum_w > 0 else 0.0
             type_label = "HAVO/VWO"
@@ -279,9 +372,12 @@ def compute_vo_xy(
                 sum_w += w
                 sum_w_y += w * y_year
                 # VWO 占比：scholengemeenschap 可能同时有 VMBO 和少量 VWO，按 vwo/total 计算
+                x_year_vmbo: float | None = None
                 if t_all > 0:
                     vwo_g = hw[year]["vwo"]
-                    sum_w_x += w * (100.0 * vwo_g / t_all)
+                    x_year_vmbo = 100.0 * vwo_g / t_all
+                    sum_w_x += w * x_year_vmbo
+                facts.append(_vo_year_fact(year, w, hw, vmbo, all_kand, x_year_vmbo, y_year))
             x_linear = sum_w_x / sum_w if sum_w > 0 else 0.0
             y_linear = sum_w_y / sum_w if sum_w > 0 else 0.0
             type_label = "VMBO"
@@ -322,6 +418,8 @@ def compute_vo_xy(
         row_vo["years_covered"] = years_covered_str
         row_vo["data_quality_flags"] = ""
         rows_out.append(row_vo)
+        if year_facts is not None:
+            year_facts[brin] = facts
 
     if outliers:
         _apply_outlier_clipping(rows_out, "X_linear", "Y_linear", outliers)
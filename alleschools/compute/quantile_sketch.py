@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+"""
+可合并的流式分位数草图（KLL sketch）。
+
+用于在流式或并行加载时（例如按 gemeente 分片、按参数扫描变体）累积 X/Y，
+无需保留全部数值即可得到 outliers.clip_percentiles 所需的截断边界：
+    - update(x) / extend(xs)：逐值写入；
+    - merge(other)：合并另一分片的草图（结合律成立，可任意顺序归并）；
+    - percentile(p)：近似百分位数；数据量未超过容量时不发生压缩，结果与
+      indicators._compute_percentile 完全一致。
+
+空间约为 O(k)，秩误差约为 O(n / k)。压缩时的随机取舍由 seed 决定，
+同一输入序列的结果可复现。
+"""
+
+import math
+import random
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from .indicators import _compute_percentile
+
+
+class QuantileSketch:
+    """KLL 分位数草图：第 h 层中的每个值代表 2**h 个原始值。"""
+
+    def __init__(self, k: int = 200, seed: int = 0) -> None:
+        if k < 8:
+            raise ValueError("k must be >= 8")
+        self.k = int(k)
+        self.n = 0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self._rng = random.Random(seed)
+        self._levels: List[List[float]] = [[]]
+
+    # --- 写入 -------------------------------------------------------------
+
+    def _capacity(self, h: int) -> int:
+        depth = len(self._levels) - h - 1
+        return max(2, int(math.ceil(self.k * (2.0 / 3.0) ** depth)))
+
+    def _size(self) -> int:
+        return sum(len(level) for level in self._levels)
+
+    def _max_size(self) -> int:
+        return sum(self._capacity(h) for h in range(len(self._levels)))
+
+    def update(self, value: float) -> None:
+        v = float(value)
+        self._levels[0].append(v)
+        self.n += 1
+        if self.min is None or v < self.min:
+            self.min = v
+        if self.max is None or v > self.max:
+            self.max = v
+        if len(self._levels[0]) >= self._capacity(0):
+            self._compress()
+
+    def extend(self, values: Iterable[float]) -> None:
+        for v in values:
+            self.update(v)
+
+    def _compress(self) -> None:
+        """自底向上压缩超出容量的层：排序后随机取奇/偶位提升到上一层（权重翻倍）。"""
+        while self._size() >= self._max_size():
+            for h in range(len(self._levels)):
+                if len(self._levels[h]) < self._capacity(h):
+                    continue
+                if h + 1 == len(self._levels):
+                    self._levels.append([])
+                items = sorted(self._levels[h])
+                # 奇数个时保留一个值在本层，保证权重守恒
+                keep = [items.pop()] if len(items) % 2 else []
+                offset = self._rng.randint(0, 1)
+                self._levels[h + 1].extend(items[offset::2])
+                self._levels[h] = keep
+                break
+            else:
+                return
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        """将 other 合并进本草图（就地），返回 self。"""
+        if other.n == 0:
+            return self
+        while len(self._levels) < len(other._levels):
+            self._levels.append([])
+        for h, level in enumerate(other._levels):
+            self._levels[h].extend(level)
+        self.n += other.n
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+        self._compress()
+        return self
+
+    # --- 查询 -------------------------------------------------------------
+
+    @property
+    def is_exact(self) -> bool:
+        """尚未发生压缩时，草图保存了全部原始值。"""
+        return all(not level for level in self._levels[1:])
+
+    def percentile(self, p: float) -> float:
+        """近似百分位数（0–100）；空草图返回 0.0，0/100 返回精确最小/最大值。"""
+        if self.n == 0:
+            return 0.0
+        if p <= 0:
+            return float(self.min)  # type: ignore[arg-type]
+        if p >= 100:
+            return float(self.max)  # type: ignore[arg-type]
+        if self.is_exact:
+            return _compute_percentile(self._levels[0], p)
+        weighted = sorted((v, 1 << h) for h, level in enumerate(self._levels) for v in level)
+        total = sum(w for _, w in weighted)
+        target = (p / 100.0) * total
+        acc = 0
+        for v, w in weighted:
+            acc += w
+            if acc >= target:
+                return v
+        return weighted[-1][0]
+
+    # --- 序列化（跨进程合并） ----------------------------------------------
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"k": self.k, "n": self.n, "min": self.min, "max": self.max, "levels": [list(l) for l in self._levels]}
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any], seed: int = 0) -> "QuantileSketch":
+        sketch = cls(k=int(data.get("k") or 200), seed=seed)
+        sketch.n = int(data.get("n") or 0)
+        sketch.min = data.get("min")
+        sketch.max = data.get("max")
+        sketch._levels = [[float(v) for v in level] for level in (data.get("levels") or [[]])] or [[]]
+        return sketch
+
+
+def clip_bounds_from_sketches(
+    x_sketch: QuantileSketch,
+    y_sketch: QuantileSketch,
+    outliers: Mapping[str, Any] | None,
+) -> Tuple[Tuple[float, float], Tuple[float, float]] | None:
+    """
+    由 X/Y 草图得到 _apply_outlier_clipping(bounds=...) 所需的 ((x_lo, x_hi), (y_lo, y_hi))。
+
+    outliers.clip_percentiles 缺失或非法时返回 None（与 _apply_outlier_clipping 的校验一致）。
+    """
+    if not outliers:
+        return None
+    clip = outliers.get("clip_percentiles")
+    if (
+        not isinstance(clip, (list, tuple))
+        or len(clip) != 2
+        or not all(isinstance(v, (int, float)) for v in clip)
+    ):
+        return None
+    low_p, high_p = float(clip[0]), float(clip[1])
+    if not (0.0 <= low_p < high_p <= 100.0):
+        return None
+    return (
+        (x_sketch.percentile(low_p), x_sketch.percentile(high_p)),
+        (y_sketch.percentile(low_p), y_sketch.percentile(high_p)),
+    )
+
+
+__all__ = ["QuantileSketch", "clip_bounds_from_sketches"]
@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+"""
+学校级结果的区域汇总（roll-up）：按 gemeente 或 PC4 分组。
+
+rollup_rows 对 compute_*_xy 的输出做一次遍历的哈希分组，每组累积：
+学校数、规模合计（PO: pupils_total；VO: candidates_total）、按规模加权的 X/Y 质心、
+未加权均值、X/Y 分位数以及学校类型分布。结果用于：
+    - privacy.max_detail_level = gemeente / pc4：以汇总行替代学校行发布（rollup_to_wide_rows）；
+    - 预计算汇总文件（{stem}_rollup_{level}.json），供前端缩小视图时替代数千个点。
+"""
+
+from typing import Any, Dict, Iterable, List, Mapping, Sequence
+
+from .indicators import _compute_percentile
+
+DETAIL_LEVELS: Sequence[str] = ("school", "pc4", "gemeente")
+
+DEFAULT_PERCENTILES: Sequence[float] = (10, 50, 90)
+
+# 区域汇总须至少包含的学校数：单校分组等同于学校行，max_detail_level 高于 school 时不得发布
+MIN_GROUP_SCHOOLS = 2
+
+
+def is_finer_than(level: str, max_detail_level: str) -> bool:
+    """level 是否比 max_detail_level 更细（按 DETAIL_LEVELS 从细到粗排序）；未知级别返回 False。"""
+    if level not in DETAIL_LEVELS or max_detail_level not in DETAIL_LEVELS:
+        return False
+    return DETAIL_LEVELS.index(level) < DETAIL_LEVELS.index(max_detail_level)
+
+
+def _group_key(row: Mapping[str, Any], level: str) -> str:
+    if level == "gemeente":
+        return str(row.get("gemeente") or "").strip()
+    if level == "pc4":
+        return str(row.get("postcode") or "").replace(" ", "")[:4]
+    raise ValueError(f"Unknown roll-up level {level!r}; expected one of {list(DETAIL_LEVELS[1:])}")
+
+
+def rollup_rows(
+    rows: Iterable[Mapping[str, Any]],
+    level: str,
+    size_key: str,
+    *,
+    percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+    sum_keys: Sequence[str] = (),
+    x_key: str = "X_linear",
+    y_key: str = "Y_linear",
+) -> List[Dict[str, Any]]:
+    """
+    按 level（gemeente / pc4）对学校行分组汇总，返回按 key 排序的分组统计列表。
+
+    每组字段：level, key, gemeente, n_schools, size_total, x_centroid, y_centroid（按 size_key 加权；
+    组内规模合计为 0 时退化为未加权均值）, x_mean, y_mean, x_p{p} / y_p{p}, types, years_covered,
+    sums（sum_keys 中各列的组内合计，布尔值按 1/0 计）以及组内 BRIN 列表 brins。
+    """
+    groups: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        key = _group_key(row, level)
+        g = groups.get(key)
+        if g is None:
+            g = groups[key] = {
+                "n": 0,
+                "size": 0.0,
+                "wx": 0.0,
+                "wy": 0.0,
+                "xs": [],
+                "ys": [],
+                "types": {},
+                "gemeenten": {},
+                "years": set(),
+                "sums": {k: 0.0 for k in sum_keys},
+                "brins": [],
+            }
+        x = float(row.get(x_key) or 0.0)
+        y = float(row.get(y_key) or 0.0)
+        size = float(row.get(size_key) or 0.0)
+        g["n"] += 1
+        g["size"] += size
+        g["wx"] += size * x
+        g["wy"] += size * y
+        g["xs"].append(x)
+        g["ys"].append(y)
+        type_label = row.get("type") or ""
+        g["types"][type_label] = g["types"].get(type_label, 0) + 1
+        gemeente = row.get("gemeente") or ""
+        g["gemeenten"][gemeente] = g["gemeenten"].get(gemeente, 0) + 1
+        for year in str(row.get("years_covered") or "").split(","):
+            if year.strip():
+                g["years"].add(year.strip())
+        for k in sum_keys:
+            g["sums"][k] += float(row.get(k) or 0.0)
+        g["brins"].append(row.get("BRIN"))
+
+    out: List[Dict[str, Any]] = []
+    for key in sorted(groups):
+        g = groups[key]
+        n = g["n"]
+        x_mean = sum(g["xs"]) / n
+        y_mean = sum(g["ys"]) / n
+        stat: Dict[str, Any] = {
+            "level": level,
+            "key": key,
+            "gemeente": max(g["gemeenten"].items(), key=lambda kv: (kv[1], kv[0]))[0],
+            "n_schools": n,
+            "size_total": int(round(g["size"])),
+            "x_centroid": round(g["wx"] / g["size"], 2) if g["size"] > 0 else round(x_mean, 2),
+            "y_centroid": round(g["wy"] / g["size"], 2) if g["size"] > 0 else round(y_mean, 2),
+            "x_mean": round(x_mean, 2),
+            "y_mean": round(y_mean, 2),
+        }
+        for p in percentiles:
+            label = f"{float(p):g}"
+            stat[f"x_p{label}"] = round(_compute_percentile(g["xs"], p), 2)
+            stat[f"y_p{label}"] = round(_compute_percentile(g["ys"], p), 2)
+        stat["types"] = dict(sorted(g["types"].items()))
+        stat["years_covered"] = sorted(g["years"])
+        stat["sums"] = {k: round(v, 2) for k, v in g["sums"].items()}
+        stat["brins"] = sorted(b for b in g["brins"] if b)
+        out.append(stat)
+    return out
+
+
+def rollup_to_wide_rows(
+    groups: Iterable[Mapping[str, Any]],
+    layer: str,
+) -> List[Dict[str, Any]]:
+    """
+    将分组统计转为与 compute_*_xy 输出同形的宽表行，使 CSV/JSON/GeoJSON/长表导出可直接复用。
+
+    BRIN 列为分组标识（"GM:<gemeente>" 或 "PC4:<pc4>"），type 取组内最多的学校类型，
+    X/Y 为加权质心，规模列为组内合计；data_quality_flags 标记 rollup 级别与学校数。
+    PO 的 has_full_woz 需 rollup_rows(sum_keys=("has_full_woz",))，VO 的 candidates_weighted_avg
+    需 sum_keys=("candidates_weighted_avg",)，否则分别为 False / 0。
+    """
+    rows: List[Dict[str, Any]] = []
+    for g in groups:
+        level = g["level"]
+        key = g["key"]
+        types: Mapping[str, int] = g.get("types") or {}
+        type_label = max(types.items(), key=lambda kv: (kv[1], kv[0]))[0] if types else ""
+        sums: Mapping[str, float] = g.get("sums") or {}
+        row: Dict[str, Any] = {
+            "BRIN": f"GM:{key}" if level == "gemeente" else f"PC4:{key}",
+            "vestigingsnaam": key if level == "gemeente" else f"{key} {g.get('gemeente') or ''}".strip(),
+            "gemeente": g.get("gemeente") or "",
+            "postcode": key if level == "pc4" else "",
+            "type": type_label,
+            "X_linear": g["x_centroid"],
+            "Y_linear": g["y_centroid"],
+            "years_covered": ",".join(g.get("years_covered") or []),
+            "data_quality_flags": f"rollup:{level};n_schools={g['n_schools']}",
+        }
+        if layer == "po":
+            row["pupils_total"] = g["size_total"]
+            row["has_full_woz"] = "has_full_woz" in sums and sums["has_full_woz"] == g["n_schools"]
+        else:
+            row["candidates_total"] = g["size_total"]
+            row["candidates_weighted_avg"] = round(float(sums.get("candidates_weighted_avg", 0.0)), 2)
+        rows.append(row)
+    return rows
+
+
+__all__ = [
+    "DETAIL_LEVELS",
+    "DEFAULT_PERCENTILES",
+    "MIN_GROUP_SCHOOLS",
+    "is_finer_than",
+    "rollup_rows",
+    "rollup_to_wide_rows",
+]
@@ -147,6 +147,7 @@ def compute_vwo_profile_indices(
     *,
     year_order: Sequence[str],
     year_weights: Mapping[str, float],
+    per_year: Dict[str, Dict[str, Dict[ProfileId, float]]] | None = None,
 ) -> Dict[ProfileId, Dict[str, float]]:
     """
     Compute 5-year weighted profiel indices X_NT, X_NG, X_EM, X_CM for each school.
@@ -161,6 +162,10 @@ def compute_vwo_profile_indices(
         This is used only for determinism; actual weights come from year_weights.
     year_weights:
         Mapping year_label -> weight w_k. Missing years are treated as weight 0.
+    per_year:
+        Optional; if given, it is filled in place with
+        brin -> {year_label -> {profile_id -> X_profile for that year}}
+        (the per-year values before time weighting, e.g. for detail shards).
 
     Returns
     -------
@@ -202,6 +207,8 @@ def compute_vwo_profile_indices(
 
         if not per_year_profile:
             continue
+        if per_year is not None:
+            per_year[brin] = per_year_profile
 
         # Time-weighted aggregation for each profile separately.
         for prof in ("NT", "NG", "EM", "CM"):
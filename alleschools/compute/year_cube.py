@@ -0,0 +1,535 @@
+from __future__ import annotations
+
+"""
+学校 × 学年「年度立方体」：预计算逐年分子/分母及其沿年份轴的前缀和。
+
+compute_po_xy / compute_vo_xy 只能按配置中固定的一组年份与权重计算一次 X/Y；
+本模块把 loader 输出整理为 [学校][学年] 的数值矩阵，并对每个度量保存两组前缀和：
+    - prefix[m][i][k]  = Σ_{j<k} m[i][j]
+    - wprefix[m][i][k] = Σ_{j<k} w_j · m[i][j]（w 为配置中的基础年权重）
+任意连续学年窗口的（加权）和因此只需一次减法；任意权重向量则为一次点积。
+query_xy 在此之上复现 compute_*_xy 的 X/Y 口径，可用于发布「最近 3 年」「最近 5 年」等变体，
+而不必重新运行 loader。
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from alleschools.config import MIN_PUPILS_TOTAL, SCHOOLJARS, WEIGHTS, WOZ_YEARS
+
+from .indicators import _apply_outlier_clipping, _compute_percentile, get_woz_for_year
+
+
+PO_MEASURES: Sequence[str] = (
+    "has_record",
+    "present",
+    "total",
+    "vwo_equiv",
+    "x_share",
+    "woz",
+    "woz_present",
+)
+
+VO_MEASURES: Sequence[str] = (
+    "all_kand",
+    "vwo_geslaagd",
+    "science",
+    "havo_vwo_total",
+    "vmbo_total",
+    "vmbo_techniek",
+    "present_hv",
+    "present_vmbo",
+    "x_share",
+    "x_share_vmbo",
+    "y_share_hv",
+    "y_share_vmbo",
+    "all_kand_vmbo",
+)
+
+
+@dataclass
+class YearCube:
+    """
+    单个 layer 的学校 × 学年数值立方体。
+
+    years:   学年标签（如 "2019-2020"），按时间升序；
+    weights: 与 years 对齐的基础年权重（来自 config）；
+    brins / info: 学校顺序与维度信息（naam, gemeente, postcode, type 等）；
+    measures / prefix / wprefix: 度量名 -> [学校][学年] 矩阵及其（加权）前缀和。
+    """
+
+    layer: str
+    years: List[str]
+    weights: List[float]
+    brins: List[str]
+    info: List[Dict[str, Any]]
+    measures: Dict[str, List[List[float]]] = field(default_factory=dict)
+    prefix: Dict[str, List[List[float]]] = field(default_factory=dict)
+    wprefix: Dict[str, List[List[float]]] = field(default_factory=dict)
+
+    def window_sums(self, measure: str, lo: int, hi: int, weighted: bool = True) -> List[float]:
+        """返回每所学校在学年下标 [lo, hi) 上的（基础权重加权）和，每校 O(1)。"""
+        table = self.wprefix[measure] if weighted else self.prefix[measure]
+        return [row[hi] - row[lo] for row in table]
+
+    def dot(self, measure: str, weights: Sequence[float], lo: int = 0, hi: Optional[int] = None) -> List[float]:
+        """返回每所学校在 [lo, hi) 上与任意权重向量（与 years 对齐）的点积。"""
+        hi = len(self.years) if hi is None else hi
+        w = [float(weights[j]) for j in range(lo, hi)]
+        return [sum(wj * v for wj, v in zip(w, row[lo:hi])) for row in self.measures[measure]]
+
+
+def _finalize(cube: YearCube) -> YearCube:
+    """为 cube.measures 中每个度量计算前缀和与基础权重加权前缀和。"""
+    for name, table in cube.measures.items():
+        pref: List[List[float]] = []
+        wpref: List[List[float]] = []
+        for row in table:
+            acc = 0.0
+            wacc = 0.0
+            p = [0.0]
+            wp = [0.0]
+            for w, v in zip(cube.weights, row):
+                acc += v
+                wacc += w * v
+                p.append(acc)
+                wp.append(wacc)
+            pref.append(p)
+            wpref.append(wp)
+        cube.prefix[name] = pref
+        cube.wprefix[name] = wpref
+    return cube
+
+
+def _woz_lookup(
+    woz: Mapping[Tuple[str, int], float],
+    woz_years_list: List[int],
+    pc4_means: Mapping[str, float],
+    pc4: str,
+    year: int,
+    woz_strategy: str,
+) -> float | None:
+    """与 compute_po_xy 相同的 WOZ 缺失值策略。"""
+    if woz_strategy == "drop":
+        return woz.get((pc4, year))
+    if woz_strategy == "pc4_mean":
+        val = woz.get((pc4, year))
+        return val if val is not None else pc4_means.get(pc4)
+    return get_woz_for_year(woz, woz_years_list, pc4, year)  # type: ignore[arg-type]
+
+
+def build_po_year_cube(
+    schools: Mapping[str, dict],
+    woz: Mapping[Tuple[str, int], float],
+    woz_years: Iterable[int],
+    woz_strategy: str = "nearest_year",
+) -> YearCube:
+    """
+    由 load_schooladviezen_po + load_woz_pc4_year 的输出构建 PO 年度立方体。
+
+    度量（PO_MEASURES）：has_record（该学年有记录）、present（total>0）、total、vwo_equiv、
+    x_share（100·vwo_equiv/total）、woz（该学年使用的 WOZ，缺失为 0）、woz_present。
+    """
+    woz_years_list = list(woz_years)
+    pc4_means: Dict[str, float] = {}
+    if woz_strategy == "pc4_mean":
+        sums: Dict[str, float] = {}
+        counts: Dict[str, int] = {}
+        for (pc4_key, _year), value in woz.items():
+            sums[pc4_key] = sums.get(pc4_key, 0.0) + float(value)
+            counts[pc4_key] = counts.get(pc4_key, 0) + 1
+        pc4_means = {k: v / counts[k] for k, v in sums.items() if counts.get(k)}
+
+    years = [f"{start}-{end}" for start, end in SCHOOLJARS]
+    cube = YearCube(layer="po", years=years, weights=[float(w) for w in WEIGHTS], brins=[], info=[])
+    cube.measures = {m: [] for m in PO_MEASURES}
+
+    for brin in sorted(schools.keys()):
+        data = schools[brin]
+        years_data = data.get("years") or {}
+        if not years_data:
+            continue
+        pc4 = data.get("pc4") or ""
+        type_label = data.get("soort_po") or "Bo"
+        if type_label not in ("Bo", "Sbo"):
+            type_label = "Bo"
+        cube.brins.append(brin)
+        cube.info.append(
+            {
+                "naam": data.get("naam"),
+                "gemeente": data.get("gemeente"),
+                "postcode": (data.get("postcode") or "").strip(),
+                "pc4": pc4,
+                "type": type_label,
+            }
+        )
+        rows = {m: [0.0] * len(years) for m in PO_MEASURES}
+        for i, key in enumerate(SCHOOLJARS):
+            ydat = years_data.get(key)
+            if ydat is None:
+                continue
+            rows["has_record"][i] = 1.0
+            total = float(ydat["total"])
+            rows["total"][i] = total
+            rows["vwo_equiv"][i] = float(ydat["vwo_equiv"])
+            if total <= 0:
+                continue
+            rows["present"][i] = 1.0
+            rows["x_share"][i] = 100.0 * float(ydat["vwo_equiv"]) / total
+            if pc4:
+                woz_val = _woz_lookup(woz, woz_years_list, pc4_means, pc4, WOZ_YEARS[i], woz_strategy)
+                if woz_val is not None:
+                    rows["woz"][i] = float(woz_val)
+                    rows["woz_present"][i] = 1.0
+        for m in PO_MEASURES:
+            cube.measures[m].append(rows[m])
+
+    return _finalize(cube)
+
+
+def build_vo_year_cube(
+    schools: Mapping[str, dict],
+    brin_to_postcode: Mapping[str, str],
+    year_cols: Sequence[Any],
+) -> YearCube:
+    """
+    由 load_exam_schools 的输出构建 VO 年度立方体（学年与基础权重取自 year_cols）。
+
+    除原始计数（all_kand, vwo_geslaagd, science, havo_vwo_total, vmbo_total, vmbo_techniek）外，
+    还保存 compute_vo_xy 所需的逐年比率与出现标记（见 VO_MEASURES）；*_vmbo 度量仅在该学年
+    VMBO 有考生时非零，对应 compute_vo_xy 的 VMBO 分支。
+    """
+    years = [str(y[2]) for y in year_cols]
+    weights = [float(y[3]) for y in year_cols]
+    cube = YearCube(layer="vo", years=years, weights=weights, brins=[], info=[])
+    cube.measures = {m: [] for m in VO_MEASURES}
+
+    for brin in sorted(schools.keys()):
+        data = schools[brin]
+        hw = data["havo_vwo"]
+        vmbo = data["vmbo"]
+        all_kand = data["all_kand"]
+        cube.brins.append(brin)
+        cube.info.append(
+            {
+                "naam": data.get("naam"),
+                "gemeente": data.get("gemeente"),
+                "postcode": brin_to_postcode.get(brin, ""),
+            }
+        )
+        rows = {m: [0.0] * len(years) for m in VO_MEASURES}
+        for i, year in enumerate(years):
+            t_all = float(all_kand[year])
+            t_vmbo = float(vmbo[year]["total"])
+            rows["all_kand"][i] = t_all
+            rows["vwo_geslaagd"][i] = float(hw[year]["vwo"])
+            rows["science"][i] = float(hw[year]["science"])
+            rows["havo_vwo_total"][i] = float(hw[year]["total"])
+            rows["vmbo_total"][i] = t_vmbo
+            rows["vmbo_techniek"][i] = float(vmbo[year]["techniek"])
+            if t_all > 0:
+                rows["present_hv"][i] = 1.0
+                rows["x_share"][i] = 100.0 * float(hw[year]["vwo"]) / t_all
+                rows["y_share_hv"][i] = 100.0 * float(hw[year]["science"]) / t_all
+            if t_vmbo > 0:
+                rows["present_vmbo"][i] = 1.0
+                rows["y_share_vmbo"][i] = 100.0 * float(vmbo[year]["techniek"]) / t_vmbo
+                rows["x_share_vmbo"][i] = rows["x_share"][i]
+                rows["all_kand_vmbo"][i] = t_all
+        for m in VO_MEASURES:
+            cube.measures[m].append(rows[m])
+
+    return _finalize(cube)
+
+
+def parse_window(spec: str) -> Tuple[int, int]:
+    """
+    解析窗口字符串 "2021-2024" -> (2021, 2024)。
+
+    窗口按学年边界闭区间理解：包含起始年 >= 2021 且结束年 <= 2024 的学年，
+    即 2021-2022、2022-2023、2023-2024。
+    """
+    parts = str(spec or "").strip().split("-")
+    if len(parts) != 2:
+        raise ValueError(f"Invalid window {spec!r}; expected 'YYYY-YYYY'")
+    try:
+        start, end = int(parts[0]), int(parts[1])
+    except ValueError:
+        raise ValueError(f"Invalid window {spec!r}; expected 'YYYY-YYYY'") from None
+    if start >= end:
+        raise ValueError(f"Invalid window {spec!r}; start year must be before end year")
+    return start, end
+
+
+def window_indices(cube: YearCube, window: Tuple[int, int]) -> Tuple[int, int]:
+    """将 (start, end) 窗口映射为 cube.years 上的半开下标区间 [lo, hi)。"""
+    start, end = window
+    idx: List[int] = []
+    for i, label in enumerate(cube.years):
+        s, e = label.split("-", 1)
+        if int(s) >= start and int(e) <= end:
+            idx.append(i)
+    if not idx:
+        raise ValueError(f"Window {start}-{end} does not cover any schoolyear in {cube.years}")
+    if idx != list(range(idx[0], idx[-1] + 1)):
+        raise ValueError(f"Window {start}-{end} maps to non-contiguous schoolyears in {cube.years}")
+    return idx[0], idx[-1] + 1
+
+
+def _ratio(num: float, den: float) -> float:
+    return num / den if den > 0 else 0.0
+
+
+def _sums(
+    cube: YearCube,
+    measure: str,
+    lo: int,
+    hi: int,
+    weights: Optional[Sequence[float]],
+) -> List[float]:
+    if weights is None:
+        return cube.window_sums(measure, lo, hi, weighted=True)
+    return cube.dot(measure, weights, lo, hi)
+
+
+def _years_covered(cube: YearCube, flag: str, i: int, lo: int, hi: int) -> str:
+    row = cube.measures[flag][i]
+    return ",".join(cube.years[j] for j in range(lo, hi) if row[j] > 0)
+
+
+def query_xy(
+    cube: YearCube,
+    window: Optional[Tuple[int, int]] = None,
+    weights: Optional[Sequence[float]] = None,
+    *,
+    min_pupils_total: int = MIN_PUPILS_TOTAL,
+    min_havo_vwo_total: int = 20,
+    outliers: Dict[str, Any] | None = None,
+) -> Tuple[List[dict], List[dict]]:
+    """
+    在年度立方体上按窗口和/或权重计算 X/Y，返回与 compute_*_xy 相同形状的 (rows_out, excluded)。
+
+    window:  (start, end)，见 parse_window；None 表示全部学年。
+    weights: 与 cube.years 对齐的权重向量；None 表示使用基础年权重（此时每校 O(1)）。
+    阈值（PO: min_pupils_total；VO: min_havo_vwo_total）按窗口内合计判断。
+    """
+    lo, hi = window_indices(cube, window) if window is not None else (0, len(cube.years))
+    if cube.layer == "po":
+        rows_out, excluded = _query_po(cube, lo, hi, weights, min_pupils_total)
+    else:
+        rows_out, excluded = _query_vo(cube, lo, hi, weights, min_havo_vwo_total)
+    if outliers:
+        _apply_outlier_clipping(rows_out, "X_linear", "Y_linear", outliers)
+    return rows_out, excluded
+
+
+def query_xy_values(
+    cube: YearCube,
+    window: Optional[Tuple[int, int]] = None,
+    weights: Optional[Sequence[float]] = None,
+    *,
+    min_pupils_total: int = MIN_PUPILS_TOTAL,
+    min_havo_vwo_total: int = 20,
+    outliers: Dict[str, Any] | None = None,
+) -> Tuple[List[str], List[float], List[float], int]:
+    """
+    query_xy 的精简版本：只返回 (brins, xs, ys, n_excluded)，不构造逐校行字典。
+
+    数值与 query_xy 的 X_linear / Y_linear 完全一致（含截断），供参数扫描等批量场景使用。
+    """
+    lo, hi = window_indices(cube, window) if window is not None else (0, len(cube.years))
+    if cube.layer == "po":
+        core = _po_core(cube, lo, hi, weights, min_pupils_total)
+    else:
+        core = _vo_core(cube, lo, hi, weights, min_havo_vwo_total)
+    xs, ys = core["x"], core["y"]
+    if outliers:
+        _clip_values(xs, ys, outliers)
+    return [cube.brins[i] for i in core["kept"]], xs, ys, len(core["excluded"])
+
+
+def _clip_values(xs: List[float], ys: List[float], outliers: Dict[str, Any]) -> None:
+    """与 _apply_outlier_clipping 相同的百分位截断，直接作用于数值列表。"""
+    clip = outliers.get("clip_percentiles")
+    if (
+        not isinstance(clip, (list, tuple))
+        or len(clip) != 2
+        or not all(isinstance(v, (int, float)) for v in clip)
+    ):
+        return
+    low_p, high_p = float(clip[0]), float(clip[1])
+    if not (0.0 <= low_p < high_p <= 100.0) or not xs:
+        return
+    for vals in (xs, ys):
+        lo_v = _compute_percentile(vals, low_p)
+        hi_v = _compute_percentile(vals, high_p)
+        vals[:] = [round(min(max(v, lo_v), hi_v), 2) for v in vals]
+
+
+def _po_core(
+    cube: YearCube,
+    lo: int,
+    hi: int,
+    weights: Optional[Sequence[float]],
+    min_pupils_total: int,
+) -> Dict[str, Any]:
+    """PO 数值核心：返回保留/排除的学校下标及对应 X/Y（已四舍五入到 2 位）与学生总数。"""
+    n_records = cube.window_sums("has_record", lo, hi, weighted=False)
+    pupils = cube.window_sums("total", lo, hi, weighted=False)
+    sum_w = _sums(cube, "present", lo, hi, weights)
+    # x_share / woz 在缺失年份为 0，因此可直接求和
+    sum_w_x = _sums(cube, "x_share", lo, hi, weights)
+    sum_w_y = _sums(cube, "woz", lo, hi, weights)
+    sum_w_y_weights = _sums(cube, "woz_present", lo, hi, weights)
+
+    kept: List[int] = []
+    excluded: List[int] = []
+    xs: List[float] = []
+    ys: List[float] = []
+    totals: List[int] = []
+    for i in range(len(cube.brins)):
+        if n_records[i] <= 0:
+            continue
+        pupils_total = int(round(pupils[i]))
+        if pupils_total < min_pupils_total:
+            excluded.append(i)
+            continue
+        kept.append(i)
+        xs.append(round(_ratio(sum_w_x[i], sum_w[i]), 2))
+        ys.append(round(_ratio(sum_w_y[i], sum_w_y_weights[i]), 2))
+        totals.append(pupils_total)
+    return {"kept": kept, "excluded": excluded, "x": xs, "y": ys, "pupils_total": totals}
+
+
+def _query_po(
+    cube: YearCube,
+    lo: int,
+    hi: int,
+    weights: Optional[Sequence[float]],
+    min_pupils_total: int,
+) -> Tuple[List[dict], List[dict]]:
+    core = _po_core(cube, lo, hi, weights, min_pupils_total)
+    n_present = cube.window_sums("present", lo, hi, weighted=False)
+    n_woz = cube.window_sums("woz_present", lo, hi, weighted=False)
+
+    rows_out: List[dict] = []
+    for k, i in enumerate(core["kept"]):
+        info = cube.info[i]
+        has_full_woz = bool(info.get("pc4") and n_present[i] > 0 and n_woz[i] == n_present[i])
+        rows_out.append(
+            {
+                "BRIN": cube.brins[i],
+                "vestigingsnaam": info["naam"],
+                "gemeente": info["gemeente"],
+                "postcode": info["postcode"],
+                "type": info["type"],
+                "X_linear": core["x"][k],
+                "Y_linear": core["y"][k],
+                "pupils_total": core["pupils_total"][k],
+                "years_covered": _years_covered(cube, "present", i, lo, hi),
+                "has_full_woz": has_full_woz,
+                "data_quality_flags": "",
+            }
+        )
+    return rows_out, _excluded_rows(cube, core["excluded"])
+
+
+def _vo_core(
+    cube: YearCube,
+    lo: int,
+    hi: int,
+    weights: Optional[Sequence[float]],
+    min_havo_vwo_total: int,
+) -> Dict[str, Any]:
+    """VO 数值核心：返回保留/排除的学校下标、X/Y、类型（HAVO/VWO 或 VMBO 分支）与加权平均考生数。"""
+    hv_total = cube.window_sums("havo_vwo_total", lo, hi, weighted=False)
+    vmbo_total = cube.window_sums("vmbo_total", lo, hi, weighted=False)
+    # HAVO/VWO 分支
+    hv_w = _sums(cube, "present_hv", lo, hi, weights)
+    hv_x = _sums(cube, "x_share", lo, hi, weights)
+    hv_y = _sums(cube, "y_share_hv", lo, hi, weights)
+    hv_cand = _sums(cube, "all_kand", lo, hi, weights)
+    # VMBO 分支：X 仍按 vwo/all_kand（all_kand 为 0 的年份贡献 0），分母为 VMBO 有考生的年份
+    vm_w = _sums(cube, "present_vmbo", lo, hi, weights)
+    vm_x = _sums(cube, "x_share_vmbo", lo, hi, weights)
+    vm_y = _sums(cube, "y_share_vmbo", lo, hi, weights)
+    vm_cand = _sums(cube, "all_kand_vmbo", lo, hi, weights)
+
+    kept: List[int] = []
+    excluded: List[int] = []
+    xs: List[float] = []
+    ys: List[float] = []
+    types: List[str] = []
+    cand_avgs: List[float] = []
+    for i in range(len(cube.brins)):
+        if hv_total[i] >= min_havo_vwo_total:
+            x_linear = _ratio(hv_x[i], hv_w[i])
+            y_linear = _ratio(hv_y[i], hv_w[i])
+            cand_avg = _ratio(hv_cand[i], hv_w[i])
+            types.append("HAVO/VWO")
+        elif vmbo_total[i] > 0:
+            x_linear = _ratio(vm_x[i], vm_w[i])
+            y_linear = _ratio(vm_y[i], vm_w[i])
+            cand_avg = _ratio(vm_cand[i], vm_w[i])
+            types.append("VMBO")
+        else:
+            excluded.append(i)
+            continue
+        kept.append(i)
+        xs.append(round(x_linear, 2))
+        ys.append(round(y_linear, 2))
+        cand_avgs.append(round(cand_avg, 2))
+    return {"kept": kept, "excluded": excluded, "x": xs, "y": ys, "type": types, "cand_avg": cand_avgs}
+
+
+def _query_vo(
+    cube: YearCube,
+    lo: int,
+    hi: int,
+    weights: Optional[Sequence[float]],
+    min_havo_vwo_total: int,
+) -> Tuple[List[dict], List[dict]]:
+    core = _vo_core(cube, lo, hi, weights, min_havo_vwo_total)
+    cand_total = cube.window_sums("all_kand", lo, hi, weighted=False)
+
+    rows_out: List[dict] = []
+    for k, i in enumerate(core["kept"]):
+        info = cube.info[i]
+        type_label = core["type"][k]
+        flag = "present_hv" if type_label == "HAVO/VWO" else "present_vmbo"
+        rows_out.append(
+            {
+                "BRIN": cube.brins[i],
+                "vestigingsnaam": info["naam"],
+                "gemeente": info["gemeente"],
+                "postcode": info["postcode"],
+                "type": type_label,
+                "X_linear": core["x"][k],
+                "Y_linear": core["y"][k],
+                "candidates_total": int(round(cand_total[i])),
+                "candidates_weighted_avg": core["cand_avg"][k],
+                "years_covered": _years_covered(cube, flag, i, lo, hi),
+                "data_quality_flags": "",
+            }
+        )
+    return rows_out, _excluded_rows(cube, core["excluded"])
+
+
+def _excluded_rows(cube: YearCube, indices: List[int]) -> List[dict]:
+    return [
+        {"BRIN": cube.brins[i], "naam": cube.info[i]["naam"], "gemeente": cube.info[i]["gemeente"]}
+        for i in indices
+    ]
+
+
+__all__ = [
+    "PO_MEASURES",
+    "VO_MEASURES",
+    "YearCube",
+    "build_po_year_cube",
+    "build_vo_year_cube",
+    "parse_window",
+    "window_indices",
+    "query_xy",
+    "query_xy_values",
+]
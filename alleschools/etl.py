@@ -26,6 +26,7 @@ import urllib.request
 from alleschools import config as config_mod
 from alleschools import fetch_cbs_woz as cbs_woz
 from alleschools import pipeline
+from alleschools import tracing
 
 
 def _get_data_root(cfg: Dict[str, Any]) -> Path:
@@ -56,6 +57,16 @@ def _get_raw_root(cfg: Dict[str, Any]) -> Path:
 # Fetch helpers
 # ---------------------------------------------------------------------------
 
+def _download(url: str, out_path: Path) -> Path:
+    """urlretrieve 包一层 fetch.download span，并把文件字节数累加到 bytes_downloaded 计数器。"""
+    with tracing.span("fetch.download", cat="fetch", url=url) as sp:
+        urllib.request.urlretrieve(url, out_path)
+        n_bytes = out_path.stat().st_size
+        sp.args["bytes"] = n_bytes
+    tracing.counter("bytes_downloaded", cumulative=True, total=n_bytes)
+    return out_path
+
+
 def fetch_vo_exams(data_root: Path) -> Path:
     """
     下载 VO 考试全量 CSV 到 data_root。
@@ -66,8 +77,7 @@ def fetch_vo_exams(data_root: Path) -> Path:
     data_root.mkdir(parents=True, exist_ok=True)
     out_path = data_root / "duo_examen_raw_all.csv"
     print(f"[fetch] VO exams: {url} -> {out_path}")
-    urllib.request.urlretrieve(url, out_path)
-    return out_path
+    return _download(url, out_path)
 
 
 def fetch_vo_vestigingen(data_root: Path) -> Path:
@@ -80,8 +90,7 @@ def fetch_vo_vestigingen(data_root: Path) -> Path:
     data_root.mkdir(parents=True, exist_ok=True)
     out_path = data_root / "duo_vestigingen_vo.csv"
     print(f"[fetch] VO vestigingen: {url} -> {out_path}")
-    urllib.request.urlretrieve(url, out_path)
-    return out_path
+    return _download(url, out_path)
 
 
 def fetch_vo_vwo_exam_scores(data_root: Path) -> Dict[str, Path]:
@@ -109,8 +118,7 @@ def fetch_vo_vwo_exam_scores(data_root: Path) -> Dict[str, Path]:
         url = f"{base_url}/{filename}"
         out_path = data_root / filename
         print(f"[fetch] VO VWO exam scores: {url} -> {out_path}")
-        urllib.request.urlretrieve(url, out_path)
-        out[schooljaar] = out_path
+        out[schooljaar] = _download(url, out_path)
     return out
 
 
@@ -151,7 +159,7 @@ def fetch_po_schooladviezen(
         out_path = data_root / out_name
         try:
             print(f"[fetch] PO schooladviezen: {url} -> {out_path}")
-            urllib.request.urlretrieve(url, out_path)
+            _download(url, out_path)
             ok += 1
         except Exception as exc:  # pragma: no cover - 网络异常
             print(f"[fetch]   failed for {out_name}: {exc}")
@@ -172,7 +180,7 @@ def fetch_cbs_woz(data_root: Path) -> Path:
             zip_path = os.path.join(tmpdir, zip_name)
             try:
                 print(f"[fetch] CBS WOZ: downloading {url}")
-                urllib.request.urlretrieve(url, zip_path)
+                _download(url, Path(zip_path))
             except Exception as exc:  # pragma: no cover - 网络异常
                 print(f"[fetch]   download failed for {zip_name}: {exc}")
                 continue
@@ -186,7 +194,9 @@ def fetch_cbs_woz(data_root: Path) -> Path:
                     continue
                 zf.extract(gpkg_names[0], tmpdir)
                 gpkg_path = os.path.join(tmpdir, gpkg_names[0])
-            rows = cbs_woz.extract_woz_from_gpkg(gpkg_path, year)
+            with tracing.span("fetch.cbs_woz.extract", cat="fetch", year=year) as sp:
+                rows = cbs_woz.extract_woz_from_gpkg(gpkg_path, year)
+                sp.args["rows"] = len(rows)
             all_rows.extend(rows)
             print(f"[fetch]   {year}: {len(rows)} valid WOZ rows")
 
@@ -202,10 +212,14 @@ def fetch_cbs_woz(data_root: Path) -> Path:
 
 def run_etl_vo(cfg: Dict[str, Any]) -> Dict[str, Any]:
     """基于当前配置跑 VO 聚合流水线。返回 pipeline 的 stats（含 summary_status）。"""
-    csv_path, stats = pipeline.run_vo_pipeline(cfg)
+    with tracing.span("etl.vo", cat="etl"):
+        csv_path, stats = pipeline.run_vo_pipeline(cfg)
     n = int(stats.get("n_schools", 0))
     n_excluded = int(stats.get("n_excluded", 0))
-    print(f"VO: 已写入 {csv_path}（共 {n} 所中学，排除 {n_excluded} 所）")
+    if stats.get("shard"):
+        print(f"VO 分片 {stats['shard']}: 已写入 {csv_path}（共 {n} 所中学，排除 {n_excluded} 所；用 merge 合并）")
+    else:
+        print(f"VO: 已写入 {csv_path}（共 {n} 所中学，排除 {n_excluded} 所）")
     if stats.get("run_report_path"):
         print(f"VO 运行报告: {stats['run_report_path']}")
     return stats
@@ -213,10 +227,14 @@ def run_etl_vo(cfg: Dict[str, Any]) -> Dict[str, Any]:
 
 def run_etl_po(cfg: Dict[str, Any]) -> Dict[str, Any]:
     """基于当前配置跑 PO 聚合流水线。返回 pipeline 的 stats（含 summary_status）。"""
-    csv_path, stats = pipeline.run_po_pipeline(cfg)
+    with tracing.span("etl.po", cat="etl"):
+        csv_path, stats = pipeline.run_po_pipeline(cfg)
     n = int(stats.get("n_schools", 0))
     n_excluded = int(stats.get("n_excluded", 0))
-    print(f"PO: 已写入 {csv_path}（共 {n} 所小学，排除 {n_excluded} 所）")
+    if stats.get("shard"):
+        print(f"PO 分片 {stats['shard']}: 已写入 {csv_path}（共 {n} 所小学，排除 {n_excluded} 所；用 merge 合并）")
+    else:
+        print(f"PO: 已写入 {csv_path}（共 {n} 所小学，排除 {n_excluded} 所）")
     if stats.get("run_report_path"):
         print(f"PO 运行报告: {stats['run_report_path']}")
     return stats
@@ -227,13 +245,16 @@ def run_fetch_from_cli_args(cfg: Dict[str, Any], *, vo: bool, po: bool, cbs_woz:
     raw_root = _get_raw_root(cfg)
     if vo:
         # VO fetch 同时需要考试数据、vestigingen 映射，以及 VWO 科目成绩明细
-        fetch_vo_exams(raw_root)
-        fetch_vo_vestigingen(raw_root)
-        fetch_vo_vwo_exam_scores(raw_root)
+        with tracing.span("fetch.vo", cat="fetch"):
+            fetch_vo_exams(raw_root)
+            fetch_vo_vestigingen(raw_root)
+            fetch_vo_vwo_exam_scores(raw_root)
     if po:
-        fetch_po_schooladviezen(raw_root)
+        with tracing.span("fetch.po", cat="fetch"):
+            fetch_po_schooladviezen(raw_root)
     if cbs_woz:
-        fetch_cbs_woz(raw_root)
+        with tracing.span("fetch.cbs_woz", cat="fetch"):
+            fetch_cbs_woz(raw_root)
 
 
 def run_etl_from_cli_args(cfg: Dict[str, Any], *, vo: bool, po: bool) -> bool:
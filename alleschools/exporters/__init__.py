@@ -1,13 +1,23 @@
 """
 导出模块。
 
-负责将计算结果写出为 CSV/JSON/GeoJSON/长表/points JSON 等格式。
+负责将计算结果写出为 CSV/JSON/GeoJSON/长表/points JSON/搜索索引/gemeente 分片/学校明细分片/密度金字塔/地图聚类索引等格式。
 """
 
+from .cluster_exporter import build_cluster_index, export_cluster_index  # noqa: F401
 from .csv_exporter import export_po_csv, export_vo_csv  # noqa: F401
+from .density_exporter import build_density_pyramid, export_density_tiles  # noqa: F401
+from .detail_exporter import build_school_details, export_detail_shards  # noqa: F401
 from .geojson_exporter import export_geojson  # noqa: F401
-from .long_table_exporter import export_po_long_table, export_vo_long_table  # noqa: F401
+from .long_table_exporter import (  # noqa: F401
+    export_po_long_table,
+    export_po_star_tables,
+    export_vo_long_table,
+    export_vo_star_tables,
+)
 from .points_exporter import export_po_points, export_vo_points  # noqa: F401
+from .search_index_exporter import build_search_index, export_search_index  # noqa: F401
+from .shard_exporter import export_gemeente_shards  # noqa: F401
 
 __all__ = [
     "export_po_csv",
@@ -15,7 +25,18 @@ __all__ = [
     "export_geojson",
     "export_po_long_table",
     "export_vo_long_table",
+    "export_po_star_tables",
+    "export_vo_star_tables",
     "export_po_points",
     "export_vo_points",
+    "build_search_index",
+    "export_search_index",
+    "export_gemeente_shards",
+    "build_school_details",
+    "export_detail_shards",
+    "build_density_pyramid",
+    "export_density_tiles",
+    "build_cluster_index",
+    "export_cluster_index",
 ]
 
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+"""
+地图视图的分层点聚类索引：构建期按缩放级别做贪心半径聚类，浏览器按级别查表，无需在前端重新聚类。
+
+输入为 GeoJSON FeatureCollection（geojson_exporter 的输出；geometry 为 null 的学校不参与）。
+坐标投影到 Web Mercator 单位正方形；第 z 级的聚类半径为 radius / (extent * 2**z)（radius、extent 以像素计，
+与 512 像素瓦片一致）。从叶子层（max_zoom + 1，即单个学校）开始逐级向上：
+在边长等于半径的网格上，每个尚未归属的条目吸收 3×3 邻格内半径范围内的其他未归属条目，形成上一级的一个聚类。
+输出 {stem}_geo_clusters.json（与 {stem}_geo.json 同目录），列式数组：
+    {
+      "version": 1, "layer": "po", "radius": 60, "extent": 512, "min_zoom": 0, "max_zoom": 16, "n_points": N,
+      "levels": [
+        {"zoom": z, "n": k, "lon": [...], "lat": [...], "count": [...], "x": [...], "y": [...], "size": [...],
+         "parent": [...]},              # parent[i]：该条目在 zoom - 1 级中的下标（min_zoom 级没有 parent）
+        ...,
+        {"zoom": max_zoom + 1, ..., "brin": [...]}   # 叶子层：每个条目即一所学校
+      ]
+    }
+聚类的 lon / lat 为成员按学校数加权的中心，x / y 为成员学校 X/Y 的平均值，size 为规模合计；
+聚类 id 即 (zoom, 下标)，展开聚类时取 zoom + 1 级中 parent 等于该下标的条目。
+"""
+
+import json
+import math
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+from alleschools.tracing import traced
+
+CLUSTER_INDEX_VERSION = 1
+DEFAULT_RADIUS = 60
+DEFAULT_EXTENT = 512
+DEFAULT_MIN_ZOOM = 0
+DEFAULT_MAX_ZOOM = 16
+
+# 条目字段下标：投影坐标、学校数、X/Y 合计及其计数、规模合计
+_MX, _MY, _COUNT, _XS, _XN, _YS, _YN, _SIZE = range(8)
+
+
+def _number(v: Any) -> Optional[float]:
+    if v is None or isinstance(v, bool):
+        return None
+    try:
+        f = float(v)
+    except (TypeError, ValueError):
+        return None
+    return f if math.isfinite(f) else None
+
+
+def _project(lon: float, lat: float) -> List[float]:
+    """经纬度 → Web Mercator 单位正方形 [0, 1]²。"""
+    s = math.sin(max(-85.0511, min(85.0511, lat)) * math.pi / 180.0)
+    y = 0.5 - 0.25 * math.log((1 + s) / (1 - s)) / math.pi
+    return [lon / 360.0 + 0.5, min(1.0, max(0.0, y))]
+
+
+def _unproject(mx: float, my: float) -> List[float]:
+    lon = (mx - 0.5) * 360.0
+    lat = 360.0 * math.atan(math.exp((180.0 - my * 360.0) * math.pi / 180.0)) / math.pi - 90.0
+    return [round(lon, 6), round(lat, 6)]
+
+
+def _cluster_level(items: Sequence[List[float]], r: float) -> Dict[str, Any]:
+    """对上一级条目做一次贪心半径聚类，返回 {"items": 新条目, "parent": 旧条目 → 新条目下标}。"""
+    grid: Dict[tuple, List[int]] = {}
+    for i, it in enumerate(items):
+        grid.setdefault((int(it[_MX] / r), int(it[_MY] / r)), []).append(i)
+
+    r2 = r * r
+    parent = [-1] * len(items)
+    out: List[List[float]] = []
+    for i, it in enumerate(items):
+        if parent[i] >= 0:
+            continue
+        k = len(out)
+        parent[i] = k
+        acc = [it[_MX] * it[_COUNT], it[_MY] * it[_COUNT]] + list(it[_COUNT:])
+        gx, gy = int(it[_MX] / r), int(it[_MY] / r)
+        for cx in (gx - 1, gx, gx + 1):
+            for cy in (gy - 1, gy, gy + 1):
+                for j in grid.get((cx, cy), ()):
+                    if parent[j] >= 0:
+                        continue
+                    other = items[j]
+                    dx = other[_MX] - it[_MX]
+                    dy = other[_MY] - it[_MY]
+                    if dx * dx + dy * dy > r2:
+                        continue
+                    parent[j] = k
+                    acc[_MX] += other[_MX] * other[_COUNT]
+                    acc[_MY] += other[_MY] * other[_COUNT]
+                    for f in range(_COUNT, _SIZE + 1):
+                        acc[f] += other[f]
+        acc[_MX] /= acc[_COUNT]
+        acc[_MY] /= acc[_COUNT]
+        out.append(acc)
+    return {"items": out, "parent": parent}
+
+
+def _level_record(zoom: int, items: Sequence[List[float]]) -> Dict[str, Any]:
+    lonlat = [_unproject(it[_MX], it[_MY]) for it in items]
+    return {
+        "zoom": zoom,
+        "n": len(items),
+        "lon": [p[0] for p in lonlat],
+        "lat": [p[1] for p in lonlat],
+        "count": [int(it[_COUNT]) for it in items],
+        "x": [round(it[_XS] / it[_XN], 2) if it[_XN] else None for it in items],
+        "y": [round(it[_YS] / it[_YN], 2) if it[_YN] else None for it in items],
+        "size": [round(it[_SIZE], 3) for it in items],
+    }
+
+
+def build_cluster_index(
+    features: Sequence[Mapping[str, Any]],
+    *,
+    x_field: str = "X_linear",
+    y_field: str = "Y_linear",
+    size_field: str = "pupils_total",
+    id_field: str = "BRIN",
+    radius: float = DEFAULT_RADIUS,
+    extent: int = DEFAULT_EXTENT,
+    min_zoom: int = DEFAULT_MIN_ZOOM,
+    max_zoom: int = DEFAULT_MAX_ZOOM,
+) -> Dict[str, Any]:
+    """由 GeoJSON features 构建分层聚类索引（见模块说明）。"""
+    leaves: List[List[float]] = []
+    ids: List[Any] = []
+    for feat in features:
+        geom = feat.get("geometry") or {}
+        coords = geom.get("coordinates") if geom.get("type") == "Point" else None
+        if not coords or _number(coords[0]) is None or _number(coords[1]) is None:
+            continue
+        props = feat.get("properties") or {}
+        x = _number(props.get(x_field))
+        y = _number(props.get(y_field))
+        leaves.append(
+            _project(float(coords[0]), float(coords[1]))
+            + [1.0, x or 0.0, 1.0 if x is not None else 0.0, y or 0.0, 1.0 if y is not None else 0.0,
+               _number(props.get(size_field)) or 0.0]
+        )
+        ids.append(props.get(id_field))
+
+    leaf_record = _level_record(max_zoom + 1, leaves)
+    leaf_record["brin"] = ids
+    levels: List[Dict[str, Any]] = [leaf_record]
+    items = leaves
+    for zoom in range(max_zoom, min_zoom - 1, -1):
+        step = _cluster_level(items, radius / (extent * 2.0**zoom))
+        levels[-1]["parent"] = step["parent"]
+        items = step["items"]
+        levels.append(_level_record(zoom, items))
+
+    return {
+        "version": CLUSTER_INDEX_VERSION,
+        "radius": radius,
+        "extent": extent,
+        "min_zoom": min_zoom,
+        "max_zoom": max_zoom,
+        "n_points": len(leaves),
+        "levels": levels[::-1],
+    }
+
+
+@traced(cat="exporter")
+def export_cluster_index(
+    features: Sequence[Mapping[str, Any]],
+    path: Path,
+    layer: str,
+    **options: Any,
+) -> Dict[str, Any]:
+    """构建并写出 {stem}_geo_clusters.json，返回索引字典；options 透传给 build_cluster_index。"""
+    index = build_cluster_index(features, **options)
+    doc = {"version": index.pop("version"), "layer": layer, **index}
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as f:
+        json.dump(doc, f, ensure_ascii=False, separators=(",", ":"))
+    return doc
+
+
+__all__ = [
+    "CLUSTER_INDEX_VERSION",
+    "DEFAULT_RADIUS",
+    "DEFAULT_MAX_ZOOM",
+    "build_cluster_index",
+    "export_cluster_index",
+]
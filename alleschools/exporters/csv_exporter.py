@@ -8,6 +8,8 @@ import csv
 from pathlib import Path
 from typing import Iterable, Mapping, Sequence
 
+from alleschools.tracing import traced
+
 
 PO_FIELDNAMES: Sequence[str] = [
     "BRIN",
@@ -59,6 +61,7 @@ VO_PROFILES_FIELDNAMES: Sequence[str] = [
 ]
 
 
+@traced(cat="exporter")
 def export_po_csv(
     rows: Iterable[Mapping[str, object]],
     path: Path,
@@ -78,6 +81,7 @@ def export_po_csv(
         writer.writerows(rows)
 
 
+@traced(cat="exporter")
 def export_vo_csv(
     rows: Iterable[Mapping[str, object]],
     path: Path,
@@ -94,6 +98,7 @@ def export_vo_csv(
         writer.writerows(rows)
 
 
+@traced(cat="exporter")
 def export_vo_profiles_csv(
     rows: Iterable[Mapping[str, object]],
     path: Path,
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+"""
+X/Y 散点密度金字塔导出：按缩放级别预计算二维直方图，供前端在低缩放时绘制密度、仅在可视窗口内绘制单点。
+
+每个数据集（po / vo / VO profiel vo_nt 等）在其数据范围 extent = [xmin, ymin, xmax, ymax] 上分箱：
+第 z 级每轴 base_bins * 2**z 个箱。点只在最细一级分箱一次（整数箱号），
+较粗的级别由下一级的 2×2 子箱合并得到，每级耗时与非空箱数成正比。
+输出 {stem}_density.json：
+    {
+      "version": 1, "layer": "vo", "base_bins": 8, "n_levels": 5,
+      "datasets": {
+        "vo": {"x_field", "y_field", "size_field", "n_points", "extent": [...], "types": [类型名...],
+               "levels": [{"level": z, "bins": n, "n_cells": k,
+                           "ix": [...], "iy": [...], "count": [...], "size_sum": [...], "type": [...]}]},
+        ...
+      }
+    }
+每级只列出非空箱（列式数组，按 iy、ix 排序）；type 为该箱内点数最多的类型在 types 中的下标。
+"""
+
+import json
+import math
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from alleschools.tracing import traced
+
+DENSITY_VERSION = 1
+DEFAULT_BASE_BINS = 8
+DEFAULT_LEVELS = 5
+
+_Cell = Tuple[int, int]
+
+
+def _finite(v: Any) -> Optional[float]:
+    if isinstance(v, bool) or not isinstance(v, (int, float)):
+        return None
+    f = float(v)
+    return f if math.isfinite(f) else None
+
+
+def _extent(xs: Sequence[float], ys: Sequence[float]) -> List[float]:
+    x0, x1, y0, y1 = min(xs), max(xs), min(ys), max(ys)
+    # 退化范围（所有点同一坐标）扩展为单位宽度，避免除零
+    if x1 <= x0:
+        x1 = x0 + 1.0
+    if y1 <= y0:
+        y1 = y0 + 1.0
+    return [x0, y0, x1, y1]
+
+
+def _dominant(types: Mapping[str, int]) -> str:
+    # 点数最多的类型；并列时取名称最小者，保证输出稳定
+    return min(types, key=lambda t: (-types[t], t))
+
+
+def _level_record(
+    level: int,
+    bins: int,
+    cells: Mapping[_Cell, List[Any]],
+    type_ids: Mapping[str, int],
+) -> Dict[str, Any]:
+    order = sorted(cells, key=lambda c: (c[1], c[0]))
+    return {
+        "level": level,
+        "bins": bins,
+        "n_cells": len(order),
+        "ix": [c[0] for c in order],
+        "iy": [c[1] for c in order],
+        "count": [cells[c][0] for c in order],
+        "size_sum": [round(cells[c][1], 3) for c in order],
+        "type": [type_ids[_dominant(cells[c][2])] for c in order],
+    }
+
+
+def build_density_pyramid(
+    points: Sequence[Mapping[str, Any]],
+    *,
+    x_field: str = "x_linear",
+    y_field: str = "y_linear",
+    size_field: str = "size",
+    type_field: str = "school_type",
+    base_bins: int = DEFAULT_BASE_BINS,
+    levels: int = DEFAULT_LEVELS,
+) -> Dict[str, Any]:
+    """构建单个数据集的密度金字塔（无数值坐标的点不计入）。"""
+    base_bins = max(1, int(base_bins))
+    levels = max(1, int(levels))
+    coords = [(_finite(p.get(x_field)), _finite(p.get(y_field)), p) for p in points]
+    coords = [(x, y, p) for x, y, p in coords if x is not None and y is not None]
+    dataset: Dict[str, Any] = {
+        "x_field": x_field,
+        "y_field": y_field,
+        "size_field": size_field,
+        "n_points": len(coords),
+        "extent": None,
+        "types": [],
+        "levels": [],
+    }
+    if not coords:
+        return dataset
+
+    extent = _extent([c[0] for c in coords], [c[1] for c in coords])
+    fine = base_bins << (levels - 1)
+    sx = fine / (extent[2] - extent[0])
+    sy = fine / (extent[3] - extent[1])
+    last = fine - 1
+
+    # 最细一级：每点一次整数分箱，箱值为 [点数, 规模合计, {类型: 点数}]
+    cells: Dict[_Cell, List[Any]] = {}
+    for x, y, p in coords:
+        cell = (min(last, int((x - extent[0]) * sx)), min(last, int((y - extent[1]) * sy)))
+        acc = cells.get(cell)
+        if acc is None:
+            acc = cells[cell] = [0, 0.0, {}]
+        acc[0] += 1
+        acc[1] += _finite(p.get(size_field)) or 0.0
+        t = str(p.get(type_field) or "")
+        acc[2][t] = acc[2].get(t, 0) + 1
+
+    types = sorted({t for acc in cells.values() for t in acc[2]})
+    type_ids = {t: i for i, t in enumerate(types)}
+
+    records: List[Dict[str, Any]] = [_level_record(levels - 1, fine, cells, type_ids)]
+    for level in range(levels - 2, -1, -1):
+        parent: Dict[_Cell, List[Any]] = {}
+        for (ix, iy), acc in cells.items():
+            cell = (ix >> 1, iy >> 1)
+            merged = parent.get(cell)
+            if merged is None:
+                merged = parent[cell] = [0, 0.0, {}]
+            merged[0] += acc[0]
+            merged[1] += acc[1]
+            for t, n in acc[2].items():
+                merged[2][t] = merged[2].get(t, 0) + n
+        cells = parent
+        records.append(_level_record(level, base_bins << level, cells, type_ids))
+
+    dataset["extent"] = extent
+    dataset["types"] = types
+    dataset["levels"] = records[::-1]
+    return dataset
+
+
+@traced(cat="exporter")
+def export_density_tiles(
+    datasets: Mapping[str, Mapping[str, Any]],
+    path: Path,
+    layer: str,
+    *,
+    base_bins: int = DEFAULT_BASE_BINS,
+    levels: int = DEFAULT_LEVELS,
+) -> Dict[str, Any]:
+    """
+    写出 {stem}_density.json 并返回其内容。
+
+    datasets: 名称 -> {"points": [...], 可选 "x_field" / "y_field" / "size_field" / "type_field"}。
+    """
+    out: Dict[str, Any] = {}
+    for name, spec in datasets.items():
+        fields = {k: spec[k] for k in ("x_field", "y_field", "size_field", "type_field") if spec.get(k)}
+        out[name] = build_density_pyramid(spec.get("points") or [], base_bins=base_bins, levels=levels, **fields)
+    doc: Dict[str, Any] = {
+        "version": DENSITY_VERSION,
+        "layer": layer,
+        "base_bins": max(1, int(base_bins)),
+        "n_levels": max(1, int(levels)),
+        "datasets": out,
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as f:
+        json.dump(doc, f, ensure_ascii=False, separators=(",", ":"))
+    return doc
+
+
+__all__ = [
+    "DENSITY_VERSION",
+    "DEFAULT_BASE_BINS",
+    "DEFAULT_LEVELS",
+    "build_density_pyramid",
+    "export_density_tiles",
+]
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+"""
+学校明细分片导出：保存 compute_po_xy / compute_vo_xy 加权汇总前的逐年序列，供前端点击学校时按需加载。
+
+- 每校一条明细：基础信息 + 汇总 X/Y + years（compute_*_xy 的 year_facts 逐年记录：占比、人数、
+  PO 的 woz_year / woz_used）；VO 另附 profiles（逐年 profiel 指数）与 profile_indices（加权后指数）；
+- 明细按 BRIN 前 prefix_length 位分组，每组一个内容寻址文件 details/<layer>/<sha256 前 16 位>.json，
+  内容不变则文件名不变，可长期缓存；
+- 索引 {stem}_details.json：{"version", "layer", "prefix_length", "n_schools",
+  "shards": {前缀: {"path", "count", "bytes", "sha256"}}}；BRIN → 分片即 shards[BRIN[:prefix_length]]。
+"""
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+from alleschools.tracing import traced
+
+DETAIL_INDEX_VERSION = 1
+DEFAULT_PREFIX_LENGTH = 3
+
+_SIZE_KEYS = {"po": "pupils_total", "vo": "candidates_total"}
+
+
+def build_school_details(
+    rows: Iterable[Mapping[str, Any]],
+    layer: str,
+    year_facts: Mapping[str, List[Mapping[str, Any]]],
+    *,
+    profile_years: Optional[Mapping[str, Mapping[str, Mapping[str, float]]]] = None,
+    profile_indices: Optional[Mapping[str, Mapping[str, float]]] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    由发布的宽表行与逐年明细组装 brin -> 明细记录。
+
+    仅包含 rows 中出现且有逐年明细的学校（汇总行或被隐私抑制的学校不会出现），
+    保证明细分片不会泄露主数据中未发布的学校。
+    """
+    details: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        brin = str(row.get("BRIN") or "")
+        facts = year_facts.get(brin)
+        if not brin or not facts:
+            continue
+        record: Dict[str, Any] = {
+            "brin": brin,
+            "name": row.get("vestigingsnaam"),
+            "gemeente": row.get("gemeente"),
+            "type": row.get("type"),
+            "x_linear": row.get("X_linear"),
+            "y_linear": row.get("Y_linear"),
+            "size": row.get(_SIZE_KEYS[layer]),
+            "years": [dict(f) for f in facts],
+        }
+        if profile_years is not None and brin in profile_years:
+            record["profiles"] = {
+                year: {prof: round(float(v), 3) for prof, v in sorted(vals.items())}
+                for year, vals in sorted(profile_years[brin].items())
+            }
+        if profile_indices is not None:
+            indices = {prof: round(float(m[brin]), 3) for prof, m in profile_indices.items() if brin in m}
+            if indices:
+                record["profile_indices"] = indices
+        details[brin] = record
+    return details
+
+
+@traced(cat="exporter")
+def export_detail_shards(
+    details: Mapping[str, Mapping[str, Any]],
+    index_path: Path,
+    layer: str,
+    *,
+    prefix_length: int = DEFAULT_PREFIX_LENGTH,
+) -> Dict[str, Any]:
+    """
+    按 BRIN 前缀写出内容寻址的明细分片与索引 JSON，返回索引字典。
+
+    分片写在索引同级的 details/<layer>/ 目录下（该目录由本函数管理，写入前清理旧分片）。
+    """
+    prefix_length = max(1, int(prefix_length))
+    groups: Dict[str, Dict[str, Mapping[str, Any]]] = {}
+    for brin in sorted(details):
+        groups.setdefault(brin[:prefix_length], {})[brin] = details[brin]
+
+    shard_dir = index_path.parent / "details" / layer
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    for old in shard_dir.glob("*.json"):
+        old.unlink()
+
+    shards: Dict[str, Dict[str, Any]] = {}
+    for prefix in sorted(groups):
+        body = json.dumps(groups[prefix], ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        digest = hashlib.sha256(body).hexdigest()
+        path = shard_dir / f"{digest[:16]}.json"
+        path.write_bytes(body)
+        shards[prefix] = {
+            "path": path.relative_to(index_path.parent).as_posix(),
+            "count": len(groups[prefix]),
+            "bytes": len(body),
+            "sha256": digest,
+        }
+
+    index: Dict[str, Any] = {
+        "version": DETAIL_INDEX_VERSION,
+        "layer": layer,
+        "prefix_length": prefix_length,
+        "n_schools": len(details),
+        "shards": shards,
+    }
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    with index_path.open("w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, separators=(",", ":"))
+    return index
+
+
+def shard_for_brin(index: Mapping[str, Any], brin: str) -> Optional[Mapping[str, Any]]:
+    """按索引查找某 BRIN 所在分片条目（不存在时返回 None）。"""
+    return (index.get("shards") or {}).get(str(brin)[: int(index.get("prefix_length") or DEFAULT_PREFIX_LENGTH)])
+
+
+__all__ = [
+    "DETAIL_INDEX_VERSION",
+    "DEFAULT_PREFIX_LENGTH",
+    "build_school_details",
+    "export_detail_shards",
+    "shard_for_brin",
+]
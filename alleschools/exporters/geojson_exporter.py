@@ -11,6 +11,8 @@ import json
 from pathlib import Path
 from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
 
+from alleschools.tracing import traced
+
 
 def _load_pc4_centroids(path: Optional[Path]) -> Dict[str, Tuple[float, float]]:
     """
@@ -50,13 +52,14 @@ def _row_to_properties(row: Mapping[str, Any]) -> Dict[str, Any]:
     return {k: v for k, v in row.items()}
 
 
+@traced(cat="exporter")
 def export_geojson(
     rows: Iterable[Mapping[str, Any]],
     path: Path,
     lookup_path: Optional[str] = None,
-) -> None:
+) -> Dict[str, Any]:
     """
-    将学校结果写出为 GeoJSON FeatureCollection。
+    将学校结果写出为 GeoJSON FeatureCollection，并返回该 FeatureCollection（供聚类索引等后续导出复用）。
 
     - properties：每行所有键值（与主 CSV 列一致）。
     - geometry：若 lookup_path 指向的 CSV 中存在该行的 PC4（由 postcode 前 4 位得到）则为 Point(lon, lat)，否则为 null。
@@ -82,6 +85,7 @@ def export_geojson(
     fc = {"type": "FeatureCollection", "features": features}
     with path.open("w", encoding="utf-8") as f:
         json.dump(fc, f, ensure_ascii=False, indent=2)
+    return fc
 
 
 __all__ = ["export_geojson"]
@@ -10,7 +10,10 @@ import json
 from pathlib import Path
 from typing import Any, Iterable, Mapping
 
+from alleschools.tracing import traced
 
+
+@traced(cat="exporter")
 def export_json(items: Iterable[Mapping[str, Any]], path: Path) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
     # 与现有实现保持格式一致：ensure_ascii=False, indent=0
@@ -18,6 +21,7 @@ def export_json(items: Iterable[Mapping[str, Any]], path: Path) -> None:
         json.dump(list(items), f, ensure_ascii=False, indent=0)
 
 
+@traced(cat="exporter")
 def write_meta_json(meta: Mapping[str, Any], path: Path) -> None:
     """将单条 meta 信息写出为 JSON 文件（便于工具与文档消费）。"""
     path.parent.mkdir(parents=True, exist_ok=True)
@@ -2,12 +2,19 @@ from __future__ import annotations
 
 """
 长表导出：按「学校 × 学年」展开为 CSV，便于 BI 按年筛选。
+
+两种模式：
+- wide（默认，向后兼容）：宽表行按 years_covered 复制，每行附 year 列；
+- star：规范化星型结构，学校维表（每个 BRIN 一行）+ 逐年事实表（仅含真实的逐年指标，
+  来自 compute_*_xy 的 year_facts）。
 """
 
 import csv
 from pathlib import Path
 from typing import Any, Dict, Iterable, List, Mapping, Sequence, Tuple
 
+from alleschools.tracing import traced
+
 from .csv_exporter import (
     PO_FIELDNAMES,
     PO_META_FIELDNAMES,
@@ -16,6 +23,32 @@ from .csv_exporter import (
 )
 
 
+PO_FACT_FIELDNAMES: Sequence[str] = [
+    "BRIN",
+    "year",
+    "weight",
+    "pupils_total",
+    "vwo_equiv",
+    "vwo_share",
+    "woz_year",
+    "woz_used",
+]
+
+VO_FACT_FIELDNAMES: Sequence[str] = [
+    "BRIN",
+    "year",
+    "weight",
+    "candidates",
+    "havo_vwo_candidates",
+    "vwo_geslaagd",
+    "science_geslaagd",
+    "vmbo_candidates",
+    "vmbo_techniek",
+    "vwo_share",
+    "science_share",
+]
+
+
 def _expand_rows(
     rows: Iterable[Mapping[str, Any]],
     fieldnames: Sequence[str],
@@ -46,6 +79,7 @@ def _expand_rows(
     return out, long_names
 
 
+@traced(cat="exporter")
 def export_po_long_table(
     rows: Iterable[Mapping[str, Any]],
     path: Path,
@@ -62,6 +96,7 @@ def export_po_long_table(
         writer.writerows(expanded)
 
 
+@traced(cat="exporter")
 def export_vo_long_table(
     rows: Iterable[Mapping[str, Any]],
     path: Path,
@@ -78,4 +113,83 @@ def export_vo_long_table(
         writer.writerows(expanded)
 
 
-__all__ = ["export_po_long_table", "export_vo_long_table"]
+def _fact_rows(
+    rows: Iterable[Mapping[str, Any]],
+    year_facts: Mapping[str, Sequence[Mapping[str, Any]]],
+) -> List[Dict[str, Any]]:
+    """按 rows 的顺序（即维表顺序）展开逐年事实；不在 rows 中的 BRIN（如被隐私抑制）不会输出。"""
+    out: List[Dict[str, Any]] = []
+    for row in rows:
+        brin = row.get("BRIN")
+        if not brin:
+            continue
+        for fact in year_facts.get(str(brin)) or ():
+            r = dict(fact)
+            r["BRIN"] = brin
+            out.append(r)
+    return out
+
+
+def _write_star_tables(
+    rows: Iterable[Mapping[str, Any]],
+    year_facts: Mapping[str, Sequence[Mapping[str, Any]]],
+    dim_path: Path,
+    fact_path: Path,
+    dim_fieldnames: Sequence[str],
+    fact_fieldnames: Sequence[str],
+) -> None:
+    rows_list = list(rows)
+    for p in (dim_path, fact_path):
+        p.parent.mkdir(parents=True, exist_ok=True)
+    with dim_path.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(dim_fieldnames), extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows_list)
+    with fact_path.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(fact_fieldnames), extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(_fact_rows(rows_list, year_facts))
+
+
+@traced(cat="exporter")
+def export_po_star_tables(
+    rows: Iterable[Mapping[str, Any]],
+    year_facts: Mapping[str, Sequence[Mapping[str, Any]]],
+    dim_path: Path,
+    fact_path: Path,
+    include_meta_columns: bool = True,
+) -> None:
+    """
+    将 PO 结果写出为星型长表：学校维表（每个 BRIN 一行，列同宽表）+ 逐年事实表（PO_FACT_FIELDNAMES）。
+
+    year_facts 为 compute_po_xy(year_facts=...) 填充的 brin -> 逐年明细。
+    """
+    dim_fieldnames = list(PO_FIELDNAMES) + (list(PO_META_FIELDNAMES) if include_meta_columns else [])
+    _write_star_tables(
+        rows, year_facts, Path(dim_path), Path(fact_path), dim_fieldnames, PO_FACT_FIELDNAMES
+    )
+
+
+@traced(cat="exporter")
+def export_vo_star_tables(
+    rows: Iterable[Mapping[str, Any]],
+    year_facts: Mapping[str, Sequence[Mapping[str, Any]]],
+    dim_path: Path,
+    fact_path: Path,
+    include_meta_columns: bool = True,
+) -> None:
+    """将 VO 结果写出为星型长表：学校维表 + 逐年事实表（VO_FACT_FIELDNAMES）。"""
+    dim_fieldnames = list(VO_FIELDNAMES) + (list(VO_META_FIELDNAMES) if include_meta_columns else [])
+    _write_star_tables(
+        rows, year_facts, Path(dim_path), Path(fact_path), dim_fieldnames, VO_FACT_FIELDNAMES
+    )
+
+
+__all__ = [
+    "PO_FACT_FIELDNAMES",
+    "VO_FACT_FIELDNAMES",
+    "export_po_long_table",
+    "export_vo_long_table",
+    "export_po_star_tables",
+    "export_vo_star_tables",
+]
@@ -16,8 +16,17 @@ def build_po_meta(
     row_count: int,
     columns: Sequence[str],
     outliers: Dict[str, Any] | None = None,
+    shards: Mapping[str, Any] | None = None,
+    details: Mapping[str, Any] | None = None,
+    density: Mapping[str, Any] | None = None,
+    geo_clusters: Mapping[str, Any] | None = None,
 ) -> Dict[str, Any]:
-    """为 PO points 数据构建 meta JSON。"""
+    """
+    为 PO points 数据构建 meta JSON。
+
+    shards / details / density / geo_clusters 为可选引用：按 gemeente 分片清单、按 BRIN 前缀分组的学校明细索引、
+    X/Y 密度金字塔、地图分层聚类索引。
+    """
     meta: Dict[str, Any] = {
         "version": SCHEMA_VERSION,
         "layer": "po",
@@ -149,6 +158,18 @@ def build_po_meta(
         meta["summary"]["outliers"] = {
             "clip_percentiles": outliers.get("clip_percentiles"),
         }
+    if shards:
+        # 按 gemeente 分片的清单（相对 meta 同目录），前端可按需加载单个 gemeente 的点
+        meta["shards"] = dict(shards)
+    if details:
+        # 学校明细索引（逐年序列），点击学校时按 BRIN 前缀懒加载
+        meta["details"] = dict(details)
+    if density:
+        # 多级 X/Y 密度直方图，低缩放时代替逐点绘制
+        meta["density"] = dict(density)
+    if geo_clusters:
+        # 地图视图按缩放级别查表的聚类索引（与 {stem}_geo.json 同目录）
+        meta["geo_clusters"] = dict(geo_clusters)
     return meta
 
 
@@ -157,8 +178,12 @@ def build_vo_meta(
     row_count: int,
     columns: Sequence[str],
     outliers: Dict[str, Any] | None = None,
+    shards: Mapping[str, Any] | None = None,
+    details: Mapping[str, Any] | None = None,
+    density: Mapping[str, Any] | None = None,
+    geo_clusters: Mapping[str, Any] | None = None,
 ) -> Dict[str, Any]:
-    """为 VO points 数据构建 meta JSON（示意版，重点是结构对齐）。"""
+    """为 VO points 数据构建 meta JSON（示意版，重点是结构对齐）；shards / details / density / geo_clusters 同 build_po_meta。"""
     meta: Dict[str, Any] = {
         "version": SCHEMA_VERSION,
         "layer": "vo",
@@ -266,6 +291,14 @@ def build_vo_meta(
         meta["summary"]["outliers"] = {
             "clip_percentiles": outliers.get("clip_percentiles"),
         }
+    if shards:
+        meta["shards"] = dict(shards)
+    if details:
+        meta["details"] = dict(details)
+    if density:
+        meta["density"] = dict(density)
+    if geo_clusters:
+        meta["geo_clusters"] = dict(geo_clusters)
     return meta
 
 
@@ -274,6 +307,8 @@ def build_vo_profiles_meta(
     row_counts: Mapping[str, int],
     *,
     y_domain: Sequence[float] | None = None,
+    shards: Mapping[str, Any] | None = None,
+    density: Mapping[str, Any] | None = None,
 ) -> Dict[str, Any]:
     """
     为 VO profiel 图构建 meta JSON。
@@ -284,6 +319,10 @@ def build_vo_profiles_meta(
         profile_id -> 行数
     y_domain:
         VWO 占比 Y 轴 domain，默认 [0, 100]。
+    shards:
+        按 gemeente 分片清单的引用（VO 清单同时包含 vo_nt 等 profiel 数据集），可选。
+    density:
+        X/Y 密度金字塔的引用（同样包含 vo_nt 等 profiel 数据集），可选。
     """
     y_dom = list(y_domain) if y_domain is not None else [0.0, 100.0]
     profiles_summary: Dict[str, Any] = {}
@@ -459,6 +498,10 @@ def build_vo_profiles_meta(
             "y_domain": y_dom,
         },
     }
+    if shards:
+        meta["shards"] = dict(shards)
+    if density:
+        meta["density"] = dict(density)
     return meta
 
 
@@ -9,6 +9,8 @@ from typing import Any, Dict, Iterable, List, Mapping
 
 import json
 
+from alleschools.tracing import traced
+
 
 def _po_row_to_point(row: Mapping[str, Any]) -> Dict[str, Any]:
     """将 PO 宽表行映射为 points data schema 的单个点对象。"""
@@ -68,6 +70,7 @@ def _vo_row_to_point(row: Mapping[str, Any]) -> Dict[str, Any]:
     }
 
 
+@traced(cat="exporter")
 def export_po_points(
     rows: Iterable[Mapping[str, Any]],
     path: Path,
@@ -79,6 +82,7 @@ def export_po_points(
         json.dump(points, f, ensure_ascii=False, indent=2)
 
 
+@traced(cat="exporter")
 def export_vo_points(
     rows: Iterable[Mapping[str, Any]],
     path: Path,
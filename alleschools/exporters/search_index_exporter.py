@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+"""
+学校搜索索引导出：在导出阶段为前端搜索框预先构建紧凑的静态索引（{stem}_search.json）。
+
+文档编号 = 宽表行顺序（与 points JSON / CSV 的行顺序一致）。索引结构：
+    {
+      "version": 1, "layer": "po", "n_docs": N,
+      "brins": [...], "acronyms": [...],          # 按文档编号对齐，首字母缩写无需在前端逐键重算
+      "prefix":   {"keys": [...], "postings": [[...], ...]},
+      "trigrams": {"keys": [...], "postings": [[...], ...]}
+    }
+- prefix：vestigingsnaam / gemeente 中的单词、BRIN 与首字母缩写（均大写）组成的有序词表，
+  前端对前缀二分查找得到 [lo, hi) 区间后合并对应 postings；
+- trigrams：名称、首字母缩写、BRIN、gemeente 与去空白 postcode 的所有三元组，
+  子串搜索词的候选集 = 其全部三元组 postings 的交集（超集，仍需按 pointMatchesSearch 校验）；
+- postings 为升序文档编号的差分编码（首项为绝对值，其后为相邻差值），压缩 JSON 体积。
+"""
+
+import json
+import re
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Set
+
+from alleschools.tracing import traced
+
+SEARCH_INDEX_VERSION = 1
+
+_WS = re.compile(r"\s")
+_WORD = re.compile(r"[^\W_]+", re.UNICODE)
+
+
+def acronym_from_name(naam: str) -> str:
+    """名称首字母缩写（与 view_xy_logic.acronymFromName 相同）。"""
+    return "".join(w[0].upper() for w in str(naam or "").strip().split() if w)
+
+
+def delta_encode(ids: Iterable[int]) -> List[int]:
+    """升序整数序列 → 差分编码（首项为绝对值）。"""
+    out: List[int] = []
+    prev = 0
+    for i in ids:
+        out.append(i - prev)
+        prev = i
+    return out
+
+
+def delta_decode(deltas: Iterable[int]) -> List[int]:
+    out: List[int] = []
+    acc = 0
+    for d in deltas:
+        acc += d
+        out.append(acc)
+    return out
+
+
+def _table(postings: Mapping[str, Set[int]]) -> Dict[str, Any]:
+    keys = sorted(postings)
+    return {"keys": keys, "postings": [delta_encode(sorted(postings[k])) for k in keys]}
+
+
+def build_search_index(rows: Iterable[Mapping[str, Any]], layer: str) -> Dict[str, Any]:
+    """由宽表行（vestigingsnaam / gemeente / BRIN / postcode）构建搜索索引字典。"""
+    brins: List[str] = []
+    acronyms: List[str] = []
+    prefix: Dict[str, Set[int]] = {}
+    trigrams: Dict[str, Set[int]] = {}
+    for doc, row in enumerate(rows):
+        naam = str(row.get("vestigingsnaam") or row.get("naam") or "").upper()
+        gemeente = str(row.get("gemeente") or "").upper()
+        brin = str(row.get("BRIN") or "").upper()
+        postcode = _WS.sub("", str(row.get("postcode") or "").upper())
+        acronym = acronym_from_name(naam)
+        brins.append(str(row.get("BRIN") or ""))
+        acronyms.append(acronym)
+
+        for token in set(_WORD.findall(naam)) | set(_WORD.findall(gemeente)) | {brin, acronym}:
+            if token:
+                prefix.setdefault(token, set()).add(doc)
+        for field in (naam, acronym, brin, gemeente, postcode):
+            for i in range(len(field) - 2):
+                trigrams.setdefault(field[i : i + 3], set()).add(doc)
+
+    return {
+        "version": SEARCH_INDEX_VERSION,
+        "layer": layer,
+        "n_docs": len(brins),
+        "brins": brins,
+        "acronyms": acronyms,
+        "prefix": _table(prefix),
+        "trigrams": _table(trigrams),
+    }
+
+
+@traced(cat="exporter")
+def export_search_index(
+    rows: Iterable[Mapping[str, Any]],
+    path: Path,
+    layer: str,
+) -> Dict[str, Any]:
+    """构建并写出搜索索引（紧凑 JSON，无缩进）；返回 {"n_docs", "n_prefix_keys", "n_trigrams"} 摘要。"""
+    index = build_search_index(rows, layer)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, separators=(",", ":"))
+    return {
+        "n_docs": index["n_docs"],
+        "n_prefix_keys": len(index["prefix"]["keys"]),
+        "n_trigrams": len(index["trigrams"]["keys"]),
+    }
+
+
+__all__ = [
+    "SEARCH_INDEX_VERSION",
+    "acronym_from_name",
+    "build_search_index",
+    "delta_decode",
+    "delta_encode",
+    "export_search_index",
+]
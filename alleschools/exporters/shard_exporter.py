@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+"""
+按 gemeente 分片导出 points（静态部署的按需加载）。
+
+每个数据集（po / vo / VO profiel vo_nt 等）按 gemeente 切分为若干小 JSON 分片，文件名含内容哈希
+（{slug}.{sha256 前 12 位}.json），可被 CDN 长期缓存；另写一个清单 {stem}_shards.json：
+    {
+      "version": 1, "layer": "vo", "partition_key": "gemeente",
+      "datasets": {
+        "vo": {"key_field": "municipality", "x_field": "x_linear", "y_field": "y_linear",
+               "n_points": N, "bbox": [xmin, ymin, xmax, ymax],
+               "shards": [{"gemeente", "path", "count", "bbox", "sha256", "bytes"}, ...]},
+        ...
+      }
+    }
+path 相对于清单所在目录；bbox 位于 X/Y 坐标空间（无数值坐标的分片为 null）。
+前端只需先取清单，再按所选 gemeente（或视口与 bbox 相交）拉取对应分片。
+"""
+
+import hashlib
+import json
+import re
+import unicodedata
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+from alleschools.tracing import traced
+
+SHARD_MANIFEST_VERSION = 1
+
+_SLUG_STRIP = re.compile(r"[^a-z0-9]+")
+
+
+def gemeente_slug(name: str) -> str:
+    """gemeente 名称 → 文件名安全的 ASCII slug（"'s-Gravenhage" → "s-gravenhage"）；空名称为 "unknown"。"""
+    ascii_name = unicodedata.normalize("NFKD", str(name or "")).encode("ascii", "ignore").decode("ascii")
+    slug = _SLUG_STRIP.sub("-", ascii_name.lower()).strip("-")
+    return slug or "unknown"
+
+
+def _bbox(points: Sequence[Mapping[str, Any]], x_field: str, y_field: str) -> Optional[List[float]]:
+    xs = [float(p[x_field]) for p in points if isinstance(p.get(x_field), (int, float))]
+    ys = [float(p[y_field]) for p in points if isinstance(p.get(y_field), (int, float))]
+    if not xs or not ys:
+        return None
+    return [min(xs), min(ys), max(xs), max(ys)]
+
+
+def _merge_bbox(boxes: Sequence[Optional[List[float]]]) -> Optional[List[float]]:
+    valid = [b for b in boxes if b is not None]
+    if not valid:
+        return None
+    return [min(b[0] for b in valid), min(b[1] for b in valid), max(b[2] for b in valid), max(b[3] for b in valid)]
+
+
+def _write_dataset_shards(
+    name: str,
+    points: Sequence[Mapping[str, Any]],
+    shard_dir: Path,
+    manifest_dir: Path,
+    *,
+    key_field: str,
+    x_field: str,
+    y_field: str,
+) -> Dict[str, Any]:
+    groups: Dict[str, List[Mapping[str, Any]]] = {}
+    for p in points:
+        groups.setdefault(str(p.get(key_field) or ""), []).append(p)
+
+    # 分片目录完全由本导出器管理：先清理上一轮的分片，避免哈希文件名堆积
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    for old in shard_dir.glob("*.json"):
+        old.unlink()
+
+    shards: List[Dict[str, Any]] = []
+    for gemeente in sorted(groups):
+        members = groups[gemeente]
+        body = json.dumps(members, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        digest = hashlib.sha256(body).hexdigest()
+        path = shard_dir / f"{gemeente_slug(gemeente)}.{digest[:12]}.json"
+        path.write_bytes(body)
+        shards.append(
+            {
+                "gemeente": gemeente,
+                "path": path.relative_to(manifest_dir).as_posix(),
+                "count": len(members),
+                "bbox": _bbox(members, x_field, y_field),
+                "sha256": digest,
+                "bytes": len(body),
+            }
+        )
+    return {
+        "key_field": key_field,
+        "x_field": x_field,
+        "y_field": y_field,
+        "n_points": len(points),
+        "bbox": _merge_bbox([s["bbox"] for s in shards]),
+        "shards": shards,
+    }
+
+
+@traced(cat="exporter")
+def export_gemeente_shards(
+    datasets: Mapping[str, Mapping[str, Any]],
+    manifest_path: Path,
+    layer: str,
+) -> Dict[str, Any]:
+    """
+    将若干数据集按 gemeente 分片写出，并写出清单 JSON；返回清单字典。
+
+    datasets: 数据集名 -> {"points": [...], "key_field": ..., "x_field": ..., "y_field": ...}，
+    分片写在清单同级的 shards/<数据集名>/ 目录下。
+    """
+    manifest_dir = manifest_path.parent
+    manifest: Dict[str, Any] = {
+        "version": SHARD_MANIFEST_VERSION,
+        "layer": layer,
+        "partition_key": "gemeente",
+        "datasets": {},
+    }
+    for name, spec in datasets.items():
+        manifest["datasets"][name] = _write_dataset_shards(
+            name,
+            list(spec.get("points") or []),
+            manifest_dir / "shards" / name,
+            manifest_dir,
+            key_field=str(spec.get("key_field") or "municipality"),
+            x_field=str(spec.get("x_field") or "x_linear"),
+            y_field=str(spec.get("y_field") or "y_linear"),
+        )
+    manifest_dir.mkdir(parents=True, exist_ok=True)
+    with manifest_path.open("w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+
+def shard_count(manifest: Mapping[str, Any]) -> int:
+    """清单中所有数据集的分片总数。"""
+    return sum(len(ds.get("shards") or []) for ds in (manifest.get("datasets") or {}).values())
+
+
+__all__ = ["SHARD_MANIFEST_VERSION", "export_gemeente_shards", "gemeente_slug", "shard_count"]
@@ -0,0 +1,382 @@
+from __future__ import annotations
+
+"""
+运行历史：把每次流水线的 run_report 追加写入本地 SQLite（默认 generated/run_history.sqlite），并按滚动基线检测回退。
+
+run_report_{po,vo}.json 每次运行都会被覆盖；历史库只追加（UPDATE / DELETE 由触发器拒绝），保留：
+    runs        每次运行一行：layer、起止时间、状态、config 哈希、git commit、学校数 / 排除数、RSS 峰值、完整 run_report JSON
+    run_inputs  该次运行各原始输入文件的 sha256 与字节数（路径相对 data_root）
+    run_stages  performance.stages 的逐阶段墙钟 / CPU 时间、行数、读写字节与是否命中阶段缓存（cached）
+
+detect_anomalies 以同一 layer 之前 window 次成功运行的中位数为基线：阶段耗时（及总耗时）超过基线 × (1 + threshold)
+且绝对差超过 min_seconds 时标记变慢；学校数、排除数与阶段行数相对基线的偏差超过 threshold 时标记（两个方向）。
+命中阶段缓存的阶段耗时不进入基线也不参与比较；有缓存命中的运行同样不参与总耗时的基线与比较。
+"""
+
+import hashlib
+import json
+import sqlite3
+import statistics
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from alleschools import config as config_mod
+
+SCHEMA_VERSION = 2
+DEFAULT_HISTORY_PATH = "generated/run_history.sqlite"
+DEFAULT_WINDOW = 5
+DEFAULT_THRESHOLD = 0.5
+DEFAULT_MIN_SECONDS = 0.05
+
+# config 中与结果无关、随机器或运行方式变化的键，不参与 config 哈希（stage_cache.force 等只影响是否重算）
+_VOLATILE_CONFIG_KEYS = ("data_root", "output_root", "config_path", "stage_cache")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    layer TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT,
+    duration_seconds REAL,
+    status TEXT,
+    profile TEXT,
+    config_hash TEXT,
+    git_commit TEXT,
+    n_schools INTEGER,
+    n_excluded INTEGER,
+    peak_rss_mb REAL,
+    report TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_layer ON runs (layer, id);
+CREATE TABLE IF NOT EXISTS run_inputs (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    path TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    bytes INTEGER NOT NULL,
+    PRIMARY KEY (run_id, path)
+);
+CREATE TABLE IF NOT EXISTS run_stages (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    seq INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    wall_seconds REAL,
+    cpu_seconds REAL,
+    rows_in INTEGER,
+    rows_out INTEGER,
+    bytes_read INTEGER,
+    bytes_written INTEGER,
+    cached INTEGER,
+    PRIMARY KEY (run_id, seq)
+);
+"""
+
+_TABLES = ("runs", "run_inputs", "run_stages")
+
+
+def history_settings(config: Mapping[str, Any]) -> Dict[str, Any]:
+    """history 配置段（带默认值），path 已解析为绝对路径（相对 data_root）。"""
+    hist = dict(config.get("history") or {})
+    path = Path(hist.get("path") or DEFAULT_HISTORY_PATH)
+    if not path.is_absolute():
+        path = Path(config.get("data_root") or config_mod.PROJECT_ROOT) / path
+    return {
+        "enabled": bool(hist.get("enabled", True)),
+        "path": path,
+        "window": int(hist.get("window") or DEFAULT_WINDOW),
+        "threshold": float(hist.get("threshold") or DEFAULT_THRESHOLD),
+        "min_seconds": float(hist.get("min_seconds") or DEFAULT_MIN_SECONDS),
+    }
+
+
+def config_hash(config: Mapping[str, Any]) -> str:
+    """有效配置的 sha256（键排序的 JSON，去掉 data_root 等与机器相关的键）。"""
+    stable = {k: v for k, v in config.items() if k not in _VOLATILE_CONFIG_KEYS}
+    body = json.dumps(stable, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+    return hashlib.sha256(body).hexdigest()
+
+
+def hash_files(root: Path, paths: Iterable[Path]) -> Dict[str, Dict[str, Any]]:
+    """存在的文件 → {"sha256", "bytes"}；键为相对 root 的路径（不在 root 下时为绝对路径）。"""
+    out: Dict[str, Dict[str, Any]] = {}
+    for p in paths:
+        path = Path(p)
+        if not path.is_file():
+            continue
+        digest = hashlib.sha256()
+        with path.open("rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        try:
+            key = str(path.relative_to(root))
+        except ValueError:
+            key = str(path)
+        out[key] = {"sha256": digest.hexdigest(), "bytes": path.stat().st_size}
+    return out
+
+
+def connect(path: Path) -> sqlite3.Connection:
+    """打开（必要时创建）历史库并确保表结构与只追加触发器存在。"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path))
+    conn.row_factory = sqlite3.Row
+    with conn:
+        conn.executescript(_SCHEMA)
+        # schema 1 → 2：run_stages 增加 cached 列（旧行为 NULL，按未命中处理）
+        if "cached" not in {r["name"] for r in conn.execute("PRAGMA table_info(run_stages)")}:
+            conn.execute("ALTER TABLE run_stages ADD COLUMN cached INTEGER")
+        for table in _TABLES:
+            for op in ("UPDATE", "DELETE"):
+                conn.execute(
+                    f"CREATE TRIGGER IF NOT EXISTS {table}_no_{op.lower()} BEFORE {op} ON {table} "
+                    "BEGIN SELECT RAISE(ABORT, 'run history is append-only'); END"
+                )
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return conn
+
+
+def record_run(
+    path: Path,
+    report: Mapping[str, Any],
+    *,
+    config_hash: Optional[str] = None,
+    inputs: Optional[Mapping[str, Mapping[str, Any]]] = None,
+    git_commit: Optional[str] = None,
+) -> int:
+    """把一份 run_report 追加到历史库，返回新运行的 id。"""
+    layer = str(report.get("pipeline_type") or "")
+    outputs = dict((report.get("outputs") or {}).get(layer) or {})
+    perf = dict(report.get("performance") or {})
+    totals = dict(perf.get("totals") or {})
+    conn = connect(path)
+    try:
+        with conn:
+            cur = conn.execute(
+                "INSERT INTO runs (layer, started_at, finished_at, duration_seconds, status, profile, config_hash,"
+                " git_commit, n_schools, n_excluded, peak_rss_mb, report) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    layer,
+                    report.get("started_at"),
+                    report.get("finished_at"),
+                    report.get("duration_seconds"),
+                    (report.get("summary") or {}).get("status"),
+                    report.get("profile"),
+                    config_hash,
+                    git_commit,
+                    outputs.get("n_schools"),
+                    outputs.get("n_excluded"),
+                    totals.get("peak_rss_mb"),
+                    json.dumps(report, ensure_ascii=False, default=str),
+                ),
+            )
+            run_id = int(cur.lastrowid)
+            conn.executemany(
+                "INSERT INTO run_inputs (run_id, path, sha256, bytes) VALUES (?, ?, ?, ?)",
+                [(run_id, p, v["sha256"], v["bytes"]) for p, v in sorted((inputs or {}).items())],
+            )
+            conn.executemany(
+                "INSERT INTO run_stages (run_id, seq, name, wall_seconds, cpu_seconds, rows_in, rows_out,"
+                " bytes_read, bytes_written, cached) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        run_id,
+                        seq,
+                        s.get("name"),
+                        s.get("wall_seconds"),
+                        s.get("cpu_seconds"),
+                        s.get("rows_in"),
+                        s.get("rows_out"),
+                        s.get("bytes_read"),
+                        s.get("bytes_written"),
+                        int(bool(s.get("cached"))),
+                    )
+                    for seq, s in enumerate(perf.get("stages") or [])
+                ],
+            )
+    finally:
+        conn.close()
+    return run_id
+
+
+def load_runs(path: Path, layer: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    按 id 升序返回最近 limit 次运行（不含完整 report），每项附带：
+        stages: {阶段名: {"wall_seconds", "rows_in", "rows_out", "cached"}}（同名阶段累加；任一次命中缓存即 cached）
+        cached: 是否有阶段命中缓存
+        inputs: {路径: sha256}
+    """
+    if not path.is_file():
+        return []
+    conn = connect(path)
+    try:
+        sql = (
+            "SELECT id, layer, started_at, finished_at, duration_seconds, status, profile, config_hash, git_commit,"
+            " n_schools, n_excluded, peak_rss_mb FROM runs"
+        )
+        params: List[Any] = []
+        if layer:
+            sql += " WHERE layer = ?"
+            params.append(layer)
+        sql += " ORDER BY id DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        runs = [dict(r) for r in conn.execute(sql, params)][::-1]
+        for run in runs:
+            stages: Dict[str, Dict[str, Any]] = {}
+            for s in conn.execute(
+                "SELECT name, wall_seconds, rows_in, rows_out, cached FROM run_stages WHERE run_id = ? ORDER BY seq",
+                (run["id"],),
+            ):
+                agg = stages.setdefault(
+                    s["name"], {"wall_seconds": 0.0, "rows_in": None, "rows_out": None, "cached": False}
+                )
+                agg["wall_seconds"] += s["wall_seconds"] or 0.0
+                agg["cached"] = agg["cached"] or bool(s["cached"])
+                for key in ("rows_in", "rows_out"):
+                    if s[key] is not None:
+                        agg[key] = (agg[key] or 0) + s[key]
+            run["stages"] = stages
+            run["cached"] = any(stage["cached"] for stage in stages.values())
+            run["inputs"] = {
+                r["path"]: r["sha256"]
+                for r in conn.execute("SELECT path, sha256 FROM run_inputs WHERE run_id = ? ORDER BY path", (run["id"],))
+            }
+    finally:
+        conn.close()
+    return runs
+
+
+def load_report(path: Path, run_id: int) -> Optional[Dict[str, Any]]:
+    """取回某次运行当时的完整 run_report。"""
+    conn = connect(path)
+    try:
+        row = conn.execute("SELECT report FROM runs WHERE id = ?", (int(run_id),)).fetchone()
+    finally:
+        conn.close()
+    return json.loads(row["report"]) if row else None
+
+
+def _baseline(values: Sequence[Optional[float]]) -> Optional[float]:
+    present = [float(v) for v in values if v is not None]
+    return statistics.median(present) if present else None
+
+
+def _slower(name: str, current: Optional[float], base: Optional[float], threshold: float, min_seconds: float) -> Optional[str]:
+    if current is None or base is None:
+        return None
+    if current - base > base * threshold and current - base > min_seconds:
+        return f"{name} {current:.3f}s vs baseline {base:.3f}s"
+    return None
+
+
+def _count_shift(name: str, current: Optional[float], base: Optional[float], threshold: float) -> Optional[str]:
+    if current is None or base is None:
+        return None
+    if abs(current - base) > max(base, 1.0) * threshold:
+        return f"{name} {int(current)} vs baseline {int(base)}"
+    return None
+
+
+def detect_anomalies(
+    runs: Sequence[Mapping[str, Any]],
+    *,
+    window: int = DEFAULT_WINDOW,
+    threshold: float = DEFAULT_THRESHOLD,
+    min_seconds: float = DEFAULT_MIN_SECONDS,
+) -> Dict[int, List[str]]:
+    """
+    runs 为 load_runs 的结果（id 升序）。返回 {run_id: [偏差说明...]}，只包含有偏差的运行。
+    每次运行与同一 layer 之前最多 window 次成功运行的中位数比较；没有前序成功运行时不做判断。
+    耗时只与未命中缓存的前序运行 / 阶段比较，命中缓存的运行（阶段）本身不做耗时判断。
+    """
+    flagged: Dict[int, List[str]] = {}
+    history: Dict[str, List[Mapping[str, Any]]] = {}
+    for run in runs:
+        previous = history.setdefault(str(run.get("layer")), [])
+        base_runs = previous[-window:]
+        notes: List[str] = []
+        if base_runs:
+            if not run.get("cached"):
+                note = _slower(
+                    "duration",
+                    run.get("duration_seconds"),
+                    _baseline([r.get("duration_seconds") for r in previous if not r.get("cached")][-window:]),
+                    threshold,
+                    min_seconds,
+                )
+                if note:
+                    notes.append(note)
+            for key in ("n_schools", "n_excluded"):
+                note = _count_shift(key, run.get(key), _baseline([r.get(key) for r in base_runs]), threshold)
+                if note:
+                    notes.append(note)
+            for name, stage in (run.get("stages") or {}).items():
+                prior = [r["stages"][name] for r in base_runs if name in (r.get("stages") or {})]
+                if not prior:
+                    continue
+                if not stage.get("cached"):
+                    timed = [
+                        r["stages"][name]["wall_seconds"]
+                        for r in previous
+                        if name in (r.get("stages") or {}) and not r["stages"][name].get("cached")
+                    ][-window:]
+                    note = _slower(name, stage.get("wall_seconds"), _baseline(timed), threshold, min_seconds)
+                    if note:
+                        notes.append(note)
+                note = _count_shift(
+                    f"{name} rows_out", stage.get("rows_out"), _baseline([p.get("rows_out") for p in prior]), threshold
+                )
+                if note:
+                    notes.append(note)
+        if notes:
+            flagged[int(run["id"])] = notes
+        if run.get("status") == "success":
+            previous.append(run)
+    return flagged
+
+
+def baseline_ratio(runs: Sequence[Mapping[str, Any]], index: int, window: int = DEFAULT_WINDOW) -> Optional[float]:
+    """
+    runs[index] 的总耗时相对其滚动基线（同 layer 之前 window 次未命中缓存的成功运行的中位数）的倍数；
+    该次运行有缓存命中时返回 None。
+    """
+    run = runs[index]
+    if run.get("cached"):
+        return None
+    prior = [
+        r.get("duration_seconds")
+        for r in runs[:index]
+        if r.get("layer") == run.get("layer") and r.get("status") == "success" and not r.get("cached")
+    ][-window:]
+    base = _baseline(prior)
+    current = run.get("duration_seconds")
+    if not base or current is None:
+        return None
+    return float(current) / base
+
+
+def input_changes(previous: Mapping[str, Any], current: Mapping[str, Any]) -> Tuple[List[str], List[str], List[str]]:
+    """两次运行的输入对比：(新增, 移除, 内容变化) 的路径列表。"""
+    old, new = dict(previous.get("inputs") or {}), dict(current.get("inputs") or {})
+    added = sorted(set(new) - set(old))
+    removed = sorted(set(old) - set(new))
+    changed = sorted(p for p in set(old) & set(new) if old[p] != new[p])
+    return added, removed, changed
+
+
+__all__ = [
+    "DEFAULT_HISTORY_PATH",
+    "DEFAULT_MIN_SECONDS",
+    "DEFAULT_THRESHOLD",
+    "DEFAULT_WINDOW",
+    "baseline_ratio",
+    "config_hash",
+    "connect",
+    "detect_anomalies",
+    "hash_files",
+    "history_settings",
+    "input_changes",
+    "load_report",
+    "load_runs",
+    "record_run",
+]
@@ -11,7 +11,10 @@ import csv
 import os
 from typing import Dict, List, Tuple
 
+from alleschools.tracing import traced
 
+
+@traced(cat="loader")
 def load_woz_pc4_year(path: str) -> Tuple[Dict[Tuple[str, int], float], List[int]]:
     """
     读取 cbs_woz_per_postcode_year.csv。
@@ -16,9 +16,10 @@ DUO Schooladviezen (PO) 加载。
 
 import csv
 import os
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 
 from alleschools.config import SCHOOLJARS
+from alleschools.tracing import traced
 
 
 def _parse_int(s: str) -> int:
@@ -31,12 +32,17 @@ def _parse_int(s: str) -> int:
         return 0
 
 
-def load_schooladviezen_po(base_dir: str) -> Dict[str, dict]:
+@traced(cat="loader")
+def load_schooladviezen_po(
+    base_dir: str,
+    brin_filter: Optional[Callable[[str], bool]] = None,
+) -> Dict[str, dict]:
     """
     读取所有 duo_schooladviezen_YYYY_YYYY.csv，按 BRIN 聚合。
 
     参数:
         base_dir: CSV 所在目录，一般为项目根目录。
+        brin_filter: 可选；只保留 brin_filter(BRIN) 为真的学校（分片运行时按行尽早丢弃）。
 
     返回:
         brin -> { naam, gemeente, postcode, pc4, soort_po, years: { (start,end): { total, vwo_equiv } } }
@@ -65,7 +71,7 @@ def load_schooladviezen_po(base_dir: str) -> Dict[str, dict]:
             inst = (row.get("INSTELLINGSCODE") or row.get("BRIN_NUMMER") or "").strip().strip('"')
             vest = (row.get("VESTIGINGSCODE") or row.get("VESTIGINGSNUMMER") or "").strip().strip('"')
             brin = (inst + vest) if (inst + vest) else (row.get("BRIN_NUMMER") or "").strip().strip('"')
-            if not brin:
+            if not brin or (brin_filter is not None and not brin_filter(brin)):
                 continue
 
             naam = (row.get("INSTELLINGSNAAM_VESTIGING") or "").strip().strip('"')
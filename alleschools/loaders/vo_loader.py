@@ -9,7 +9,9 @@ from __future__ import annotations
 
 import csv
 import os
-from typing import Any, Dict, List, Union
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from alleschools.tracing import traced
 
 # DUO 考试 CSV 列索引（0-based）
 COL_INSTELLING = 0
@@ -47,13 +49,15 @@ def is_science_vmbo(opleiding: Union[str, None]) -> bool:
     return "techniek" in (opleiding or "").lower()
 
 
+@traced(cat="loader")
 def load_vestigingen_postcode(
     base_dir: str,
     vestigingen_csv: str = "duo_vestigingen_vo.csv",
+    brin_filter: Optional[Callable[[str], bool]] = None,
 ) -> Dict[str, str]:
     """
     从指定 CSV 加载 VESTIGINGSCODE -> POSTCODE。
-    返回 dict，无文件或无数据则返回空 dict。
+    返回 dict，无文件或无数据则返回空 dict；brin_filter 可选，只保留其为真的 VESTIGINGSCODE。
     """
     path = os.path.join(base_dir, vestigingen_csv)
     out: Dict[str, str] = {}
@@ -66,7 +70,7 @@ def load_vestigingen_postcode(
                 for row in reader:
                     vest = (row.get("VESTIGINGSCODE") or "").strip().strip('"')
                     pc = (row.get("POSTCODE") or "").strip().strip('"')
-                    if vest:
+                    if vest and (brin_filter is None or brin_filter(vest)):
                         out[vest] = pc
             break
         except UnicodeDecodeError:
@@ -74,16 +78,19 @@ def load_vestigingen_postcode(
     return out
 
 
+@traced(cat="loader")
 def load_exam_schools(
     base_dir: str,
     exams_all_csv: str,
     exams_small_csv: str,
     year_cols: List[Any],
+    brin_filter: Optional[Callable[[str], bool]] = None,
 ) -> Dict[str, dict]:
     """
     从考试 CSV 按学校聚合，得到 brin -> { naam, gemeente, havo_vwo, vmbo, all_kand }。
 
     year_cols: 来自配置的 weights.year_cols，每项 [col_kand, col_geslaagd, year_label, weight]。
+    brin_filter: 可选；只保留 brin_filter(BRIN) 为真的学校（分片运行时按行尽早丢弃）。
     """
     inp_all = os.path.join(base_dir, exams_all_csv)
     inp_small = os.path.join(base_dir, exams_small_csv)
@@ -106,6 +113,8 @@ def load_exam_schools(
             skip_header = False
 
             brin = (row[COL_VESTIGING] or "").strip().strip('"')
+            if brin_filter is not None and not brin_filter(brin):
+                continue
             naam = (row[COL_NAAM] or "").strip().strip('"')
             gemeente = (row[COL_GEMEENTE] or "").strip().strip('"')
             otype = (row[COL_ONDERWIJSTYPE] or "").strip().strip('"')
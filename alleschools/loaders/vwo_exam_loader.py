@@ -18,7 +18,9 @@ We keep the loader purely IO/row‑level; no statistics here.
 import csv
 import os
 from dataclasses import dataclass, field
-from typing import Dict, Iterable, List, Mapping, MutableMapping, Optional
+from typing import Callable, Dict, Iterable, List, Mapping, MutableMapping, Optional
+
+from alleschools.tracing import traced
 
 
 # DUO column names used in the VWO exam CSVs
@@ -126,6 +128,7 @@ class SchoolYearCentralExamScores:
     years: MutableMapping[str, Dict[str, float]] = field(default_factory=dict)
 
 
+@traced(cat="loader")
 def load_vwo_exam_cijferlijst_scores(
     base_dir: str,
     schoolyear_files: Mapping[str, str],
@@ -209,9 +212,11 @@ def load_vwo_exam_cijferlijst_scores(
     return schools
 
 
+@traced(cat="loader")
 def load_vwo_central_exam_scores(
     base_dir: str,
     schoolyear_files: Mapping[str, str],
+    brin_filter: Optional[Callable[[str], bool]] = None,
 ) -> Dict[str, SchoolYearCentralExamScores]:
     """
     Load DUO per‑subject VWO exam CSVs and aggregate central exam averages by school.
@@ -227,6 +232,9 @@ def load_vwo_central_exam_scores(
     - `GEM  CIJFER CENTRALE EXAMENS MET CIJFER MEETELLEND VOOR DIPLOMA`
       when available (preferred);
     - otherwise falls back to `GEM  CIJFER TOTAAL AANTAL CENTRALE EXAMENS`.
+
+    If `brin_filter` is given, only schools for which it returns True are kept
+    (used by sharded runs to drop other shards' rows early).
     """
     schools: Dict[str, SchoolYearCentralExamScores] = {}
 
@@ -253,7 +261,7 @@ def load_vwo_central_exam_scores(
                 continue
 
             vest = _brin_key_from_row(row)
-            if not vest:
+            if not vest or (brin_filter is not None and not brin_filter(vest)):
                 continue
 
             naam = (row.get(COL_INSTELLINGSNAAM_VESTIGING) or "").strip().strip('"')
@@ -0,0 +1,363 @@
+from __future__ import annotations
+
+"""
+流水线分阶段性能指标：墙钟 / CPU 时间、输入输出行数、读写字节、吞吐与内存峰值。
+
+用法（run_po_pipeline / run_vo_pipeline 内部）：
+
+    perf = PerfRecorder.from_config(config)
+    with perf.stage("load.cbs_woz") as st:
+        woz, woz_years = cbs_loader.load_woz_pc4_year(...)
+        st.rows_out = len(woz)
+    ...
+    run_report["performance"] = perf.report()
+
+每个阶段记录：
+    - wall_seconds / cpu_seconds：time.perf_counter / time.process_time 之差；
+    - rows_in / rows_out / rows_per_second：由调用方填写行数，吞吐按 rows_out（缺省时 rows_in）计算；
+    - bytes_read / bytes_written：Linux 上取 /proc/self/io 的 rchar / wchar 差值（即经由 read/write
+      系统调用的字节数，含页缓存命中）；其他平台只统计通过 st.wrote(path) 登记的输出文件大小；
+    - peak_rss_mb / peak_rss_delta_mb：resource.getrusage 的进程 RSS 高水位及其在本阶段的增长；
+    - py_alloc_peak_mb：开启 performance.tracemalloc 时，本阶段 Python 分配峰值相对阶段开始的增量。
+阶段按顺序记录、不嵌套；流水线串行执行，进程级计数即为阶段内开销。
+
+深度剖析（CLI --profile-cpu / --profile-mem，即 performance.profile_cpu / profile_mem）：
+每个阶段额外包一层 cProfile / tracemalloc 快照，产物写入 {data_root}/{profile_dir}/{layer}/：
+    - NN_<stage>.pstats：cProfile 统计（python -m pstats / snakeviz 可读）；
+    - NN_<stage>.collapsed.txt：折叠调用栈（"a;b;c 微秒"，flamegraph.pl / speedscope 可渲染）；
+      cProfile 只记录调用边而非完整栈，故按调用边的累计时间比例把被调函数的自身时间分摊到各条调用路径；
+    - <layer>.collapsed.txt：全部阶段的折叠栈，以阶段名为根帧，便于一张火焰图看完整次运行；
+    - NN_<stage>.alloc.txt：阶段内分配且在阶段结束时仍存活的内存，按 file:line 取前 profile_top_n 条
+      （阶段开始时 clear_traces，之前的分配不再追踪；py_alloc_peak_mb 同时给出阶段内的分配峰值）。
+各阶段记录的 "profile" 字段给出上述文件相对 data_root 的路径。两个开关均关闭时 stage() 不创建任何剖析器。
+"""
+
+import cProfile
+import os
+import pstats
+import re
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Union
+
+from alleschools import tracing
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows
+    resource = None  # type: ignore[assignment]
+
+_PROC_IO = Path("/proc/self/io")
+_MB = 1024.0 * 1024.0
+DEFAULT_PROFILE_DIR = "generated/profile"
+DEFAULT_PROFILE_TOP_N = 25
+_MAX_STACK_DEPTH = 64
+
+
+def _io_counters() -> Optional[Dict[str, int]]:
+    """读取 /proc/self/io 的 rchar / wchar；不可用时返回 None。"""
+    try:
+        text = _PROC_IO.read_text(encoding="ascii")
+    except OSError:
+        return None
+    out: Dict[str, int] = {}
+    for line in text.splitlines():
+        key, _, value = line.partition(":")
+        if key in ("rchar", "wchar"):
+            out[key] = int(value)
+    return out if len(out) == 2 else None
+
+
+def peak_rss_mb() -> Optional[float]:
+    """进程 RSS 高水位（MB）；ru_maxrss 在 Linux 上以 KB、在 macOS 上以字节为单位。"""
+    if resource is None:
+        return None
+    peak = float(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+    return peak / _MB if sys.platform == "darwin" else peak / 1024.0
+
+
+def _frame_name(func: tuple) -> str:
+    """pstats 函数键 (file, line, name) → 折叠栈帧名；分号与换行会破坏行格式，替换为下划线。"""
+    filename, line, name = func
+    if filename == "~":
+        label = name
+    else:
+        label = f"{name} ({Path(filename).name}:{line})"
+    return re.sub(r"[;\r\n]+", "_", label)
+
+
+def collapse_pstats(stats: pstats.Stats) -> Dict[str, int]:
+    """由 pstats 调用图生成折叠栈 {"root;...;leaf": 自身时间微秒}（分摊方式见模块说明）。"""
+    raw = stats.stats  # type: ignore[attr-defined]
+    children: Dict[tuple, List[tuple]] = {}
+    for func, (_, _, _, _, callers) in raw.items():
+        for caller, edge in callers.items():
+            children.setdefault(caller, []).append((func, edge[3]))
+    roots = [f for f, (_, _, _, _, callers) in raw.items() if not any(c in raw for c in callers)]
+    # 调用图中的路径数可随深度指数增长：分摊后不足总时间万分之一的子树、以及超过 64 层的栈直接剪掉
+    min_seconds = sum(v[2] for v in raw.values()) * 1e-4
+
+    out: Dict[str, int] = {}
+
+    def walk(func: tuple, frac: float, path: List[tuple]) -> None:
+        _, _, tt, ct, _ = raw[func]
+        stack = path + [func]
+        if len(stack) > _MAX_STACK_DEPTH:
+            return
+        key = ";".join(_frame_name(f) for f in stack)
+        us = int(round(tt * frac * 1e6))
+        if us > 0:
+            out[key] = out.get(key, 0) + us
+        for child, edge_ct in children.get(func, ()):
+            if child in stack:
+                continue
+            child_ct = raw[child][3]
+            if child_ct <= 0 or edge_ct <= 0 or frac * edge_ct < min_seconds:
+                continue
+            walk(child, frac * min(1.0, edge_ct / child_ct), stack)
+
+    for root in roots:
+        walk(root, 1.0, [])
+    return out
+
+
+def _write_collapsed(stacks: Mapping[str, int], path: Path) -> None:
+    with path.open("w", encoding="utf-8") as f:
+        for key in sorted(stacks):
+            f.write(f"{key} {stacks[key]}\n")
+
+
+def _write_alloc_report(snapshot: tracemalloc.Snapshot, path: Path, top_n: int) -> None:
+    """阶段内新分配且在阶段结束时仍存活的内存，按 file:line 汇总后取前 top_n 条（大小降序）。"""
+    skip = {tracemalloc.__file__, __file__}
+    stats = [s for s in snapshot.statistics("lineno") if s.traceback[0].filename not in skip][:top_n]
+    with path.open("w", encoding="utf-8") as f:
+        f.write(f"# top {len(stats)} allocation sites still live at stage end (file:line, KiB, blocks)\n")
+        for s in stats:
+            frame = s.traceback[0]
+            f.write(f"{frame.filename}:{frame.lineno}\t{s.size / 1024.0:.1f} KiB\t{s.count}\n")
+
+
+class StageHandle:
+    """阶段上下文中由调用方填写的计数；cached 由阶段缓存（stage_cache）在命中时置为 True。"""
+
+    __slots__ = ("name", "rows_in", "rows_out", "cached", "_written")
+
+    def __init__(self, rows_in: Optional[int] = None, *, name: str = "") -> None:
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out: Optional[int] = None
+        self.cached = False
+        self._written: List[Path] = []
+
+    def wrote(self, *paths: Union[str, "os.PathLike[str]", None]) -> None:
+        """登记本阶段写出的文件（无 /proc/self/io 时用于统计 bytes_written）。"""
+        self._written.extend(Path(p) for p in paths if p)
+
+
+class PerfRecorder:
+    """按顺序记录流水线各阶段的性能指标；enabled=False 时 stage() 不做任何测量。"""
+
+    def __init__(
+        self,
+        *,
+        enabled: bool = True,
+        trace_memory: bool = False,
+        profile_cpu: bool = False,
+        profile_mem: bool = False,
+        profile_dir: Optional[Path] = None,
+        profile_top_n: int = DEFAULT_PROFILE_TOP_N,
+        root: Optional[Path] = None,
+        layer: str = "run",
+    ) -> None:
+        self.enabled = enabled
+        self.layer = layer
+        self.trace_memory = bool(enabled and trace_memory)
+        self.profile_cpu = bool(enabled and profile_cpu and profile_dir is not None)
+        self.profile_mem = bool(enabled and profile_mem and profile_dir is not None)
+        self.profile_dir = profile_dir
+        self.profile_top_n = int(profile_top_n)
+        self.root = root
+        self.stages: List[Dict[str, Any]] = []
+        self._collapsed: Dict[str, int] = {}
+        self._owns_tracing = False
+        if (self.trace_memory or self.profile_mem) and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracing = True
+
+    @classmethod
+    def from_config(
+        cls,
+        config: Mapping[str, Any],
+        *,
+        layer: str = "run",
+        root: Optional[Path] = None,
+    ) -> "PerfRecorder":
+        """读取 config["performance"]；剖析产物写入 {root}/{profile_dir}/{layer}/（root 缺省为 data_root）。"""
+        perf_cfg = dict(config.get("performance") or {})
+        profile_cpu = bool(perf_cfg.get("profile_cpu", False))
+        profile_mem = bool(perf_cfg.get("profile_mem", False))
+        profile_dir = None
+        if root is None:
+            root = Path(config.get("data_root") or ".")
+        if profile_cpu or profile_mem:
+            profile_dir = Path(str(perf_cfg.get("profile_dir") or DEFAULT_PROFILE_DIR)) / layer
+            if not profile_dir.is_absolute():
+                profile_dir = root / profile_dir
+            profile_dir.mkdir(parents=True, exist_ok=True)
+        return cls(
+            enabled=bool(perf_cfg.get("enabled", True)),
+            trace_memory=bool(perf_cfg.get("tracemalloc", False)),
+            profile_cpu=profile_cpu,
+            profile_mem=profile_mem,
+            profile_dir=profile_dir,
+            profile_top_n=int(perf_cfg.get("profile_top_n") or DEFAULT_PROFILE_TOP_N),
+            root=root,
+            layer=layer,
+        )
+
+    def _rel(self, path: Path) -> str:
+        if self.root is not None:
+            try:
+                return str(path.relative_to(self.root))
+            except ValueError:
+                pass
+        return str(path)
+
+    def _profile_stem(self, name: str) -> Path:
+        assert self.profile_dir is not None
+        safe = re.sub(r"[^A-Za-z0-9_.-]+", "_", name)
+        return self.profile_dir / f"{len(self.stages) + 1:02d}_{safe}"
+
+    @contextmanager
+    def stage(self, name: str, *, rows_in: Optional[int] = None) -> Iterator[StageHandle]:
+        """测量一个阶段；追踪开启时同时记录同名 span（cat 为 layer）与 rows_processed 计数器。"""
+        handle = StageHandle(rows_in, name=name)
+        with tracing.span(name, cat=self.layer) as sp:
+            try:
+                if self.enabled:
+                    with self._measure(name, handle):
+                        yield handle
+                else:
+                    yield handle
+            finally:
+                if tracing.is_enabled():
+                    if handle.rows_in is not None:
+                        sp.args["rows_in"] = handle.rows_in
+                    if handle.rows_out is not None:
+                        sp.args["rows_out"] = handle.rows_out
+                    rows = handle.rows_out if handle.rows_out is not None else handle.rows_in
+                    if rows:
+                        tracing.counter("rows_processed", cumulative=True, **{self.layer: rows})
+
+    @contextmanager
+    def _measure(self, name: str, handle: StageHandle) -> Iterator[StageHandle]:
+        io0 = _io_counters()
+        rss0 = peak_rss_mb()
+        alloc0 = 0
+        if self.profile_mem:
+            # 丢弃此前的 trace：阶段结束时的快照只含本阶段的分配，避免对全部存活对象做快照差分（数十万条时每阶段数秒）
+            tracemalloc.clear_traces()
+        if self.trace_memory or self.profile_mem:
+            tracemalloc.reset_peak()
+            alloc0 = tracemalloc.get_traced_memory()[0]
+        profiler = cProfile.Profile() if self.profile_cpu else None
+        cpu0 = time.process_time()
+        t0 = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield handle
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            wall = time.perf_counter() - t0
+            cpu = time.process_time() - cpu0
+            io1 = _io_counters()
+            rss1 = peak_rss_mb()
+            record: Dict[str, Any] = {
+                "name": name,
+                "wall_seconds": round(wall, 6),
+                "cpu_seconds": round(cpu, 6),
+                "rows_in": handle.rows_in,
+                "rows_out": handle.rows_out,
+                "cached": handle.cached,
+            }
+            rows = handle.rows_out if handle.rows_out is not None else handle.rows_in
+            record["rows_per_second"] = round(rows / wall, 1) if rows is not None and wall > 0 else None
+            if io0 is not None and io1 is not None:
+                record["bytes_read"] = io1["rchar"] - io0["rchar"]
+                record["bytes_written"] = io1["wchar"] - io0["wchar"]
+            else:
+                record["bytes_read"] = None
+                record["bytes_written"] = sum(p.stat().st_size for p in handle._written if p.is_file()) or None
+            record["peak_rss_mb"] = round(rss1, 2) if rss1 is not None else None
+            record["peak_rss_delta_mb"] = round(rss1 - rss0, 2) if rss0 is not None and rss1 is not None else None
+            if self.trace_memory or self.profile_mem:
+                record["py_alloc_peak_mb"] = round((tracemalloc.get_traced_memory()[1] - alloc0) / _MB, 3)
+            if profiler is not None or self.profile_mem:
+                record["profile"] = self._write_profile(name, profiler)
+            self.stages.append(record)
+
+    def _write_profile(self, name: str, profiler: Optional[cProfile.Profile]) -> Dict[str, str]:
+        stem = self._profile_stem(name)
+        files: Dict[str, str] = {}
+        if profiler is not None:
+            pstats_path = stem.with_name(stem.name + ".pstats")
+            profiler.dump_stats(str(pstats_path))
+            stacks = collapse_pstats(pstats.Stats(profiler))
+            collapsed_path = stem.with_name(stem.name + ".collapsed.txt")
+            _write_collapsed(stacks, collapsed_path)
+            root_frame = re.sub(r"[;\r\n]+", "_", name)
+            for key, us in stacks.items():
+                full = f"{root_frame};{key}"
+                self._collapsed[full] = self._collapsed.get(full, 0) + us
+            files["pstats"] = self._rel(pstats_path)
+            files["collapsed"] = self._rel(collapsed_path)
+        if self.profile_mem:
+            alloc_path = stem.with_name(stem.name + ".alloc.txt")
+            _write_alloc_report(tracemalloc.take_snapshot(), alloc_path, self.profile_top_n)
+            files["alloc"] = self._rel(alloc_path)
+        return files
+
+    def report(self) -> Dict[str, Any]:
+        """run_report.performance：各阶段明细与合计；由本记录器启动的 tracemalloc 在此停止。"""
+        if self._owns_tracing:
+            tracemalloc.stop()
+            self._owns_tracing = False
+        collapsed_rel = None
+        if self.profile_cpu and self.profile_dir is not None:
+            collapsed_path = self.profile_dir / f"{self.profile_dir.name}.collapsed.txt"
+            _write_collapsed(self._collapsed, collapsed_path)
+            collapsed_rel = self._rel(collapsed_path)
+
+        def _sum(field: str) -> Optional[float]:
+            values = [s[field] for s in self.stages if s.get(field) is not None]
+            return sum(values) if values else None
+
+        wall = _sum("wall_seconds")
+        cpu = _sum("cpu_seconds")
+        return {
+            "enabled": self.enabled,
+            "tracemalloc": self.trace_memory,
+            "profile_cpu": self.profile_cpu,
+            "profile_mem": self.profile_mem,
+            "profile_dir": self._rel(self.profile_dir) if self.profile_dir is not None else None,
+            "collapsed_stacks": collapsed_rel,
+            "stages": list(self.stages),
+            "totals": {
+                "n_stages": len(self.stages),
+                "wall_seconds": round(wall, 6) if wall is not None else None,
+                "cpu_seconds": round(cpu, 6) if cpu is not None else None,
+                "bytes_read": _sum("bytes_read"),
+                "bytes_written": _sum("bytes_written"),
+                "peak_rss_mb": round(peak_rss_mb() or 0.0, 2) if self.enabled and resource is not None else None,
+                "slowest_stage": max(self.stages, key=lambda s: s["wall_seconds"])["name"] if self.stages else None,
+            },
+        }
+
+
+__all__ = ["DEFAULT_PROFILE_DIR", "PerfRecorder", "StageHandle", "collapse_pstats", "peak_rss_mb"]
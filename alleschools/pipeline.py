@@ -9,27 +9,49 @@ from __future__ import annotations
 
 import csv
 import json
+import sqlite3
 import subprocess
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Mapping, Optional
 
 from alleschools import config as config_mod
+from alleschools import history as history_mod
 from alleschools import schema_validator as sv
+from alleschools import sharding
 from alleschools.compute import (
     compute_po_xy,
     compute_vo_xy,
     compute_vwo_mean_latest_year,
     compute_vwo_profile_indices,
 )
+from alleschools.compute.indicators import _apply_outlier_clipping
+from alleschools.compute.rollup import MIN_GROUP_SCHOOLS, is_finer_than, rollup_rows, rollup_to_wide_rows
+from alleschools.compute.year_cube import (
+    YearCube,
+    build_po_year_cube,
+    build_vo_year_cube,
+    parse_window,
+    query_xy,
+)
 from alleschools.exporters import csv_exporter, geojson_exporter, json_exporter, long_table_exporter
+from alleschools.exporters.cluster_exporter import DEFAULT_MAX_ZOOM, DEFAULT_RADIUS, export_cluster_index
+from alleschools.exporters.density_exporter import DEFAULT_BASE_BINS, DEFAULT_LEVELS, export_density_tiles
+from alleschools.exporters.detail_exporter import build_school_details, export_detail_shards
 from alleschools.exporters.meta_builder import (
     SCHEMA_VERSION,
     build_po_meta,
     build_vo_meta,
     build_vo_profiles_meta,
 )
-from alleschools.exporters.points_exporter import export_po_points, export_vo_points
+from alleschools.exporters.points_exporter import (
+    _po_row_to_point,
+    _vo_row_to_point,
+    export_po_points,
+    export_vo_points,
+)
+from alleschools.exporters.shard_exporter import export_gemeente_shards, shard_count
+from alleschools.exporters.search_index_exporter import export_search_index
 from alleschools.loaders import (
     cbs_loader,
     duo_loader,
@@ -38,6 +60,8 @@ from alleschools.loaders import (
     load_vwo_central_exam_scores,
 )
 from alleschools.logging_utils import setup_logger
+from alleschools.perf import PerfRecorder
+from alleschools.stage_cache import StageCache
 from alleschools.quality import run_po_quality, run_vo_quality
 
 
@@ -57,12 +81,616 @@ def _get_git_commit(cwd: Path) -> Optional[str]:
     return None
 
 
-def run_po_pipeline(config: Optional[Dict[str, Any]] = None) -> tuple[Path, Dict[str, Any]]:
+# VWO 中央考试成绩（各学年一份 CSV），用于 NT/NG/EM/CM 考试成绩指数
+VWO_EXAM_FILES: Dict[str, str] = {
+    "2020-2021": "examenkandidaten-vwo-en-examencijfers-2020-2021.csv",
+    "2021-2022": "examenkandidaten-vwo-en-examencijfers-2021-2022.csv",
+    "2022-2023": "examenkandidaten-vwo-en-examencijfers-2022-2023.csv",
+    "2023-2024": "examenkandidaten-vwo-en-examencijfers-2023-2024.csv",
+    "2024-2025": "examenkandidaten-vwo-en-examencijfers-2024-2025.csv",
+}
+
+
+# VO 考试 CSV 的学年列（count 列, pass 列, 学年, 权重）；config vo.weights.year_cols 缺省时使用，与 config 一致
+DEFAULT_VO_YEAR_COLS: List[List[Any]] = [
+    [13, 14, "2019-2020", 0.2],
+    [22, 23, "2020-2021", 0.4],
+    [31, 32, "2021-2022", 0.6],
+    [40, 41, "2022-2023", 0.8],
+    [49, 50, "2023-2024", 1.0],
+]
+
+
+def vwo_year_weights() -> tuple:
+    """VWO 统考学年（升序）与时间权重：最近学年权重最高，2024-2025 -> 5, 2023-2024 -> 4, ..."""
+    year_order = sorted(VWO_EXAM_FILES.keys())  # 升序："2020-2021" ... "2024-2025"
+    weights_desc = [1.0, 2.0, 3.0, 4.0, 5.0]
+    # Python 3.9 中内置 zip 不支持 strict 参数，这里依赖 year_order 与 weights_desc 长度一致的事实。
+    return year_order, {label: w for label, w in zip(year_order, weights_desc)}
+
+
+def _raw_root(config: Mapping[str, Any], data_root: Path) -> Path:
+    # 原始数据目录：允许通过 raw_subdir 将 DUO/CBS 源文件移出项目根，便于 .gitignore 管理。
+    raw_sub = str(config.get("raw_subdir") or "").strip()
+    return data_root / raw_sub if raw_sub and not Path(raw_sub).is_absolute() else (
+        Path(raw_sub) if raw_sub else data_root
+    )
+
+
+def layer_inputs(config: Mapping[str, Any], layer: str) -> List[Path]:
+    """该层流水线读取的全部原始输入文件（写入运行历史的哈希、watch 轮询的对象）；文件可以不存在。"""
+    data_root = Path(config.get("data_root") or config_mod.PROJECT_ROOT)
+    raw_root = _raw_root(config, data_root)
+    input_cfg: Dict[str, Any] = dict((config.get(layer) or {}).get("input") or {})
+    if layer == "po":
+        return [raw_root / (input_cfg.get("cbs_woz_csv") or "cbs_woz_per_postcode_year.csv")] + [
+            raw_root / f"duo_schooladviezen_{start}_{end}.csv" for start, end in config_mod.SCHOOLJARS
+        ]
+    return [
+        raw_root / (input_cfg.get("duo_vestigingen_vo_csv") or "duo_vestigingen_vo.csv"),
+        raw_root / (input_cfg.get("exams_all_csv") or "duo_examen_raw_all.csv"),
+        raw_root / (input_cfg.get("exams_small_csv") or "duo_examen_raw.csv"),
+    ] + [raw_root / name for name in VWO_EXAM_FILES.values()]
+
+
+def _record_history(
+    config: Mapping[str, Any],
+    data_root: Path,
+    run_report: Dict[str, Any],
+    input_paths: List[Path],
+    logger: Any,
+) -> None:
+    """
+    把 run_report 追加到运行历史库（history.enabled 时），并在 run_report["history"] 记下库路径与运行 id。
+    历史库写入失败只记警告，不影响流水线结果。
+    """
+    settings = history_mod.history_settings(config)
+    if not settings["enabled"]:
+        return
+    db_path: Path = settings["path"]
+    try:
+        run_id = history_mod.record_run(
+            db_path,
+            run_report,
+            config_hash=history_mod.config_hash(config),
+            inputs=history_mod.hash_files(data_root, input_paths),
+            git_commit=_get_git_commit(config_mod.PROJECT_ROOT),
+        )
+    except (OSError, sqlite3.Error) as e:
+        logger.warning("Could not record run history", extra={"path": str(db_path), "error": str(e)})
+        return
+    try:
+        rel = str(db_path.relative_to(data_root))
+    except ValueError:
+        rel = str(db_path)
+    run_report["history"] = {"path": rel, "run_id": run_id}
+
+
+def _stage_value(
+    memo: StageCache,
+    handle: Any,
+    sources: Optional[Mapping[str, Any]],
+    key: str,
+    compute: Any,
+    **kwargs: Any,
+) -> Any:
+    """合并分片时直接取 sources[key]（各分片已加载 / 计算的结果），否则经阶段缓存执行 compute。"""
+    if sources is not None:
+        return sources[key]
+    return memo.run(handle, compute, **kwargs)
+
+
+def _check_shard_settings(sources: Optional[Mapping[str, Any]], settings: Mapping[str, Any]) -> None:
+    def _canonical(value: Mapping[str, Any]) -> str:
+        return json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+
+    if sources is not None and _canonical(sources["settings"]) != _canonical(settings):
+        raise sharding.ShardMergeError(
+            "Shard results were computed with different input/compute settings than the merge config"
+        )
+
+
+def _write_shard(
+    config: Mapping[str, Any],
+    layer: str,
+    shard: tuple,
+    *,
+    data_root: Path,
+    raw_root: Path,
+    input_cfg: Mapping[str, Any],
+    start: datetime,
+    perf: PerfRecorder,
+    logger: Any,
+    history_inputs: List[Path],
+    settings: Mapping[str, Any],
+    data: Dict[str, Any],
+) -> tuple[Path, Dict[str, Any]]:
+    """
+    分片运行的收尾：写出本分片的加载 / 计算结果（{shard.dir}/{layer}-i-of-N.pkl）与分片 run_report，
+    依赖全体学校的截断、隐私处理与导出留给 merge。
+    """
+    keep = sharding.brin_filter(shard)
+    rows, excluded = data["rows"], data["excluded"]
+    run_quality = run_po_quality if layer == "po" else run_vo_quality
+    with perf.stage("data_quality", rows_in=len(rows) + len(excluded)):
+        data_quality = run_quality(rows, excluded, raw_root, input_cfg, max_brins_in_report=0)
+        # 重复 BRIN 扫描的是整个源文件：只保留本分片的 BRIN，合并时取并集
+        duplicates = [b for b in data_quality["duplicate_brin_in_source"]["brins"] if keep(b)]
+        data_quality["duplicate_brin_in_source"] = {"count": len(duplicates), "brins": duplicates}
+    data["duplicate_brins"] = duplicates
+
+    out_dir = sharding.shard_dir(config, data_root)
+    bundle = sharding.bundle_path(out_dir, layer, *shard)
+    try:
+        bundle_rel = str(bundle.relative_to(data_root))
+    except ValueError:
+        bundle_rel = str(bundle)
+    end = datetime.now(timezone.utc)
+    run_report: Dict[str, Any] = {
+        "pipeline_type": layer,
+        "profile": config.get("profile"),
+        "config_path": config.get("config_path"),
+        "started_at": start.isoformat(),
+        "finished_at": end.isoformat(),
+        "duration_seconds": (end - start).total_seconds(),
+        "inputs": {"data_root": str(data_root), layer: dict(input_cfg)},
+        "shard": {
+            "index": shard[0],
+            "count": shard[1],
+            "path": bundle_rel,
+            "n_schools": len(rows),
+            "n_excluded": len(excluded),
+        },
+        "summary": {"status": "success", "warnings": [], "errors": []},
+        "data_quality": data_quality,
+        "performance": perf.report(),
+    }
+    _record_history(config, data_root, run_report, history_inputs, logger)
+    sharding.write_bundle(bundle, layer=layer, shard=shard, settings=settings, data=data, run_report=run_report)
+    report_path = bundle.with_suffix(".json")
+    json_exporter.export_json([run_report], report_path)
+    logger.info("Wrote shard result", extra={"shard": f"{shard[0]}/{shard[1]}", "path": bundle_rel})
+    stats = {
+        "n_schools": len(rows),
+        "n_excluded": len(excluded),
+        "excluded_path": "",
+        "run_report_path": str(report_path),
+        "summary_status": "success",
+        "shard": f"{shard[0]}/{shard[1]}",
+    }
+    return bundle, stats
+
+
+def build_vo_profile_rows(
+    rows: List[Dict[str, Any]],
+    profile_indices: Mapping[str, Mapping[str, float]],
+) -> Dict[str, List[Dict[str, Any]]]:
+    """为每个 profiel（NT/NG/EM/CM）组装点列表：与主 VO 宽表行 join，以 BRIN 对齐。"""
+    rows_by_profile: Dict[str, List[Dict[str, Any]]] = {"NT": [], "NG": [], "EM": [], "CM": []}
+    for row in rows:
+        brin = row.get("BRIN")
+        if not brin:
+            continue
+        brin_str = str(brin)
+        naam = row.get("vestigingsnaam")
+        gemeente = row.get("gemeente")
+        postcode = (row.get("postcode") or "").strip()
+        # backlog 约定：现有 VO 主图的 X 轴（VWO 占比）作为 profiel 图的 Y 轴。
+        y_vwo_share = row.get("X_linear")
+        candidates_total = row.get("candidates_total")
+        candidates_weighted_avg = row.get("candidates_weighted_avg")
+
+        for prof in ("NT", "NG", "EM", "CM"):
+            prof_map = profile_indices.get(prof) or {}
+            x_prof = prof_map.get(brin_str)
+            if x_prof is None:
+                continue
+            # 进入 profile 的学校必有 VWO 统考数据，统一标为 HAVO/VWO（避免主表 type=VMBO 的误标）
+            rows_by_profile[prof].append(
+                {
+                    "BRIN": brin_str,
+                    "vestigingsnaam": naam,
+                    "naam": naam,
+                    "gemeente": gemeente,
+                    "postcode": postcode,
+                    "type": "HAVO/VWO",
+                    "profile_id": prof,
+                    "X_profile": float(x_prof),
+                    "Y_vwo_share": float(y_vwo_share) if y_vwo_share is not None else None,
+                    "candidates_total": int(candidates_total or 0),
+                    "candidates_weighted_avg": (
+                        float(candidates_weighted_avg)
+                        if candidates_weighted_avg is not None
+                        else None
+                    ),
+                }
+            )
+    return rows_by_profile
+
+
+def privacy_settings(config: Mapping[str, Any], layer: str) -> tuple:
+    """层级 privacy 配置覆盖全局 privacy：返回 (min_group_size, max_detail_level)。"""
+    privacy_global: Dict[str, Any] = dict(config.get("privacy") or {})
+    privacy_layer: Dict[str, Any] = dict((config.get(layer) or {}).get("privacy") or {})
+    min_group_size = privacy_layer.get("min_group_size", privacy_global.get("min_group_size", 0)) or 0
+    max_detail_level = privacy_layer.get("max_detail_level", privacy_global.get("max_detail_level", "school"))
+    return min_group_size, max_detail_level
+
+
+def _apply_privacy_suppression(
+    rows: List[Dict[str, Any]],
+    size_key: str,
+    min_group_size: Any,
+) -> tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """按 privacy.min_group_size 过滤 size_key 过小的行，返回 (保留行, 被抑制的 {BRIN, size_key} 列表)。"""
+    if not isinstance(min_group_size, int) or min_group_size <= 0:
+        return rows, []
+    kept: List[Dict[str, Any]] = []
+    suppressed: List[Dict[str, Any]] = []
+    for row in rows:
+        size = int(row.get(size_key) or 0)
+        if size < min_group_size:
+            suppressed.append({"BRIN": row.get("BRIN"), size_key: size})
+        else:
+            kept.append(row)
+    return kept, suppressed
+
+
+# rollup_to_wide_rows 需要的额外组内合计列（见 compute.rollup）
+_ROLLUP_SUM_KEYS: Dict[str, tuple] = {"po": ("has_full_woz",), "vo": ("candidates_weighted_avg",)}
+
+
+def _apply_detail_level(
+    rows: List[Dict[str, Any]],
+    layer: str,
+    size_key: str,
+    max_detail_level: Any,
+) -> tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    privacy.max_detail_level 为 gemeente / pc4 时以区域汇总行替代学校行；school 时原样返回。
+
+    学校数少于 MIN_GROUP_SCHOOLS 的分组等同学校行，不发布。返回 (汇总行, 被抑制的 {BRIN, size_key} 列表)。
+    """
+    level = str(max_detail_level or "school")
+    if level == "school":
+        return rows, []
+    groups = rollup_rows(rows, level, size_key, sum_keys=_ROLLUP_SUM_KEYS[layer])
+    kept = [g for g in groups if g["n_schools"] >= MIN_GROUP_SCHOOLS]
+    suppressed = [
+        {"BRIN": row["BRIN"], size_key: row[size_key]}
+        for row in rollup_to_wide_rows([g for g in groups if g["n_schools"] < MIN_GROUP_SCHOOLS], layer)
+    ]
+    return rollup_to_wide_rows(kept, layer), suppressed
+
+
+def _apply_privacy(
+    rows: List[Dict[str, Any]],
+    layer: str,
+    size_key: str,
+    min_group_size: Any,
+    max_detail_level: Any,
+) -> tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """privacy 阶段：先按 max_detail_level 汇总，再按 min_group_size 抑制；返回 (发布行, 全部被抑制行)。"""
+    rows, suppressed_groups = _apply_detail_level(rows, layer, size_key, max_detail_level)
+    rows, suppressed = _apply_privacy_suppression(rows, size_key, min_group_size)
+    return rows, suppressed_groups + suppressed
+
+
+def _export_rollups(
+    rows: List[Dict[str, Any]],
+    layer: str,
+    size_key: str,
+    levels: List[str],
+    data_root: Path,
+    out_dir_rel: Path,
+    stem: str,
+    *,
+    min_group_size: Any,
+    max_detail_level: Any = "school",
+) -> Dict[str, Dict[str, Any]]:
+    """
+    为 output.rollup_levels 中每个级别写出 {stem}_rollup_{level}.json（供前端缩小视图时加载）。
+
+    汇总基于学校级行；比 privacy.max_detail_level 更细的级别跳过不写。规模合计低于
+    privacy.min_group_size 的分组不写出；max_detail_level 高于 school 时，学校数少于
+    MIN_GROUP_SCHOOLS 的分组（等同学校行）同样不写出。返回 level -> 运行报告条目。
+    """
+    min_size = min_group_size if isinstance(min_group_size, int) and min_group_size > 0 else 0
+    max_level = str(max_detail_level or "school")
+    min_schools = MIN_GROUP_SCHOOLS if max_level != "school" else 1
+    written: Dict[str, Dict[str, Any]] = {}
+    for level in levels:
+        if is_finer_than(level, max_level):
+            continue
+        groups = rollup_rows(rows, level, size_key, sum_keys=_ROLLUP_SUM_KEYS[layer])
+        kept = [g for g in groups if g["size_total"] >= min_size and g["n_schools"] >= min_schools]
+        for g in kept:
+            # 分组内学校列表由学校级 points 提供，汇总文件只保留统计量以控制体积
+            g.pop("brins", None)
+        rel = str(out_dir_rel / f"{stem}_rollup_{level}.json")
+        json_exporter.write_meta_json(
+            {
+                "layer": layer,
+                "level": level,
+                "size_key": size_key,
+                "n_groups": len(kept),
+                "groups": kept,
+            },
+            data_root / rel,
+        )
+        written[level] = {"path": rel, "n_groups": len(kept), "n_suppressed": len(groups) - len(kept)}
+    return written
+
+
+def _export_shards(
+    datasets: Dict[str, Dict[str, Any]],
+    layer: str,
+    data_root: Path,
+    out_dir_rel: Path,
+    stem: str,
+) -> Dict[str, Any]:
+    """
+    写出按 gemeente 分片的 points 与清单 {stem}_shards.json（output.export_shards）。
+
+    返回 {"path": 清单相对路径, "files": 各分片相对路径, "n_shards": 分片总数, "meta_ref": 写入 meta JSON 的引用}。
+    """
+    rel = str(out_dir_rel / f"{stem}_shards.json")
+    manifest = export_gemeente_shards(datasets, data_root / rel, layer)
+    n_shards = shard_count(manifest)
+    return {
+        "path": rel,
+        "files": [
+            str(out_dir_rel / shard["path"]) for ds in manifest["datasets"].values() for shard in ds["shards"]
+        ],
+        "n_shards": n_shards,
+        "meta_ref": {
+            "manifest": Path(rel).name,
+            "partition_key": "gemeente",
+            "datasets": sorted(manifest["datasets"]),
+            "n_shards": n_shards,
+        },
+    }
+
+
+def _export_details(
+    details: Dict[str, Dict[str, Any]],
+    layer: str,
+    data_root: Path,
+    out_dir_rel: Path,
+    stem: str,
+    prefix_length: int,
+) -> Dict[str, Any]:
+    """
+    写出按 BRIN 前缀分组的学校明细分片与索引 {stem}_details.json（output.export_detail_shards）。
+
+    返回 {"path": 索引相对路径, "files": 各分片相对路径, "n_shards", "meta_ref"}。
+    """
+    rel = str(out_dir_rel / f"{stem}_details.json")
+    index = export_detail_shards(details, data_root / rel, layer, prefix_length=prefix_length)
+    return {
+        "path": rel,
+        "files": [str(out_dir_rel / shard["path"]) for shard in index["shards"].values()],
+        "n_shards": len(index["shards"]),
+        "meta_ref": {
+            "index": Path(rel).name,
+            "prefix_length": index["prefix_length"],
+            "n_schools": index["n_schools"],
+        },
+    }
+
+
+def _export_density(
+    datasets: Dict[str, Dict[str, Any]],
+    layer: str,
+    data_root: Path,
+    out_dir_rel: Path,
+    stem: str,
+    output_cfg: Mapping[str, Any],
+) -> Dict[str, Any]:
+    """写出 X/Y 密度金字塔 {stem}_density.json（output.export_density_tiles）。"""
+    rel = str(out_dir_rel / f"{stem}_density.json")
+    doc = export_density_tiles(
+        datasets,
+        data_root / rel,
+        layer,
+        base_bins=int(output_cfg.get("density_base_bins") or DEFAULT_BASE_BINS),
+        levels=int(output_cfg.get("density_levels") or DEFAULT_LEVELS),
+    )
+    return {
+        "path": rel,
+        "meta_ref": {
+            "path": Path(rel).name,
+            "base_bins": doc["base_bins"],
+            "n_levels": doc["n_levels"],
+            "datasets": sorted(doc["datasets"]),
+        },
+    }
+
+
+def _export_geo_clusters(
+    features: List[Dict[str, Any]],
+    layer: str,
+    size_field: str,
+    data_root: Path,
+    out_dir_rel: Path,
+    stem: str,
+    output_cfg: Mapping[str, Any],
+) -> Dict[str, Any]:
+    """写出地图分层聚类索引 {stem}_geo_clusters.json（output.export_geo_clusters，需 pc4_centroids_path）。"""
+    rel = str(out_dir_rel / f"{stem}_geo_clusters.json")
+    doc = export_cluster_index(
+        features,
+        data_root / rel,
+        layer,
+        size_field=size_field,
+        radius=float(output_cfg.get("geo_cluster_radius") or DEFAULT_RADIUS),
+        max_zoom=int(output_cfg.get("geo_cluster_max_zoom") or DEFAULT_MAX_ZOOM),
+    )
+    return {
+        "path": rel,
+        "meta_ref": {
+            "path": Path(rel).name,
+            "radius": doc["radius"],
+            "min_zoom": doc["min_zoom"],
+            "max_zoom": doc["max_zoom"],
+            "n_points": doc["n_points"],
+        },
+    }
+
+
+def _export_window_variants(
+    layer: str,
+    cube: YearCube,
+    windows: List[str],
+    data_root: Path,
+    out_dir_rel: Path,
+    stem: str,
+    *,
+    min_group_size: Any,
+    include_meta_columns: bool,
+    export_points_json: bool,
+    outliers: Optional[Dict[str, Any]],
+    min_havo_vwo_total: int = 20,
+    max_detail_level: Any = "school",
+) -> Dict[str, Dict[str, Any]]:
+    """
+    基于年度立方体为每个学年窗口（如 "2021-2024"）额外写出 CSV / points JSON 变体。
+
+    文件名为 {stem}_w{start}_{end}.csv / .json，与主产物位于同一目录；阈值、异常值截断、
+    privacy.max_detail_level 与隐私抑制与主产物一致（阈值按窗口内合计判断）。返回 window -> 运行报告条目。
+    """
+    size_key = "pupils_total" if layer == "po" else "candidates_total"
+    variants: Dict[str, Dict[str, Any]] = {}
+    for spec in windows:
+        start_year, end_year = parse_window(spec)
+        rows_w, excluded_w = query_xy(
+            cube,
+            window=(start_year, end_year),
+            min_havo_vwo_total=min_havo_vwo_total,
+            outliers=outliers,
+        )
+        rows_w, suppressed_w = _apply_privacy(rows_w, layer, size_key, min_group_size, max_detail_level)
+        suffix = f"w{start_year}_{end_year}"
+        csv_rel_w = str(out_dir_rel / f"{stem}_{suffix}.csv")
+        if layer == "po":
+            csv_exporter.export_po_csv(rows_w, data_root / csv_rel_w, include_meta_columns=include_meta_columns)
+        else:
+            csv_exporter.export_vo_csv(rows_w, data_root / csv_rel_w, include_meta_columns=include_meta_columns)
+        points_rel_w: Optional[str] = None
+        if export_points_json:
+            points_rel_w = str(out_dir_rel / f"{stem}_{suffix}.json")
+            if layer == "po":
+                export_po_points(rows_w, data_root / points_rel_w)
+            else:
+                export_vo_points(rows_w, data_root / points_rel_w)
+        variants[f"{start_year}-{end_year}"] = {
+            "csv_path": csv_rel_w,
+            "points_path": points_rel_w,
+            "n_schools": len(rows_w),
+            "n_excluded": len(excluded_w),
+            "n_suppressed": len(suppressed_w),
+        }
+    return variants
+
+
+def _output_options(
+    output_cfg: Mapping[str, Any], out_dir_rel: Path, stem: str, *keys: str, **extra: Any
+) -> Dict[str, Any]:
+    """
+    某个导出阶段的输出位置（out_dir + stem）与读取的 output 配置子集（用作阶段缓存的 config 依赖）。
+
+    输出位置必须进入指纹：只改 output.csv 的目录时，导出阶段需重写到新目录而非命中旧缓存。
+    """
+    options: Dict[str, Any] = {"out_dir": str(out_dir_rel), "stem": stem}
+    options.update({key: output_cfg.get(key) for key in keys})
+    options.update(extra)
+    return options
+
+
+def _window_variant_outputs(data_root: Path):
+    """export.window_variants 阶段写出的文件（由返回的 window -> 条目映射得到）。"""
+
+    def outputs(variants: Mapping[str, Mapping[str, Any]]) -> List[Path]:
+        return [
+            data_root / v[key] for v in variants.values() for key in ("csv_path", "points_path") if v.get(key)
+        ]
+
+    return outputs
+
+
+def _validate_exports(
+    layer: str,
+    data_root: Path,
+    csv_path: Path,
+    points_path: Optional[Path],
+    meta_path: Path,
+    output_cfg: Mapping[str, Any],
+) -> List[Dict[str, Any]]:
+    """对已导出的 points/meta、GeoJSON 与长表做 schema 校验，返回带 artifact 标记的错误列表。"""
+    schema_errors: List[Dict[str, Any]] = []
+
+    # points + meta 校验
+    if points_path is not None:
+        try:
+            points_data = json.loads(Path(points_path).read_text(encoding="utf-8"))
+            meta_data = json.loads(meta_path.read_text(encoding="utf-8"))
+            for e in sv.validate_points_against_meta(points_data, meta_data, layer=layer):
+                d = e.to_dict()
+                d["artifact"] = f"{layer}_points_meta"
+                schema_errors.append(d)
+        except Exception as exc:  # pragma: no cover - 极端 IO/JSON 异常
+            schema_errors.append(
+                {"kind": "schema_validator_exception", "message": str(exc), "artifact": f"{layer}_points_meta"}
+            )
+
+    # GeoJSON 校验
+    if output_cfg.get("export_geojson", True):
+        geo_path = data_root / (csv_path.stem + "_geo.json")
+        if geo_path.exists():
+            try:
+                geo = json.loads(geo_path.read_text(encoding="utf-8"))
+                for e in sv.validate_geojson_schema(geo, layer=layer):
+                    d = e.to_dict()
+                    d["artifact"] = f"{layer}_geojson"
+                    schema_errors.append(d)
+            except Exception as exc:  # pragma: no cover
+                schema_errors.append(
+                    {"kind": "schema_validator_exception", "message": str(exc), "artifact": f"{layer}_geojson"}
+                )
+
+    # 长表 CSV 校验
+    if output_cfg.get("export_long_table", True):
+        long_path = data_root / (csv_path.stem + "_long.csv")
+        if long_path.exists():
+            try:
+                with long_path.open(encoding="utf-8", newline="") as f:
+                    long_rows = list(csv.DictReader(f))
+                for e in sv.validate_long_table_schema(long_rows, layer=layer):
+                    d = e.to_dict()
+                    d["artifact"] = f"{layer}_long_table"
+                    schema_errors.append(d)
+            except Exception as exc:  # pragma: no cover
+                schema_errors.append(
+                    {"kind": "schema_validator_exception", "message": str(exc), "artifact": f"{layer}_long_table"}
+                )
+
+    return schema_errors
+
+
+def run_po_pipeline(
+    config: Optional[Dict[str, Any]] = None,
+    *,
+    sources: Optional[Mapping[str, Any]] = None,
+) -> tuple[Path, Dict[str, Any]]:
     """
     运行小学 PO X/Y 计算流水线。
 
     参数:
         config: 可选配置字典；若未提供，则从 config.yaml 加载（build_effective_config()）。
+        sources: 合并分片时由 sharding.merge_sources() 提供的已加载 / 已计算结果，此时不读原始文件。
+
+    配置含 shard.index / shard.count（CLI etl --shard i/N）时只处理本分片的 BRIN，
+    写出分片结果后返回 (分片结果路径, stats)，见 alleschools.sharding。
 
     返回:
         (csv_path, stats) 元组，其中 stats 至少包含:
@@ -76,11 +704,7 @@ def run_po_pipeline(config: Optional[Dict[str, Any]] = None) -> tuple[Path, Dict
 
     start = datetime.now(timezone.utc)
     data_root = Path(config.get("data_root") or config_mod.PROJECT_ROOT)
-    # 原始数据目录：允许通过 raw_subdir 将 DUO/CBS 源文件移出项目根，便于 .gitignore 管理。
-    raw_sub = str(config.get("raw_subdir") or "").strip()
-    raw_root = data_root / raw_sub if raw_sub and not Path(raw_sub).is_absolute() else (
-        Path(raw_sub) if raw_sub else data_root
-    )
+    raw_root = _raw_root(config, data_root)
     po_cfg: Dict[str, Any] = dict(config.get("po") or {})
     input_cfg: Dict[str, Any] = dict(po_cfg.get("input") or {})
     output_cfg: Dict[str, Any] = dict(po_cfg.get("output") or {})
@@ -88,18 +712,43 @@ def run_po_pipeline(config: Optional[Dict[str, Any]] = None) -> tuple[Path, Dict
     # 初始化 logger（此处使用默认级别与 stderr 输出）
     logger = setup_logger()
     logger.info("Starting PO pipeline")
+    perf = PerfRecorder.from_config(config, layer="po", root=data_root)
+    # 阶段缓存：每个 perf 阶段声明上游阶段 / 配置 / 输入文件，指纹未变且输出完好的阶段直接复用上次结果
+    memo = StageCache.from_config(config, layer="po", root=data_root)
+    # 分片：loader 只保留本分片的 BRIN；合并分片：加载 / 计算结果来自各分片，阶段缓存不参与
+    shard = sharding.shard_settings(config) if sources is None else None
+    keep = sharding.brin_filter(shard)
+    shard_key: Dict[str, Any] = {"shard": list(shard)} if shard else {}
+    if sources is not None:
+        memo = StageCache(None)
 
     # 1. 加载 WOZ（从原始数据目录）
     woz_rel = input_cfg.get("cbs_woz_csv") or "cbs_woz_per_postcode_year.csv"
     woz_path = raw_root / woz_rel
-    woz, woz_years = cbs_loader.load_woz_pc4_year(str(woz_path))
+    with perf.stage("load.cbs_woz") as st:
+        woz, woz_years = _stage_value(
+            memo, st, sources, "woz", lambda: cbs_loader.load_woz_pc4_year(str(woz_path)), files=[woz_path]
+        )
+        st.rows_out = len(woz)
     logger.info(
         "Loaded WOZ data",
         extra={"woz_entries": len(woz), "woz_years": list(woz_years)},
     )
 
+    history_inputs = layer_inputs(config, "po")
+
     # 2. 加载 DUO Schooladviezen（从原始数据目录）
-    schools = duo_loader.load_schooladviezen_po(str(raw_root))
+    with perf.stage("load.duo_schooladviezen") as st:
+        schools = _stage_value(
+            memo,
+            st,
+            sources,
+            "schools",
+            lambda: duo_loader.load_schooladviezen_po(str(raw_root), keep),
+            config=shard_key,
+            files=history_inputs[1:],
+        )
+        st.rows_out = len(schools)
     logger.info(
         "Loaded PO schooladviezen",
         extra={
@@ -108,8 +757,8 @@ def run_po_pipeline(config: Optional[Dict[str, Any]] = None) -> tuple[Path, Dict
         },
     )
 
-    # 必要输入缺失时写出 run_report 并提前返回（与 VO 行为一致）
-    if not schools:
+    # 必要输入缺失时写出 run_report 并提前返回（与 VO 行为一致）；分片可以合法地不含任何学校
+    if not schools and not (shard and any(p.is_file() for p in history_inputs[1:])):
         logger.error("No PO schooladviezen data found")
         end = datetime.now(timezone.utc)
         duration = (end - start).total_seconds()
@@ -137,7 +786,9 @@ def run_po_pipeline(config: Optional[Dict[str, Any]] = None) -> tuple[Path, Dict
                 }
             },
             "summary": {"status": "error", "warnings": [], "errors": ["No PO schooladviezen data found"]},
+            "performance": perf.report(),
         }
+        _record_history(config, data_root, run_report, history_inputs, logger)
         json_exporter.export_json([run_report], report_path)
         stats = {
             "n_schools": 0,
@@ -152,29 +803,70 @@ def run_po_pipeline(config: Optional[Dict[str, Any]] = None) -> tuple[Path, Dict
     missing_cfg: Dict[str, Any] = dict(po_cfg.get("missing_values") or {})
     woz_strategy = str(missing_cfg.get("woz_strategy") or "nearest_year")
     outliers_cfg: Dict[str, Any] = dict(po_cfg.get("outliers") or {})
-    rows_out, excluded = compute_po_xy(
-        schools,
-        woz,
-        woz_years,
-        woz_strategy=woz_strategy,
-        outliers=outliers_cfg or None,
-    )
+    compute_settings = {"input": input_cfg, "woz_strategy": woz_strategy}
+    _check_shard_settings(sources, compute_settings)
+
+    def _compute() -> tuple:
+        facts: Dict[str, List[Dict[str, Any]]] = {}
+        rows, excl = compute_po_xy(
+            schools,
+            woz,
+            woz_years,
+            woz_strategy=woz_strategy,
+            # 百分位截断依赖全体学校：分片时推迟到 merge
+            outliers=None if shard else outliers_cfg or None,
+            year_facts=facts,
+        )
+        return rows, excl, facts
+
+    with perf.stage("compute.po_xy", rows_in=len(schools)) as st:
+        rows_out, excluded, year_facts = _stage_value(
+            memo,
+            st,
+            sources,
+            "compute",
+            _compute,
+            after=("load.cbs_woz", "load.duo_schooladviezen"),
+            config={"woz_strategy": woz_strategy, "outliers": outliers_cfg},
+        )
+        if sources is not None and outliers_cfg:
+            _apply_outlier_clipping(rows_out, "X_linear", "Y_linear", outliers_cfg)
+        st.rows_out = len(rows_out)
+
+    if shard is not None:
+        return _write_shard(
+            config,
+            "po",
+            shard,
+            data_root=data_root,
+            raw_root=raw_root,
+            input_cfg=input_cfg,
+            start=start,
+            perf=perf,
+            logger=logger,
+            history_inputs=history_inputs,
+            settings=compute_settings,
+            data={
+                "woz": woz,
+                "woz_years": woz_years,
+                "schools": schools,
+                "rows": rows_out,
+                "excluded": excluded,
+                "year_facts": year_facts,
+            },
+        )
 
     # 隐私抑制：根据 privacy.min_group_size 过滤过小样本（额外于业务阈值）。
-    privacy_global: Dict[str, Any] = dict(config.get("privacy") or {})
-    privacy_po: Dict[str, Any] = dict(po_cfg.get("privacy") or {})
-    min_group_size_priv = privacy_po.get("min_group_size", privacy_global.get("min_group_size", 0)) or 0
-    max_detail_level = privacy_po.get("max_detail_level", privacy_global.get("max_detail_level", "school"))
-    privacy_excluded: List[Dict[str, Any]] = []
-    if isinstance(min_group_size_priv, int) and min_group_size_priv > 0:
-        kept: List[Dict[str, Any]] = []
-        for row in rows_out:
-            pupils_total = int(row.get("pupils_total") or 0)
-            if pupils_total < min_group_size_priv:
-                privacy_excluded.append({"BRIN": row.get("BRIN"), "pupils_total": pupils_total})
-            else:
-                kept.append(row)
-        rows_out = kept
+    min_group_size_priv, max_detail_level = privacy_settings(config, "po")
+    school_rows = rows_out
+    with perf.stage("privacy", rows_in=len(rows_out)) as st:
+        rows_out, privacy_excluded = memo.run(
+            st,
+            lambda: _apply_privacy(school_rows, "po", "pupils_total", min_group_size_priv, max_detail_level),
+            after=("compute.po_xy",),
+            config={"max_detail_level": max_detail_level, "min_group_size": min_group_size_priv},
+        )
+        st.rows_out = len(rows_out)
 
     # 4. 导出
     # 所有导出产物默认与 csv 位于同一目录（通常为 generated/ 前缀），
@@ -189,17 +881,39 @@ def run_po_pipeline(config: Optional[Dict[str, Any]] = None) -> tuple[Path, Dict
     excluded_path = data_root / excluded_rel
     geo_rel_default = out_dir_rel / f"{stem}_geo.json"
     long_rel_default = out_dir_rel / f"{stem}_long.csv"
+    long_dim_rel_default = out_dir_rel / f"{stem}_long_dim.csv"
+    long_fact_rel_default = out_dir_rel / f"{stem}_long_fact.csv"
     points_rel_default = out_dir_rel / f"{stem}.json"
     meta_rel_default = out_dir_rel / f"{stem}_meta.json"
 
     include_meta_columns = output_cfg.get("include_meta_columns", True)
+    long_table_mode = str(output_cfg.get("long_table_mode") or "wide")
     write_meta_json_flag = output_cfg.get("write_meta_json", True)
 
-    csv_exporter.export_po_csv(rows_out, csv_path, include_meta_columns=include_meta_columns)
-    json_exporter.export_json(excluded, excluded_path)
+    with perf.stage("export.csv", rows_in=len(rows_out)) as st:
+        memo.run(
+            st,
+            lambda: csv_exporter.export_po_csv(rows_out, csv_path, include_meta_columns=include_meta_columns),
+            after=("privacy",),
+            config={"path": csv_rel, "include_meta_columns": include_meta_columns},
+            outputs=[csv_path],
+        )
+        st.wrote(csv_path)
+    with perf.stage("export.excluded", rows_in=len(excluded)) as st:
+        memo.run(
+            st,
+            lambda: json_exporter.export_json(excluded, excluded_path),
+            after=("compute.po_xy",),
+            config={"path": excluded_rel},
+            outputs=[excluded_path],
+        )
+        st.wrote(excluded_path)
 
     geo_rel: Optional[str] = None
+    geo_clusters_out: Optional[Dict[str, Any]] = None
     long_rel: Optional[str] = None
+    long_dim_rel: Optional[str] = None
+    long_fact_rel: Optional[str] = None
     points_rel: Optional[str] = None
     meta_rel: Optional[str] = None
 
@@ -210,18 +924,202 @@ def run_po_pipeline(config: Optional[Dict[str, Any]] = None) -> tuple[Path, Dict
         lookup_path = (
             str(data_root / pc4_path) if pc4_path and not Path(pc4_path).is_absolute() else (pc4_path or None)
         )
-        geojson_exporter.export_geojson(rows_out, geo_path, lookup_path=lookup_path)
+        with perf.stage("export.geojson", rows_in=len(rows_out)) as st:
+            geo_fc = memo.run(
+                st,
+                lambda: geojson_exporter.export_geojson(rows_out, geo_path, lookup_path=lookup_path),
+                after=("privacy",),
+                config={"path": geo_rel},
+                files=[lookup_path] if lookup_path else [],
+                outputs=[geo_path],
+            )
+            st.wrote(geo_path)
+        if output_cfg.get("export_geo_clusters", False):
+            with perf.stage("export.geo_clusters", rows_in=len(geo_fc["features"])) as st:
+                geo_clusters_out = memo.run(
+                    st,
+                    lambda: _export_geo_clusters(
+                        geo_fc["features"], "po", "pupils_total", data_root, out_dir_rel, stem, output_cfg
+                    ),
+                    after=("export.geojson",),
+                    config=_output_options(output_cfg, out_dir_rel, stem, "geo_cluster_radius", "geo_cluster_max_zoom"),
+                    outputs=lambda out: [data_root / out["path"]],
+                )
+                st.wrote(data_root / geo_clusters_out["path"])
     if output_cfg.get("export_long_table", True):
-        long_rel = str(long_rel_default)
-        long_path = data_root / long_rel
-        long_table_exporter.export_po_long_table(
-            rows_out, long_path, include_meta_columns=include_meta_columns
-        )
+        if long_table_mode == "star":
+            # 星型长表：学校维表 + 逐年事实表，替代按年复制宽表行的 wide 模式
+            long_dim_rel = str(long_dim_rel_default)
+            long_fact_rel = str(long_fact_rel_default)
+            long_outputs = [data_root / long_dim_rel, data_root / long_fact_rel]
+        else:
+            long_rel = str(long_rel_default)
+            long_outputs = [data_root / long_rel]
+
+        def _write_long_table() -> None:
+            if long_table_mode == "star":
+                long_table_exporter.export_po_star_tables(
+                    rows_out,
+                    year_facts,
+                    long_outputs[0],
+                    long_outputs[1],
+                    include_meta_columns=include_meta_columns,
+                )
+            else:
+                long_table_exporter.export_po_long_table(
+                    rows_out, long_outputs[0], include_meta_columns=include_meta_columns
+                )
+
+        with perf.stage("export.long_table", rows_in=len(rows_out)) as st:
+            memo.run(
+                st,
+                _write_long_table,
+                after=("privacy", "compute.po_xy"),
+                config=_output_options(
+                    output_cfg, out_dir_rel, stem, mode=long_table_mode, include_meta_columns=include_meta_columns
+                ),
+                outputs=long_outputs,
+            )
+            st.wrote(*long_outputs)
     points_path = None
     if output_cfg.get("export_points_json", True):
         points_rel = str(points_rel_default)
         points_path = data_root / points_rel
-        export_po_points(rows_out, points_path)
+        with perf.stage("export.points", rows_in=len(rows_out)) as st:
+            memo.run(
+                st,
+                lambda: export_po_points(rows_out, points_path),
+                after=("privacy",),
+                config={"path": points_rel},
+                outputs=[points_path],
+            )
+            st.wrote(points_path)
+    search_rel = None
+    if output_cfg.get("export_search_index", True):
+        # 搜索索引与 points JSON 文档顺序一致（均为 rows_out 顺序）
+        search_rel = str(out_dir_rel / f"{stem}_search.json")
+        with perf.stage("export.search_index", rows_in=len(rows_out)) as st:
+            memo.run(
+                st,
+                lambda: export_search_index(rows_out, data_root / search_rel, "po"),
+                after=("privacy",),
+                config={"path": search_rel},
+                outputs=[data_root / search_rel],
+            )
+            st.wrote(data_root / search_rel)
+    shards_out: Optional[Dict[str, Any]] = None
+    density_out: Optional[Dict[str, Any]] = None
+    if output_cfg.get("export_shards", False) or output_cfg.get("export_density_tiles", False):
+        point_datasets: Dict[str, Dict[str, Any]] = {
+            "po": {"points": [_po_row_to_point(r) for r in rows_out], "key_field": "municipality"},
+        }
+        if output_cfg.get("export_shards", False):
+            with perf.stage("export.shards", rows_in=len(rows_out)) as st:
+                shards_out = memo.run(
+                    st,
+                    lambda: _export_shards(point_datasets, "po", data_root, out_dir_rel, stem),
+                    after=("privacy",),
+                    config=_output_options(output_cfg, out_dir_rel, stem),
+                    outputs=lambda out: [data_root / rel for rel in (out["path"], *out["files"])],
+                )
+                st.rows_out = shards_out["n_shards"]
+                st.wrote(*(data_root / rel for rel in (shards_out["path"], *shards_out["files"])))
+        if output_cfg.get("export_density_tiles", False):
+            with perf.stage("export.density", rows_in=len(rows_out)) as st:
+                density_out = memo.run(
+                    st,
+                    lambda: _export_density(point_datasets, "po", data_root, out_dir_rel, stem, output_cfg),
+                    after=("privacy",),
+                    config=_output_options(output_cfg, out_dir_rel, stem, "density_base_bins", "density_levels"),
+                    outputs=lambda out: [data_root / out["path"]],
+                )
+                st.wrote(data_root / density_out["path"])
+    details_out: Optional[Dict[str, Any]] = None
+    if output_cfg.get("export_detail_shards", False):
+        # 逐年明细仅对已发布的学校行写出（汇总行 / 隐私抑制的学校没有明细）
+        with perf.stage("export.details", rows_in=len(rows_out)) as st:
+            details_out = memo.run(
+                st,
+                lambda: _export_details(
+                    build_school_details(rows_out, "po", year_facts),
+                    "po",
+                    data_root,
+                    out_dir_rel,
+                    stem,
+                    int(output_cfg.get("detail_prefix_length") or 3),
+                ),
+                after=("privacy", "compute.po_xy"),
+                config=_output_options(output_cfg, out_dir_rel, stem, "detail_prefix_length"),
+                outputs=lambda out: [data_root / rel for rel in (out["path"], *out["files"])],
+            )
+            st.rows_out = details_out["n_shards"]
+            st.wrote(*(data_root / rel for rel in (details_out["path"], *details_out["files"])))
+
+    rollup_levels = [str(level) for level in (output_cfg.get("rollup_levels") or [])]
+    with perf.stage("export.rollups", rows_in=len(school_rows)) as st:
+        rollup_outputs = memo.run(
+            st,
+            lambda: _export_rollups(
+                school_rows,
+                "po",
+                "pupils_total",
+                rollup_levels,
+                data_root,
+                out_dir_rel,
+                stem,
+                min_group_size=min_group_size_priv,
+                max_detail_level=max_detail_level,
+            ),
+            after=("compute.po_xy",),
+            config=_output_options(
+                output_cfg,
+                out_dir_rel,
+                stem,
+                levels=rollup_levels,
+                min_group_size=min_group_size_priv,
+                max_detail_level=max_detail_level,
+            ),
+            outputs=lambda out: [data_root / r["path"] for r in out.values()],
+        )
+        st.rows_out = sum(int(r["n_groups"]) for r in rollup_outputs.values())
+        st.wrote(*(data_root / r["path"] for r in rollup_outputs.values()))
+
+    # 学年窗口变体（CLI --window / config windows）：复用已加载数据构建年度立方体，不重跑 loader
+    windows: List[str] = [str(w) for w in (config.get("windows") or [])]
+    window_variants: Optional[Dict[str, Dict[str, Any]]] = None
+    if windows:
+        with perf.stage("export.window_variants", rows_in=len(schools)) as st:
+            window_variants = memo.run(
+                st,
+                lambda: _export_window_variants(
+                    "po",
+                    build_po_year_cube(schools, woz, woz_years, woz_strategy=woz_strategy),
+                    windows,
+                    data_root,
+                    out_dir_rel,
+                    stem,
+                    min_group_size=min_group_size_priv,
+                    include_meta_columns=include_meta_columns,
+                    export_points_json=bool(output_cfg.get("export_points_json", True)),
+                    outliers=outliers_cfg or None,
+                    max_detail_level=max_detail_level,
+                ),
+                after=("load.cbs_woz", "load.duo_schooladviezen"),
+                config=_output_options(
+                    output_cfg,
+                    out_dir_rel,
+                    stem,
+                    windows=windows,
+                    woz_strategy=woz_strategy,
+                    outliers=outliers_cfg,
+                    min_group_size=min_group_size_priv,
+                    max_detail_level=max_detail_level,
+                    include_meta_columns=include_meta_columns,
+                    export_points_json=bool(output_cfg.get("export_points_json", True)),
+                ),
+                outputs=_window_variant_outputs(data_root),
+            )
+            st.rows_out = sum(int(v.get("n_schools") or 0) for v in window_variants.values())
 
     end = datetime.now(timezone.utc)
     duration = (end - start).total_seconds()
@@ -229,24 +1127,40 @@ def run_po_pipeline(config: Optional[Dict[str, Any]] = None) -> tuple[Path, Dict
     dq_cfg: Dict[str, Any] = dict(po_cfg.get("data_quality") or {})
     data_quality: Optional[Dict[str, Any]] = None
     if dq_cfg.get("enabled", True):
-        data_quality = run_po_quality(
-            rows_out,
-            excluded,
-            raw_root,
-            input_cfg,
-            max_brins_in_report=int(dq_cfg.get("max_brins_in_report") or 50),
-        )
-        if dq_cfg.get("write_standalone_report"):
-            dq_path = data_root / "data_quality_report_po.json"
-            json_exporter.write_meta_json(
-                {
-                    "pipeline_type": "po",
-                    "data_quality": data_quality,
-                    "generated_at": end.isoformat(),
-                    "schema_version": SCHEMA_VERSION,
-                },
-                dq_path,
+        dq_path = data_root / "data_quality_report_po.json"
+
+        def _data_quality() -> Dict[str, Any]:
+            dq = run_po_quality(
+                rows_out,
+                excluded,
+                raw_root,
+                input_cfg,
+                max_brins_in_report=int(dq_cfg.get("max_brins_in_report") or 50),
+                duplicate_brins=sources["duplicate_brins"] if sources is not None else None,
+            )
+            if dq_cfg.get("write_standalone_report"):
+                json_exporter.write_meta_json(
+                    {
+                        "pipeline_type": "po",
+                        "data_quality": dq,
+                        "generated_at": end.isoformat(),
+                        "schema_version": SCHEMA_VERSION,
+                    },
+                    dq_path,
+                )
+            return dq
+
+        with perf.stage("data_quality", rows_in=len(rows_out) + len(excluded)) as st:
+            data_quality = memo.run(
+                st,
+                _data_quality,
+                after=("privacy", "compute.po_xy"),
+                config={"data_quality": dq_cfg, "input": input_cfg},
+                files=history_inputs,
+                outputs=[dq_path] if dq_cfg.get("write_standalone_report") else [],
             )
+            if dq_cfg.get("write_standalone_report"):
+                st.wrote(dq_path)
 
     # 构建运行报告（此时 meta 可能尚未写出，但可以先占位 meta_path/schema_version）
     run_report: Dict[str, Any] = {
@@ -275,9 +1189,19 @@ def run_po_pipeline(config: Optional[Dict[str, Any]] = None) -> tuple[Path, Dict
                 "n_excluded": len(excluded),
                 "geojson_path": geo_rel if geo_rel is not None else None,
                 "long_table_path": long_rel if long_rel is not None else None,
+                "long_table_mode": long_table_mode,
+                "long_table_dim_path": long_dim_rel,
+                "long_table_fact_path": long_fact_rel,
                 "points_path": points_rel if points_rel is not None else None,
+                "search_index_path": search_rel,
+                "shards_manifest_path": shards_out["path"] if shards_out else None,
+                "detail_index_path": details_out["path"] if details_out else None,
+                "density_tiles_path": density_out["path"] if density_out else None,
+                "geo_clusters_path": geo_clusters_out["path"] if geo_clusters_out else None,
                 "meta_path": None,
                 "schema_version": SCHEMA_VERSION if write_meta_json_flag else None,
+                "window_variants": window_variants,
+                "rollups": rollup_outputs,
             }
         },
         "summary": {"status": "success", "warnings": [], "errors": []},
@@ -287,6 +1211,8 @@ def run_po_pipeline(config: Optional[Dict[str, Any]] = None) -> tuple[Path, Dict
             "n_suppressed": len(privacy_excluded),
         },
     }
+    if sources is not None:
+        run_report["shards"] = sources["shards"]
     if data_quality is not None:
         run_report["data_quality"] = data_quality
         if privacy_excluded:
@@ -301,92 +1227,54 @@ def run_po_pipeline(config: Optional[Dict[str, Any]] = None) -> tuple[Path, Dict
         meta_path = data_root / meta_rel
         meta_columns = list(csv_exporter.PO_META_FIELDNAMES) if include_meta_columns else []
         fieldnames = list(csv_exporter.PO_FIELDNAMES) + meta_columns
-        meta_dict = build_po_meta(
-            csv_path,
-            row_count=len(rows_out),
-            columns=fieldnames,
-            outliers=outliers_cfg or None,
-        )
-        json_exporter.write_meta_json(meta_dict, meta_path)
+        with perf.stage("meta") as st:
+            memo.run(
+                st,
+                lambda: json_exporter.write_meta_json(
+                    build_po_meta(
+                        csv_path,
+                        row_count=len(rows_out),
+                        columns=fieldnames,
+                        outliers=outliers_cfg or None,
+                        shards=shards_out["meta_ref"] if shards_out else None,
+                        details=details_out["meta_ref"] if details_out else None,
+                        density=density_out["meta_ref"] if density_out else None,
+                        geo_clusters=geo_clusters_out["meta_ref"] if geo_clusters_out else None,
+                    ),
+                    meta_path,
+                ),
+                after=("privacy", "export.shards", "export.details", "export.density", "export.geo_clusters"),
+                config={"path": meta_rel, "columns": fieldnames, "outliers": outliers_cfg},
+                outputs=[meta_path],
+            )
+            st.wrote(meta_path)
 
     # 可选：在流水线末尾对导出的 points/meta/GeoJSON/长表进行 schema 校验，
     # 并将错误（若有）写入 run_report.summary.errors。
     schema_val_cfg: Dict[str, Any] = dict(output_cfg.get("schema_validation") or {})
     if schema_val_cfg.get("enabled") and meta_path is not None:
-        schema_errors: list[Dict[str, Any]] = []
-
-        # points + meta 校验
-        if points_path is not None:
-            try:
-                points_data = json.loads(Path(points_path).read_text(encoding="utf-8"))
-                meta_data = json.loads(meta_path.read_text(encoding="utf-8"))
-                errs = sv.validate_points_against_meta(points_data, meta_data, layer="po")
-                for e in errs:
-                    d = e.to_dict()
-                    d["artifact"] = "po_points_meta"
-                    schema_errors.append(d)
-            except Exception as exc:  # pragma: no cover - 极端 IO/JSON 异常
-                schema_errors.append(
-                    {
-                        "kind": "schema_validator_exception",
-                        "message": str(exc),
-                        "artifact": "po_points_meta",
-                    }
-                )
-
-        # GeoJSON 校验
-        if output_cfg.get("export_geojson", True):
-            geo_path = data_root / (csv_path.stem + "_geo.json")
-            if geo_path.exists():
-                try:
-                    geo = json.loads(geo_path.read_text(encoding="utf-8"))
-                    errs = sv.validate_geojson_schema(geo, layer="po")
-                    for e in errs:
-                        d = e.to_dict()
-                        d["artifact"] = "po_geojson"
-                        schema_errors.append(d)
-                except Exception as exc:  # pragma: no cover
-                    schema_errors.append(
-                        {
-                            "kind": "schema_validator_exception",
-                            "message": str(exc),
-                            "artifact": "po_geojson",
-                        }
-                    )
-
-        # 长表 CSV 校验
-        if output_cfg.get("export_long_table", True):
-            long_path = data_root / (csv_path.stem + "_long.csv")
-            if long_path.exists():
-                try:
-                    with long_path.open(encoding="utf-8", newline="") as f:
-                        reader = csv.DictReader(f)
-                        long_rows = list(reader)
-                    errs = sv.validate_long_table_schema(long_rows, layer="po")
-                    for e in errs:
-                        d = e.to_dict()
-                        d["artifact"] = "po_long_table"
-                        schema_errors.append(d)
-                except Exception as exc:  # pragma: no cover
-                    schema_errors.append(
-                        {
-                            "kind": "schema_validator_exception",
-                            "message": str(exc),
-                            "artifact": "po_long_table",
-                        }
-                    )
-
-        if schema_errors:
-            summary = run_report.get("summary") or {}
-            errors_list = summary.get("errors") or []
-            errors_list.append({"kind": "schema_validation", "details": schema_errors})
-            summary["errors"] = errors_list
-            run_report["summary"] = summary
+        with perf.stage("schema_validation") as st:
+            schema_errors = memo.run(
+                st,
+                lambda: _validate_exports("po", data_root, csv_path, points_path, meta_path, output_cfg),
+                after=("meta", "export.points", "export.geojson", "export.long_table"),
+            )
+            if schema_errors:
+                summary = run_report.get("summary") or {}
+                errors_list = summary.get("errors") or []
+                errors_list.append({"kind": "schema_validation", "details": schema_errors})
+                summary["errors"] = errors_list
+                run_report["summary"] = summary
 
     # 补回运行报告中的 meta_path 引用并写出（同样使用相对于 data_root 的相对路径）
     if meta_rel is not None:
         run_report["outputs"]["po"]["meta_path"] = meta_rel
 
+    # 分阶段性能指标（wall/CPU、行数、读写字节、RSS/tracemalloc 峰值），用于定位变慢的阶段
+    run_report["performance"] = perf.report()
+    run_report["stage_cache"] = memo.report()
+    # 追加到运行历史库（run_report_po.json 每次覆盖，历史库保留每次的耗时、行数与输入哈希）
+    _record_history(config, data_root, run_report, history_inputs, logger)
     report_path = data_root / "run_report_po.json"
     # 使用 export_json 写单个对象时包在列表里，保持现有格式习惯
     json_exporter.export_json([run_report], report_path)
@@ -407,6 +1295,7 @@ def run_po_pipeline(config: Optional[Dict[str, Any]] = None) -> tuple[Path, Dict
         "excluded_path": str(excluded_path),
         "run_report_path": str(report_path),
         "summary_status": run_report["summary"].get("status", "success"),
+        "stage_cache": run_report["stage_cache"],
     }
     if meta_path is not None:
         stats["meta_path"] = str(meta_path)
@@ -414,42 +1303,64 @@ def run_po_pipeline(config: Optional[Dict[str, Any]] = None) -> tuple[Path, Dict
         stats["geojson_path"] = str(data_root / geo_rel)
     if long_rel is not None:
         stats["long_table_path"] = str(data_root / long_rel)
+    if long_dim_rel is not None and long_fact_rel is not None:
+        stats["long_table_dim_path"] = str(data_root / long_dim_rel)
+        stats["long_table_fact_path"] = str(data_root / long_fact_rel)
     if points_path is not None:
         stats["points_path"] = str(points_path)
 
     return csv_path, stats
 
 
-def run_vo_pipeline(config: Optional[Dict[str, Any]] = None) -> tuple[Path, Dict[str, Any]]:
+def run_vo_pipeline(
+    config: Optional[Dict[str, Any]] = None,
+    *,
+    sources: Optional[Mapping[str, Any]] = None,
+) -> tuple[Path, Dict[str, Any]]:
     """
     运行中学 VO X/Y 计算流水线。
 
     返回 (csv_path, stats)，stats 含 n_schools, n_excluded, excluded_path, run_report_path。
     若输入文件不存在，仍写出 run_report_vo.json（status=error），并返回 would-be csv_path 与 stats。
+    分片 / 合并分片（shard 配置与 sources 参数）同 run_po_pipeline。
     """
     if config is None:
         config = config_mod.build_effective_config()
 
     start = datetime.now(timezone.utc)
     data_root = Path(config.get("data_root") or config_mod.PROJECT_ROOT)
-    raw_sub = str(config.get("raw_subdir") or "").strip()
-    raw_root = data_root / raw_sub if raw_sub and not Path(raw_sub).is_absolute() else (
-        Path(raw_sub) if raw_sub else data_root
-    )
+    raw_root = _raw_root(config, data_root)
     vo_cfg: Dict[str, Any] = dict(config.get("vo") or {})
     input_cfg: Dict[str, Any] = dict(vo_cfg.get("input") or {})
     output_cfg: Dict[str, Any] = dict(vo_cfg.get("output") or {})
     thresholds: Dict[str, Any] = dict(vo_cfg.get("thresholds") or {})
     weights_cfg: Dict[str, Any] = dict(vo_cfg.get("weights") or {})
-    year_cols: List[Any] = list(weights_cfg.get("year_cols") or [])
+    year_cols: List[Any] = list(weights_cfg.get("year_cols") or DEFAULT_VO_YEAR_COLS)
     min_havo_vwo_total = int(thresholds.get("min_havo_vwo_total") or 20)
     min_vwo_subjects_per_year = int(thresholds.get("min_vwo_subjects_per_year") or 3)
 
     logger = setup_logger(name="alleschools.vo")
     logger.info("Starting VO pipeline")
+    perf = PerfRecorder.from_config(config, layer="vo", root=data_root)
+    memo = StageCache.from_config(config, layer="vo", root=data_root)
+    shard = sharding.shard_settings(config) if sources is None else None
+    keep = sharding.brin_filter(shard)
+    shard_key: Dict[str, Any] = {"shard": list(shard)} if shard else {}
+    if sources is not None:
+        memo = StageCache(None)
 
     vestigingen_csv = input_cfg.get("duo_vestigingen_vo_csv") or "duo_vestigingen_vo.csv"
-    brin_to_postcode = vo_loader.load_vestigingen_postcode(str(raw_root), vestigingen_csv)
+    with perf.stage("load.duo_vestigingen") as st:
+        brin_to_postcode = _stage_value(
+            memo,
+            st,
+            sources,
+            "brin_to_postcode",
+            lambda: vo_loader.load_vestigingen_postcode(str(raw_root), vestigingen_csv, keep),
+            config=shard_key,
+            files=[raw_root / vestigingen_csv],
+        )
+        st.rows_out = len(brin_to_postcode)
     if brin_to_postcode:
         logger.info("Loaded vestigingen postcode", extra={"n": len(brin_to_postcode)})
     else:
@@ -457,18 +1368,21 @@ def run_vo_pipeline(config: Optional[Dict[str, Any]] = None) -> tuple[Path, Dict
 
     exams_all = input_cfg.get("exams_all_csv") or "duo_examen_raw_all.csv"
     exams_small = input_cfg.get("exams_small_csv") or "duo_examen_raw.csv"
-    if not year_cols:
-        # 内建默认与 config 一致
-        year_cols = [
-            [13, 14, "2019-2020", 0.2],
-            [22, 23, "2020-2021", 0.4],
-            [31, 32, "2021-2022", 0.6],
-            [40, 41, "2022-2023", 0.8],
-            [49, 50, "2023-2024", 1.0],
-        ]
 
-    schools = vo_loader.load_exam_schools(str(raw_root), exams_all, exams_small, year_cols)
-    if not schools:
+    history_inputs = layer_inputs(config, "vo")
+
+    with perf.stage("load.duo_exams") as st:
+        schools = _stage_value(
+            memo,
+            st,
+            sources,
+            "schools",
+            lambda: vo_loader.load_exam_schools(str(raw_root), exams_all, exams_small, year_cols, keep),
+            config={"year_cols": year_cols, **shard_key},
+            files=[raw_root / exams_all, raw_root / exams_small],
+        )
+        st.rows_out = len(schools)
+    if not schools and not (shard and any((raw_root / name).is_file() for name in (exams_all, exams_small))):
         logger.error("VO input file not found (exams_all or exams_small)")
         end = datetime.now(timezone.utc)
         duration = (end - start).total_seconds()
@@ -483,7 +1397,9 @@ def run_vo_pipeline(config: Optional[Dict[str, Any]] = None) -> tuple[Path, Dict
             "inputs": {"data_root": str(data_root), "vo": input_cfg},
             "outputs": {"vo": {"csv_path": None, "excluded_path": None, "n_schools": 0, "n_excluded": 0}},
             "summary": {"status": "error", "warnings": [], "errors": ["Input exam CSV not found"]},
+            "performance": perf.report(),
         }
+        _record_history(config, data_root, run_report, history_inputs, logger)
         json_exporter.export_json([run_report], report_path)
         csv_rel = output_cfg.get("csv") or "schools_xy_coords.csv"
         csv_path = data_root / csv_rel
@@ -499,13 +1415,34 @@ def run_vo_pipeline(config: Optional[Dict[str, Any]] = None) -> tuple[Path, Dict
     logger.info("Loaded VO exam schools", extra={"n_schools": len(schools)})
 
     outliers_cfg_vo: Dict[str, Any] = dict(vo_cfg.get("outliers") or {})
-    rows_out, excluded = compute_vo_xy(
-        schools,
-        brin_to_postcode,
-        year_cols,
-        min_havo_vwo_total,
-        outliers=outliers_cfg_vo or None,
-    )
+    compute_settings = {"input": input_cfg, "year_cols": year_cols, "min_havo_vwo_total": min_havo_vwo_total}
+    _check_shard_settings(sources, compute_settings)
+
+    def _compute() -> tuple:
+        facts: Dict[str, List[Dict[str, Any]]] = {}
+        rows, excl = compute_vo_xy(
+            schools,
+            brin_to_postcode,
+            year_cols,
+            min_havo_vwo_total,
+            outliers=None if shard else outliers_cfg_vo or None,
+            year_facts=facts,
+        )
+        return rows, excl, facts
+
+    with perf.stage("compute.vo_xy", rows_in=len(schools)) as st:
+        rows_out, excluded, year_facts_vo = _stage_value(
+            memo,
+            st,
+            sources,
+            "compute",
+            _compute,
+            after=("load.duo_vestigingen", "load.duo_exams"),
+            config={"year_cols": year_cols, "min_havo_vwo_total": min_havo_vwo_total, "outliers": outliers_cfg_vo},
+        )
+        if sources is not None and outliers_cfg_vo:
+            _apply_outlier_clipping(rows_out, "X_linear", "Y_linear", outliers_cfg_vo)
+        st.rows_out = len(rows_out)
 
     # ------------------------------------------------------------------
     # VWO profiel 指数（NT/NG/EM/CM）—— 基于 VWO 统考的四个 X 轴
@@ -516,45 +1453,82 @@ def run_vo_pipeline(config: Optional[Dict[str, Any]] = None) -> tuple[Path, Dict
     # - profiel 指数完全遵循 backlog 3.5：按指定科目的 VWO 统考平均分组合，
     #   不再使用此前的「所有 VWO 科目 cijferlijst 中位数/平均数」方案。
     # - 时间加权采用最近 5 学年，权重 w_0..w_4 = 5,4,3,2,1，其中 w_0 对应最新学年。
-    vwo_exam_files = {
-        "2020-2021": "examenkandidaten-vwo-en-examencijfers-2020-2021.csv",
-        "2021-2022": "examenkandidaten-vwo-en-examencijfers-2021-2022.csv",
-        "2022-2023": "examenkandidaten-vwo-en-examencijfers-2022-2023.csv",
-        "2023-2024": "examenkandidaten-vwo-en-examencijfers-2023-2024.csv",
-        "2024-2025": "examenkandidaten-vwo-en-examencijfers-2024-2025.csv",
-    }
-    year_order = sorted(vwo_exam_files.keys())  # 升序："2020-2021" ... "2024-2025"
-    # 最近学年权重最高：2024-2025 -> 5, 2023-2024 -> 4, ...
-    year_weights: Dict[str, float] = {}
-    weights_desc = [1.0, 2.0, 3.0, 4.0, 5.0]
-    # Python 3.9 中内置 zip 不支持 strict 参数，这里依赖 year_order 与 weights_desc 长度一致的事实。
-    for label, w in zip(year_order, weights_desc):
-        year_weights[label] = w
-
-    vwo_central = load_vwo_central_exam_scores(str(raw_root), vwo_exam_files)
+    vwo_exam_files = dict(VWO_EXAM_FILES)
+    year_order, year_weights = vwo_year_weights()
+
+    with perf.stage("load.vwo_central_exams") as st:
+        vwo_central = _stage_value(
+            memo,
+            st,
+            sources,
+            "vwo_central",
+            lambda: load_vwo_central_exam_scores(str(raw_root), vwo_exam_files, keep),
+            config=shard_key,
+            files=[raw_root / name for name in vwo_exam_files.values()],
+        )
+        st.rows_out = len(vwo_central)
     profile_indices: Dict[str, Dict[str, float]] = {}
+    profile_years_vo: Dict[str, Dict[str, Dict[str, float]]] = {}
     if vwo_central:
-        profile_indices = compute_vwo_profile_indices(
-            vwo_central,
-            year_order=year_order,
-            year_weights=year_weights,
+
+        def _compute_profiles() -> tuple:
+            per_year: Dict[str, Dict[str, Dict[str, float]]] = {}
+            indices = compute_vwo_profile_indices(
+                vwo_central,
+                year_order=year_order,
+                year_weights=year_weights,
+                per_year=per_year,  # type: ignore[arg-type]
+            )
+            return indices, per_year
+
+        with perf.stage("compute.vwo_profiles", rows_in=len(vwo_central)) as st:
+            profile_indices, profile_years_vo = _stage_value(
+                memo,
+                st,
+                sources,
+                "vwo_profiles",
+                _compute_profiles,
+                after=("load.vwo_central_exams",),
+                config={"year_weights": year_weights},
+            )
+            st.rows_out = len(profile_indices)
+
+    if shard is not None:
+        return _write_shard(
+            config,
+            "vo",
+            shard,
+            data_root=data_root,
+            raw_root=raw_root,
+            input_cfg=input_cfg,
+            start=start,
+            perf=perf,
+            logger=logger,
+            history_inputs=history_inputs,
+            settings=compute_settings,
+            data={
+                "brin_to_postcode": brin_to_postcode,
+                "schools": schools,
+                "rows": rows_out,
+                "excluded": excluded,
+                "year_facts": year_facts_vo,
+                "vwo_central": vwo_central,
+                "profile_indices": profile_indices,
+                "profile_years": profile_years_vo,
+            },
         )
 
     # 隐私抑制：根据 privacy.min_group_size 过滤过小样本（VO 使用 candidates_total）。
-    privacy_global_vo: Dict[str, Any] = dict(config.get("privacy") or {})
-    privacy_vo_cfg: Dict[str, Any] = dict(vo_cfg.get("privacy") or {})
-    min_group_size_priv_vo = privacy_vo_cfg.get("min_group_size", privacy_global_vo.get("min_group_size", 0)) or 0
-    max_detail_level_vo = privacy_vo_cfg.get("max_detail_level", privacy_global_vo.get("max_detail_level", "school"))
-    privacy_excluded_vo: List[Dict[str, Any]] = []
-    if isinstance(min_group_size_priv_vo, int) and min_group_size_priv_vo > 0:
-        kept_vo: List[Dict[str, Any]] = []
-        for row in rows_out:
-            cand_total = int(row.get("candidates_total") or 0)
-            if cand_total < min_group_size_priv_vo:
-                privacy_excluded_vo.append({"BRIN": row.get("BRIN"), "candidates_total": cand_total})
-            else:
-                kept_vo.append(row)
-        rows_out = kept_vo
+    min_group_size_priv_vo, max_detail_level_vo = privacy_settings(config, "vo")
+    school_rows_vo = rows_out
+    with perf.stage("privacy", rows_in=len(rows_out)) as st:
+        rows_out, privacy_excluded_vo = memo.run(
+            st,
+            lambda: _apply_privacy(school_rows_vo, "vo", "candidates_total", min_group_size_priv_vo, max_detail_level_vo),
+            after=("compute.vo_xy",),
+            config={"max_detail_level": max_detail_level_vo, "min_group_size": min_group_size_priv_vo},
+        )
+        st.rows_out = len(rows_out)
 
     csv_rel = output_cfg.get("csv") or "schools_xy_coords.csv"
     csv_path = data_root / csv_rel
@@ -566,16 +1540,38 @@ def run_vo_pipeline(config: Optional[Dict[str, Any]] = None) -> tuple[Path, Dict
     excluded_path = data_root / excluded_rel
     geo_rel_default = out_dir_rel / f"{stem}_geo.json"
     long_rel_default = out_dir_rel / f"{stem}_long.csv"
+    long_dim_rel_default = out_dir_rel / f"{stem}_long_dim.csv"
+    long_fact_rel_default = out_dir_rel / f"{stem}_long_fact.csv"
     points_rel_default = out_dir_rel / f"{stem}.json"
     meta_rel_default = out_dir_rel / f"{stem}_meta.json"
     include_meta_columns = output_cfg.get("include_meta_columns", True)
+    long_table_mode_vo = str(output_cfg.get("long_table_mode") or "wide")
     write_meta_json_flag = output_cfg.get("write_meta_json", True)
 
-    csv_exporter.export_vo_csv(rows_out, csv_path, include_meta_columns=include_meta_columns)
-    json_exporter.export_json(excluded, excluded_path)
+    with perf.stage("export.csv", rows_in=len(rows_out)) as st:
+        memo.run(
+            st,
+            lambda: csv_exporter.export_vo_csv(rows_out, csv_path, include_meta_columns=include_meta_columns),
+            after=("privacy",),
+            config={"path": csv_rel, "include_meta_columns": include_meta_columns},
+            outputs=[csv_path],
+        )
+        st.wrote(csv_path)
+    with perf.stage("export.excluded", rows_in=len(excluded)) as st:
+        memo.run(
+            st,
+            lambda: json_exporter.export_json(excluded, excluded_path),
+            after=("compute.vo_xy",),
+            config={"path": excluded_rel},
+            outputs=[excluded_path],
+        )
+        st.wrote(excluded_path)
 
     geo_rel: Optional[str] = None
+    geo_clusters_out: Optional[Dict[str, Any]] = None
     long_rel: Optional[str] = None
+    long_dim_rel: Optional[str] = None
+    long_fact_rel: Optional[str] = None
     points_rel: Optional[str] = None
     meta_rel: Optional[str] = None
 
@@ -585,64 +1581,37 @@ def run_vo_pipeline(config: Optional[Dict[str, Any]] = None) -> tuple[Path, Dict
     profiles_csv_rel: Dict[str, Optional[str]] = {"NT": None, "NG": None, "EM": None, "CM": None}
     profiles_points_rel: Dict[str, Optional[str]] = {"NT": None, "NG": None, "EM": None, "CM": None}
     profiles_meta_rel: Optional[str] = None
+    profile_rows: Dict[str, list[Dict[str, Any]]] = {"NT": [], "NG": [], "EM": [], "CM": []}
 
     if profile_indices:
-        # 为每个 profiel 组装点列表：与主 VO 宽表行 join，以 BRIN 对齐。
-        profile_rows: Dict[str, list[Dict[str, Any]]] = {"NT": [], "NG": [], "EM": [], "CM": []}
-        for row in rows_out:
-            brin = row.get("BRIN")
-            if not brin:
-                continue
-            brin_str = str(brin)
-            naam = row.get("vestigingsnaam")
-            gemeente = row.get("gemeente")
-            postcode = (row.get("postcode") or "").strip()
-            # backlog 约定：现有 VO 主图的 X 轴（VWO 占比）作为 profiel 图的 Y 轴。
-            y_vwo_share = row.get("X_linear")
-            candidates_total = row.get("candidates_total")
-            candidates_weighted_avg = row.get("candidates_weighted_avg")
+        profile_rows = build_vo_profile_rows(rows_out, profile_indices)
 
+        # 写出 4 个 CSV + 4 个 points JSON（相对路径固定在主 VO CSV 的目录下）
+        def _write_profiles() -> tuple:
+            csv_rels: Dict[str, Optional[str]] = dict(profiles_csv_rel)
+            points_rels: Dict[str, Optional[str]] = dict(profiles_points_rel)
             for prof in ("NT", "NG", "EM", "CM"):
-                prof_map = profile_indices.get(prof) or {}
-                x_prof = prof_map.get(brin_str)
-                if x_prof is None:
+                rows_prof = profile_rows.get(prof) or []
+                if not rows_prof:
                     continue
-                # 进入 profile 的学校必有 VWO 统考数据，统一标为 HAVO/VWO（避免主表 type=VMBO 的误标）
-                profile_rows[prof].append(
-                    {
-                        "BRIN": brin_str,
-                        "vestigingsnaam": naam,
-                        "naam": naam,
-                        "gemeente": gemeente,
-                        "postcode": postcode,
-                        "type": "HAVO/VWO",
-                        "profile_id": prof,
-                        "X_profile": float(x_prof),
-                        "Y_vwo_share": float(y_vwo_share) if y_vwo_share is not None else None,
-                        "candidates_total": int(candidates_total or 0),
-                        "candidates_weighted_avg": (
-                            float(candidates_weighted_avg)
-                            if candidates_weighted_avg is not None
-                            else None
-                        ),
-                    }
-                )
-
-        # 写出 4 个 CSV + 4 个 points JSON（相对路径固定在主 VO CSV 的目录下）
-        for prof in ("NT", "NG", "EM", "CM"):
-            rows_prof = profile_rows.get(prof) or []
-            if not rows_prof:
-                continue
-            csv_rel_prof = str(out_dir_rel / f"schools_profiles_{prof.lower()}.csv")
-            points_rel_prof = str(out_dir_rel / f"schools_profiles_{prof.lower()}.json")
-            csv_path_prof = data_root / csv_rel_prof
-            points_path_prof = data_root / points_rel_prof
-
-            csv_exporter.export_vo_profiles_csv(rows_prof, csv_path_prof)
-            json_exporter.export_json(rows_prof, points_path_prof)
-
-            profiles_csv_rel[prof] = csv_rel_prof
-            profiles_points_rel[prof] = points_rel_prof
+                csv_rel_prof = str(out_dir_rel / f"schools_profiles_{prof.lower()}.csv")
+                points_rel_prof = str(out_dir_rel / f"schools_profiles_{prof.lower()}.json")
+                csv_exporter.export_vo_profiles_csv(rows_prof, data_root / csv_rel_prof)
+                json_exporter.export_json(rows_prof, data_root / points_rel_prof)
+                csv_rels[prof] = csv_rel_prof
+                points_rels[prof] = points_rel_prof
+            return csv_rels, points_rels
+
+        with perf.stage("export.profiles", rows_in=sum(len(r) for r in profile_rows.values())) as st:
+            profiles_csv_rel, profiles_points_rel = memo.run(
+                st,
+                _write_profiles,
+                after=("privacy", "compute.vwo_profiles"),
+                config={"out_dir": str(out_dir_rel)},
+                outputs=lambda out: [data_root / rel for rels in out for rel in rels.values() if rel],
+            )
+            st.wrote(*(data_root / rel for rel in profiles_csv_rel.values() if rel))
+            st.wrote(*(data_root / rel for rel in profiles_points_rel.values() if rel))
 
 
     if output_cfg.get("export_geojson", True):
@@ -652,18 +1621,219 @@ def run_vo_pipeline(config: Optional[Dict[str, Any]] = None) -> tuple[Path, Dict
         lookup_path = (
             str(data_root / pc4_path) if pc4_path and not Path(pc4_path).is_absolute() else (pc4_path or None)
         )
-        geojson_exporter.export_geojson(rows_out, geo_path, lookup_path=lookup_path)
+        with perf.stage("export.geojson", rows_in=len(rows_out)) as st:
+            geo_fc = memo.run(
+                st,
+                lambda: geojson_exporter.export_geojson(rows_out, geo_path, lookup_path=lookup_path),
+                after=("privacy",),
+                config={"path": geo_rel},
+                files=[lookup_path] if lookup_path else [],
+                outputs=[geo_path],
+            )
+            st.wrote(geo_path)
+        if output_cfg.get("export_geo_clusters", False):
+            with perf.stage("export.geo_clusters", rows_in=len(geo_fc["features"])) as st:
+                geo_clusters_out = memo.run(
+                    st,
+                    lambda: _export_geo_clusters(
+                        geo_fc["features"], "vo", "candidates_total", data_root, out_dir_rel, stem, output_cfg
+                    ),
+                    after=("export.geojson",),
+                    config=_output_options(output_cfg, out_dir_rel, stem, "geo_cluster_radius", "geo_cluster_max_zoom"),
+                    outputs=lambda out: [data_root / out["path"]],
+                )
+                st.wrote(data_root / geo_clusters_out["path"])
     if output_cfg.get("export_long_table", True):
-        long_rel = str(long_rel_default)
-        long_path = data_root / long_rel
-        long_table_exporter.export_vo_long_table(
-            rows_out, long_path, include_meta_columns=include_meta_columns
-        )
+        if long_table_mode_vo == "star":
+            long_dim_rel = str(long_dim_rel_default)
+            long_fact_rel = str(long_fact_rel_default)
+            long_outputs = [data_root / long_dim_rel, data_root / long_fact_rel]
+        else:
+            long_rel = str(long_rel_default)
+            long_outputs = [data_root / long_rel]
+
+        def _write_long_table() -> None:
+            if long_table_mode_vo == "star":
+                long_table_exporter.export_vo_star_tables(
+                    rows_out,
+                    year_facts_vo,
+                    long_outputs[0],
+                    long_outputs[1],
+                    include_meta_columns=include_meta_columns,
+                )
+            else:
+                long_table_exporter.export_vo_long_table(
+                    rows_out, long_outputs[0], include_meta_columns=include_meta_columns
+                )
+
+        with perf.stage("export.long_table", rows_in=len(rows_out)) as st:
+            memo.run(
+                st,
+                _write_long_table,
+                after=("privacy", "compute.vo_xy"),
+                config=_output_options(
+                    output_cfg, out_dir_rel, stem, mode=long_table_mode_vo, include_meta_columns=include_meta_columns
+                ),
+                outputs=long_outputs,
+            )
+            st.wrote(*long_outputs)
     points_path = None
     if output_cfg.get("export_points_json", True):
         points_rel = str(points_rel_default)
         points_path = data_root / points_rel
-        export_vo_points(rows_out, points_path)
+        with perf.stage("export.points", rows_in=len(rows_out)) as st:
+            memo.run(
+                st,
+                lambda: export_vo_points(rows_out, points_path),
+                after=("privacy",),
+                config={"path": points_rel},
+                outputs=[points_path],
+            )
+            st.wrote(points_path)
+    search_rel = None
+    if output_cfg.get("export_search_index", True):
+        # 搜索索引与 points JSON 文档顺序一致（均为 rows_out 顺序）
+        search_rel = str(out_dir_rel / f"{stem}_search.json")
+        with perf.stage("export.search_index", rows_in=len(rows_out)) as st:
+            memo.run(
+                st,
+                lambda: export_search_index(rows_out, data_root / search_rel, "vo"),
+                after=("privacy",),
+                config={"path": search_rel},
+                outputs=[data_root / search_rel],
+            )
+            st.wrote(data_root / search_rel)
+    shards_out: Optional[Dict[str, Any]] = None
+    density_out: Optional[Dict[str, Any]] = None
+    if output_cfg.get("export_shards", False) or output_cfg.get("export_density_tiles", False):
+        point_datasets: Dict[str, Dict[str, Any]] = {
+            "vo": {"points": [_vo_row_to_point(r) for r in rows_out], "key_field": "municipality"},
+        }
+        # VO profiel 点：坐标轴与 schools_profiles_meta.json 一致（X = VWO 占比，Y = profiel 分数）
+        for prof in ("NT", "NG", "EM", "CM"):
+            if profile_rows.get(prof):
+                point_datasets[f"vo_{prof.lower()}"] = {
+                    "points": profile_rows[prof],
+                    "key_field": "gemeente",
+                    "x_field": "Y_vwo_share",
+                    "y_field": "X_profile",
+                    "size_field": "candidates_total",
+                    "type_field": "type",
+                }
+        n_points = sum(len(d["points"]) for d in point_datasets.values())
+        if output_cfg.get("export_shards", False):
+            with perf.stage("export.shards", rows_in=n_points) as st:
+                shards_out = memo.run(
+                    st,
+                    lambda: _export_shards(point_datasets, "vo", data_root, out_dir_rel, stem),
+                    after=("privacy", "compute.vwo_profiles"),
+                    config=_output_options(output_cfg, out_dir_rel, stem),
+                    outputs=lambda out: [data_root / rel for rel in (out["path"], *out["files"])],
+                )
+                st.rows_out = shards_out["n_shards"]
+                st.wrote(*(data_root / rel for rel in (shards_out["path"], *shards_out["files"])))
+        if output_cfg.get("export_density_tiles", False):
+            with perf.stage("export.density", rows_in=n_points) as st:
+                density_out = memo.run(
+                    st,
+                    lambda: _export_density(point_datasets, "vo", data_root, out_dir_rel, stem, output_cfg),
+                    after=("privacy", "compute.vwo_profiles"),
+                    config=_output_options(output_cfg, out_dir_rel, stem, "density_base_bins", "density_levels"),
+                    outputs=lambda out: [data_root / out["path"]],
+                )
+                st.wrote(data_root / density_out["path"])
+    details_out: Optional[Dict[str, Any]] = None
+    if output_cfg.get("export_detail_shards", False):
+        with perf.stage("export.details", rows_in=len(rows_out)) as st:
+            details_out = memo.run(
+                st,
+                lambda: _export_details(
+                    build_school_details(
+                        rows_out,
+                        "vo",
+                        year_facts_vo,
+                        profile_years=profile_years_vo,
+                        profile_indices=profile_indices,
+                    ),
+                    "vo",
+                    data_root,
+                    out_dir_rel,
+                    stem,
+                    int(output_cfg.get("detail_prefix_length") or 3),
+                ),
+                after=("privacy", "compute.vo_xy", "compute.vwo_profiles"),
+                config=_output_options(output_cfg, out_dir_rel, stem, "detail_prefix_length"),
+                outputs=lambda out: [data_root / rel for rel in (out["path"], *out["files"])],
+            )
+            st.rows_out = details_out["n_shards"]
+            st.wrote(*(data_root / rel for rel in (details_out["path"], *details_out["files"])))
+
+    rollup_levels_vo = [str(level) for level in (output_cfg.get("rollup_levels") or [])]
+    with perf.stage("export.rollups", rows_in=len(school_rows_vo)) as st:
+        rollup_outputs_vo = memo.run(
+            st,
+            lambda: _export_rollups(
+                school_rows_vo,
+                "vo",
+                "candidates_total",
+                rollup_levels_vo,
+                data_root,
+                out_dir_rel,
+                stem,
+                min_group_size=min_group_size_priv_vo,
+                max_detail_level=max_detail_level_vo,
+            ),
+            after=("compute.vo_xy",),
+            config=_output_options(
+                output_cfg,
+                out_dir_rel,
+                stem,
+                levels=rollup_levels_vo,
+                min_group_size=min_group_size_priv_vo,
+                max_detail_level=max_detail_level_vo,
+            ),
+            outputs=lambda out: [data_root / r["path"] for r in out.values()],
+        )
+        st.rows_out = sum(int(r["n_groups"]) for r in rollup_outputs_vo.values())
+        st.wrote(*(data_root / r["path"] for r in rollup_outputs_vo.values()))
+
+    windows_vo: List[str] = [str(w) for w in (config.get("windows") or [])]
+    window_variants_vo: Optional[Dict[str, Dict[str, Any]]] = None
+    if windows_vo:
+        with perf.stage("export.window_variants", rows_in=len(schools)) as st:
+            window_variants_vo = memo.run(
+                st,
+                lambda: _export_window_variants(
+                    "vo",
+                    build_vo_year_cube(schools, brin_to_postcode, year_cols),
+                    windows_vo,
+                    data_root,
+                    out_dir_rel,
+                    stem,
+                    min_group_size=min_group_size_priv_vo,
+                    include_meta_columns=include_meta_columns,
+                    export_points_json=bool(output_cfg.get("export_points_json", True)),
+                    outliers=outliers_cfg_vo or None,
+                    min_havo_vwo_total=min_havo_vwo_total,
+                    max_detail_level=max_detail_level_vo,
+                ),
+                after=("load.duo_vestigingen", "load.duo_exams"),
+                config=_output_options(
+                    output_cfg,
+                    out_dir_rel,
+                    stem,
+                    windows=windows_vo,
+                    year_cols=year_cols,
+                    outliers=outliers_cfg_vo,
+                    min_havo_vwo_total=min_havo_vwo_total,
+                    min_group_size=min_group_size_priv_vo,
+                    max_detail_level=max_detail_level_vo,
+                    include_meta_columns=include_meta_columns,
+                    export_points_json=bool(output_cfg.get("export_points_json", True)),
+                ),
+                outputs=_window_variant_outputs(data_root),
+            )
+            st.rows_out = sum(int(v.get("n_schools") or 0) for v in window_variants_vo.values())
 
     end = datetime.now(timezone.utc)
     duration = (end - start).total_seconds()
@@ -671,24 +1841,40 @@ def run_vo_pipeline(config: Optional[Dict[str, Any]] = None) -> tuple[Path, Dict
     dq_cfg_vo: Dict[str, Any] = dict(vo_cfg.get("data_quality") or {})
     data_quality_vo: Optional[Dict[str, Any]] = None
     if dq_cfg_vo.get("enabled", True):
-        data_quality_vo = run_vo_quality(
-            rows_out,
-            excluded,
-            raw_root,
-            input_cfg,
-            max_brins_in_report=int(dq_cfg_vo.get("max_brins_in_report") or 50),
-        )
-        if dq_cfg_vo.get("write_standalone_report"):
-            dq_path_vo = data_root / "data_quality_report_vo.json"
-            json_exporter.write_meta_json(
-                {
-                    "pipeline_type": "vo",
-                    "data_quality": data_quality_vo,
-                    "generated_at": end.isoformat(),
-                    "schema_version": SCHEMA_VERSION,
-                },
-                dq_path_vo,
+        dq_path_vo = data_root / "data_quality_report_vo.json"
+
+        def _data_quality() -> Dict[str, Any]:
+            dq = run_vo_quality(
+                rows_out,
+                excluded,
+                raw_root,
+                input_cfg,
+                max_brins_in_report=int(dq_cfg_vo.get("max_brins_in_report") or 50),
+                duplicate_brins=sources["duplicate_brins"] if sources is not None else None,
             )
+            if dq_cfg_vo.get("write_standalone_report"):
+                json_exporter.write_meta_json(
+                    {
+                        "pipeline_type": "vo",
+                        "data_quality": dq,
+                        "generated_at": end.isoformat(),
+                        "schema_version": SCHEMA_VERSION,
+                    },
+                    dq_path_vo,
+                )
+            return dq
+
+        with perf.stage("data_quality", rows_in=len(rows_out) + len(excluded)) as st:
+            data_quality_vo = memo.run(
+                st,
+                _data_quality,
+                after=("privacy", "compute.vo_xy"),
+                config={"data_quality": dq_cfg_vo, "input": input_cfg},
+                files=history_inputs,
+                outputs=[dq_path_vo] if dq_cfg_vo.get("write_standalone_report") else [],
+            )
+            if dq_cfg_vo.get("write_standalone_report"):
+                st.wrote(dq_path_vo)
 
     run_report = {
         "pipeline_type": "vo",
@@ -714,13 +1900,23 @@ def run_vo_pipeline(config: Optional[Dict[str, Any]] = None) -> tuple[Path, Dict
                 "n_excluded": len(excluded),
                 "geojson_path": geo_rel if geo_rel is not None else None,
                 "long_table_path": long_rel if long_rel is not None else None,
+                "long_table_mode": long_table_mode_vo,
+                "long_table_dim_path": long_dim_rel,
+                "long_table_fact_path": long_fact_rel,
                 "points_path": points_rel if points_rel is not None else None,
+                "search_index_path": search_rel,
+                "shards_manifest_path": shards_out["path"] if shards_out else None,
+                "detail_index_path": details_out["path"] if details_out else None,
+                "density_tiles_path": density_out["path"] if density_out else None,
+                "geo_clusters_path": geo_clusters_out["path"] if geo_clusters_out else None,
                 "meta_path": None,
                 "schema_version": SCHEMA_VERSION if write_meta_json_flag else None,
                 # VO profiel 导出产物：在有数据时填充具体路径（相对于 data_root）
                 "profiles_csv_paths": None,
                 "profiles_points_paths": None,
                 "profiles_meta_path": None,
+                "window_variants": window_variants_vo,
+                "rollups": rollup_outputs_vo,
             }
         },
         "summary": {"status": "success", "warnings": [], "errors": []},
@@ -730,6 +1926,8 @@ def run_vo_pipeline(config: Optional[Dict[str, Any]] = None) -> tuple[Path, Dict
             "n_suppressed": len(privacy_excluded_vo),
         },
     }
+    if sources is not None:
+        run_report["shards"] = sources["shards"]
     if data_quality_vo is not None:
         run_report["data_quality"] = data_quality_vo
         if privacy_excluded_vo:
@@ -746,13 +1944,27 @@ def run_vo_pipeline(config: Optional[Dict[str, Any]] = None) -> tuple[Path, Dict
         meta_path = data_root / meta_rel
         meta_columns = list(csv_exporter.VO_META_FIELDNAMES) if include_meta_columns else []
         vo_fieldnames = list(csv_exporter.VO_FIELDNAMES) + meta_columns
-        meta_dict_vo = build_vo_meta(
-            csv_path,
-            row_count=len(rows_out),
-            columns=vo_fieldnames,
-            outliers=outliers_cfg_vo or None,
-        )
-        json_exporter.write_meta_json(meta_dict_vo, meta_path)
+        with perf.stage("meta") as st:
+            memo.run(
+                st,
+                lambda: json_exporter.write_meta_json(
+                    build_vo_meta(
+                        csv_path,
+                        row_count=len(rows_out),
+                        columns=vo_fieldnames,
+                        outliers=outliers_cfg_vo or None,
+                        shards=shards_out["meta_ref"] if shards_out else None,
+                        details=details_out["meta_ref"] if details_out else None,
+                        density=density_out["meta_ref"] if density_out else None,
+                        geo_clusters=geo_clusters_out["meta_ref"] if geo_clusters_out else None,
+                    ),
+                    meta_path,
+                ),
+                after=("privacy", "export.shards", "export.details", "export.density", "export.geo_clusters"),
+                config={"path": meta_rel, "columns": vo_fieldnames, "outliers": outliers_cfg_vo},
+                outputs=[meta_path],
+            )
+            st.wrote(meta_path)
 
     # VO profiel meta：仅在存在至少一个 profiel CSV 时写出
     profiles_meta_path = None
@@ -770,86 +1982,41 @@ def run_vo_pipeline(config: Optional[Dict[str, Any]] = None) -> tuple[Path, Dict
             # profile_rows 在上文中已按 profiel 聚合。
             # 为避免在此作用域重复构造，保守起见设置为 -1，表示“未知行数但存在文件”。
             row_counts_map[prof] = -1
-        meta_profiles = build_vo_profiles_meta(
-            data_files=data_files_map,
-            row_counts=row_counts_map,
-            y_domain=[0.0, 100.0],
-        )
-        json_exporter.write_meta_json(meta_profiles, profiles_meta_path)
+        with perf.stage("meta.profiles") as st:
+            memo.run(
+                st,
+                lambda: json_exporter.write_meta_json(
+                    build_vo_profiles_meta(
+                        data_files=data_files_map,
+                        row_counts=row_counts_map,
+                        y_domain=[0.0, 100.0],
+                        shards=shards_out["meta_ref"] if shards_out else None,
+                        density=density_out["meta_ref"] if density_out else None,
+                    ),
+                    profiles_meta_path,
+                ),
+                after=("export.profiles", "export.shards", "export.density"),
+                config={"path": profiles_meta_rel},
+                outputs=[profiles_meta_path],
+            )
+            st.wrote(profiles_meta_path)
 
     # 可选：在流水线末尾对导出的 points/meta/GeoJSON/长表进行 schema 校验，
     # 并将错误（若有）写入 run_report.summary.errors。
     schema_val_cfg_vo: Dict[str, Any] = dict(output_cfg.get("schema_validation") or {})
     if schema_val_cfg_vo.get("enabled") and meta_path is not None:
-        schema_errors_vo: list[Dict[str, Any]] = []
-
-        # points + meta 校验
-        if points_path is not None:
-            try:
-                points_data_vo = json.loads(Path(points_path).read_text(encoding="utf-8"))
-                meta_data_vo = json.loads(meta_path.read_text(encoding="utf-8"))
-                errs_vo = sv.validate_points_against_meta(points_data_vo, meta_data_vo, layer="vo")
-                for e in errs_vo:
-                    d = e.to_dict()
-                    d["artifact"] = "vo_points_meta"
-                    schema_errors_vo.append(d)
-            except Exception as exc:  # pragma: no cover
-                schema_errors_vo.append(
-                    {
-                        "kind": "schema_validator_exception",
-                        "message": str(exc),
-                        "artifact": "vo_points_meta",
-                    }
-                )
-
-        # GeoJSON 校验
-        if output_cfg.get("export_geojson", True):
-            geo_path_vo = data_root / (csv_path.stem + "_geo.json")
-            if geo_path_vo.exists():
-                try:
-                    geo_vo = json.loads(geo_path_vo.read_text(encoding="utf-8"))
-                    errs_vo = sv.validate_geojson_schema(geo_vo, layer="vo")
-                    for e in errs_vo:
-                        d = e.to_dict()
-                        d["artifact"] = "vo_geojson"
-                        schema_errors_vo.append(d)
-                except Exception as exc:  # pragma: no cover
-                    schema_errors_vo.append(
-                        {
-                            "kind": "schema_validator_exception",
-                            "message": str(exc),
-                            "artifact": "vo_geojson",
-                        }
-                    )
-
-        # 长表 CSV 校验
-        if output_cfg.get("export_long_table", True):
-            long_path_vo = data_root / (csv_path.stem + "_long.csv")
-            if long_path_vo.exists():
-                try:
-                    with long_path_vo.open(encoding="utf-8", newline="") as f:
-                        reader_vo = csv.DictReader(f)
-                        long_rows_vo = list(reader_vo)
-                    errs_vo = sv.validate_long_table_schema(long_rows_vo, layer="vo")
-                    for e in errs_vo:
-                        d = e.to_dict()
-                        d["artifact"] = "vo_long_table"
-                        schema_errors_vo.append(d)
-                except Exception as exc:  # pragma: no cover
-                    schema_errors_vo.append(
-                        {
-                            "kind": "schema_validator_exception",
-                            "message": str(exc),
-                            "artifact": "vo_long_table",
-                        }
-                    )
-
-        if schema_errors_vo:
-            summary_vo = run_report.get("summary") or {}
-            errors_list_vo = summary_vo.get("errors") or []
-            errors_list_vo.append({"kind": "schema_validation", "details": schema_errors_vo})
-            summary_vo["errors"] = errors_list_vo
-            run_report["summary"] = summary_vo
+        with perf.stage("schema_validation") as st:
+            schema_errors_vo = memo.run(
+                st,
+                lambda: _validate_exports("vo", data_root, csv_path, points_path, meta_path, output_cfg),
+                after=("meta", "export.points", "export.geojson", "export.long_table"),
+            )
+            if schema_errors_vo:
+                summary_vo = run_report.get("summary") or {}
+                errors_list_vo = summary_vo.get("errors") or []
+                errors_list_vo.append({"kind": "schema_validation", "details": schema_errors_vo})
+                summary_vo["errors"] = errors_list_vo
+                run_report["summary"] = summary_vo
 
     if meta_rel is not None:
         run_report["outputs"]["vo"]["meta_path"] = meta_rel
@@ -866,6 +2033,9 @@ def run_vo_pipeline(config: Optional[Dict[str, Any]] = None) -> tuple[Path, Dict
             prof: rel for prof, rel in profiles_csv_rel.items() if rel
         }
 
+    run_report["performance"] = perf.report()
+    run_report["stage_cache"] = memo.report()
+    _record_history(config, data_root, run_report, history_inputs, logger)
     report_path = data_root / "run_report_vo.json"
     json_exporter.export_json([run_report], report_path)
 
@@ -885,6 +2055,7 @@ def run_vo_pipeline(config: Optional[Dict[str, Any]] = None) -> tuple[Path, Dict
         "excluded_path": str(excluded_path),
         "run_report_path": str(report_path),
         "summary_status": run_report["summary"].get("status", "success"),
+        "stage_cache": run_report["stage_cache"],
     }
     if meta_path is not None:
         stats["meta_path"] = str(meta_path)
@@ -892,6 +2063,9 @@ def run_vo_pipeline(config: Optional[Dict[str, Any]] = None) -> tuple[Path, Dict
         stats["geojson_path"] = str(data_root / geo_rel)
     if long_rel is not None:
         stats["long_table_path"] = str(data_root / long_rel)
+    if long_dim_rel is not None and long_fact_rel is not None:
+        stats["long_table_dim_path"] = str(data_root / long_dim_rel)
+        stats["long_table_fact_path"] = str(data_root / long_fact_rel)
     if points_path is not None:
         stats["points_path"] = str(points_path)
     return csv_path, stats
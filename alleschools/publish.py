@@ -0,0 +1,272 @@
+from __future__ import annotations
+
+"""
+发布（publish）：将本轮 generated/ 下的 points JSON 与上一发布版本按 BRIN 对比，写出增量补丁与版本链清单。
+
+每月 ETL 后大多数学校的 X/Y 几乎不变，客户端却要重新下载整份 points JSON。发布步骤：
+    - 每个数据集（VO / PO points 与 VO profiel points，路径取自 run_report 的 outputs）
+      以紧凑 JSON 写出内容寻址快照 <publish.dir>/<数据集>/<sha256 前 12 位>.json，版本号即该哈希；
+    - 与上一版本快照做哈希连接（以 brin / BRIN 为键，线性时间），写出补丁
+      <数据集>/patches/<旧版本>-<新版本>.json：
+        {"format": 1, "dataset", "key", "from", "to",
+         "added": [新增点...], "removed": [键...],
+         "changed": [{"key": 键, "set": {字段: 新值}, "unset": [被删除的字段]}...],
+         "order": [键...]}   # 仅当新顺序不等于「保留点按旧顺序 + 新增点追加在后」时给出
+    - 清单 <publish.dir>/manifest.json 记录每个数据集的最新版本、快照路径与补丁链：
+        {"version": 1, "published_at", "datasets": {名称: {"key", "latest", "snapshot", "sha256",
+         "n_points", "bytes", "chain": [{"from", "to", "patch", "bytes", "n_added", "n_removed",
+         "n_changed", "published_at"}...]}}}
+客户端缓存了版本 v 时，从 chain 中 from == v 的一项起依次应用补丁即可升级到 latest
+（见 view_xy_logic.js 的 patchChain / applyPointsPatch）；v 不在链中时回退为下载完整快照。
+只保留最新快照与最近 publish.max_versions 个补丁，更早的文件会被清理。
+"""
+
+import hashlib
+import json
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from alleschools import config as config_mod
+from alleschools.exporters import json_exporter
+
+PATCH_FORMAT = 1
+MANIFEST_VERSION = 1
+HASH_LENGTH = 12
+DEFAULT_MAX_VERSIONS = 12
+
+_KEY_FIELDS = ("brin", "BRIN")
+_MISSING = object()
+
+
+def _dumps(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def detect_key(points: Sequence[Mapping[str, Any]]) -> str:
+    """points 数组的连接键：points schema 为 brin，VO profiel 宽表为 BRIN。"""
+    for field in _KEY_FIELDS:
+        if points and field in points[0]:
+            return field
+    return _KEY_FIELDS[0]
+
+
+def _index_by_key(points: Sequence[Mapping[str, Any]], key: str) -> Dict[Any, Mapping[str, Any]]:
+    index: Dict[Any, Mapping[str, Any]] = {}
+    for p in points:
+        k = p.get(key)
+        if k is None or k in index:
+            raise ValueError(f"键 {key!r} 缺失或重复: {k!r}")
+        index[k] = p
+    return index
+
+
+def diff_points(
+    old: Sequence[Mapping[str, Any]],
+    new: Sequence[Mapping[str, Any]],
+    key: str = "brin",
+) -> Dict[str, Any]:
+    """
+    以 key 对两个 points 数组做哈希连接，返回补丁主体（added / removed / changed，必要时 order）。
+
+    复杂度 O(len(old) + len(new))；键缺失或重复时抛出 ValueError（此时应发布完整快照）。
+    """
+    old_index = _index_by_key(old, key)
+    new_index = _index_by_key(new, key)
+
+    added: List[Mapping[str, Any]] = []
+    changed: List[Dict[str, Any]] = []
+    for p in new:
+        k = p[key]
+        prev = old_index.get(k)
+        if prev is None:
+            added.append(p)
+            continue
+        if prev == p:
+            continue
+        entry: Dict[str, Any] = {"key": k, "set": {f: v for f, v in p.items() if prev.get(f, _MISSING) != v}}
+        unset = [f for f in prev if f not in p]
+        if unset:
+            entry["unset"] = unset
+        changed.append(entry)
+    removed = [p[key] for p in old if p[key] not in new_index]
+
+    patch: Dict[str, Any] = {"added": added, "removed": removed, "changed": changed}
+    # 默认重建顺序：保留点沿用旧顺序，新增点按新顺序追加；不一致时显式给出完整键序
+    rebuilt = [p[key] for p in old if p[key] in new_index] + [p[key] for p in added]
+    if rebuilt != [p[key] for p in new]:
+        patch["order"] = [p[key] for p in new]
+    return patch
+
+
+def apply_patch(
+    points: Sequence[Mapping[str, Any]],
+    patch: Mapping[str, Any],
+    key: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """将 diff_points 产出的补丁应用到旧 points 数组，返回新数组（不修改输入）。"""
+    key = key or str(patch.get("key") or detect_key(points))
+    removed = set(patch.get("removed") or ())
+    changes = {c["key"]: c for c in patch.get("changed") or ()}
+    out: List[Dict[str, Any]] = []
+    for p in points:
+        k = p.get(key)
+        if k in removed:
+            continue
+        q = dict(p)
+        change = changes.get(k)
+        if change is not None:
+            q.update(change.get("set") or {})
+            for f in change.get("unset") or ():
+                q.pop(f, None)
+        out.append(q)
+    out.extend(dict(p) for p in patch.get("added") or ())
+    order = patch.get("order")
+    if order is not None:
+        by_key = {p[key]: p for p in out}
+        out = [by_key[k] for k in order]
+    return out
+
+
+def _publish_settings(config: Mapping[str, Any]) -> Tuple[Path, Path, int]:
+    data_root = Path(config.get("data_root") or config_mod.PROJECT_ROOT)
+    settings = dict(config.get("publish") or {})
+    out_dir = Path(str(settings.get("dir") or "generated/published"))
+    if not out_dir.is_absolute():
+        out_dir = data_root / out_dir
+    max_versions = max(1, int(settings.get("max_versions") or DEFAULT_MAX_VERSIONS))
+    return data_root, out_dir, max_versions
+
+
+def collect_datasets(config: Mapping[str, Any], layers: Sequence[str]) -> Dict[str, Path]:
+    """从 run_report_{layer}.json 的 outputs 收集待发布的 points 文件：数据集名（文件 stem）→ 路径。"""
+    data_root, _, _ = _publish_settings(config)
+    datasets: Dict[str, Path] = {}
+    for layer in layers:
+        report_path = data_root / f"run_report_{layer}.json"
+        if not report_path.exists():
+            continue
+        reports = json.loads(report_path.read_text(encoding="utf-8"))
+        report = reports[-1] if isinstance(reports, list) else reports
+        outputs = ((report or {}).get("outputs") or {}).get(layer) or {}
+        rels = [outputs.get("points_path")] + list((outputs.get("profiles_points_paths") or {}).values())
+        for rel in rels:
+            if not rel:
+                continue
+            path = Path(rel) if Path(rel).is_absolute() else data_root / rel
+            if path.exists():
+                datasets[path.stem] = path
+    return datasets
+
+
+def _publish_dataset(
+    name: str,
+    points: Sequence[Mapping[str, Any]],
+    entry: Optional[Mapping[str, Any]],
+    out_dir: Path,
+    *,
+    max_versions: int,
+    published_at: str,
+) -> Dict[str, Any]:
+    body = _dumps(points)
+    digest = hashlib.sha256(body).hexdigest()
+    version = digest[:HASH_LENGTH]
+    if entry is not None and entry.get("latest") == version:
+        return dict(entry)
+
+    key = detect_key(points)
+    dataset_dir = out_dir / name
+    patch_dir = dataset_dir / "patches"
+    patch_dir.mkdir(parents=True, exist_ok=True)
+    snapshot = dataset_dir / f"{version}.json"
+    snapshot.write_bytes(body)
+
+    chain: List[Dict[str, Any]] = list((entry or {}).get("chain") or [])
+    prev_path = out_dir / str(entry["snapshot"]) if entry and entry.get("snapshot") else None
+    if entry is not None and prev_path is not None and prev_path.exists():
+        prev_points = json.loads(prev_path.read_text(encoding="utf-8"))
+        try:
+            patch_body = diff_points(prev_points, points, key)
+        except ValueError:
+            # 键不可用时无法增量升级：清空补丁链，客户端回退为下载完整快照
+            chain = []
+        else:
+            patch = {"format": PATCH_FORMAT, "dataset": name, "key": key,
+                     "from": entry["latest"], "to": version, **patch_body}
+            patch_bytes = _dumps(patch)
+            patch_path = patch_dir / f"{entry['latest']}-{version}.json"
+            patch_path.write_bytes(patch_bytes)
+            chain.append({
+                "from": entry["latest"],
+                "to": version,
+                "patch": patch_path.relative_to(out_dir).as_posix(),
+                "bytes": len(patch_bytes),
+                "n_added": len(patch["added"]),
+                "n_removed": len(patch["removed"]),
+                "n_changed": len(patch["changed"]),
+                "published_at": published_at,
+            })
+        if prev_path != snapshot:
+            prev_path.unlink()
+    else:
+        chain = []
+
+    chain = chain[-max_versions:]
+    keep = {out_dir / c["patch"] for c in chain}
+    for old in patch_dir.glob("*.json"):
+        if old not in keep:
+            old.unlink()
+
+    return {
+        "key": key,
+        "latest": version,
+        "snapshot": snapshot.relative_to(out_dir).as_posix(),
+        "sha256": digest,
+        "n_points": len(points),
+        "bytes": len(body),
+        "chain": chain,
+    }
+
+
+def run_publish(config: Mapping[str, Any], layers: Sequence[str] = ("vo", "po")) -> Tuple[Path, Dict[str, Any]]:
+    """
+    发布 layers 对应的 points 数据集并更新清单，返回 (manifest_path, manifest)。
+
+    未变化的数据集沿用原条目（不生成空补丁）；清单中不属于本次 layers 的数据集保持不变。
+    """
+    t0 = time.perf_counter()
+    _, out_dir, max_versions = _publish_settings(config)
+    manifest_path = out_dir / "manifest.json"
+    manifest: Dict[str, Any] = {"version": MANIFEST_VERSION, "datasets": {}}
+    if manifest_path.exists():
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    published_at = datetime.now(timezone.utc).isoformat()
+
+    datasets: Dict[str, Any] = dict(manifest.get("datasets") or {})
+    for name, path in sorted(collect_datasets(config, layers).items()):
+        points = json.loads(path.read_text(encoding="utf-8"))
+        datasets[name] = _publish_dataset(
+            name, points, datasets.get(name), out_dir, max_versions=max_versions, published_at=published_at
+        )
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "published_at": published_at,
+        "duration_seconds": round(time.perf_counter() - t0, 3),
+        "datasets": datasets,
+    }
+    out_dir.mkdir(parents=True, exist_ok=True)
+    json_exporter.write_meta_json(manifest, manifest_path)
+    return manifest_path, manifest
+
+
+__all__ = [
+    "PATCH_FORMAT",
+    "MANIFEST_VERSION",
+    "apply_patch",
+    "collect_datasets",
+    "detect_key",
+    "diff_points",
+    "run_publish",
+]
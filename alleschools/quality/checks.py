@@ -94,14 +94,18 @@ def run_po_quality(
     input_cfg: Mapping[str, Any],
     *,
     max_brins_in_report: int = 50,
+    duplicate_brins: Optional[Sequence[str]] = None,
 ) -> Dict[str, Any]:
     """
     执行 PO 数据质量检查。
 
+    duplicate_brins: 可选；已知的源文件重复 BRIN（如合并分片结果时），提供时不再扫描源文件。
     返回 data_quality 字典，可直接并入 run_report。
     """
-    pattern = str(input_cfg.get("duo_schooladviezen_pattern") or "duo_schooladviezen_{start}_{end}.csv")
-    duplicate_brins = _collect_duplicate_brins_po(data_root, pattern)
+    if duplicate_brins is None:
+        pattern = str(input_cfg.get("duo_schooladviezen_pattern") or "duo_schooladviezen_{start}_{end}.csv")
+        duplicate_brins = _collect_duplicate_brins_po(data_root, pattern)
+    duplicate_brins = sorted(duplicate_brins)
     missing = _missing_postcode_brins(rows_out)
     return {
         "duplicate_brin_in_source": {
@@ -125,15 +129,19 @@ def run_vo_quality(
     input_cfg: Mapping[str, Any],
     *,
     max_brins_in_report: int = 50,
+    duplicate_brins: Optional[Sequence[str]] = None,
 ) -> Dict[str, Any]:
     """
     执行 VO 数据质量检查。
 
+    duplicate_brins: 可选；已知的源文件重复 BRIN（如合并分片结果时），提供时不再扫描源文件。
     返回 data_quality 字典，可直接并入 run_report。
     """
-    exams_all = str(input_cfg.get("exams_all_csv") or "duo_examen_raw_all.csv")
-    exams_small = str(input_cfg.get("exams_small_csv") or "duo_examen_raw.csv")
-    duplicate_brins = _collect_duplicate_brins_vo(data_root, exams_all, exams_small)
+    if duplicate_brins is None:
+        exams_all = str(input_cfg.get("exams_all_csv") or "duo_examen_raw_all.csv")
+        exams_small = str(input_cfg.get("exams_small_csv") or "duo_examen_raw.csv")
+        duplicate_brins = _collect_duplicate_brins_vo(data_root, exams_all, exams_small)
+    duplicate_brins = sorted(duplicate_brins)
     missing = _missing_postcode_brins(rows_out)
     return {
         "duplicate_brin_in_source": {
@@ -0,0 +1,329 @@
+from __future__ import annotations
+
+"""
+本地 ETL 作业服务（alleschools serve）：常驻进程 + 线程池作业队列，原始数据解析结果常驻内存。
+
+- 仅监听 localhost（默认 127.0.0.1:8765），JSON 接口：
+    POST /jobs            {"profile": "default", "overrides": {...}, "layers": ["po", "vo"], "artifacts": ["points_json"]}
+                          → 202 + 作业摘要；配置在提交时构造，profile / layers / artifacts 无效时直接返回 400
+    GET  /jobs            最近的作业（新 → 旧）
+    GET  /jobs/<id>       作业状态（queued / running / succeeded / failed）与各层统计
+    GET  /jobs/<id>/report  各层 run_report（与 run_report_{layer}.json 中本次运行的条目相同）
+    GET  /health          工作线程数、排队 / 运行中作业数、内存中的阶段缓存条目数
+- 服务在整个生命周期内处于 stage_cache.keep_in_memory()：duo_loader / vo_loader / cbs_loader /
+  vwo_exam_loader 的解析结果（load.* 阶段）与其余阶段结果都留在进程内；原始数据未变的重复作业
+  load 阶段全部命中，不再解析 CSV（作业结果中 load_skipped=true）；
+- 作业在有界线程池（service.workers）中并发执行；写同一 data_root 的作业共用输出文件与阶段缓存，
+  按 data_root 串行，不同 data_root 的作业并行；
+- overrides 与 CLI 覆盖相同，按 config.build_effective_config 的一层嵌套合并语义；
+  artifacts 给出时只写出所列可选产物（主 CSV、排除列表与 meta 总是写出）。
+"""
+
+import itertools
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from datetime import datetime, timezone
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from alleschools import config as config_mod
+from alleschools import stage_cache
+from alleschools.pipeline import run_po_pipeline, run_vo_pipeline
+from alleschools.web import make_server
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_JOBS = 200
+
+LAYERS: Tuple[str, ...] = ("po", "vo")
+# 作业可选择的产物 -> {layer}.output 中对应的开关
+ARTIFACTS: Dict[str, str] = {
+    "geojson": "export_geojson",
+    "long_table": "export_long_table",
+    "points_json": "export_points_json",
+    "search_index": "export_search_index",
+    "shards": "export_shards",
+    "details": "export_detail_shards",
+    "density": "export_density_tiles",
+    "geo_clusters": "export_geo_clusters",
+}
+
+Runner = Callable[[Dict[str, Any]], Tuple[Path, Dict[str, Any]]]
+
+
+class JobError(ValueError):
+    """作业请求无效（返回 400）。"""
+
+
+def select_artifacts(config: Dict[str, Any], layers: Sequence[str], artifacts: Sequence[str]) -> Dict[str, Any]:
+    """只打开 artifacts 所列的可选产物，其余 export_* 开关关闭。"""
+    unknown = sorted(set(artifacts) - set(ARTIFACTS))
+    if unknown:
+        raise JobError(f"unknown artifacts: {', '.join(unknown)} (choose from {', '.join(sorted(ARTIFACTS))})")
+    selected = dict(config)
+    for layer in layers:
+        layer_cfg = dict(selected.get(layer) or {})
+        output_cfg = dict(layer_cfg.get("output") or {})
+        for name, flag in ARTIFACTS.items():
+            output_cfg[flag] = name in artifacts
+        layer_cfg["output"] = output_cfg
+        selected[layer] = layer_cfg
+    return selected
+
+
+class Job:
+    """一次作业：提交时构造好的生效配置 + 运行状态与结果。"""
+
+    def __init__(self, job_id: int, request: Mapping[str, Any], config: Dict[str, Any], layers: List[str]) -> None:
+        self.id = job_id
+        self.request = dict(request)
+        self.config = config
+        self.layers = layers
+        self.status = "queued"
+        self.submitted_at = datetime.now(timezone.utc).isoformat()
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+        self.duration_seconds: Optional[float] = None
+        self.error: Optional[str] = None
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self.reports: Dict[str, Any] = {}
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "profile": self.config.get("profile"),
+            "data_root": self.config.get("data_root"),
+            "layers": self.layers,
+            "request": self.request,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "duration_seconds": self.duration_seconds,
+            "error": self.error,
+            "results": self.results,
+        }
+
+
+class JobService:
+    """作业队列与执行；HTTP 层见 make_service_handler。"""
+
+    def __init__(
+        self,
+        *,
+        config_path: Optional[Path] = None,
+        profile: Optional[str] = None,
+        base_overrides: Optional[Mapping[str, Any]] = None,
+        workers: int = DEFAULT_WORKERS,
+        max_jobs: int = DEFAULT_MAX_JOBS,
+        runners: Optional[Mapping[str, Runner]] = None,
+    ) -> None:
+        self.config_path = config_path
+        self.profile = profile
+        self.base_overrides = dict(base_overrides or {})
+        self.workers = max(1, int(workers))
+        self.max_jobs = max(1, int(max_jobs))
+        self.runners: Dict[str, Runner] = dict(runners or {"po": run_po_pipeline, "vo": run_vo_pipeline})
+        self.memory: Dict[str, Dict[str, Any]] = {}
+        self.jobs: Dict[int, Job] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._root_locks: Dict[str, threading.Lock] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._stack = ExitStack()
+
+    def start(self) -> "JobService":
+        # 整个服务生命周期共用一份进程内阶段缓存（各作业线程不各自进入 / 退出，避免相互覆盖）
+        self._stack.enter_context(stage_cache.keep_in_memory(self.memory))
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="alleschools-job")
+        return self
+
+    def close(self, wait: bool = True) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+        self._stack.close()
+
+    def submit(self, request: Mapping[str, Any]) -> Job:
+        """校验请求、构造生效配置并排队；请求无效时抛 JobError。"""
+        if self._executor is None:
+            raise RuntimeError("JobService.start() has not been called")
+        layers = list(request.get("layers") or LAYERS)
+        if not layers or set(layers) - set(LAYERS):
+            raise JobError(f"layers must be a subset of {list(LAYERS)}")
+        overrides = request.get("overrides") or {}
+        if not isinstance(overrides, dict):
+            raise JobError("overrides must be an object")
+        try:
+            config = config_mod.build_effective_config(
+                profile=request.get("profile") or self.profile,
+                overrides={**self.base_overrides, **overrides} or None,
+                config_path=self.config_path,
+            )
+        except (KeyError, ValueError, OSError) as e:
+            raise JobError(str(e)) from e
+        if request.get("artifacts") is not None:
+            config = select_artifacts(config, layers, list(request["artifacts"]))
+
+        with self._lock:
+            job = Job(next(self._ids), request, config, [layer for layer in LAYERS if layer in layers])
+            self.jobs[job.id] = job
+            for old_id in sorted(self.jobs)[: max(0, len(self.jobs) - self.max_jobs)]:
+                if self.jobs[old_id].status in ("succeeded", "failed"):
+                    del self.jobs[old_id]
+        self._executor.submit(self._run, job)
+        return job
+
+    def _root_lock(self, config: Mapping[str, Any]) -> threading.Lock:
+        root = str(Path(config.get("data_root") or config_mod.PROJECT_ROOT).resolve())
+        with self._lock:
+            return self._root_locks.setdefault(root, threading.Lock())
+
+    def _run(self, job: Job) -> None:
+        # 同一 data_root 的作业写同一批输出文件与阶段缓存：串行执行
+        with self._root_lock(job.config):
+            job.status = "running"
+            job.started_at = datetime.now(timezone.utc).isoformat()
+            t0 = time.perf_counter()
+            try:
+                for layer in job.layers:
+                    job.results[layer], job.reports[layer] = self._run_layer(job.config, layer)
+                job.status = "succeeded"
+            except Exception as e:
+                job.status = "failed"
+                job.error = f"{type(e).__name__}: {e}"
+            job.duration_seconds = round(time.perf_counter() - t0, 3)
+            job.finished_at = datetime.now(timezone.utc).isoformat()
+
+    def _run_layer(self, config: Dict[str, Any], layer: str) -> Tuple[Dict[str, Any], Any]:
+        t0 = time.perf_counter()
+        csv_path, stats = self.runners[layer](config)
+        memo = stats.get("stage_cache") or {}
+        hits = list(memo.get("hits") or [])
+        misses = list(memo.get("misses") or [])
+        loads = [name for name in hits + misses if name.startswith("load.")]
+        report: Any = None
+        report_path = stats.get("run_report_path")
+        if report_path and Path(report_path).is_file():
+            with open(report_path, "r", encoding="utf-8") as f:
+                history = json.load(f)
+            report = history[0] if isinstance(history, list) and history else history
+        result = {
+            "status": stats.get("summary_status"),
+            "seconds": round(time.perf_counter() - t0, 3),
+            "n_schools": stats.get("n_schools"),
+            "n_excluded": stats.get("n_excluded"),
+            "csv_path": str(csv_path),
+            "run_report_path": report_path,
+            "load_skipped": bool(loads) and all(name in hits for name in loads),
+            "stages_cached": hits,
+            "stages_run": misses,
+            "artifacts_changed": list(memo.get("changed") or []),
+        }
+        return result, report
+
+    def list_jobs(self) -> List[Job]:
+        """最近的作业，新 → 旧。"""
+        with self._lock:
+            return sorted(self.jobs.values(), key=lambda j: j.id, reverse=True)
+
+    def health(self) -> Dict[str, Any]:
+        with self._lock:
+            statuses = [job.status for job in self.jobs.values()]
+        return {
+            "status": "ok",
+            "workers": self.workers,
+            "queued": statuses.count("queued"),
+            "running": statuses.count("running"),
+            "jobs": len(statuses),
+            "cached_stages": len(self.memory),
+        }
+
+
+def _json_bytes(payload: Any) -> bytes:
+    return json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+
+
+def make_service_handler(service: JobService) -> type:
+    """绑定到 service 的请求处理类。"""
+
+    class ServiceHandler(BaseHTTPRequestHandler):
+        server_version = "alleschools-service"
+
+        def log_message(self, format: str, *args: Any) -> None:  # noqa: A002 - 与基类签名一致
+            if getattr(self.server, "quiet", False):
+                return
+            super().log_message(format, *args)
+
+        def _send(self, status: int, payload: Any) -> None:
+            body = _json_bytes(payload)
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _job(self, parts: List[str]) -> Optional[Job]:
+            try:
+                return service.jobs.get(int(parts[1]))
+            except (IndexError, ValueError):
+                return None
+
+        def do_GET(self) -> None:
+            parts = [p for p in self.path.split("?", 1)[0].split("/") if p]
+            if parts == ["health"]:
+                return self._send(HTTPStatus.OK, service.health())
+            if parts == ["jobs"]:
+                return self._send(HTTPStatus.OK, [job.summary() for job in service.list_jobs()])
+            if parts[:1] == ["jobs"] and len(parts) in (2, 3):
+                job = self._job(parts)
+                if job is None:
+                    return self._send(HTTPStatus.NOT_FOUND, {"error": "job not found"})
+                if len(parts) == 2:
+                    return self._send(HTTPStatus.OK, job.summary())
+                if parts[2] == "report":
+                    return self._send(HTTPStatus.OK, {"id": job.id, "status": job.status, "reports": job.reports})
+            return self._send(HTTPStatus.NOT_FOUND, {"error": "not found"})
+
+        def do_POST(self) -> None:
+            if self.path.split("?", 1)[0].rstrip("/") != "/jobs":
+                return self._send(HTTPStatus.NOT_FOUND, {"error": "not found"})
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                request = json.loads(self.rfile.read(length) or b"{}")
+                if not isinstance(request, dict):
+                    raise JobError("request body must be a JSON object")
+                job = service.submit(request)
+            except (JobError, json.JSONDecodeError) as e:
+                return self._send(HTTPStatus.BAD_REQUEST, {"error": str(e)})
+            return self._send(HTTPStatus.ACCEPTED, job.summary())
+
+    return ServiceHandler
+
+
+def make_service_server(
+    service: JobService, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, *, quiet: bool = False
+) -> ThreadingHTTPServer:
+    """创建绑定 service 的多线程 HTTP 服务（port=0 时由系统分配端口）。"""
+    return make_server(host, port, make_service_handler(service), quiet=quiet)
+
+
+__all__ = [
+    "ARTIFACTS",
+    "DEFAULT_HOST",
+    "DEFAULT_MAX_JOBS",
+    "DEFAULT_PORT",
+    "DEFAULT_WORKERS",
+    "Job",
+    "JobError",
+    "JobService",
+    "make_service_handler",
+    "make_service_server",
+    "select_artifacts",
+]
@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+"""
+按 BRIN 哈希分片：把一次大规模 ETL 拆到多台机器上运行，再在一台机器上合并为常规产物。
+
+    python -m alleschools.cli etl --vo --shard 0/4     # 每台机器跑一个分片
+    python -m alleschools.cli merge --vo --shards-dir DIR  # 收集全部分片后合并
+
+- 分片归属：zlib.crc32(BRIN) % N，与进程、平台与 PYTHONHASHSEED 无关，任何机器上结果相同；
+- 分片运行时 loader 只保留本分片的 BRIN（按学校聚合前即丢弃其他行），随后照常计算逐校 X/Y，
+  把本分片的加载结果、计算结果与数据质量明细写成 {shard.dir}/{layer}-{i:03d}-of-{N:03d}.pkl；
+- 依赖全体学校的步骤（outliers 百分位截断、privacy 汇总与抑制、全部导出与 meta）推迟到 merge：
+  合并后的行按 BRIN 排序（与单机计算顺序相同），再走与单机完全相同的后续流水线，产物逐字节一致；
+- CBS WOZ 是按 PC4 的查找表而非按 BRIN 的数据，每个分片完整加载。
+"""
+
+import pickle
+import re
+import zlib
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from alleschools.stage_cache import code_version
+
+BUNDLE_FORMAT = 1
+DEFAULT_SHARD_DIR = "generated/etl_shards"
+
+_SHARD_RE = re.compile(r"^\s*(\d+)\s*/\s*(\d+)\s*$")
+
+
+class ShardMergeError(ValueError):
+    """分片结果不完整、来自不同配置 / 代码版本，或与合并时的配置不一致。"""
+
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """解析 "i/N"（0 <= i < N）；格式不对时抛出 ValueError。"""
+    m = _SHARD_RE.match(str(value))
+    if not m:
+        raise ValueError(f"shard must look like i/N (e.g. 0/4), got {value!r}")
+    index, count = int(m.group(1)), int(m.group(2))
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"shard index must satisfy 0 <= i < N, got {index}/{count}")
+    return index, count
+
+
+def brin_shard(brin: str, count: int) -> int:
+    """BRIN 所属分片（稳定哈希）。"""
+    return zlib.crc32(str(brin).encode("utf-8")) % count
+
+
+def shard_settings(config: Mapping[str, Any]) -> Optional[Tuple[int, int]]:
+    """生效配置中的分片 (index, count)；未分片时返回 None。"""
+    shard = dict(config.get("shard") or {})
+    if shard.get("count") in (None, ""):
+        return None
+    return parse_shard(f"{shard.get('index', 0)}/{shard['count']}")
+
+
+def brin_filter(shard: Optional[Tuple[int, int]]) -> Optional[Callable[[str], bool]]:
+    """loader 用的 BRIN 过滤函数；未分片时返回 None（不过滤）。"""
+    if shard is None:
+        return None
+    index, count = shard
+    return lambda brin: brin_shard(brin, count) == index
+
+
+def shard_dir(config: Mapping[str, Any], data_root: Path) -> Path:
+    """分片结果目录：shard.dir（相对 data_root）。"""
+    path = Path(str(dict(config.get("shard") or {}).get("dir") or DEFAULT_SHARD_DIR))
+    return path if path.is_absolute() else data_root / path
+
+
+def bundle_path(directory: Path, layer: str, index: int, count: int) -> Path:
+    return directory / f"{layer}-{index:03d}-of-{count:03d}.pkl"
+
+
+def write_bundle(
+    path: Path,
+    *,
+    layer: str,
+    shard: Tuple[int, int],
+    settings: Mapping[str, Any],
+    data: Mapping[str, Any],
+    run_report: Mapping[str, Any],
+) -> Path:
+    """写出一个分片的结果（pickle：保留浮点与 dict 顺序，合并时无需重新解析）。"""
+    bundle = {
+        "format": BUNDLE_FORMAT,
+        "layer": layer,
+        "index": shard[0],
+        "count": shard[1],
+        "code_version": code_version(),
+        "settings": dict(settings),
+        "data": dict(data),
+        "run_report": dict(run_report),
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(pickle.dumps(bundle, protocol=pickle.HIGHEST_PROTOCOL))
+    tmp.replace(path)
+    return path
+
+
+def load_bundles(directory: Path, layer: str) -> List[Dict[str, Any]]:
+    """
+    读取 directory 下某层的全部分片结果并校验：同一分片数、0..N-1 各出现一次、
+    代码版本与分片时的计算配置一致。返回按分片序号排列的列表。
+    """
+    paths = sorted(Path(directory).glob(f"{layer}-*-of-*.pkl"))
+    if not paths:
+        raise ShardMergeError(f"No {layer} shard results found in {directory}")
+    bundles = []
+    for path in paths:
+        with path.open("rb") as f:
+            bundle = pickle.load(f)
+        if bundle.get("format") != BUNDLE_FORMAT or bundle.get("layer") != layer:
+            raise ShardMergeError(f"{path.name}: not a {layer} shard result (format {bundle.get('format')})")
+        bundles.append(bundle)
+    counts = {b["count"] for b in bundles}
+    if len(counts) != 1:
+        raise ShardMergeError(f"{layer} shards come from different shard counts: {sorted(counts)}")
+    count = counts.pop()
+    indices = sorted(b["index"] for b in bundles)
+    if indices != list(range(count)):
+        missing = sorted(set(range(count)) - set(indices))
+        raise ShardMergeError(f"{layer} shards incomplete or duplicated: have {indices}, missing {missing} of {count}")
+    first = bundles[0]
+    for b in bundles[1:]:
+        if b["code_version"] != first["code_version"]:
+            raise ShardMergeError(f"{layer} shard {b['index']} was produced by a different alleschools version")
+        if b["settings"] != first["settings"]:
+            raise ShardMergeError(f"{layer} shard {b['index']} was produced with different settings")
+    return sorted(bundles, key=lambda b: b["index"])
+
+
+def _union(parts: Sequence[Mapping[str, Any]]) -> Dict[str, Any]:
+    merged: Dict[str, Any] = {}
+    for part in parts:
+        merged.update(part)
+    return {key: merged[key] for key in sorted(merged)}
+
+
+def _by_brin(parts: Sequence[Sequence[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    return sorted((row for part in parts for row in part), key=lambda row: str(row.get("BRIN") or ""))
+
+
+def merge_sources(bundles: Sequence[Mapping[str, Any]], layer: str) -> Dict[str, Any]:
+    """
+    把各分片的加载 / 计算结果合并为流水线可直接使用的 sources（见 run_po_pipeline / run_vo_pipeline）：
+    按 BRIN 的映射取并集并按键排序，逐校行与排除列表按 BRIN 排序（即单机 compute 的输出顺序）。
+    """
+    data = [b["data"] for b in bundles]
+    sources: Dict[str, Any] = {
+        "settings": dict(bundles[0]["settings"]),
+        "shards": merge_run_reports([b["run_report"] for b in bundles]),
+        "schools": _union([d["schools"] for d in data]),
+        "compute": (
+            _by_brin([d["rows"] for d in data]),
+            _by_brin([d["excluded"] for d in data]),
+            _union([d["year_facts"] for d in data]),
+        ),
+        "duplicate_brins": sorted({brin for d in data for brin in d["duplicate_brins"]}),
+    }
+    if layer == "po":
+        sources["woz"] = (data[0]["woz"], data[0]["woz_years"])
+    else:
+        sources["brin_to_postcode"] = _union([d["brin_to_postcode"] for d in data])
+        sources["vwo_central"] = _union([d["vwo_central"] for d in data])
+        profiles = {prof: _union([d["profile_indices"].get(prof) or {} for d in data]) for prof in ("NT", "NG", "EM", "CM")}
+        has_profiles = any(d["profile_indices"] for d in data)
+        sources["vwo_profiles"] = (
+            profiles if has_profiles else {},
+            _union([d["profile_years"] for d in data]),
+        )
+    return sources
+
+
+def merge_run_reports(reports: Sequence[Mapping[str, Any]]) -> Dict[str, Any]:
+    """
+    合并各分片的 run_report：逐分片摘要、学校 / 排除数与数据质量计数之和、
+    各阶段耗时之和（合并后 run_report["shards"]）。
+    """
+    per_shard = []
+    totals = {"n_schools": 0, "n_excluded": 0}
+    dq_counts: Dict[str, int] = {}
+    stage_seconds: Dict[str, float] = {}
+    for report in reports:
+        shard = dict(report.get("shard") or {})
+        per_shard.append(
+            {
+                "index": shard.get("index"),
+                "n_schools": shard.get("n_schools", 0),
+                "n_excluded": shard.get("n_excluded", 0),
+                "duration_seconds": report.get("duration_seconds"),
+                "status": (report.get("summary") or {}).get("status"),
+            }
+        )
+        totals["n_schools"] += int(shard.get("n_schools") or 0)
+        totals["n_excluded"] += int(shard.get("n_excluded") or 0)
+        for check, entry in (report.get("data_quality") or {}).items():
+            dq_counts[check] = dq_counts.get(check, 0) + int((entry or {}).get("count") or 0)
+        for stage in (report.get("performance") or {}).get("stages") or []:
+            name = stage.get("name")
+            stage_seconds[name] = round(stage_seconds.get(name, 0.0) + float(stage.get("wall_seconds") or 0.0), 6)
+    return {
+        "count": len(per_shard),
+        "shards": per_shard,
+        "totals": totals,
+        "data_quality_counts": dq_counts,
+        "stage_seconds": stage_seconds,
+    }
+
+
+__all__ = [
+    "BUNDLE_FORMAT",
+    "DEFAULT_SHARD_DIR",
+    "ShardMergeError",
+    "bundle_path",
+    "brin_filter",
+    "brin_shard",
+    "load_bundles",
+    "merge_run_reports",
+    "merge_sources",
+    "parse_shard",
+    "shard_dir",
+    "shard_settings",
+    "write_bundle",
+]
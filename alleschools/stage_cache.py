@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+"""
+阶段级记忆化：流水线的每个阶段（load → compute → privacy → 各 export → data_quality → meta → schema_validation）
+声明自己依赖的上游阶段、配置值与原始输入文件，结果按指纹缓存在 {data_root}/{stage_cache.dir}/{layer}/{阶段名}.pkl。
+
+    with perf.stage("export.geojson", rows_in=len(rows)) as st:
+        geo_fc = memo.run(
+            st,
+            lambda: geojson_exporter.export_geojson(rows, geo_path),
+            after=("privacy",),
+            config={"path": geo_rel},
+            outputs=[geo_path],
+        )
+
+- 指纹 = sha256(阶段名、alleschools 源码哈希、上游阶段指纹、config 值、输入文件的 (大小, mtime_ns))，
+  上游指纹沿依赖链传递：只改某个导出选项时，只有该导出阶段（及依赖它的阶段）的指纹变化；
+- 命中条件：缓存文件的指纹一致，且该阶段登记的输出文件仍存在、大小与 mtime 与写出时相同；
+  命中时直接返回缓存值（导出阶段不重写文件），perf 记录中 cached=True；
+- 每个阶段完成后立即原子写入缓存（临时文件 + os.replace），进程中途崩溃后重跑，已完成的阶段全部命中，
+  即从最后一个完成的阶段之后继续；
+- stage_cache.enabled: false 时不读不写；stage_cache.force（CLI --force）时不读、照常写入（刷新缓存）。
+
+常驻进程（alleschools watch）在 keep_in_memory() 内运行流水线：阶段结果同时以 pickle 字节保存在进程内，
+重跑时不再读盘；并按内容哈希比较重算阶段的输出文件，字节未变的文件恢复原 mtime，report()["changed"]
+只列出内容真正变化的产物（浏览器 / view_xy_server 只需重新加载这些文件）。
+"""
+
+import contextlib
+import functools
+import hashlib
+import json
+import os
+import pickle
+import re
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, TypeVar, Union
+
+from alleschools.perf import StageHandle
+
+CACHE_FORMAT = 1
+DEFAULT_CACHE_DIR = "generated/.stage_cache"
+
+T = TypeVar("T")
+# 进程内缓存：缓存文件路径 -> {"blob": pickle 字节, "outputs": [[rel, state, sha256], ...]}；None 表示未启用
+_MEMORY: Optional[Dict[str, Dict[str, Any]]] = None
+Outputs = Union[Iterable[Union[str, "os.PathLike[str]"]], Callable[[Any], Iterable[Union[str, "os.PathLike[str]"]]]]
+
+
+@functools.lru_cache(maxsize=1)
+def code_version() -> str:
+    """alleschools 包全部源码的哈希：代码变化时所有阶段缓存自动失效。"""
+    package_dir = Path(__file__).resolve().parent
+    digest = hashlib.sha256()
+    for path in sorted(package_dir.rglob("*.py")):
+        digest.update(str(path.relative_to(package_dir)).encode("utf-8"))
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def _file_state(path: Path) -> Optional[List[int]]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _file_sha256(path: Path) -> Optional[str]:
+    digest = hashlib.sha256()
+    try:
+        with path.open("rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+@contextlib.contextmanager
+def keep_in_memory(store: Optional[Dict[str, Dict[str, Any]]] = None) -> Iterator[Dict[str, Dict[str, Any]]]:
+    """
+    在此上下文内，各 StageCache 把阶段结果同时保存在进程内并跟踪输出内容变化。
+    store 为跨多次进入复用的内存（常驻进程持有）；省略时沿用外层上下文的内存或新建。
+    """
+    global _MEMORY
+    previous = _MEMORY
+    if store is not None:
+        _MEMORY = store
+    elif _MEMORY is None:
+        _MEMORY = {}
+    try:
+        yield _MEMORY
+    finally:
+        _MEMORY = previous
+
+
+class StageCache:
+    """一次流水线运行的阶段缓存；cache_dir 为 None 时禁用（run() 直接执行计算）。"""
+
+    def __init__(self, cache_dir: Optional[Path], *, force: bool = False, root: Optional[Path] = None) -> None:
+        self.cache_dir = cache_dir
+        self.force = bool(force)
+        self.root = root
+        self.fingerprints: Dict[str, str] = {}
+        self.hits: List[str] = []
+        self.misses: List[str] = []
+        self.changed: List[str] = []
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any], *, layer: str, root: Path) -> "StageCache":
+        sc = dict(config.get("stage_cache") or {})
+        if not sc.get("enabled", True):
+            return cls(None, root=root)
+        cache_dir = Path(sc.get("dir") or DEFAULT_CACHE_DIR)
+        if not cache_dir.is_absolute():
+            cache_dir = root / cache_dir
+        return cls(cache_dir / layer, force=bool(sc.get("force", False)), root=root)
+
+    @property
+    def enabled(self) -> bool:
+        return self.cache_dir is not None
+
+    def _path(self, name: str) -> Path:
+        assert self.cache_dir is not None
+        return self.cache_dir / (re.sub(r"[^A-Za-z0-9_.-]+", "_", name) + ".pkl")
+
+    def _rel(self, path: Path) -> str:
+        if self.root is not None:
+            try:
+                return str(path.relative_to(self.root))
+            except ValueError:
+                pass
+        return str(path)
+
+    def fingerprint(
+        self,
+        name: str,
+        *,
+        after: Sequence[str] = (),
+        config: Optional[Mapping[str, Any]] = None,
+        files: Iterable[Union[str, "os.PathLike[str]"]] = (),
+    ) -> str:
+        doc = {
+            "format": CACHE_FORMAT,
+            "code": code_version(),
+            "stage": name,
+            "after": {dep: self.fingerprints.get(dep) for dep in after},
+            "config": config or {},
+            "files": {self._rel(Path(p)): _file_state(Path(p)) for p in files},
+        }
+        body = json.dumps(doc, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+        return hashlib.sha256(body).hexdigest()
+
+    def _abs(self, rel: str) -> Path:
+        return Path(rel) if Path(rel).is_absolute() or self.root is None else self.root / rel
+
+    def _load(self, name: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+        path = self._path(name)
+        if self.force:
+            return None
+        try:
+            if _MEMORY is not None and str(path) in _MEMORY:
+                entry = pickle.loads(_MEMORY[str(path)]["blob"])
+            elif path.is_file():
+                blob = path.read_bytes()
+                entry = pickle.loads(blob)
+                if _MEMORY is not None and isinstance(entry, dict):
+                    _MEMORY[str(path)] = {"blob": blob, "outputs": entry.get("outputs") or []}
+            else:
+                return None
+        except Exception:  # 损坏 / 不兼容的缓存按未命中处理
+            return None
+        if not isinstance(entry, dict) or entry.get("fingerprint") != fingerprint:
+            return None
+        for item in entry.get("outputs") or []:
+            if _file_state(self._abs(item[0])) != item[1]:
+                return None
+        return entry
+
+    def _settle_outputs(self, name: str, outputs: List[Path]) -> List[List[Any]]:
+        """
+        记录重算阶段写出的文件状态。跟踪内容时（keep_in_memory 内）与上次写出的 sha256 比较：
+        字节未变的文件恢复上次的 mtime，只有内容变化的文件计入 changed。
+        """
+        previous: Dict[str, List[Any]] = {}
+        if _MEMORY is not None:
+            for item in (_MEMORY.get(str(self._path(name))) or {}).get("outputs") or []:
+                previous[item[0]] = item
+        settled: List[List[Any]] = []
+        for p in outputs:
+            rel = self._rel(p)
+            if _MEMORY is None:
+                settled.append([rel, _file_state(p)])
+                self.changed.append(rel)
+                continue
+            sha = _file_sha256(p)
+            prev = previous.get(rel)
+            if sha is not None and prev is not None and len(prev) > 2 and prev[2] == sha and prev[1]:
+                os.utime(p, ns=(prev[1][1], prev[1][1]))
+            else:
+                self.changed.append(rel)
+            settled.append([rel, _file_state(p), sha])
+        return settled
+
+    def _store(self, name: str, fingerprint: str, value: Any, outputs: List[Path]) -> None:
+        path = self._path(name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        entry = {
+            "fingerprint": fingerprint,
+            "value": value,
+            "outputs": self._settle_outputs(name, outputs),
+        }
+        blob = pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL)
+        fd, tmp = tempfile.mkstemp(prefix=path.name, suffix=".tmp", dir=str(path.parent))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(blob)
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        if _MEMORY is not None:
+            _MEMORY[str(path)] = {"blob": blob, "outputs": entry["outputs"]}
+
+    def run(
+        self,
+        handle: StageHandle,
+        compute: Callable[[], T],
+        *,
+        after: Sequence[str] = (),
+        config: Optional[Mapping[str, Any]] = None,
+        files: Iterable[Union[str, "os.PathLike[str]"]] = (),
+        outputs: Optional[Outputs] = None,
+    ) -> T:
+        """
+        执行（或从缓存取回）handle 对应阶段的结果。
+
+        after:   依赖的上游阶段名（其指纹进入本阶段指纹）
+        config:  本阶段读取的配置值（可 JSON 序列化）
+        files:   本阶段读取的原始输入文件（按大小与 mtime 判断变化）
+        outputs: 本阶段写出的文件，或由返回值得到这些文件的函数；命中前校验它们未被改动或删除
+        """
+        if self.cache_dir is None:
+            return compute()
+        name = handle.name
+        fp = self.fingerprint(name, after=after, config=config, files=list(files))
+        self.fingerprints[name] = fp
+        entry = self._load(name, fp)
+        if entry is not None:
+            handle.cached = True
+            self.hits.append(name)
+            return entry["value"]
+        value = compute()
+        written = outputs(value) if callable(outputs) else (outputs or [])
+        self._store(name, fp, value, [Path(p) for p in written if p])
+        self.misses.append(name)
+        return value
+
+    def report(self) -> Dict[str, Any]:
+        """写入 run_report["stage_cache"] 的摘要。"""
+        return {
+            "enabled": self.enabled,
+            "force": self.force,
+            "dir": self._rel(self.cache_dir) if self.cache_dir is not None else None,
+            "hits": list(self.hits),
+            "misses": list(self.misses),
+            "changed": list(self.changed),
+        }
+
+
+__all__ = [
+    "CACHE_FORMAT",
+    "DEFAULT_CACHE_DIR",
+    "StageCache",
+    "code_version",
+    "keep_in_memory",
+]
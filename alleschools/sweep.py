@@ -0,0 +1,326 @@
+from __future__ import annotations
+
+"""
+参数扫描（sweep）：原始数据只加载一次，在年度立方体上批量评估多组参数。
+
+可扫描的参数（按层）：
+- PO: min_pupils_total, woz_strategy, weights, clip_percentiles, window
+- VO: min_havo_vwo_total, weights, clip_percentiles, window
+
+网格为 参数名 -> 候选值列表，取笛卡尔积；未出现在网格中的参数沿用当前配置（基线）。
+每组参数输出学校数/排除数、X/Y 分布及相对基线的偏移与逐校排名变化，
+结果写入 sweep.output（默认 generated/sweep_{layer}.json）。
+"""
+
+import heapq
+import itertools
+import json
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+try:
+    import yaml  # type: ignore[import]
+except ImportError:  # pragma: no cover
+    yaml = None  # type: ignore[assignment]
+
+from alleschools import config as config_mod
+from alleschools.compute.indicators import _compute_percentile
+from alleschools.compute.year_cube import (
+    YearCube,
+    build_po_year_cube,
+    build_vo_year_cube,
+    parse_window,
+    query_xy_values,
+)
+from alleschools.exporters import json_exporter
+from alleschools.loaders import cbs_loader, duo_loader, vo_loader
+
+SWEEP_PARAMS: Dict[str, Tuple[str, ...]] = {
+    "po": ("min_pupils_total", "woz_strategy", "weights", "clip_percentiles", "window"),
+    "vo": ("min_havo_vwo_total", "weights", "clip_percentiles", "window"),
+}
+
+
+def _raw_root(config: Mapping[str, Any]) -> Tuple[Path, Path]:
+    """与 pipeline 相同的 data_root / raw_subdir 解析，返回 (data_root, raw_root)。"""
+    data_root = Path(config.get("data_root") or config_mod.PROJECT_ROOT)
+    raw_sub = str(config.get("raw_subdir") or "").strip()
+    raw_root = data_root / raw_sub if raw_sub and not Path(raw_sub).is_absolute() else (
+        Path(raw_sub) if raw_sub else data_root
+    )
+    return data_root, raw_root
+
+
+def load_grid(path: Path, layer: str) -> Dict[str, List[Any]]:
+    """
+    从 YAML/JSON 文件读取扫描网格。
+
+    文件可以是扁平映射（参数名 -> 列表），也可以按层分组（{"po": {...}, "vo": {...}}）。
+    """
+    text = Path(path).read_text(encoding="utf-8")
+    if Path(path).suffix.lower() == ".json" or yaml is None:
+        data = json.loads(text)
+    else:
+        try:
+            data = yaml.safe_load(text)
+        except yaml.YAMLError as exc:
+            raise ValueError(f"Sweep grid {path} is not valid YAML: {exc}") from exc
+    if not isinstance(data, dict):
+        raise ValueError(f"Sweep grid {path} must contain a mapping at top-level.")
+    if layer in data and isinstance(data[layer], dict):
+        data = data[layer]
+    elif any(k in data for k in SWEEP_PARAMS):
+        data = {}
+    return {str(k): v if isinstance(v, list) else [v] for k, v in data.items()}
+
+
+def parse_param_arg(spec: str) -> Tuple[str, List[Any]]:
+    """解析 CLI 的 --param name=v1,v2,...；每个值按 JSON 解析，失败则保留字符串。"""
+    if "=" not in spec:
+        raise ValueError(f"Invalid --param {spec!r}; expected name=v1,v2")
+    name, raw = spec.split("=", 1)
+    values: List[Any] = []
+    for token in raw.split(","):
+        token = token.strip()
+        if not token:
+            continue
+        try:
+            values.append(json.loads(token))
+        except ValueError:
+            values.append(token)
+    return name.strip(), values
+
+
+def expand_grid(grid: Mapping[str, Sequence[Any]], layer: str) -> List[Dict[str, Any]]:
+    """网格 -> 参数组列表（笛卡尔积，键顺序稳定）。未知参数名抛出 ValueError。"""
+    allowed = SWEEP_PARAMS[layer]
+    unknown = sorted(k for k in grid if k not in allowed)
+    if unknown:
+        raise ValueError(f"Unknown sweep parameter(s) for {layer}: {unknown}; allowed: {list(allowed)}")
+    keys = [k for k in allowed if k in grid and list(grid[k])]
+    if not keys:
+        return [{}]
+    return [dict(zip(keys, combo)) for combo in itertools.product(*(list(grid[k]) for k in keys))]
+
+
+def baseline_params(config: Mapping[str, Any], layer: str) -> Dict[str, Any]:
+    """当前配置对应的基线参数（weights 为 None 表示使用立方体的基础年权重）。"""
+    layer_cfg: Dict[str, Any] = dict(config.get(layer) or {})
+    thresholds: Dict[str, Any] = dict(layer_cfg.get("thresholds") or {})
+    outliers: Dict[str, Any] = dict(layer_cfg.get("outliers") or {})
+    params: Dict[str, Any] = {
+        "weights": None,
+        "clip_percentiles": outliers.get("clip_percentiles"),
+        "window": None,
+    }
+    if layer == "po":
+        missing_cfg: Dict[str, Any] = dict(layer_cfg.get("missing_values") or {})
+        params["min_pupils_total"] = int(thresholds.get("min_pupils_total") or config_mod.MIN_PUPILS_TOTAL)
+        params["woz_strategy"] = str(missing_cfg.get("woz_strategy") or "nearest_year")
+    else:
+        params["min_havo_vwo_total"] = int(thresholds.get("min_havo_vwo_total") or 20)
+    return params
+
+
+def _build_cube_factory(config: Mapping[str, Any], layer: str):
+    """加载原始数据一次，返回 woz_strategy -> YearCube 的缓存构造函数；无输入时返回 None。"""
+    _, raw_root = _raw_root(config)
+    layer_cfg: Dict[str, Any] = dict(config.get(layer) or {})
+    input_cfg: Dict[str, Any] = dict(layer_cfg.get("input") or {})
+    cubes: Dict[str, YearCube] = {}
+
+    if layer == "po":
+        woz_rel = input_cfg.get("cbs_woz_csv") or "cbs_woz_per_postcode_year.csv"
+        woz, woz_years = cbs_loader.load_woz_pc4_year(str(raw_root / woz_rel))
+        schools = duo_loader.load_schooladviezen_po(str(raw_root))
+        if not schools:
+            return None
+
+        def get_po(woz_strategy: str) -> YearCube:
+            if woz_strategy not in cubes:
+                cubes[woz_strategy] = build_po_year_cube(schools, woz, woz_years, woz_strategy=woz_strategy)
+            return cubes[woz_strategy]
+
+        return get_po
+
+    weights_cfg: Dict[str, Any] = dict(layer_cfg.get("weights") or {})
+    year_cols: List[Any] = list(weights_cfg.get("year_cols") or [])
+    brin_to_postcode = vo_loader.load_vestigingen_postcode(
+        str(raw_root), input_cfg.get("duo_vestigingen_vo_csv") or "duo_vestigingen_vo.csv"
+    )
+    schools = vo_loader.load_exam_schools(
+        str(raw_root),
+        input_cfg.get("exams_all_csv") or "duo_examen_raw_all.csv",
+        input_cfg.get("exams_small_csv") or "duo_examen_raw.csv",
+        year_cols,
+    )
+    if not schools:
+        return None
+
+    def get_vo(_woz_strategy: str) -> YearCube:
+        if "" not in cubes:
+            cubes[""] = build_vo_year_cube(schools, brin_to_postcode, year_cols)
+        return cubes[""]
+
+    return get_vo
+
+
+def _distribution(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"mean": 0.0, "min": 0.0, "p10": 0.0, "p50": 0.0, "p90": 0.0, "max": 0.0}
+    return {
+        "mean": round(sum(values) / len(values), 4),
+        "min": min(values),
+        "p10": round(_compute_percentile(values, 10), 4),
+        "p50": round(_compute_percentile(values, 50), 4),
+        "p90": round(_compute_percentile(values, 90), 4),
+        "max": max(values),
+    }
+
+
+def _ranks(brins: List[str], values: List[float]) -> Dict[str, int]:
+    """按数值降序排名（1 为最高），同值按 BRIN 排序以保证稳定。"""
+    order = sorted(range(len(brins)), key=lambda k: (-values[k], brins[k]))
+    return {brins[k]: pos + 1 for pos, k in enumerate(order)}
+
+
+def _evaluate(
+    get_cube,
+    params: Mapping[str, Any],
+    layer: str,
+) -> Tuple[List[str], List[float], List[float], int]:
+    """在（按 woz_strategy 缓存的）立方体上评估一组参数，返回 (brins, xs, ys, n_excluded)。"""
+    cube = get_cube(str(params.get("woz_strategy") or ""))
+    window = params.get("window")
+    weights = params.get("weights")
+    if weights is not None and len(weights) != len(cube.years):
+        raise ValueError(f"weights must have {len(cube.years)} entries (one per {cube.years}), got {weights!r}")
+    clip = params.get("clip_percentiles")
+    kwargs: Dict[str, Any] = {"outliers": {"clip_percentiles": clip} if clip else None}
+    if layer == "po":
+        kwargs["min_pupils_total"] = int(params["min_pupils_total"])
+    else:
+        kwargs["min_havo_vwo_total"] = int(params["min_havo_vwo_total"])
+    return query_xy_values(
+        cube,
+        parse_window(str(window)) if window else None,
+        [float(w) for w in weights] if weights is not None else None,
+        **kwargs,
+    )
+
+
+def _summarize(
+    evaluated: Tuple[List[str], List[float], List[float], int],
+    base: Optional[Dict[str, Any]],
+    names: Mapping[str, Any],
+    top_n: int,
+) -> Dict[str, Any]:
+    brin_list, xs, ys, n_excluded = evaluated
+    summary: Dict[str, Any] = {
+        "n_schools": len(brin_list),
+        "n_excluded": n_excluded,
+        "x": _distribution(xs),
+        "y": _distribution(ys),
+    }
+    if base is None:
+        return summary
+
+    summary["shift"] = {
+        f"{axis}_{stat}": round(summary[axis][stat] - base["summary"][axis][stat], 4)
+        for axis in ("x", "y")
+        for stat in ("mean", "p10", "p50", "p90")
+    }
+    brins = set(brin_list)
+    summary["n_added"] = len(brins - base["brins"])
+    summary["n_removed"] = len(base["brins"] - brins)
+
+    x_rank = _ranks(brin_list, xs)
+    y_rank = _ranks(brin_list, ys)
+    changes: List[Tuple[int, int, str]] = []
+    for brin in sorted(brins & base["brins"]):
+        changes.append((x_rank[brin] - base["x_rank"][brin], y_rank[brin] - base["y_rank"][brin], brin))
+    n_common = len(changes)
+    summary["rank_change"] = {
+        "n_common": n_common,
+        "x_mean_abs": round(sum(abs(c[0]) for c in changes) / n_common, 4) if n_common else 0.0,
+        "x_max_abs": max((abs(c[0]) for c in changes), default=0),
+        "y_mean_abs": round(sum(abs(c[1]) for c in changes) / n_common, 4) if n_common else 0.0,
+        "y_max_abs": max((abs(c[1]) for c in changes), default=0),
+        "top": [
+            {"BRIN": brin, "naam": names.get(brin), "x_rank_change": dx, "y_rank_change": dy}
+            for dx, dy, brin in heapq.nsmallest(top_n, changes, key=lambda c: (-(abs(c[0]) + abs(c[1])), c[2]))
+            if dx or dy
+        ],
+    }
+    return summary
+
+
+def run_sweep(
+    config: Optional[Dict[str, Any]],
+    layer: str,
+    grid: Mapping[str, Sequence[Any]],
+) -> Tuple[Optional[Path], Dict[str, Any]]:
+    """
+    对 layer 执行参数扫描并写出 JSON 结果。
+
+    返回 (output_path, result)；原始输入缺失时 output_path 为 None，result["status"] 为 "error"。
+    """
+    if config is None:
+        config = config_mod.build_effective_config()
+    sweep_cfg: Dict[str, Any] = dict(config.get("sweep") or {})
+    top_n = int(sweep_cfg.get("top_rank_changes") or 0)
+
+    started = time.perf_counter()
+    param_sets = expand_grid(grid, layer)
+    base_params = baseline_params(config, layer)
+
+    get_cube = _build_cube_factory(config, layer)
+    if get_cube is None:
+        return None, {"layer": layer, "status": "error", "errors": [f"No {layer.upper()} input data found"]}
+    load_seconds = time.perf_counter() - started
+
+    base_eval = _evaluate(get_cube, base_params, layer)
+    base_cube = get_cube(str(base_params.get("woz_strategy") or ""))
+    names = {brin: info.get("naam") for brin, info in zip(base_cube.brins, base_cube.info)}
+    baseline = {
+        "params": base_params,
+        "summary": _summarize(base_eval, None, names, top_n),
+        "brins": set(base_eval[0]),
+        "x_rank": _ranks(base_eval[0], base_eval[1]),
+        "y_rank": _ranks(base_eval[0], base_eval[2]),
+    }
+
+    results: List[Dict[str, Any]] = []
+    for overrides in param_sets:
+        params = dict(base_params)
+        params.update(overrides)
+        results.append({"params": params, **_summarize(_evaluate(get_cube, params, layer), baseline, names, top_n)})
+
+    data_root, _ = _raw_root(config)
+    out_rel = str(sweep_cfg.get("output") or "generated/sweep_{layer}.json").format(layer=layer)
+    out_path = Path(out_rel) if Path(out_rel).is_absolute() else data_root / out_rel
+    result = {
+        "layer": layer,
+        "status": "ok",
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "n_param_sets": len(results),
+        "load_seconds": round(load_seconds, 3),
+        "duration_seconds": round(time.perf_counter() - started, 3),
+        "grid": {k: list(v) for k, v in grid.items()},
+        "baseline": {"params": baseline["params"], **baseline["summary"]},
+        "results": results,
+    }
+    json_exporter.write_meta_json(result, out_path)
+    return out_path, result
+
+
+__all__ = [
+    "SWEEP_PARAMS",
+    "load_grid",
+    "parse_param_arg",
+    "expand_grid",
+    "baseline_params",
+    "run_sweep",
+]
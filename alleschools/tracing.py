@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+"""
+轻量 span 追踪：写出 Chrome trace-event JSON（chrome://tracing、Perfetto UI、speedscope 可直接打开）。
+
+用法：
+
+    tracing.start()
+    with tracing.span("fetch.vo", cat="fetch", url=url):
+        ...
+    tracing.counter("bytes_downloaded", total=n)
+    tracing.stop(Path("generated/trace.json"))
+
+    @tracing.traced(cat="loader")
+    def load_exam_schools(...): ...
+
+- span 以完整事件（ph="X"）记录，pid / tid 取自当前进程与线程，查看器按时间区间自动嵌套；
+  每个出现过的线程另写一条 thread_name 元数据事件，线程池中的并行任务因此各占一行；
+- counter 以 ph="C" 记录，args 中每个键为一条曲线（如 rows_processed 的 po / vo）；
+- 时间戳为「启动时的墙钟 + perf_counter 增量」（微秒），进程内单调，不同进程各自写出的事件可直接拼接到同一文件；
+- 未调用 start() 时 span() 返回共享的空上下文、traced 包装函数只多一次全局判断，不记录任何事件。
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+
+DEFAULT_TRACE_PATH = "generated/trace.json"
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class Span:
+    """进行中的 span；args 可在退出前补充（如行数），随事件一同写出。"""
+
+    __slots__ = ("_tracer", "name", "cat", "args", "_t0")
+
+    def __init__(self, tracer: "Tracer", name: str, cat: str, args: Dict[str, Any]) -> None:
+        self._tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self._t0 = 0
+
+    def __enter__(self) -> "Span":
+        self._t0 = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        t1 = time.perf_counter_ns()
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self._tracer._complete(self, self._t0, t1)
+
+
+class _NullSpan:
+    """追踪关闭时的 span：不计时、不记录。"""
+
+    __slots__ = ()
+
+    @property
+    def args(self) -> Dict[str, Any]:
+        return {}
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        return None
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """收集一次运行的 trace 事件；线程安全（事件追加在锁内完成）。"""
+
+    def __init__(self) -> None:
+        self.pid = os.getpid()
+        self._epoch_us = time.time_ns() // 1000
+        self._pc0 = time.perf_counter_ns()
+        self._lock = threading.Lock()
+        self._events: List[Dict[str, Any]] = []
+        self._threads: Dict[int, str] = {}
+        self._counters: Dict[str, Dict[str, float]] = {}
+
+    def _ts(self, pc_ns: int) -> float:
+        return self._epoch_us + (pc_ns - self._pc0) / 1000.0
+
+    def _tid(self) -> int:
+        tid = threading.get_ident()
+        if tid not in self._threads:
+            with self._lock:
+                if tid not in self._threads:
+                    name = threading.current_thread().name
+                    self._threads[tid] = name
+                    self._events.append(
+                        {"ph": "M", "name": "thread_name", "pid": self.pid, "tid": tid, "args": {"name": name}}
+                    )
+        return tid
+
+    def _complete(self, span: Span, t0: int, t1: int) -> None:
+        event = {
+            "ph": "X",
+            "name": span.name,
+            "cat": span.cat,
+            "pid": self.pid,
+            "tid": self._tid(),
+            "ts": round(self._ts(t0), 3),
+            "dur": round((t1 - t0) / 1000.0, 3),
+        }
+        if span.args:
+            event["args"] = span.args
+        with self._lock:
+            self._events.append(event)
+
+    def counter(self, name: str, *, cumulative: bool = False, **values: float) -> None:
+        """记录计数器；cumulative=True 时把 values 累加到该计数器此前的值上。"""
+        tid = self._tid()
+        ts = round(self._ts(time.perf_counter_ns()), 3)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            for key, v in values.items():
+                series[key] = series.get(key, 0) + v if cumulative else v
+            self._events.append(
+                {"ph": "C", "name": name, "pid": self.pid, "tid": tid, "ts": ts, "args": dict(series)}
+            )
+
+    def events(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            meta = {"ph": "M", "name": "process_name", "pid": self.pid, "tid": 0, "args": {"name": "alleschools"}}
+            return [meta] + list(self._events)
+
+    def write(self, path: Path) -> Path:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        doc = {"traceEvents": self.events(), "displayTimeUnit": "ms"}
+        with path.open("w", encoding="utf-8") as f:
+            json.dump(doc, f, ensure_ascii=False, separators=(",", ":"))
+        return path
+
+
+_tracer: Optional[Tracer] = None
+
+
+def start() -> Tracer:
+    """开启进程级追踪（已开启时返回现有 Tracer）。"""
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer()
+    return _tracer
+
+
+def stop(path: Optional[Path] = None) -> Optional[Path]:
+    """结束追踪；给出 path 时写出 trace JSON 并返回该路径。"""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer is None or path is None:
+        return None
+    return tracer.write(path)
+
+
+def is_enabled() -> bool:
+    return _tracer is not None
+
+
+def span(name: str, cat: str = "", **args: Any) -> Any:
+    """with tracing.span(...) as sp：追踪关闭时返回空上下文。"""
+    tracer = _tracer
+    if tracer is None:
+        return _NULL_SPAN
+    return Span(tracer, name, cat, args)
+
+
+def counter(name: str, *, cumulative: bool = False, **values: float) -> None:
+    tracer = _tracer
+    if tracer is not None:
+        tracer.counter(name, cumulative=cumulative, **values)
+
+
+def traced(name: Optional[str] = None, cat: str = "") -> Callable[[F], F]:
+    """装饰器：每次调用包一层 span，名称缺省为 "<模块末段>.<函数名>"。"""
+
+    def decorate(func: F) -> F:
+        span_name = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+        @functools.wraps(func)
+        def wrapper(*a: Any, **kw: Any) -> Any:
+            tracer = _tracer
+            if tracer is None:
+                return func(*a, **kw)
+            with Span(tracer, span_name, cat, {}):
+                return func(*a, **kw)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorate
+
+
+__all__ = [
+    "DEFAULT_TRACE_PATH",
+    "Span",
+    "Tracer",
+    "counter",
+    "is_enabled",
+    "span",
+    "start",
+    "stop",
+    "traced",
+]
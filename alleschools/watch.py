@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+"""
+alleschools watch：常驻进程，轮询原始数据与 config.yaml 的 mtime，变化时只重建受影响的层。
+
+- 轮询对象：各层 pipeline.layer_inputs() 列出的原始输入文件 + 生效配置的 config_path；
+- 原始文件变化 → 重建读取该文件的层；config 变化 → 重新构造生效配置，比较各层读取的配置
+  （顶层共享键 + 本层小节，另一层的小节不算），只重建有差异的层；
+- 流水线在 stage_cache.keep_in_memory() 内运行：解析好的原始数据与中间结果留在进程内，
+  每次只重算指纹变化的阶段；字节未变的产物保留原 mtime，每轮只报告内容真正变化的文件；
+- 有产物变化时，可向 view_xy_server（--pid-file 写出的 pid）发送 SIGHUP，使其重新加载数据。
+"""
+
+import os
+import signal
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Set, Tuple
+
+from alleschools import stage_cache
+from alleschools.pipeline import layer_inputs, run_po_pipeline, run_vo_pipeline
+
+LAYERS: Tuple[str, ...] = ("po", "vo")
+DEFAULT_INTERVAL = 1.0
+
+Runner = Callable[[Dict[str, Any]], Tuple[Path, Dict[str, Any]]]
+
+
+def _mtime(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def layer_config(config: Mapping[str, Any], layer: str) -> Dict[str, Any]:
+    """某一层实际读取的配置：去掉其他层的小节。"""
+    return {k: v for k, v in config.items() if k == layer or k not in LAYERS}
+
+
+def signal_server(pid_file: Path) -> bool:
+    """向 pid 文件中记录的 view_xy_server 发送 SIGHUP；进程不存在或平台不支持时返回 False。"""
+    if not hasattr(signal, "SIGHUP"):
+        return False
+    try:
+        pid = int(pid_file.read_text(encoding="utf-8").strip())
+        os.kill(pid, signal.SIGHUP)
+    except (OSError, ValueError):
+        return False
+    return True
+
+
+class Watcher:
+    """轮询并增量重建；load_config 每次 config 文件变化时被重新调用。"""
+
+    def __init__(
+        self,
+        load_config: Callable[[], Dict[str, Any]],
+        *,
+        layers: Sequence[str] = LAYERS,
+        interval: float = DEFAULT_INTERVAL,
+        pid_file: Optional[Path] = None,
+        runners: Optional[Mapping[str, Runner]] = None,
+        log: Callable[[str], None] = print,
+    ) -> None:
+        self.load_config = load_config
+        self.config = load_config()
+        self.layers = [layer for layer in LAYERS if layer in layers]
+        self.interval = float(interval)
+        self.pid_file = pid_file
+        self.runners: Dict[str, Runner] = dict(runners or {"po": run_po_pipeline, "vo": run_vo_pipeline})
+        self.log = log
+        self.memory: Dict[str, Dict[str, Any]] = {}
+        self.snapshot: Dict[Path, Optional[Tuple[int, int]]] = {}
+
+    def _config_path(self) -> Optional[Path]:
+        path = self.config.get("config_path")
+        return Path(path) if path else None
+
+    def _watched(self) -> Dict[Path, Set[str]]:
+        """轮询的文件 -> 读取它的层（config 文件映射到全部层，由配置比较进一步筛选）。"""
+        watched: Dict[Path, Set[str]] = {}
+        for layer in self.layers:
+            for path in layer_inputs(self.config, layer):
+                watched.setdefault(path, set()).add(layer)
+        config_path = self._config_path()
+        if config_path is not None:
+            watched.setdefault(config_path, set()).update(self.layers)
+        return watched
+
+    def _scan(self) -> Dict[Path, Optional[Tuple[int, int]]]:
+        return {path: _mtime(path) for path in self._watched()}
+
+    def changes(self) -> Tuple[List[Path], List[str]]:
+        """比较当前 mtime 与上次快照，返回 (变化的文件, 需要重建的层)，并更新快照。"""
+        watched = self._watched()
+        current = {path: _mtime(path) for path in watched}
+        changed = sorted(p for p, state in current.items() if self.snapshot.get(p, state) != state)
+        self.snapshot = current
+        layers: Set[str] = set()
+        config_path = self._config_path()
+        for path in changed:
+            if path == config_path:
+                layers.update(self._reload_config())
+            else:
+                layers.update(watched.get(path, ()))
+        if layers:
+            # config 变化可能改了输入文件名：按新配置重新建立快照
+            self.snapshot = self._scan()
+        return changed, [layer for layer in self.layers if layer in layers]
+
+    def _reload_config(self) -> List[str]:
+        try:
+            new_config = self.load_config()
+        except Exception as e:  # 编辑中途的 YAML 可能暂时无效：保留旧配置，等待下一次保存
+            self.log(f"[watch] 配置无效，保留上一版: {e}")
+            return []
+        affected = [
+            layer
+            for layer in self.layers
+            if layer_config(new_config, layer) != layer_config(self.config, layer)
+        ]
+        self.config = new_config
+        return affected
+
+    def build(self, layers: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        """在进程内存缓存中重建给定层；单层失败只记日志，不中断 watch。"""
+        results: Dict[str, Dict[str, Any]] = {}
+        with stage_cache.keep_in_memory(self.memory):
+            for layer in layers:
+                t0 = time.perf_counter()
+                try:
+                    _, stats = self.runners[layer](self.config)
+                except Exception as e:
+                    self.log(f"[watch] {layer}: 重建失败: {type(e).__name__}: {e}")
+                    continue
+                memo = stats.get("stage_cache") or {}
+                results[layer] = {
+                    "seconds": round(time.perf_counter() - t0, 3),
+                    "status": stats.get("summary_status"),
+                    "recomputed": list(memo.get("misses") or []),
+                    "changed": list(memo.get("changed") or []),
+                }
+                changed = results[layer]["changed"]
+                self.log(
+                    f"[watch] {layer}: {results[layer]['seconds']:.2f}s，重算 {len(results[layer]['recomputed'])} 个阶段，"
+                    f"{len(changed)} 个产物变化" + (f": {', '.join(changed)}" if changed else "")
+                )
+        return results
+
+    def poll(self) -> Optional[Dict[str, Dict[str, Any]]]:
+        """检查一次变化；有受影响的层时重建并（如有产物变化）通知 view_xy_server。"""
+        changed, layers = self.changes()
+        if not layers:
+            return None
+        self.log(f"[watch] 变化: {', '.join(str(p) for p in changed)} → 重建 {', '.join(layers)}")
+        results = self.build(layers)
+        if self.pid_file is not None and any(r["changed"] for r in results.values()):
+            if signal_server(self.pid_file):
+                self.log(f"[watch] 已通知 view_xy_server 重新加载（{self.pid_file}）")
+        return results
+
+    def run(self, max_cycles: Optional[int] = None) -> None:
+        """先完整构建一次（预热内存缓存），之后每 interval 秒轮询；Ctrl-C 退出。"""
+        self.snapshot = self._scan()
+        self.build(self.layers)
+        self.log(f"[watch] 监视 {len(self.snapshot)} 个文件，每 {self.interval:g}s 轮询（Ctrl-C 退出）")
+        cycles = 0
+        try:
+            while max_cycles is None or cycles < max_cycles:
+                time.sleep(self.interval)
+                self.poll()
+                cycles += 1
+        except KeyboardInterrupt:
+            pass
+
+
+__all__ = [
+    "DEFAULT_INTERVAL",
+    "LAYERS",
+    "Watcher",
+    "layer_config",
+    "signal_server",
+]
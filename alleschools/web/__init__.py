@@ -0,0 +1,29 @@
+"""
+前端服务辅助：内存资源缓存（gzip / 强 ETag / Range）、多线程生产模式 HTTP 服务，
+/api/points 的服务端点位索引，HTML 模板编译（流式注入数据），以及内容哈希的静态站点构建。
+"""
+
+from .cache import AssetCache, CachedAsset, accepts_gzip, etag_matches, make_asset, parse_range
+from .points_index import PointIndex, PointsApi, build_point_indexes
+from .server import make_handler, make_server
+from .static_build import build_hashed_site, update_vercel_config, vercel_headers
+from .template import CompiledTemplate, compile_template
+
+__all__ = [
+    "AssetCache",
+    "CachedAsset",
+    "accepts_gzip",
+    "etag_matches",
+    "make_asset",
+    "parse_range",
+    "PointIndex",
+    "PointsApi",
+    "build_point_indexes",
+    "CompiledTemplate",
+    "compile_template",
+    "build_hashed_site",
+    "update_vercel_config",
+    "vercel_headers",
+    "make_handler",
+    "make_server",
+]
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+"""
+内存资源缓存：为前端 HTML 与生成的数据文件预先计算 gzip 字节与强 ETag。
+
+- AssetCache.put(name, body, content_type)：登记注入后的 HTML 等内存内容；
+- AssetCache.get_file(path)：按 (mtime, size) 缓存磁盘文件，文件变化后自动重新加载；
+- parse_range / etag_matches / accepts_gzip：HTTP 条件请求与范围请求的纯函数，便于单测。
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+from dataclasses import dataclass
+from email.utils import formatdate
+from typing import Dict, Optional, Tuple
+
+# 小于该字节数的内容不压缩（gzip 头部开销不划算）
+GZIP_MIN_SIZE = 1024
+
+_COMPRESSIBLE_PREFIXES = ("text/", "application/json", "application/javascript", "application/geo+json")
+
+
+@dataclass(frozen=True)
+class CachedAsset:
+    """单个可服务资源：原始字节、可选 gzip 字节、强 ETag 与响应头所需元数据。"""
+
+    body: bytes
+    gzip_body: Optional[bytes]
+    etag: str
+    content_type: str
+    last_modified: str
+    mtime_ns: int = 0
+
+    @property
+    def size(self) -> int:
+        return len(self.body)
+
+    @property
+    def gzip_etag(self) -> str:
+        """gzip 表示的强 ETag：与原始字节的 ETag 区分（不同表示不得共用强校验器）。"""
+        return self.etag[:-1] + '-gz"'
+
+
+def _is_compressible(content_type: str) -> bool:
+    return content_type.startswith(_COMPRESSIBLE_PREFIXES)
+
+
+def make_asset(body: bytes, content_type: str, mtime: Optional[float] = None, mtime_ns: int = 0) -> CachedAsset:
+    """由原始字节构造 CachedAsset：ETag 取内容 SHA-256 前 32 位十六进制（强校验器）。"""
+    etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+    gz: Optional[bytes] = None
+    if len(body) >= GZIP_MIN_SIZE and _is_compressible(content_type):
+        # mtime=0 使相同内容的 gzip 字节稳定
+        compressed = gzip.compress(body, compresslevel=6, mtime=0)
+        if len(compressed) < len(body):
+            gz = compressed
+    return CachedAsset(
+        body=body,
+        gzip_body=gz,
+        etag=etag,
+        content_type=content_type,
+        last_modified=formatdate(mtime, usegmt=True),
+        mtime_ns=mtime_ns,
+    )
+
+
+def guess_content_type(path: str) -> str:
+    ctype, _ = mimetypes.guess_type(path)
+    if path.endswith(".json"):
+        ctype = "application/json"
+    ctype = ctype or "application/octet-stream"
+    if ctype.startswith("text/") or ctype in ("application/json", "application/javascript"):
+        ctype += "; charset=utf-8"
+    return ctype
+
+
+class AssetCache:
+    """线程安全的资源缓存（ThreadingHTTPServer 下多个请求线程共享）。"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._named: Dict[str, CachedAsset] = {}
+        self._files: Dict[str, CachedAsset] = {}
+
+    def put(self, name: str, body: bytes, content_type: str) -> CachedAsset:
+        asset = make_asset(body, content_type)
+        with self._lock:
+            self._named[name] = asset
+        return asset
+
+    def get(self, name: str) -> Optional[CachedAsset]:
+        with self._lock:
+            return self._named.get(name)
+
+    def get_file(self, path: str) -> Optional[CachedAsset]:
+        """读取并缓存磁盘文件；文件不存在返回 None，mtime/size 变化时重新加载。"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        key = os.path.abspath(path)
+        with self._lock:
+            cached = self._files.get(key)
+        if cached is not None and cached.mtime_ns == st.st_mtime_ns and cached.size == st.st_size:
+            return cached
+        with open(path, "rb") as f:
+            body = f.read()
+        asset = make_asset(body, guess_content_type(path), mtime=st.st_mtime, mtime_ns=st.st_mtime_ns)
+        with self._lock:
+            self._files[key] = asset
+        return asset
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 是否命中（支持 * 与逗号分隔列表；W/ 前缀按弱比较忽略）。"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """Accept-Encoding 中是否允许 gzip（q=0 视为拒绝）。"""
+    if not accept_encoding:
+        return False
+    for part in accept_encoding.split(","):
+        fields = [p.strip() for p in part.split(";")]
+        if fields[0].lower() not in ("gzip", "*"):
+            continue
+        q = 1.0
+        for param in fields[1:]:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        return q > 0
+    return False
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    解析单段 Range 头（bytes=start-end / start- / -suffix），返回闭区间 (start, end)。
+
+    无 Range 头、多段范围或格式不合法时返回 None（按完整响应处理）；
+    范围不可满足时抛出 ValueError（调用方返回 416）。
+    """
+    if not header or not header.startswith("bytes="):
+        return None
+    spec = header[len("bytes="):].strip()
+    if "," in spec or "-" not in spec:
+        return None
+    start_s, end_s = (part.strip() for part in spec.split("-", 1))
+    if (start_s and not start_s.isdigit()) or (end_s and not end_s.isdigit()) or not (start_s or end_s):
+        return None
+    if not start_s:
+        # 后缀范围：最后 N 个字节
+        suffix = int(end_s)
+        if suffix == 0 or size == 0:
+            raise ValueError("unsatisfiable range")
+        return max(size - suffix, 0), size - 1
+    start = int(start_s)
+    if end_s and int(end_s) < start:
+        return None  # 语法上无效（RFC 7233 §2.1），忽略 Range
+    if start >= size:
+        raise ValueError("unsatisfiable range")
+    end = int(end_s) if end_s else size - 1
+    return start, min(end, size - 1)
+
+
+__all__ = [
+    "GZIP_MIN_SIZE",
+    "CachedAsset",
+    "AssetCache",
+    "make_asset",
+    "guess_content_type",
+    "etag_matches",
+    "accepts_gzip",
+    "parse_range",
+]
@@ -0,0 +1,355 @@
+from __future__ import annotations
+
+"""
+服务端点位索引与 /api/points 查询：避免把全部 VO/PO/profiel 点内联到 HTML 后再在浏览器中过滤。
+
+PointIndex 在启动时对一层点位（view_xy_server.load_data_* 的输出形状）建立：
+    - gemeente → ids（大写键；过滤语义与 view_xy_logic.filterPointsByGemeenteText 一致：子串匹配，
+      只需扫描去重后的 gemeente 键而非全部点）；
+    - type → ids；
+    - 按 X、Y 排序的 id 序列（bisect 做 bbox 范围查询，取命中更少的一轴再校验另一轴）；
+    - 名称/BRIN/gemeente/postcode/首字母缩写的三元组（trigram）倒排，
+      q 的候选集由倒排求交得到，再用与 pointMatchesSearch 相同的谓词逐个确认。
+各过滤条件的候选集从最小的开始求交；排序复用预先计算的名次数组。
+"""
+
+import json
+import re
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
+from urllib.parse import parse_qs
+
+from alleschools.exporters.search_index_exporter import acronym_from_name
+
+from .cache import CachedAsset, make_asset
+
+DEFAULT_LIMIT = 1000
+MAX_LIMIT = 10000
+
+# sort 参数可用的键；前缀 "-" 表示降序
+SORT_KEYS: Sequence[str] = ("x", "y", "size", "naam", "brin", "gemeente")
+
+_WS = re.compile(r"\s")
+
+
+def parse_terms(raw: Optional[str]) -> List[str]:
+    """逗号分隔的搜索词 → 去空白、大写（与 view_xy_logic.parseSearchTerms 相同）。"""
+    s = (raw or "").strip()
+    if not s:
+        return []
+    return [t.strip().upper() for t in s.split(",") if t.strip()]
+
+
+def point_matches_search(point: Mapping[str, Any], terms: Sequence[str]) -> bool:
+    """与 view_xy_logic.pointMatchesSearch 相同的匹配谓词（名称取 naam）。"""
+    if not terms:
+        return True
+    naam = str(point.get("naam") or "").upper()
+    acr = acronym_from_name(point.get("naam") or "")
+    brin = str(point.get("BRIN") or "").upper()
+    gemeente = str(point.get("gemeente") or "").upper()
+    postcode = _WS.sub("", str(point.get("postcode") or "").upper())
+    for term in terms:
+        norm = _WS.sub("", term)
+        if term in naam or (acr and norm in acr) or term in brin or term in gemeente or norm in postcode:
+            return True
+    return False
+
+
+def _trigrams(s: str) -> Set[str]:
+    return {s[i : i + 3] for i in range(len(s) - 2)}
+
+
+def parse_bbox(raw: Optional[str]) -> Optional[Tuple[float, float, float, float]]:
+    """'x0,y0,x1,y1'（X/Y 空间）→ (xmin, ymin, xmax, ymax)；格式不合法时抛出 ValueError。"""
+    if not raw:
+        return None
+    parts = raw.split(",")
+    if len(parts) != 4:
+        raise ValueError("bbox must be x0,y0,x1,y1")
+    try:
+        x0, y0, x1, y1 = (float(p) for p in parts)
+    except ValueError:
+        raise ValueError("bbox must contain four numbers") from None
+    return min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1)
+
+
+class PointIndex:
+    """单层点位的内存索引；构建后只读，可被多个请求线程共享。"""
+
+    def __init__(
+        self,
+        points: Sequence[Mapping[str, Any]],
+        *,
+        x_key: str = "X_linear",
+        y_key: str = "Y_linear",
+        size_key: str = "size",
+    ) -> None:
+        self.points = list(points)
+        n = len(self.points)
+        self._xs = [float(p.get(x_key) or 0.0) for p in self.points]
+        self._ys = [float(p.get(y_key) or 0.0) for p in self.points]
+        self._sizes = [float(p.get(size_key) or 0.0) for p in self.points]
+
+        self.by_gemeente: Dict[str, List[int]] = {}
+        self.by_type: Dict[str, List[int]] = {}
+        self._postings: Dict[str, List[int]] = {}
+        for i, p in enumerate(self.points):
+            gemeente = str(p.get("gemeente") or "").upper()
+            self.by_gemeente.setdefault(gemeente, []).append(i)
+            self.by_type.setdefault(str(p.get("type") or ""), []).append(i)
+            grams: Set[str] = set()
+            for field in (
+                str(p.get("naam") or "").upper(),
+                acronym_from_name(p.get("naam") or ""),
+                str(p.get("BRIN") or "").upper(),
+                gemeente,
+                _WS.sub("", str(p.get("postcode") or "").upper()),
+            ):
+                grams |= _trigrams(field)
+            for g in grams:
+                self._postings.setdefault(g, []).append(i)
+
+        self._x_order = sorted(range(n), key=self._xs.__getitem__)
+        self._x_sorted = [self._xs[i] for i in self._x_order]
+        self._y_order = sorted(range(n), key=self._ys.__getitem__)
+        self._y_sorted = [self._ys[i] for i in self._y_order]
+        self._ranks: Dict[str, List[int]] = {}
+        self._rank_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    # --- 单条件候选集 -------------------------------------------------------
+
+    def ids_for_gemeente(self, parts: Sequence[str]) -> Set[int]:
+        """gemeente 名称包含任一 part（已大写）的点。"""
+        out: Set[int] = set()
+        for name, ids in self.by_gemeente.items():
+            if name and any(q in name for q in parts):
+                out.update(ids)
+        return out
+
+    def ids_for_types(self, types: Sequence[str]) -> Set[int]:
+        out: Set[int] = set()
+        for t in types:
+            out.update(self.by_type.get(t, ()))
+        return out
+
+    def ids_in_bbox(self, bbox: Tuple[float, float, float, float]) -> Set[int]:
+        xmin, ymin, xmax, ymax = bbox
+        xa, xb = bisect_left(self._x_sorted, xmin), bisect_right(self._x_sorted, xmax)
+        ya, yb = bisect_left(self._y_sorted, ymin), bisect_right(self._y_sorted, ymax)
+        # 取命中更少的一轴作为候选，再校验另一轴
+        if xb - xa <= yb - ya:
+            return {i for i in self._x_order[xa:xb] if ymin <= self._ys[i] <= ymax}
+        return {i for i in self._y_order[ya:yb] if xmin <= self._xs[i] <= xmax}
+
+    def _term_candidates(self, term: str) -> Optional[Set[int]]:
+        """单个搜索词的三元组候选集（超集）；词过短无法使用倒排时返回 None（需全量校验）。"""
+        out: Set[int] = set()
+        for variant in {term, _WS.sub("", term)}:
+            grams = _trigrams(variant)
+            if not grams:
+                return None
+            lists = sorted((self._postings.get(g, []) for g in grams), key=len)
+            hit = set(lists[0])
+            for lst in lists[1:]:
+                if not hit:
+                    break
+                hit.intersection_update(lst)
+            out |= hit
+        return out
+
+    def ids_for_search(self, terms: Sequence[str], within: Optional[Set[int]] = None) -> Set[int]:
+        candidates: Set[int] = set()
+        for term in terms:
+            hit = self._term_candidates(term)
+            if hit is None:
+                candidates = set(range(len(self.points)))
+                break
+            candidates |= hit
+        if within is not None:
+            candidates &= within
+        return {i for i in candidates if point_matches_search(self.points[i], terms)}
+
+    # --- 排序 ---------------------------------------------------------------
+
+    def _rank(self, key: str) -> List[int]:
+        """key 的名次数组（rank[id]），首次使用时计算并缓存。"""
+        with self._rank_lock:
+            rank = self._ranks.get(key)
+            if rank is not None:
+                return rank
+            if key == "x":
+                order = self._x_order
+            elif key == "y":
+                order = self._y_order
+            elif key == "size":
+                order = sorted(range(len(self.points)), key=self._sizes.__getitem__)
+            else:
+                field = {"naam": "naam", "brin": "BRIN", "gemeente": "gemeente"}[key]
+                order = sorted(range(len(self.points)), key=lambda i: str(self.points[i].get(field) or "").upper())
+            rank = [0] * len(self.points)
+            for r, i in enumerate(order):
+                rank[i] = r
+            self._ranks[key] = rank
+            return rank
+
+    # --- 组合查询 -----------------------------------------------------------
+
+    def query(
+        self,
+        *,
+        gemeente: Sequence[str] = (),
+        types: Sequence[str] = (),
+        terms: Sequence[str] = (),
+        bbox: Optional[Tuple[float, float, float, float]] = None,
+        sort: Optional[str] = None,
+        limit: int = DEFAULT_LIMIT,
+        offset: int = 0,
+    ) -> Tuple[int, List[Dict[str, Any]]]:
+        """
+        组合过滤 + 排序 + 分页，返回 (命中总数, 当前页点位)。
+
+        各条件之间为 AND；gemeente / types / terms 内部为 OR。sort 为 SORT_KEYS 之一，
+        可加 "-" 前缀表示降序；未指定时保持原始顺序（与内联数据一致）。
+        """
+        sets: List[Set[int]] = []
+        if gemeente:
+            sets.append(self.ids_for_gemeente(gemeente))
+        if types:
+            sets.append(self.ids_for_types(types))
+        if bbox is not None:
+            sets.append(self.ids_in_bbox(bbox))
+        sets.sort(key=len)
+        selected: Optional[Set[int]] = None
+        for s in sets:
+            selected = set(s) if selected is None else selected & s
+            if not selected:
+                break
+        if terms and (selected is None or selected):
+            selected = self.ids_for_search(terms, within=selected)
+
+        if sort:
+            desc = sort.startswith("-")
+            key = sort.lstrip("-")
+            if key not in SORT_KEYS:
+                raise ValueError(f"Unknown sort key {key!r}; expected one of {list(SORT_KEYS)}")
+            rank = self._rank(key)
+            ids = sorted(selected if selected is not None else range(len(self.points)), key=rank.__getitem__)
+            if desc:
+                ids.reverse()
+        else:
+            ids = sorted(selected) if selected is not None else list(range(len(self.points)))
+
+        page = ids[offset : offset + limit] if limit > 0 else []
+        return len(ids), [dict(self.points[i]) for i in page]
+
+
+def _first(params: Mapping[str, List[str]], name: str) -> Optional[str]:
+    values = params.get(name)
+    return values[-1] if values else None
+
+
+def _int_param(params: Mapping[str, List[str]], name: str, default: int, lo: int, hi: int) -> int:
+    raw = _first(params, name)
+    if raw is None or raw == "":
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer") from None
+    return max(lo, min(hi, value))
+
+
+class PointsApi:
+    """
+    /api/points 路由：按 layer 选择 PointIndex，解析查询参数并返回 JSON 资源。
+
+    参数：layer（必填）, gemeente, type, q（逗号分隔，与前端搜索框相同）, bbox（x0,y0,x1,y1）,
+    sort, limit（默认 DEFAULT_LIMIT，上限 MAX_LIMIT）, offset。
+    响应：{"layer", "total", "offset", "limit", "points": [...]}；参数错误返回 400 与 {"error": ...}。
+    相同查询的响应缓存在小型 LRU 中（含预压缩的 gzip 与 ETag）。
+    """
+
+    def __init__(self, indexes: Mapping[str, PointIndex], cache_size: int = 256) -> None:
+        self.indexes = dict(indexes)
+        self._cache: "OrderedDict[Tuple[Any, ...], CachedAsset]" = OrderedDict()
+        self._cache_size = int(cache_size)
+        self._lock = threading.Lock()
+
+    def __call__(self, request: Any, query_string: str) -> Tuple[int, Optional[CachedAsset]]:
+        try:
+            key = self._normalize(query_string)
+        except ValueError as e:
+            return 400, _json_asset({"error": str(e)})
+        with self._lock:
+            asset = self._cache.get(key)
+            if asset is not None:
+                self._cache.move_to_end(key)
+                return 200, asset
+        layer, gemeente, types, terms, bbox, sort, limit, offset = key
+        try:
+            total, points = self.indexes[layer].query(
+                gemeente=gemeente, types=types, terms=terms, bbox=bbox, sort=sort, limit=limit, offset=offset
+            )
+        except ValueError as e:
+            return 400, _json_asset({"error": str(e)})
+        asset = _json_asset({"layer": layer, "total": total, "offset": offset, "limit": limit, "points": points})
+        with self._lock:
+            self._cache[key] = asset
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return 200, asset
+
+    def _normalize(self, query_string: str) -> Tuple[Any, ...]:
+        params = parse_qs(query_string, keep_blank_values=False)
+        layer = _first(params, "layer")
+        if layer not in self.indexes:
+            raise ValueError(f"layer must be one of {sorted(self.indexes)}")
+        gemeente = tuple(sorted(set(parse_terms(",".join(params.get("gemeente", []))))))
+        types = tuple(sorted({t.strip() for v in params.get("type", []) for t in v.split(",") if t.strip()}))
+        terms = tuple(parse_terms(",".join(params.get("q", []))))
+        bbox = parse_bbox(_first(params, "bbox"))
+        sort = _first(params, "sort") or None
+        if sort and sort.lstrip("-") not in SORT_KEYS:
+            raise ValueError(f"sort must be one of {list(SORT_KEYS)} (optionally prefixed with '-')")
+        limit = _int_param(params, "limit", DEFAULT_LIMIT, 0, MAX_LIMIT)
+        offset = _int_param(params, "offset", 0, 0, 2**31)
+        return layer, gemeente, types, terms, bbox, sort, limit, offset
+
+
+def _json_asset(payload: Any) -> CachedAsset:
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return make_asset(body, "application/json; charset=utf-8")
+
+
+def build_point_indexes(
+    layers: Mapping[str, Iterable[Mapping[str, Any]]],
+    *,
+    axis_keys: Optional[Mapping[str, Tuple[str, str, str]]] = None,
+) -> Dict[str, PointIndex]:
+    """按层构建索引；axis_keys 可为个别层指定 (x_key, y_key, size_key)（例如 profiel 点）。"""
+    axis_keys = axis_keys or {}
+    out: Dict[str, PointIndex] = {}
+    for name, points in layers.items():
+        x_key, y_key, size_key = axis_keys.get(name, ("X_linear", "Y_linear", "size"))
+        out[name] = PointIndex(list(points), x_key=x_key, y_key=y_key, size_key=size_key)
+    return out
+
+
+__all__ = [
+    "DEFAULT_LIMIT",
+    "MAX_LIMIT",
+    "SORT_KEYS",
+    "PointIndex",
+    "PointsApi",
+    "acronym_from_name",
+    "build_point_indexes",
+    "parse_bbox",
+    "parse_terms",
+    "point_matches_search",
+]
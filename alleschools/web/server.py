@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+"""
+生产模式 HTTP 服务：ThreadingHTTPServer + 内存资源缓存。
+
+与开发模式（SimpleHTTPRequestHandler）相比：
+- 每个请求独立线程，慢客户端不再阻塞其他人；
+- 注入后的 HTML 与生成的数据文件常驻内存，并预先压缩为 gzip；
+- 强 ETag + If-None-Match → 304；
+- 单段 Range 请求（206 / 416），便于大 JSON 断点续传与分段读取。
+"""
+
+import os
+import posixpath
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional, Tuple, Type
+from urllib.parse import unquote, urlsplit
+
+from .cache import AssetCache, CachedAsset, accepts_gzip, etag_matches, parse_range
+
+# HTML 每次都需向服务器确认（依赖 ETag 304）；数据文件允许短时间缓存
+HTML_CACHE_CONTROL = "no-cache"
+DEFAULT_DATA_MAX_AGE = 300
+
+# 额外的动态路由：path -> handler(request_handler, query_string) -> (status, CachedAsset)
+Route = Callable[[BaseHTTPRequestHandler, str], Tuple[int, Optional[CachedAsset]]]
+
+
+def _resolve_static(root: str, url_path: str) -> Optional[str]:
+    """将 URL 路径映射为 root 下的文件路径；拒绝目录穿越与隐藏文件。"""
+    path = posixpath.normpath(unquote(url_path))
+    parts = [p for p in path.split("/") if p and p not in (".", "..")]
+    if any(p.startswith(".") for p in parts):
+        return None
+    full = os.path.join(root, *parts)
+    root_abs = os.path.abspath(root)
+    if os.path.commonpath([root_abs, os.path.abspath(full)]) != root_abs:
+        return None
+    if os.path.isdir(full):
+        full = os.path.join(full, "index.html")
+    return full if os.path.isfile(full) else None
+
+
+def make_handler(
+    cache: AssetCache,
+    root: str,
+    *,
+    html_routes: Optional[Dict[str, str]] = None,
+    routes: Optional[Dict[str, Route]] = None,
+    data_max_age: int = DEFAULT_DATA_MAX_AGE,
+) -> Type[BaseHTTPRequestHandler]:
+    """
+    构造请求处理类。
+
+    html_routes: URL 路径 -> cache.put 登记的资源名（例如 "/view_xy.html" -> "index"）；
+    routes: URL 路径 -> 动态处理函数（例如 /api/points），其返回的资源同样享受 gzip/ETag/Range；
+    其余路径按 root 下的静态文件服务（经 cache.get_file 缓存）。
+    """
+    html_routes = dict(html_routes or {})
+    routes = dict(routes or {})
+
+    class CachedHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        server_version = "alleschools"
+
+        def log_message(self, format: str, *args: Any) -> None:  # noqa: A002 - 与基类签名一致
+            if getattr(self.server, "quiet", False):
+                return
+            super().log_message(format, *args)
+
+        def do_GET(self) -> None:
+            self._serve(send_body=True)
+
+        def do_HEAD(self) -> None:
+            self._serve(send_body=False)
+
+        def _lookup(self) -> Tuple[int, Optional[CachedAsset], str]:
+            parts = urlsplit(self.path)
+            path = parts.path.rstrip("/") or "/"
+            if path in routes:
+                status, asset = routes[path](self, parts.query)
+                return status, asset, "no-cache"
+            if path in html_routes:
+                return HTTPStatus.OK, cache.get(html_routes[path]), HTML_CACHE_CONTROL
+            full = _resolve_static(root, parts.path)
+            if full is None:
+                return HTTPStatus.NOT_FOUND, None, ""
+            cache_control = HTML_CACHE_CONTROL if full.endswith(".html") else f"public, max-age={int(data_max_age)}"
+            return HTTPStatus.OK, cache.get_file(full), cache_control
+
+        def _serve(self, send_body: bool) -> None:
+            status, asset, cache_control = self._lookup()
+            if asset is None:
+                self._send_plain(HTTPStatus.NOT_FOUND if status == HTTPStatus.OK else status, send_body)
+                return
+
+            use_gzip = (
+                asset.gzip_body is not None
+                and "Range" not in self.headers
+                and accepts_gzip(self.headers.get("Accept-Encoding"))
+            )
+            etag = asset.gzip_etag if use_gzip else asset.etag
+            common = {
+                "ETag": etag,
+                "Last-Modified": asset.last_modified,
+                "Cache-Control": cache_control,
+                "Vary": "Accept-Encoding",
+                "Accept-Ranges": "bytes",
+            }
+
+            if status == HTTPStatus.OK and etag_matches(self.headers.get("If-None-Match"), etag):
+                self._send(HTTPStatus.NOT_MODIFIED, common, b"", send_body=False)
+                return
+
+            body = asset.gzip_body if use_gzip else asset.body
+            headers = dict(common, **{"Content-Type": asset.content_type})
+            if use_gzip:
+                headers["Content-Encoding"] = "gzip"
+
+            if status == HTTPStatus.OK and not use_gzip:
+                try:
+                    byte_range = parse_range(self.headers.get("Range"), asset.size)
+                except ValueError:
+                    headers["Content-Range"] = f"bytes */{asset.size}"
+                    self._send(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE, headers, b"", send_body)
+                    return
+                # If-Range 与当前 ETag 不一致时返回完整内容
+                if_range = self.headers.get("If-Range")
+                if byte_range is not None and (not if_range or if_range == asset.etag):
+                    start, end = byte_range
+                    headers["Content-Range"] = f"bytes {start}-{end}/{asset.size}"
+                    self._send(HTTPStatus.PARTIAL_CONTENT, headers, asset.body[start : end + 1], send_body)
+                    return
+
+            self._send(status, headers, body, send_body)  # type: ignore[arg-type]
+
+        def _send(self, status: int, headers: Dict[str, str], body: bytes, send_body: bool) -> None:
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            if status != HTTPStatus.NOT_MODIFIED:
+                self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if send_body and body:
+                self.wfile.write(body)
+
+        def _send_plain(self, status: int, send_body: bool) -> None:
+            body = f"{int(status)} {HTTPStatus(status).phrase}\n".encode("utf-8")
+            self._send(status, {"Content-Type": "text/plain; charset=utf-8"}, body, send_body)
+
+    return CachedHandler
+
+
+def make_server(
+    host: str,
+    port: int,
+    handler: Type[BaseHTTPRequestHandler],
+    *,
+    quiet: bool = False,
+) -> ThreadingHTTPServer:
+    """创建多线程服务（daemon 线程，进程退出时不等待慢连接）。"""
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.quiet = quiet  # type: ignore[attr-defined]
+    return server
+
+
+__all__ = ["HTML_CACHE_CONTROL", "DEFAULT_DATA_MAX_AGE", "Route", "make_handler", "make_server"]
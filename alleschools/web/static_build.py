@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+"""
+内容哈希的静态站点构建（view_xy_server.py --static --hashed）。
+
+与单文件内联构建不同：
+    - 每个数据集（VO / PO / profiel / meta / excluded）写成独立文件 assets/data-<名称>.<哈希>.js，
+      内容为 window.__ALLESCHOOLS__["DATA_VO"] = <JSON>;，以同步 <script src> 加载，
+      前端脚本中的 __INJECT_*__ 占位符改为引用该全局对象，前端代码无需改动；
+    - 体积超过 inline_limit 的内联 <script> 同样外置为 assets/app-<n>.<哈希>.js；
+    - index.html 只剩很小的外壳（no-cache），哈希文件可被浏览器与 CDN 永久缓存（immutable）；
+    - asset-manifest.json 记录逻辑名 → 哈希文件路径，vercel_headers() 给出对应的 Cache-Control 规则。
+数据变化时只有对应数据文件的哈希改变，回访用户仅需重新下载变化的部分。
+"""
+
+import hashlib
+import json
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Mapping
+
+from .template import compile_template
+
+ASSET_DIR = "assets"
+GLOBAL_NAME = "__ALLESCHOOLS__"
+DEFAULT_INLINE_LIMIT = 4096
+HASH_LENGTH = 12
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+SHELL_CACHE_CONTROL = "no-cache"
+
+_INLINE_SCRIPT_RE = re.compile(r"<script>(.*?)</script>", re.S)
+
+
+def _content_hash(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()[:HASH_LENGTH]
+
+
+def _write_hashed(asset_root: Path, stem: str, body: bytes, suffix: str = ".js") -> str:
+    """写出 <stem>.<hash><suffix>，返回相对站点根目录的 URL 路径。"""
+    name = f"{stem}.{_content_hash(body)}{suffix}"
+    (asset_root / name).write_bytes(body)
+    return f"{ASSET_DIR}/{name}"
+
+
+def _dataset_stem(name: str) -> str:
+    return "data-" + name.lower().replace("_", "-")
+
+
+def build_hashed_site(
+    template_path: Path,
+    payloads: Mapping[str, Any],
+    out_dir: Path,
+    *,
+    inline_limit: int = DEFAULT_INLINE_LIMIT,
+) -> Dict[str, Any]:
+    """
+    构建内容哈希的静态站点，返回 asset manifest（同时写出 out_dir/asset-manifest.json）。
+
+    out_dir/assets/ 由本函数管理：写入前清理上一轮的哈希文件。
+    """
+    template = compile_template(template_path)
+    asset_root = out_dir / ASSET_DIR
+    asset_root.mkdir(parents=True, exist_ok=True)
+    for old in asset_root.glob("*.js"):
+        old.unlink()
+
+    # 1. 数据集文件：仅写出模板中实际引用的占位符
+    datasets: Dict[str, str] = {}
+    for name in dict.fromkeys(template.placeholders):
+        if name not in payloads:
+            continue
+        body = (
+            f"(window.{GLOBAL_NAME}=window.{GLOBAL_NAME}||{{}})[{json.dumps(name)}]="
+            + json.dumps(payloads[name], ensure_ascii=False)
+            + ";\n"
+        ).encode("utf-8")
+        datasets[name] = _write_hashed(asset_root, _dataset_stem(name), body)
+
+    # 2. 外壳：占位符替换为对全局对象的引用，并在首个引用数据的 <script> 前插入数据脚本
+    exprs = {name: f"window.{GLOBAL_NAME}[{json.dumps(name)}]" for name in datasets}
+    shell = template.render_expressions(exprs)
+    first_ref = min((shell.find(e) for e in exprs.values() if e in shell), default=-1)
+    if first_ref >= 0:
+        insert_at = shell.rfind("<script", 0, first_ref)
+        tags = "".join(f'<script src="{path}"></script>\n  ' for path in datasets.values())
+        shell = shell[:insert_at] + tags + shell[insert_at:]
+
+    # 3. 较大的内联脚本外置为哈希文件（经典脚本共享全局作用域，顶层 const/let 语义不变）
+    apps: List[str] = []
+
+    def _externalize(m: "re.Match[str]") -> str:
+        body = m.group(1)
+        if len(body) <= inline_limit:
+            return m.group(0)
+        path = _write_hashed(asset_root, f"app-{len(apps)}", body.encode("utf-8"))
+        apps.append(path)
+        return f'<script src="{path}"></script>'
+
+    shell = _INLINE_SCRIPT_RE.sub(_externalize, shell)
+    (out_dir / "index.html").write_text(shell, encoding="utf-8")
+
+    manifest: Dict[str, Any] = {
+        "index": "index.html",
+        "datasets": datasets,
+        "scripts": apps,
+        "shell_bytes": len(shell.encode("utf-8")),
+    }
+    with (out_dir / "asset-manifest.json").open("w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+
+def vercel_headers(asset_dir: str = ASSET_DIR) -> List[Dict[str, Any]]:
+    """Vercel headers 规则：哈希文件 immutable，外壳与清单每次重新验证。"""
+    return [
+        {
+            "source": f"/{asset_dir}/(.*)",
+            "headers": [{"key": "Cache-Control", "value": IMMUTABLE_CACHE_CONTROL}],
+        },
+        {"source": "/", "headers": [{"key": "Cache-Control", "value": SHELL_CACHE_CONTROL}]},
+        {
+            "source": "/(index.html|asset-manifest.json)",
+            "headers": [{"key": "Cache-Control", "value": SHELL_CACHE_CONTROL}],
+        },
+    ]
+
+
+def update_vercel_config(path: Path, asset_dir: str = ASSET_DIR) -> bool:
+    """
+    将 vercel_headers() 写入 vercel.json 的 headers（保留其他键与非本构建管理的规则）。
+
+    返回文件内容是否发生变化。
+    """
+    config: Dict[str, Any] = {}
+    if path.exists():
+        config = json.loads(path.read_text(encoding="utf-8"))
+    ours = vercel_headers(asset_dir)
+    managed = {rule["source"] for rule in ours}
+    others = [r for r in (config.get("headers") or []) if r.get("source") not in managed]
+    new_config = dict(config, headers=ours + others)
+    if new_config == config:
+        return False
+    path.write_text(json.dumps(new_config, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    return True
+
+
+__all__ = [
+    "ASSET_DIR",
+    "GLOBAL_NAME",
+    "IMMUTABLE_CACHE_CONTROL",
+    "SHELL_CACHE_CONTROL",
+    "build_hashed_site",
+    "update_vercel_config",
+    "vercel_headers",
+]
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+"""
+前端 HTML 模板编译：一次定位 __INJECT_*__ 占位符，按片段流式输出。
+
+旧做法对数 MB 的文档连续调用八次 str.replace，每次都复制整份文档。这里改为：
+    - compile_template(path)：把模板切分为「字面量片段 / 占位符名」交替的序列，
+      按 (mtime_ns, size) 缓存，模板被编辑后自动重新编译；
+    - CompiledTemplate.iter_chunks(payloads)：依次产出字面量片段与各数据集的 JSON，
+      调用方直接写入文件或 socket，不拼接完整文档；峰值内存约为最大的单个数据集 JSON。
+未提供数据的占位符按原文输出（与逐个 replace 的旧行为一致）。
+"""
+
+import json
+import os
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, Mapping, Optional, Tuple, Union
+
+PLACEHOLDER_RE = re.compile(r"__INJECT_([A-Z0-9_]+?)__")
+
+
+@dataclass(frozen=True)
+class CompiledTemplate:
+    """编译后的模板：parts 中偶数位为字面量片段，奇数位为占位符名（如 "DATA_VO"）。"""
+
+    parts: Tuple[str, ...]
+
+    @property
+    def placeholders(self) -> Tuple[str, ...]:
+        return self.parts[1::2]
+
+    def iter_chunks(self, payloads: Mapping[str, Any]) -> Iterator[str]:
+        """依次产出输出片段；payloads 以占位符名为键，值为可 JSON 序列化对象。"""
+        for i, part in enumerate(self.parts):
+            if i % 2 == 0:
+                if part:
+                    yield part
+            elif part in payloads:
+                yield json.dumps(payloads[part], ensure_ascii=False)
+            else:
+                yield f"__INJECT_{part}__"
+
+    def render_expressions(self, exprs: Mapping[str, str]) -> str:
+        """以原样文本（例如 JS 表达式）替换占位符；未给出的占位符按原文输出。"""
+        return "".join(
+            part if i % 2 == 0 else exprs.get(part, f"__INJECT_{part}__") for i, part in enumerate(self.parts)
+        )
+
+    def render(self, payloads: Mapping[str, Any]) -> str:
+        return "".join(self.iter_chunks(payloads))
+
+    def render_bytes(self, payloads: Mapping[str, Any]) -> bytes:
+        return b"".join(chunk.encode("utf-8") for chunk in self.iter_chunks(payloads))
+
+    def render_to_file(self, path: Union[str, "os.PathLike[str]"], payloads: Mapping[str, Any]) -> int:
+        """流式写出到文件，返回写出的字符数。"""
+        n = 0
+        with open(path, "w", encoding="utf-8") as f:
+            for chunk in self.iter_chunks(payloads):
+                n += f.write(chunk)
+        return n
+
+
+def compile_source(source: str) -> CompiledTemplate:
+    """将模板源文本切分为字面量片段与占位符名交替的序列。"""
+    parts = []
+    pos = 0
+    for m in PLACEHOLDER_RE.finditer(source):
+        parts.append(source[pos : m.start()])
+        parts.append(m.group(1))
+        pos = m.end()
+    parts.append(source[pos:])
+    return CompiledTemplate(tuple(parts))
+
+
+_cache: Dict[str, Tuple[int, int, CompiledTemplate]] = {}
+_cache_lock = threading.Lock()
+
+
+def compile_template(path: Union[str, "os.PathLike[str]"]) -> CompiledTemplate:
+    """读取并编译模板文件；按 (mtime_ns, size) 缓存，文件未变化时直接复用。"""
+    key = os.path.abspath(path)
+    st = os.stat(key)
+    with _cache_lock:
+        cached: Optional[Tuple[int, int, CompiledTemplate]] = _cache.get(key)
+    if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+        return cached[2]
+    with open(key, "r", encoding="utf-8") as f:
+        compiled = compile_source(f.read())
+    with _cache_lock:
+        _cache[key] = (st.st_mtime_ns, st.st_size, compiled)
+    return compiled
+
+
+__all__ = ["PLACEHOLDER_RE", "CompiledTemplate", "compile_source", "compile_template"]
@@ -0,0 +1,19 @@
+"""
+AlleSchools 性能基准套件。
+
+    python -m benchmarks generate --scale 1 --out /tmp/bench_data   # 仅生成合成原始数据
+    python -m benchmarks run --scale 1                              # 运行全部用例并与 baseline.json 比较
+
+generate 模块提供确定性的全国规模合成 DUO / CBS 数据；suite 模块登记加载器、计算、导出器、
+schema 校验与端到端流水线用例，并把结果与已提交的基线按容差比较。
+"""
+
+from .generate import generate_raw_data  # noqa: F401
+from .suite import CASES, compare, run_suite  # noqa: F401
+
+__all__ = [
+    "CASES",
+    "compare",
+    "generate_raw_data",
+    "run_suite",
+]
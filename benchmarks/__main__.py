@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+"""python -m benchmarks {generate,run}：生成合成数据 / 运行基准并与基线比较。"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from benchmarks.generate import generate_raw_data
+from benchmarks.suite import (
+    DEFAULT_REPEATS,
+    DEFAULT_TOLERANCE,
+    compare,
+    load_results,
+    regressions,
+    run_suite,
+    write_results,
+)
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+
+
+def _print_progress(name: str, record: Dict[str, Any]) -> None:
+    print(f"  {name:<40} {record['median_seconds']:>9.4f}s  (min {record['min_seconds']:.4f}s, rows {record['rows']})")
+
+
+def _print_comparison(comparison: List[Dict[str, Any]]) -> None:
+    for c in comparison:
+        if c["status"] == "new":
+            print(f"  {c['name']:<40} {c['current']:>9.4f}s  new (not in baseline)")
+        else:
+            print(f"  {c['name']:<40} {c['current']:>9.4f}s  vs {c['baseline']:.4f}s  x{c['ratio']:.2f}  {c['status']}")
+
+
+def _cmd_generate(args: argparse.Namespace) -> int:
+    summary = generate_raw_data(Path(args.out), scale=args.scale, seed=args.seed)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    return 0
+
+
+def _cmd_run(args: argparse.Namespace) -> int:
+    print(f"Running benchmarks at scale {args.scale} (seed {args.seed}, {args.repeat} repeats)")
+    results = run_suite(
+        scale=args.scale,
+        seed=args.seed,
+        repeats=args.repeat,
+        only=args.only,
+        workdir=Path(args.workdir) if args.workdir else None,
+        progress=_print_progress,
+    )
+    if args.output:
+        print(f"Results written to {write_results(results, Path(args.output))}")
+
+    baseline_path = Path(args.baseline)
+    if args.update_baseline:
+        print(f"Baseline updated: {write_results(results, baseline_path)}")
+        return 0
+    if not baseline_path.is_file():
+        print(f"No baseline at {baseline_path}; run with --update-baseline to create one.")
+        return 0
+
+    try:
+        comparison = compare(results, load_results(baseline_path), tolerance=args.tolerance)
+    except ValueError as e:
+        print(f"Cannot compare with baseline {baseline_path}: {e}", file=sys.stderr)
+        return 2
+    print(f"Comparison with {baseline_path} (tolerance {args.tolerance:.0%}):")
+    _print_comparison(comparison)
+    slow = regressions(comparison)
+    if slow:
+        print("", file=sys.stderr)
+        print(f"PERFORMANCE REGRESSION: {len(slow)} benchmark(s) slower than baseline", file=sys.stderr)
+        for c in slow:
+            print(f"  {c['name']}: {c['baseline']:.4f}s -> {c['current']:.4f}s (x{c['ratio']:.2f})", file=sys.stderr)
+        return 1
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="AlleSchools benchmark suite")
+    sub = parser.add_subparsers(dest="command")
+
+    p_gen = sub.add_parser("generate", help="Write synthetic DUO/CBS raw data")
+    p_gen.add_argument("--out", required=True, help="Directory to write the raw_data files into")
+    p_gen.add_argument("--scale", type=float, default=1.0, help="1 = national size; 10 / 100 for stress runs")
+    p_gen.add_argument("--seed", type=int, default=0)
+
+    p_run = sub.add_parser("run", help="Run benchmarks and compare against the baseline")
+    p_run.add_argument("--scale", type=float, default=1.0, help="Synthetic data scale (baseline is recorded at 1)")
+    p_run.add_argument("--seed", type=int, default=0)
+    p_run.add_argument("--repeat", type=int, default=DEFAULT_REPEATS, help="Timed runs per benchmark (median is compared)")
+    p_run.add_argument("--only", nargs="+", default=None, help="Benchmark names, prefixes or groups to run")
+    p_run.add_argument("--output", default=None, help="Write results JSON to this path")
+    p_run.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="Baseline results JSON")
+    p_run.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Allowed slowdown ratio (0.25 = 25%%)")
+    p_run.add_argument("--update-baseline", action="store_true", help="Overwrite the baseline with this run")
+    p_run.add_argument("--workdir", default=None, help="Keep generated data and outputs here instead of a temp dir")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "generate":
+        return _cmd_generate(args)
+    if args.command == "run":
+        return _cmd_run(args)
+    parser.print_help()
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
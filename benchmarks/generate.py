@@ -0,0 +1,386 @@
+from __future__ import annotations
+
+"""
+确定性的全国规模合成 DUO / CBS 原始数据生成器（基准测试输入）。
+
+scale=1 对应全国规模：约 6300 所小学（vestiging）、1450 所中学、4070 个 PC4、342 个 gemeente；
+scale=10 / 100 按比例放大学校数（PC4 上限为 1000–9999 的 9000 个，学校随之变密）。
+同一 (scale, seed) 逐字节可复现。写出的文件与真实 DUO / CBS 文件同名、同分隔符、同列布局：
+
+    duo_examen_raw_all.csv                       7 个描述列 + 每学年 9 列（男/女/合计 × 考生/通过/通过率），
+                                                 合计考生 / 通过位于 config.yaml vo.weights.year_cols 所指的列
+    duo_vestigingen_vo.csv                       VESTIGINGSCODE → POSTCODE（含 DUO 其余地址列）
+    duo_schooladviezen_{start}_{end}.csv         每学年一份，12 类升学建议人数（1–4 人按 DUO 口径写作 "<5"）
+    examenkandidaten-vwo-en-examencijfers-{jaar}.csv   VWO 学校 × 科目的 SE / CE / 成绩单平均分（逗号小数）
+    cbs_woz_per_postcode_year.csv                pc4, year, woz_waarde（约 3% 的 PC4×年份缺失）
+
+每个 PC4 有一个潜在的「富裕度」，同时驱动 WOZ、小学升学建议分布、中学 HAVO/VWO 占比与统考分数，
+使 X/Y 分布、离群点与缺失比例接近真实数据，而不是均匀噪声。
+"""
+
+import csv
+import math
+import random
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Tuple
+
+from alleschools.config import SCHOOLJARS, WOZ_YEARS
+
+NATIONAL_PO_SCHOOLS = 6300
+NATIONAL_VO_SCHOOLS = 1450
+NATIONAL_PC4 = 4070
+NATIONAL_GEMEENTEN = 342
+
+# duo_examen_raw_all.csv 的学年块：第 k 块起于第 7 + 9k 列，块内第 6 / 7 列为合计考生 / 通过（即 13/14、22/23 …）
+EXAM_YEARS = ("2019-2020", "2020-2021", "2021-2022", "2022-2023", "2023-2024")
+VWO_EXAM_YEARS = ("2020-2021", "2021-2022", "2022-2023", "2023-2024", "2024-2025")
+
+PO_ADVIES_COLUMNS = (
+    "VSO", "PRO", "VMBO_B", "VMBO_B_K", "VMBO_K", "VMBO_K_GT", "VMBO_GT",
+    "VMBO_GT_HAVO", "HAVO", "HAVO_VWO", "VWO", "ADVIES_NIET_MOGELIJK",
+)
+# 各建议在「富裕度」0 / 1 两端的相对权重（线性插值），大致对应全国分布
+_ADVIES_WEIGHTS_LOW = (2, 3, 14, 4, 10, 5, 18, 6, 16, 6, 12, 4)
+_ADVIES_WEIGHTS_HIGH = (1, 1, 4, 2, 5, 3, 11, 6, 22, 11, 34, 1)
+
+VO_PROFIELEN = ("N&T", "N&G", "E&M", "C&M")
+VMBO_SECTOREN = ("techniek", "zorg en welzijn", "economie en ondernemen", "groen")
+# (AFKORTING VAKNAAM, VAKNAAM, 选修该科的 profiel；"" 表示全体考生)
+VWO_SUBJECTS: Tuple[Tuple[str, str, str], ...] = (
+    ("NETL", "Nederlandse taal en literatuur", ""),
+    ("ENTL", "Engelse taal en literatuur", ""),
+    ("WISA", "Wiskunde A", "E&M"),
+    ("WISB", "Wiskunde B", "N&T"),
+    ("WISC", "Wiskunde C", "C&M"),
+    ("NAT", "Natuurkunde", "N&T"),
+    ("SCHK", "Scheikunde", "N&G"),
+    ("BIOL", "Biologie", "N&G"),
+    ("ECON", "Economie", "E&M"),
+    ("BECO", "Bedrijfseconomie", "E&M"),
+    ("GES", "Geschiedenis", "C&M"),
+    ("AK", "Aardrijkskunde", "E&M"),
+    ("DUTL", "Duitse taal en literatuur", "C&M"),
+    ("FATL", "Franse taal en literatuur", "C&M"),
+)
+
+_PLACE_HEADS = (
+    "Alm", "Bre", "Del", "Ede", "Gou", "Har", "Lei", "Roo", "Ven", "Zwo", "Ams", "Ass", "Bos", "Dor",
+    "Ein", "Gro", "Hee", "Hil", "Lel", "Maa", "Nij", "Oss", "Pur", "Sch", "Til", "Utr", "Vla", "Wes",
+)
+_PLACE_TAILS = ("wijk", "dam", "veen", "horst", "broek", "dorp", "berg", "hoven", "hem", "huizen", "lo", "kerk")
+_PLACE_PREFIXES = ("", "", "", "Noord", "Zuid", "Oost", "West", "Nieuw", "Oud", "Groot")
+_PO_NAMES = (
+    "Linde", "Regenboog", "Wereldwijzer", "Klimop", "Vlinder", "Zonnebloem", "Ark", "Wilgen", "Eik",
+    "Horizon", "Kompas", "Sterrenwacht", "Fontein", "Tweemaster", "Windroos", "Meander", "Triangel",
+    "Springplank", "Kameleon", "Notenbalk", "Vuurtoren", "Schakel", "Boomgaard", "Dolfijn",
+)
+_PO_KINDS = ("Basisschool De", "Basisschool Het", "OBS De", "CBS De", "RK Basisschool", "Daltonschool",
+             "Montessorischool", "Jenaplanschool")
+_VO_KINDS = ("College", "Lyceum", "Scholengemeenschap", "Gymnasium", "Campus", "Montessori Lyceum")
+_DENOMINATIES = ("Openbaar", "Rooms-Katholiek", "Protestants-Christelijk", "Algemeen bijzonder", "Interconfessioneel")
+_LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+def _place_names(rnd: random.Random, n: int) -> List[str]:
+    seen: Dict[str, int] = {}
+    out: List[str] = []
+    for _ in range(n):
+        prefix = rnd.choice(_PLACE_PREFIXES)
+        base = rnd.choice(_PLACE_HEADS) + rnd.choice(_PLACE_TAILS)
+        name = f"{prefix}{base.lower()}" if prefix else base
+        k = seen.get(name, 0)
+        seen[name] = k + 1
+        out.append(name if k == 0 else f"{name} {k + 1}")
+    return out
+
+
+_N_INSTELLINGSCODES = 100 * len(_LETTERS) ** 2
+
+
+def _brin(index: int, n_total: int, per_instelling: int) -> Tuple[str, str]:
+    """
+    第 index 所学校 → (INSTELLINGSCODE, 两位 vestigingsnummer)。INSTELLINGSCODE 为「两位数字 + 两个字母」（如 "07KB"），
+    共 67600 个；大 scale 下自动提高每个 instelling 的 vestiging 数以保证唯一。
+    """
+    per = max(per_instelling, math.ceil(n_total / _N_INSTELLINGSCODES))
+    inst, vest = divmod(index, per)
+    if per > 100:
+        raise ValueError("scale too large for 6-character BRIN codes")
+    digits, letters = inst % 100, inst // 100
+    return f"{digits:02d}{_LETTERS[letters // 26]}{_LETTERS[letters % 26]}", f"{vest:02d}"
+
+
+def _masked(n: int) -> str:
+    """DUO 口径：1–4 人写作 "<5"。"""
+    return "<5" if 0 < n < 5 else str(n)
+
+
+def _nl_decimal(value: float, digits: int = 1) -> str:
+    return f"{value:.{digits}f}".replace(".", ",")
+
+
+def _split(rnd: random.Random, total: int, weights: Sequence[float]) -> List[int]:
+    """把 total 人按权重随机分配（多项分布的快速近似：带扰动的按比例取整，余数随机补齐）。"""
+    raw = [w * rnd.uniform(0.7, 1.3) for w in weights]
+    s = sum(raw)
+    counts = [int(total * r / s) for r in raw]
+    for _ in range(total - sum(counts)):
+        counts[rnd.randrange(len(counts))] += 1
+    return counts
+
+
+class _Geography:
+    """PC4 池、gemeente 划分与每个 PC4 的潜在富裕度（0–1）。"""
+
+    def __init__(self, rnd: random.Random, scale: float) -> None:
+        n_pc4 = min(9000, max(10, int(round(NATIONAL_PC4 * scale))))
+        n_gem = min(n_pc4 // 2, max(2, int(round(NATIONAL_GEMEENTEN * min(scale, 1.0)))))
+        self.pc4 = sorted(rnd.sample(range(1000, 10000), n_pc4))
+        names = _place_names(rnd, n_gem)
+        # 相邻 PC4 归入同一 gemeente，按随机切点分段（大小不等）
+        cuts = sorted(rnd.sample(range(1, n_pc4), n_gem - 1))
+        bounds = [0] + cuts + [n_pc4]
+        self.gemeente: Dict[int, Tuple[str, str]] = {}
+        base: Dict[str, float] = {}
+        for g, (lo, hi) in enumerate(zip(bounds, bounds[1:])):
+            name = names[g].upper()
+            base[name] = rnd.betavariate(2.0, 2.0)
+            for pc in self.pc4[lo:hi]:
+                self.gemeente[pc] = (name, f"{g + 1:04d}")
+        self.wealth = {
+            pc: min(1.0, max(0.0, 0.6 * base[self.gemeente[pc][0]] + 0.4 * rnd.betavariate(2.0, 2.0)))
+            for pc in self.pc4
+        }
+
+    def postcode(self, rnd: random.Random, pc: int) -> str:
+        return f"{pc}{rnd.choice(_LETTERS[:24])}{rnd.choice(_LETTERS[:24])}"
+
+
+def _active_years(rnd: random.Random, n_years: int) -> Tuple[int, int]:
+    """学年下标区间 [lo, hi)：约 3% 的学校在期间新开或关闭。"""
+    r = rnd.random()
+    if r < 0.015:
+        return rnd.randrange(1, n_years), n_years
+    if r < 0.03:
+        return 0, rnd.randrange(1, n_years)
+    return 0, n_years
+
+
+def _write_woz(path: Path, rnd: random.Random, geo: _Geography) -> int:
+    n = 0
+    with path.open("w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["pc4", "year", "woz_waarde"])
+        for pc in geo.pc4:
+            level = 170.0 * math.exp(1.6 * geo.wealth[pc]) * rnd.uniform(0.85, 1.15)
+            for i, year in enumerate(WOZ_YEARS):
+                if rnd.random() < 0.03:
+                    continue
+                w.writerow([f"{pc:04d}", year, round(level * 1.065**i)])
+                n += 1
+    return n
+
+
+def _write_schooladviezen(raw: Path, rnd: random.Random, geo: _Geography, n_schools: int) -> int:
+    schools: List[Dict[str, Any]] = []
+    for i in range(n_schools):
+        pc = rnd.choice(geo.pc4)
+        sbo = rnd.random() < 0.05
+        inst, vest = _brin(i, n_schools, 1)
+        schools.append(
+            {
+                "inst": inst,
+                "vest": vest,
+                "naam": f"{rnd.choice(_PO_KINDS)} {rnd.choice(_PO_NAMES)}",
+                "pc": pc,
+                "postcode": geo.postcode(rnd, pc),
+                "soort": "Sbo" if sbo else "Bo",
+                "size": max(3, int(rnd.lognormvariate(math.log(12 if sbo else 26), 0.5))),
+                "wealth": 0.1 if sbo else geo.wealth[pc],
+                "denominatie": rnd.choice(_DENOMINATIES),
+                "years": _active_years(rnd, len(SCHOOLJARS)),
+            }
+        )
+    header = ["INSTELLINGSCODE", "VESTIGINGSCODE", "INSTELLINGSNAAM_VESTIGING", "POSTCODE_VESTIGING",
+              "PLAATSNAAM", "GEMEENTENUMMER", "GEMEENTENAAM", "SOORT_PO", "DENOMINATIE_VESTIGING",
+              *PO_ADVIES_COLUMNS]
+    n_rows = 0
+    for k, (start, end) in enumerate(SCHOOLJARS):
+        with (raw / f"duo_schooladviezen_{start}_{end}.csv").open("w", encoding="utf-8", newline="") as f:
+            w = csv.writer(f, delimiter=";")
+            w.writerow(header)
+            for s in schools:
+                lo, hi = s["years"]
+                if not lo <= k < hi:
+                    continue
+                t = s["wealth"]
+                weights = [a + (b - a) * t for a, b in zip(_ADVIES_WEIGHTS_LOW, _ADVIES_WEIGHTS_HIGH)]
+                counts = _split(rnd, max(1, int(s["size"] * rnd.uniform(0.8, 1.2))), weights)
+                gemeente, gemeentenummer = geo.gemeente[s["pc"]]
+                w.writerow([s["inst"], s["vest"], s["naam"], s["postcode"], gemeente, gemeentenummer, gemeente,
+                            s["soort"], s["denominatie"], *(_masked(c) for c in counts)])
+                n_rows += 1
+    return n_rows
+
+
+def _vo_schools(rnd: random.Random, geo: _Geography, n_schools: int) -> List[Dict[str, Any]]:
+    schools: List[Dict[str, Any]] = []
+    for i in range(n_schools):
+        pc = rnd.choice(geo.pc4)
+        r = rnd.random()
+        # 约 25% 纯 VMBO、15% 纯 HAVO/VWO（含 categoraal gymnasium）、其余为 scholengemeenschap
+        offer = "vmbo" if r < 0.25 else "havo_vwo" if r < 0.40 else "both"
+        wealth = geo.wealth[pc]
+        # VO instellingen 多为多 vestiging 的 scholengemeenschap
+        inst, vest = _brin(i, n_schools, 2)
+        schools.append(
+            {
+                "inst": inst,
+                "brin": inst + vest,
+                "naam": f"{rnd.choice(_VO_KINDS)} {geo.gemeente[pc][0].title()} {rnd.choice(_PO_NAMES)}",
+                "pc": pc,
+                "postcode": geo.postcode(rnd, pc),
+                "offer": offer,
+                "size": max(8, int(rnd.lognormvariate(math.log(140), 0.6))),
+                "wealth": wealth,
+                # VWO 考生占 HAVO/VWO 考生的比例、理科 profiel 占比，随富裕度上升
+                "vwo_share": min(0.9, max(0.15, 0.25 + 0.45 * wealth + rnd.gauss(0, 0.08))),
+                "science": min(0.8, max(0.1, 0.3 + 0.2 * wealth + rnd.gauss(0, 0.07))),
+                "pass_rate": min(0.99, max(0.6, 0.84 + 0.08 * wealth + rnd.gauss(0, 0.04))),
+                "years": _active_years(rnd, len(EXAM_YEARS)),
+            }
+        )
+    return schools
+
+
+def _exam_rows(rnd: random.Random, s: Dict[str, Any]) -> List[Tuple[str, str, float]]:
+    """学校的 (ONDERWIJSTYPE VO, OPLEIDINGSNAAM, 该行占学校考生的份额) 列表。"""
+    rows: List[Tuple[str, str, float]] = []
+    hv = 0.0 if s["offer"] == "vmbo" else 1.0 if s["offer"] == "havo_vwo" else 0.35 + 0.4 * s["wealth"]
+    if hv > 0:
+        sci = s["science"]
+        prof_weights = {"N&T": sci * 0.45, "N&G": sci * 0.55, "E&M": (1 - sci) * 0.6, "C&M": (1 - sci) * 0.4}
+        for otype, share in (("VWO", s["vwo_share"]), ("HAVO", 1 - s["vwo_share"])):
+            for prof in VO_PROFIELEN:
+                rows.append((otype, prof, hv * share * prof_weights[prof]))
+    if hv < 1:
+        for sector in VMBO_SECTOREN:
+            rows.append(("VMBO", sector, (1 - hv) * rnd.uniform(0.1, 0.4)))
+    return rows
+
+
+def _write_exams(raw: Path, rnd: random.Random, geo: _Geography, schools: List[Dict[str, Any]]) -> int:
+    header = ["INSTELLINGSCODE", "VESTIGINGSCODE", "INSTELLINGSNAAM VESTIGING", "GEMEENTENAAM",
+              "ONDERWIJSTYPE VO", "OPLEIDINGSCODE", "OPLEIDINGSNAAM"]
+    for year in EXAM_YEARS:
+        for what in ("EXAMENKANDIDATEN", "GESLAAGDEN", "SLAGINGSPERCENTAGE"):
+            header += [f"{what} {year} MAN", f"{what} {year} VROUW"]
+        header += [f"EXAMENKANDIDATEN {year} TOTAAL", f"GESLAAGDEN {year} TOTAAL", f"SLAGINGSPERCENTAGE {year} TOTAAL"]
+    n_rows = 0
+    with (raw / "duo_examen_raw_all.csv").open("w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f, delimiter=";")
+        w.writerow(header)
+        for s in schools:
+            lo, hi = s["years"]
+            rows = _exam_rows(rnd, s)
+            total_share = sum(r[2] for r in rows) or 1.0
+            for code, (otype, opleiding, share) in enumerate(rows):
+                cells = [s["inst"], s["brin"], s["naam"], geo.gemeente[s["pc"]][0], otype,
+                         str(1000 + 10 * code), opleiding]
+                for k in range(len(EXAM_YEARS)):
+                    if not lo <= k < hi:
+                        cells += ["0"] * 9
+                        continue
+                    kand = int(round(s["size"] * share / total_share * rnd.uniform(0.8, 1.2)))
+                    geslaagd = min(kand, int(round(kand * min(1.0, s["pass_rate"] + rnd.gauss(0, 0.03)))))
+                    kand_m = int(kand * rnd.uniform(0.4, 0.6))
+                    gesl_m = min(kand_m, int(geslaagd * kand_m / kand)) if kand else 0
+                    pct = [_nl_decimal(100.0 * g / n) if n else "" for g, n in
+                           ((gesl_m, kand_m), (geslaagd - gesl_m, kand - kand_m))]
+                    cells += [_masked(kand_m), _masked(kand - kand_m), _masked(gesl_m), _masked(geslaagd - gesl_m),
+                              *pct, _masked(kand), _masked(geslaagd),
+                              _nl_decimal(100.0 * geslaagd / kand) if kand else ""]
+                w.writerow(cells)
+                n_rows += 1
+    return n_rows
+
+
+def _write_vestigingen(raw: Path, rnd: random.Random, geo: _Geography, schools: List[Dict[str, Any]]) -> int:
+    header = ["PROVINCIE", "BEVOEGD GEZAG NUMMER", "INSTELLINGSCODE", "VESTIGINGSCODE", "VESTIGINGSNAAM",
+              "STRAATNAAM", "HUISNUMMER-TOEVOEGING", "POSTCODE", "PLAATSNAAM", "GEMEENTENUMMER", "GEMEENTENAAM",
+              "DENOMINATIE", "ONDERWIJSSTRUCTUUR"]
+    structuur = {"vmbo": "VMBO", "havo_vwo": "HAVO/VWO", "both": "VMBO/HAVO/VWO"}
+    with (raw / "duo_vestigingen_vo.csv").open("w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f, delimiter=";")
+        w.writerow(header)
+        for s in schools:
+            gemeente, gemeentenummer = geo.gemeente[s["pc"]]
+            w.writerow(["", str(40000 + rnd.randrange(10000)), s["inst"], s["brin"], s["naam"],
+                        f"{rnd.choice(_PO_NAMES)}laan", str(rnd.randint(1, 250)), s["postcode"], gemeente,
+                        gemeentenummer, gemeente, rnd.choice(_DENOMINATIES), structuur[s["offer"]]])
+    return len(schools)
+
+
+def _write_vwo_exam_scores(raw: Path, rnd: random.Random, geo: _Geography, schools: List[Dict[str, Any]]) -> int:
+    header = ["INSTELLINGSCODE", "VESTIGINGSCODE", "INSTELLINGSNAAM VESTIGING", "GEMEENTENAAM", "ONDERWIJSTYPE VO",
+              "AFKORTING VAKNAAM", "VAKNAAM", "AANTAL EXAMENKANDIDATEN", "GEM. CIJFER SCHOOLEXAMEN",
+              "GEM. CIJFER CENTRALE EXAMENS MET CIJFER MEETELLEND VOOR DIPLOMA",
+              "GEM. CIJFER TOTAAL AANTAL CENTRALE EXAMENS", "GEM  CIJFER CIJFERLIJST"]
+    vwo_schools = [s for s in schools if s["offer"] != "vmbo"]
+    level = {s["brin"]: 6.1 + 0.7 * s["wealth"] + rnd.gauss(0, 0.2) for s in vwo_schools}
+    n_rows = 0
+    for year in VWO_EXAM_YEARS:
+        with (raw / f"examenkandidaten-vwo-en-examencijfers-{year}.csv").open("w", encoding="utf-8", newline="") as f:
+            w = csv.writer(f, delimiter=";")
+            w.writerow(header)
+            for s in vwo_schools:
+                n_vwo = max(1, int(s["size"] * s["vwo_share"] * 0.5))
+                for afk, vaknaam, prof in VWO_SUBJECTS:
+                    n = n_vwo if not prof else int(n_vwo * (s["science"] if prof in ("N&T", "N&G") else 1 - s["science"]) * 0.6)
+                    if n == 0 or rnd.random() < 0.04:
+                        continue
+                    ce = min(9.5, max(3.5, level[s["brin"]] + rnd.gauss(0, 0.35)))
+                    se = min(9.5, max(4.0, ce + rnd.gauss(0.3, 0.2)))
+                    w.writerow([s["inst"], s["brin"][-2:], s["naam"], geo.gemeente[s["pc"]][0], "VWO", afk, vaknaam,
+                                _masked(n), _nl_decimal(se), _nl_decimal(ce), _nl_decimal(ce), _nl_decimal((se + ce) / 2)])
+                    n_rows += 1
+    return n_rows
+
+
+def generate_raw_data(raw_dir: Path, *, scale: float = 1.0, seed: int = 0) -> Dict[str, Any]:
+    """
+    在 raw_dir 写出全部合成原始文件，返回摘要：
+        {"scale", "seed", "n_po_schools", "n_vo_schools", "n_pc4", "rows": {文件名: 数据行数}}
+    """
+    if scale <= 0:
+        raise ValueError("scale must be positive")
+    raw_dir.mkdir(parents=True, exist_ok=True)
+    rnd = random.Random(f"alleschools-bench:{seed}")
+    geo = _Geography(rnd, scale)
+    n_po = max(4, int(round(NATIONAL_PO_SCHOOLS * scale)))
+    n_vo = max(4, int(round(NATIONAL_VO_SCHOOLS * scale)))
+    vo = _vo_schools(rnd, geo, n_vo)
+    rows = {
+        "cbs_woz_per_postcode_year.csv": _write_woz(raw_dir / "cbs_woz_per_postcode_year.csv", rnd, geo),
+        "duo_schooladviezen_*.csv": _write_schooladviezen(raw_dir, rnd, geo, n_po),
+        "duo_examen_raw_all.csv": _write_exams(raw_dir, rnd, geo, vo),
+        "duo_vestigingen_vo.csv": _write_vestigingen(raw_dir, rnd, geo, vo),
+        "examenkandidaten-vwo-en-examencijfers-*.csv": _write_vwo_exam_scores(raw_dir, rnd, geo, vo),
+    }
+    return {
+        "scale": scale,
+        "seed": seed,
+        "n_po_schools": n_po,
+        "n_vo_schools": n_vo,
+        "n_pc4": len(geo.pc4),
+        "rows": rows,
+    }
+
+
+__all__ = [
+    "EXAM_YEARS",
+    "NATIONAL_PO_SCHOOLS",
+    "NATIONAL_VO_SCHOOLS",
+    "VWO_EXAM_YEARS",
+    "generate_raw_data",
+]
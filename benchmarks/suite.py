@@ -0,0 +1,423 @@
+from __future__ import annotations
+
+"""
+基准用例注册表、计时与基线比较。
+
+每个用例由 setup(ws) 返回一个无参可调用对象，调用一次即测一次，返回处理的行数。
+setup 不计时；加载器的输出、计算结果等前置数据由 Workspace 惰性缓存，多个用例共享。
+
+结果 JSON：
+    {"version": 1, "scale", "seed", "python", "platform", "repeats",
+     "results": {用例名: {"group", "median_seconds", "min_seconds", "rows"}}}
+
+比较规则：median 超过基线 median × (1 + tolerance)，且绝对差超过 min_delta_seconds（避免毫秒级用例的计时噪声）即判为回退。
+"""
+
+import json
+import platform
+import shutil
+import statistics
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from alleschools import config as config_mod
+from alleschools import schema_validator as sv
+from alleschools.compute import compute_po_xy, compute_vo_xy, compute_vwo_profile_indices
+from alleschools.exporters import csv_exporter, geojson_exporter, long_table_exporter
+from alleschools.exporters.points_exporter import export_po_points
+from alleschools.exporters.search_index_exporter import export_search_index
+from alleschools.loaders import cbs_loader, duo_loader, vo_loader
+from alleschools.loaders.vwo_exam_loader import load_vwo_central_exam_scores
+from alleschools.pipeline import run_po_pipeline, run_vo_pipeline
+
+from benchmarks.generate import VWO_EXAM_YEARS, generate_raw_data
+
+RESULTS_VERSION = 1
+DEFAULT_REPEATS = 3
+DEFAULT_TOLERANCE = 0.25
+DEFAULT_MIN_DELTA_SECONDS = 0.01
+
+GROUPS = ("loader", "compute", "exporter", "schema", "pipeline")
+
+
+class Workspace:
+    """一次基准运行的数据根：生成合成原始数据，并缓存各阶段的中间结果。"""
+
+    def __init__(self, root: Path, *, scale: float = 1.0, seed: int = 0) -> None:
+        self.root = root
+        self.scale = scale
+        self.seed = seed
+        self.raw = root / "raw_data"
+        self.out = root / "bench_out"
+        self.summary = generate_raw_data(self.raw, scale=scale, seed=seed)
+        self.out.mkdir(parents=True, exist_ok=True)
+        self._cache: Dict[str, Any] = {}
+
+    def config(self) -> Dict[str, Any]:
+        """
+        指向本工作区的完整有效配置（每次返回新副本，流水线用例可放心修改）。
+
+        关闭阶段缓存（否则重复运行计时的是缓存命中）与运行历史（基准运行不写入历史库）。
+        """
+        return config_mod.build_effective_config(
+            overrides={
+                "data_root": str(self.root),
+                "stage_cache": {"enabled": False},
+                "history": {"enabled": False},
+            }
+        )
+
+    def _cached(self, key: str, build: Callable[[], Any]) -> Any:
+        if key not in self._cache:
+            self._cache[key] = build()
+        return self._cache[key]
+
+    def woz(self) -> Any:
+        return self._cached("woz", lambda: cbs_loader.load_woz_pc4_year(str(self.raw / "cbs_woz_per_postcode_year.csv")))
+
+    def po_schools(self) -> Dict[str, dict]:
+        return self._cached("po_schools", lambda: duo_loader.load_schooladviezen_po(str(self.raw)))
+
+    def year_cols(self) -> List[Any]:
+        return list(((self.config().get("vo") or {}).get("weights") or {}).get("year_cols") or [])
+
+    def vestigingen(self) -> Dict[str, str]:
+        return self._cached(
+            "vestigingen", lambda: vo_loader.load_vestigingen_postcode(str(self.raw), "duo_vestigingen_vo.csv")
+        )
+
+    def vo_schools(self) -> Dict[str, Any]:
+        return self._cached(
+            "vo_schools",
+            lambda: vo_loader.load_exam_schools(
+                str(self.raw), "duo_examen_raw_all.csv", "duo_examen_raw.csv", self.year_cols()
+            ),
+        )
+
+    def vwo_central(self) -> Dict[str, Any]:
+        files = {y: f"examenkandidaten-vwo-en-examencijfers-{y}.csv" for y in VWO_EXAM_YEARS}
+        return self._cached("vwo_central", lambda: load_vwo_central_exam_scores(str(self.raw), files))
+
+    def po_rows(self) -> List[Dict[str, Any]]:
+        def build() -> List[Dict[str, Any]]:
+            woz, woz_years = self.woz()
+            rows, _ = compute_po_xy(self.po_schools(), woz, woz_years)
+            return rows
+
+        return self._cached("po_rows", build)
+
+    def po_points_and_meta(self) -> Any:
+        """完整跑一次 PO 流水线，取其写出的 points / meta JSON（schema 校验用例的输入）。"""
+
+        def build() -> Any:
+            csv_path, _ = run_po_pipeline(self.config())
+            stem = csv_path.stem
+            points = json.loads((csv_path.parent / f"{stem}.json").read_text(encoding="utf-8"))
+            meta = json.loads((csv_path.parent / f"{stem}_meta.json").read_text(encoding="utf-8"))
+            return points, meta
+
+        return self._cached("po_points_and_meta", build)
+
+
+@dataclass(frozen=True)
+class Case:
+    name: str
+    group: str
+    setup: Callable[[Workspace], Callable[[], int]]
+
+
+CASES: List[Case] = []
+
+
+def case(name: str, group: str) -> Callable[[Callable[[Workspace], Callable[[], int]]], Callable[[Workspace], Callable[[], int]]]:
+    """注册基准用例的装饰器。"""
+    if group not in GROUPS:
+        raise ValueError(f"unknown benchmark group: {group}")
+
+    def register(setup: Callable[[Workspace], Callable[[], int]]) -> Callable[[Workspace], Callable[[], int]]:
+        CASES.append(Case(name, group, setup))
+        return setup
+
+    return register
+
+
+# ----------------------------------------------------------------------
+# 加载器
+# ----------------------------------------------------------------------
+
+
+@case("loader.cbs_woz", "loader")
+def _load_woz(ws: Workspace) -> Callable[[], int]:
+    path = str(ws.raw / "cbs_woz_per_postcode_year.csv")
+    return lambda: len(cbs_loader.load_woz_pc4_year(path)[0])
+
+
+@case("loader.duo_schooladviezen", "loader")
+def _load_schooladviezen(ws: Workspace) -> Callable[[], int]:
+    return lambda: len(duo_loader.load_schooladviezen_po(str(ws.raw)))
+
+
+@case("loader.vo_vestigingen", "loader")
+def _load_vestigingen(ws: Workspace) -> Callable[[], int]:
+    return lambda: len(vo_loader.load_vestigingen_postcode(str(ws.raw), "duo_vestigingen_vo.csv"))
+
+
+@case("loader.vo_exams", "loader")
+def _load_vo_exams(ws: Workspace) -> Callable[[], int]:
+    year_cols = ws.year_cols()
+    return lambda: len(
+        vo_loader.load_exam_schools(str(ws.raw), "duo_examen_raw_all.csv", "duo_examen_raw.csv", year_cols)
+    )
+
+
+@case("loader.vwo_central_exams", "loader")
+def _load_vwo_central(ws: Workspace) -> Callable[[], int]:
+    files = {y: f"examenkandidaten-vwo-en-examencijfers-{y}.csv" for y in VWO_EXAM_YEARS}
+    return lambda: len(load_vwo_central_exam_scores(str(ws.raw), files))
+
+
+# ----------------------------------------------------------------------
+# 计算
+# ----------------------------------------------------------------------
+
+
+@case("compute.po_xy", "compute")
+def _compute_po(ws: Workspace) -> Callable[[], int]:
+    schools = ws.po_schools()
+    woz, woz_years = ws.woz()
+    return lambda: len(compute_po_xy(schools, woz, woz_years)[0])
+
+
+@case("compute.vo_xy", "compute")
+def _compute_vo(ws: Workspace) -> Callable[[], int]:
+    schools, postcodes, year_cols = ws.vo_schools(), ws.vestigingen(), ws.year_cols()
+    return lambda: len(compute_vo_xy(schools, postcodes, year_cols, 20)[0])
+
+
+@case("compute.vwo_profiles", "compute")
+def _compute_vwo_profiles(ws: Workspace) -> Callable[[], int]:
+    central = ws.vwo_central()
+    order = sorted(VWO_EXAM_YEARS)
+    weights = {y: float(i + 1) for i, y in enumerate(order)}
+    return lambda: sum(
+        len(v) for v in compute_vwo_profile_indices(central, year_order=order, year_weights=weights).values()
+    )
+
+
+# ----------------------------------------------------------------------
+# 导出器
+# ----------------------------------------------------------------------
+
+
+@case("export.po_csv", "exporter")
+def _export_csv(ws: Workspace) -> Callable[[], int]:
+    rows = ws.po_rows()
+
+    def run() -> int:
+        csv_exporter.export_po_csv(rows, ws.out / "po.csv")
+        return len(rows)
+
+    return run
+
+
+@case("export.po_points", "exporter")
+def _export_points(ws: Workspace) -> Callable[[], int]:
+    rows = ws.po_rows()
+
+    def run() -> int:
+        export_po_points(rows, ws.out / "po_points.json")
+        return len(rows)
+
+    return run
+
+
+@case("export.po_geojson", "exporter")
+def _export_geojson(ws: Workspace) -> Callable[[], int]:
+    rows = ws.po_rows()
+    return lambda: len(geojson_exporter.export_geojson(rows, ws.out / "po_geo.json")["features"])
+
+
+@case("export.po_long_table", "exporter")
+def _export_long(ws: Workspace) -> Callable[[], int]:
+    rows = ws.po_rows()
+
+    def run() -> int:
+        long_table_exporter.export_po_long_table(rows, ws.out / "po_long.csv")
+        return len(rows)
+
+    return run
+
+
+@case("export.search_index", "exporter")
+def _export_search(ws: Workspace) -> Callable[[], int]:
+    rows = ws.po_rows()
+
+    def run() -> int:
+        export_search_index(rows, ws.out / "po_search.json", "po")
+        return len(rows)
+
+    return run
+
+
+# ----------------------------------------------------------------------
+# schema 校验与端到端流水线
+# ----------------------------------------------------------------------
+
+
+@case("schema.validate_points_against_meta", "schema")
+def _validate(ws: Workspace) -> Callable[[], int]:
+    points, meta = ws.po_points_and_meta()
+
+    def run() -> int:
+        errors = sv.validate_points_against_meta(points, meta, layer="po")
+        if errors:
+            raise AssertionError(f"generated points fail schema validation: {errors[:3]}")
+        return len(points)
+
+    return run
+
+
+@case("pipeline.po", "pipeline")
+def _pipeline_po(ws: Workspace) -> Callable[[], int]:
+    return lambda: int(run_po_pipeline(ws.config())[1]["n_schools"])
+
+
+@case("pipeline.vo", "pipeline")
+def _pipeline_vo(ws: Workspace) -> Callable[[], int]:
+    return lambda: int(run_vo_pipeline(ws.config())[1]["n_schools"])
+
+
+# ----------------------------------------------------------------------
+# 运行与比较
+# ----------------------------------------------------------------------
+
+
+def select_cases(only: Optional[Sequence[str]] = None) -> List[Case]:
+    """按名称或名称前缀（如 "loader" / "compute.po_xy"）筛选用例；未给出时返回全部。"""
+    if not only:
+        return list(CASES)
+    picked = [c for c in CASES if any(c.name == p or c.name.startswith(p.rstrip(".") + ".") or c.group == p for p in only)]
+    if not picked:
+        raise ValueError(f"no benchmark matches {list(only)}")
+    return picked
+
+
+def time_case(fn: Callable[[], int], repeats: int) -> Dict[str, Any]:
+    timings: List[float] = []
+    rows = 0
+    for _ in range(max(1, repeats)):
+        t0 = time.perf_counter()
+        rows = fn()
+        timings.append(time.perf_counter() - t0)
+    return {
+        "median_seconds": round(statistics.median(timings), 6),
+        "min_seconds": round(min(timings), 6),
+        "rows": rows,
+    }
+
+
+def run_suite(
+    *,
+    scale: float = 1.0,
+    seed: int = 0,
+    repeats: int = DEFAULT_REPEATS,
+    only: Optional[Sequence[str]] = None,
+    workdir: Optional[Path] = None,
+    progress: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """生成数据并运行所选用例；workdir 未给出时使用临时目录并在结束后删除。"""
+    cases = select_cases(only)
+    tmp = None
+    if workdir is None:
+        tmp = tempfile.mkdtemp(prefix="alleschools-bench-")
+        workdir = Path(tmp)
+    try:
+        ws = Workspace(workdir, scale=scale, seed=seed)
+        results: Dict[str, Any] = {}
+        for c in cases:
+            record = {"group": c.group, **time_case(c.setup(ws), repeats)}
+            results[c.name] = record
+            if progress is not None:
+                progress(c.name, record)
+    finally:
+        if tmp is not None:
+            shutil.rmtree(tmp, ignore_errors=True)
+    return {
+        "version": RESULTS_VERSION,
+        "scale": scale,
+        "seed": seed,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeats": repeats,
+        "results": results,
+    }
+
+
+def compare(
+    results: Dict[str, Any],
+    baseline: Dict[str, Any],
+    *,
+    tolerance: float = DEFAULT_TOLERANCE,
+    min_delta_seconds: float = DEFAULT_MIN_DELTA_SECONDS,
+) -> List[Dict[str, Any]]:
+    """
+    返回逐用例比较记录 {"name", "baseline", "current", "ratio", "status"}，status 为
+    "ok" / "regression" / "faster" / "new"（基线中没有该用例）。
+    scale 或 seed 与基线不一致时抛出 ValueError：不同规模的计时不可比。
+    """
+    for key in ("scale", "seed"):
+        if results.get(key) != baseline.get(key):
+            raise ValueError(f"{key} mismatch: results {results.get(key)!r} vs baseline {baseline.get(key)!r}")
+    base_results = baseline.get("results") or {}
+    out: List[Dict[str, Any]] = []
+    for name, cur in (results.get("results") or {}).items():
+        current = float(cur["median_seconds"])
+        base = base_results.get(name)
+        if base is None:
+            out.append({"name": name, "baseline": None, "current": current, "ratio": None, "status": "new"})
+            continue
+        ref = float(base["median_seconds"])
+        ratio = current / ref if ref > 0 else float("inf")
+        delta = current - ref
+        if delta > ref * tolerance and delta > min_delta_seconds:
+            status = "regression"
+        elif -delta > ref * tolerance and -delta > min_delta_seconds:
+            status = "faster"
+        else:
+            status = "ok"
+        out.append({"name": name, "baseline": ref, "current": current, "ratio": round(ratio, 3), "status": status})
+    return out
+
+
+def regressions(comparison: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [c for c in comparison if c["status"] == "regression"]
+
+
+def load_results(path: Path) -> Dict[str, Any]:
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def write_results(results: Dict[str, Any], path: Path) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(results, ensure_ascii=False, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+    return path
+
+
+__all__ = [
+    "CASES",
+    "Case",
+    "DEFAULT_REPEATS",
+    "DEFAULT_TOLERANCE",
+    "Workspace",
+    "case",
+    "compare",
+    "load_results",
+    "regressions",
+    "run_suite",
+    "select_cases",
+    "time_case",
+    "write_results",
+]
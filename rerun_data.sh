@@ -9,6 +9,9 @@ echo "== 统一入口：fetch + ETL (VO + PO) =="
 # full 子命令的 --all / --vo / --po 互斥，这里用 --all 覆盖 VO+PO。
 python -m alleschools.cli full --all
 
+# 注意：不在此运行 publish —— 构建环境每次从干净检出开始，没有上一发布版本可对比；
+# publish 需在保留 generated/published/ 的主机上手动运行（见 README）。
+
 # 2. 可选：单独 schema 校验（若已在 config 中开启 schema_validation，可省略）
 echo "== 可选：校验 VO points + meta（generated/ 下） =="
 python -m alleschools.cli validate \
@@ -1,4 +1,5 @@
 """pytest 配置：保证从项目根可导入，并提供 pipeline 测试用临时 data_root 避免污染项目根。"""
+import csv
 import os
 import shutil
 import sys
@@ -26,3 +27,29 @@ def pipeline_data_root(tmp_path):
     if raw_src.is_dir():
         shutil.copytree(raw_src, tmp_path / "raw_data", dirs_exist_ok=True)
     return tmp_path
+
+
+@pytest.fixture
+def tiny_vo_data_root(tmp_path):
+    """
+    写出最小的 raw_data/duo_examen_raw_all.csv（4 所 HAVO/VWO 学校 + 1 所纯 VMBO 学校，两个 gemeente），
+    供不依赖真实 DUO 数据的 VO 流水线测试使用。
+    """
+    raw = tmp_path / "raw_data"
+    raw.mkdir(parents=True, exist_ok=True)
+    header = ["INSTELLINGSCODE", "VESTIGINGSCODE", "INSTELLINGSNAAM VESTIGING", "GEMEENTENAAM",
+              "ONDERWIJSTYPE VO", "X", "OPLEIDINGSNAAM"] + [f"C{i}" for i in range(7, 60)]
+    with (raw / "duo_examen_raw_all.csv").open("w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f, delimiter=";")
+        w.writerow(header)
+        for i in range(5):
+            brin = f"{i:02d}VO00"
+            rows = [("VMBO", "techniek")] if i == 4 else [("VWO", "N&T"), ("HAVO", "E&M")]
+            for otype, opl in rows:
+                r = [brin[:4], brin, f"College {i}", "G" if i < 3 else "H", otype, "", opl] + [""] * 53
+                for j, col in enumerate((13, 22, 31, 40, 49)):
+                    kand = 10 + 3 * i + (j * (i + 1)) % 7
+                    r[col] = str(kand)
+                    r[col + 1] = str(kand - (i + j) % 4)
+                w.writerow(r)
+    return tmp_path
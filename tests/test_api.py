@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+"""进程内 API：compute_layer 不写文件、返回列式结果；write() 产物与流水线逐字节一致。"""
+
+from pathlib import Path
+
+import pytest
+
+import alleschools.config as cfg
+from alleschools import Result, compute_layer
+from alleschools.pipeline import run_vo_pipeline
+
+
+def _config(data_root: Path) -> dict:
+    return cfg.build_effective_config(overrides={"data_root": str(data_root)})
+
+
+def test_compute_layer_returns_results_without_writing(tiny_vo_data_root: Path) -> None:
+    res = compute_layer("vo", _config(tiny_vo_data_root))
+    assert isinstance(res, Result)
+    assert not (tiny_vo_data_root / "generated").exists()
+    assert not list(tiny_vo_data_root.glob("run_report_*.json"))
+
+    assert len(res.rows) == 5 and res.excluded == []
+    assert set(res.columns) == set(res.fieldnames)
+    assert res.columns["BRIN"] == [row["BRIN"] for row in res.rows]
+    assert res.data_quality is not None and "missing_postcode" in res.data_quality
+    assert "compute.vo_xy" in [s["name"] for s in res.performance["stages"]]
+
+
+def test_write_matches_pipeline_outputs(tiny_vo_data_root: Path, tmp_path: Path) -> None:
+    res = compute_layer("vo", _config(tiny_vo_data_root))
+    written = res.write("csv", "points", "excluded", data_root=tmp_path)
+    assert sorted(written) == ["csv", "excluded", "points"]
+
+    run_vo_pipeline(_config(tiny_vo_data_root))
+    for path in written.values():
+        reference = tiny_vo_data_root / path.relative_to(tmp_path)
+        assert path.read_bytes() == reference.read_bytes()
+
+
+def test_invalid_layer_and_sink(tiny_vo_data_root: Path) -> None:
+    with pytest.raises(ValueError):
+        compute_layer("mbo", _config(tiny_vo_data_root))
+    with pytest.raises(ValueError, match="Unknown sinks"):
+        compute_layer("vo", _config(tiny_vo_data_root), sinks=("pdf",))
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+"""基准套件：合成数据生成器的确定性、加载器可解析性、基线比较与小规模运行。"""
+
+import hashlib
+from pathlib import Path
+
+import pytest
+
+from alleschools.loaders import cbs_loader, duo_loader, vo_loader
+from benchmarks.generate import generate_raw_data
+from benchmarks.suite import compare, regressions, run_suite
+
+
+def _digest(raw: Path) -> dict:
+    return {p.name: hashlib.sha256(p.read_bytes()).hexdigest() for p in sorted(raw.iterdir())}
+
+
+def test_generator_is_deterministic_and_loadable(tmp_path: Path) -> None:
+    a = generate_raw_data(tmp_path / "a", scale=0.02, seed=7)
+    b = generate_raw_data(tmp_path / "b", scale=0.02, seed=7)
+    c = generate_raw_data(tmp_path / "c", scale=0.02, seed=8)
+    assert a == b
+    assert _digest(tmp_path / "a") == _digest(tmp_path / "b")
+    assert _digest(tmp_path / "a") != _digest(tmp_path / "c")
+
+    woz, years = cbs_loader.load_woz_pc4_year(str(tmp_path / "a" / "cbs_woz_per_postcode_year.csv"))
+    assert len(woz) == a["rows"]["cbs_woz_per_postcode_year.csv"] and years
+    assert len(duo_loader.load_schooladviezen_po(str(tmp_path / "a"))) == a["n_po_schools"]
+    assert len(vo_loader.load_vestigingen_postcode(str(tmp_path / "a"), "duo_vestigingen_vo.csv")) == a["n_vo_schools"]
+
+
+def test_compare_flags_regressions_beyond_tolerance() -> None:
+    baseline = {"scale": 1.0, "seed": 0, "results": {"a": {"median_seconds": 1.0}, "b": {"median_seconds": 1.0}}}
+    results = {
+        "scale": 1.0,
+        "seed": 0,
+        "results": {
+            "a": {"median_seconds": 1.2},
+            "b": {"median_seconds": 1.5},
+            "c": {"median_seconds": 0.1},
+        },
+    }
+    by_name = {c["name"]: c["status"] for c in compare(results, baseline, tolerance=0.25)}
+    assert by_name == {"a": "ok", "b": "regression", "c": "new"}
+    assert [c["name"] for c in regressions(compare(results, baseline, tolerance=0.25))] == ["b"]
+    # 毫秒级用例的抖动不算回退
+    tiny = {"scale": 1.0, "seed": 0, "results": {"a": {"median_seconds": 0.004}}}
+    tiny_base = {"scale": 1.0, "seed": 0, "results": {"a": {"median_seconds": 0.002}}}
+    assert compare(tiny, tiny_base)[0]["status"] == "ok"
+    with pytest.raises(ValueError):
+        compare({**results, "scale": 10.0}, baseline)
+
+
+def test_run_suite_small_scale(tmp_path: Path) -> None:
+    results = run_suite(scale=0.02, repeats=1, only=["loader", "compute.po_xy", "pipeline.po"], workdir=tmp_path)
+    assert results["scale"] == 0.02 and results["repeats"] == 1
+    assert "loader.vo_exams" in results["results"] and "pipeline.vo" not in results["results"]
+    assert results["results"]["pipeline.po"]["rows"] > 0
+    assert all(r["median_seconds"] >= 0 for r in results["results"].values())
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+"""X/Y 密度金字塔（density_exporter）：逐级分箱、2×2 合并一致性、主导类型与流水线集成测试。"""
+
+import json
+from pathlib import Path
+
+import alleschools.config as cfg
+from alleschools.exporters.density_exporter import build_density_pyramid, export_density_tiles
+from alleschools.pipeline import run_vo_pipeline
+
+POINTS = [
+    {"x_linear": 0.0, "y_linear": 0.0, "size": 10, "school_type": "Bo"},
+    {"x_linear": 10.0, "y_linear": 5.0, "size": 20, "school_type": "Bo"},
+    {"x_linear": 90.0, "y_linear": 95.0, "size": 30, "school_type": "Sbo"},
+    {"x_linear": 100.0, "y_linear": 100.0, "size": 40, "school_type": "Sbo"},
+    {"x_linear": 100.0, "y_linear": 100.0, "size": 1, "school_type": "Bo"},
+    {"x_linear": None, "y_linear": 50.0, "size": 99, "school_type": "Bo"},
+]
+
+
+def test_build_density_pyramid_levels() -> None:
+    ds = build_density_pyramid(POINTS, base_bins=2, levels=3)
+    assert ds["n_points"] == 5
+    assert ds["extent"] == [0.0, 0.0, 100.0, 100.0]
+    assert ds["types"] == ["Bo", "Sbo"]
+    assert [lvl["bins"] for lvl in ds["levels"]] == [2, 4, 8]
+
+    coarse = ds["levels"][0]
+    assert (coarse["ix"], coarse["iy"], coarse["count"]) == ([0, 1], [0, 1], [2, 3])
+    assert coarse["size_sum"] == [30.0, 71.0]
+    assert [ds["types"][t] for t in coarse["type"]] == ["Bo", "Sbo"]
+    # 每一级的点数与规模合计守恒；最大坐标落在最后一个箱
+    for lvl in ds["levels"]:
+        assert sum(lvl["count"]) == 5
+        assert sum(lvl["size_sum"]) == 101.0
+    fine = ds["levels"][-1]
+    assert fine["ix"][-1] == fine["bins"] - 1 and fine["count"][-1] == 3
+
+
+def test_export_density_tiles_writes_json(tmp_path: Path) -> None:
+    path = tmp_path / "po_density.json"
+    doc = export_density_tiles({"po": {"points": POINTS}, "empty": {"points": []}}, path, "po", levels=2)
+    assert json.loads(path.read_text(encoding="utf-8")) == doc
+    assert doc["n_levels"] == 2
+    assert doc["datasets"]["empty"]["levels"] == [] and doc["datasets"]["empty"]["extent"] is None
+
+
+def test_vo_pipeline_writes_density_tiles(tiny_vo_data_root: Path) -> None:
+    effective = cfg.build_effective_config(overrides={"data_root": str(tiny_vo_data_root)})
+    effective["vo"]["output"]["export_density_tiles"] = True
+    _, stats = run_vo_pipeline(effective)
+    gen = tiny_vo_data_root / "generated"
+    meta = json.loads((gen / "schools_xy_coords_meta.json").read_text(encoding="utf-8"))
+    doc = json.loads((gen / meta["density"]["path"]).read_text(encoding="utf-8"))
+    points = json.loads(Path(stats["points_path"]).read_text(encoding="utf-8"))
+    assert "vo" in meta["density"]["datasets"]
+    assert sum(doc["datasets"]["vo"]["levels"][0]["count"]) == len(points)
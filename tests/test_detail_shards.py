@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+"""学校明细分片（detail_exporter）：逐年序列、内容寻址分片、BRIN 前缀索引与流水线集成测试。"""
+
+import hashlib
+import json
+from pathlib import Path
+
+import alleschools.config as cfg
+from alleschools.exporters.detail_exporter import build_school_details, export_detail_shards, shard_for_brin
+from alleschools.pipeline import run_vo_pipeline
+
+ROWS = [
+    {"BRIN": "01AA00", "vestigingsnaam": "A", "gemeente": "DELFT", "type": "Bo", "X_linear": 10.0,
+     "Y_linear": 300.0, "pupils_total": 100},
+    {"BRIN": "01AB00", "vestigingsnaam": "B", "gemeente": "DELFT", "type": "Bo", "X_linear": 20.0,
+     "Y_linear": 400.0, "pupils_total": 50},
+    {"BRIN": "GM:LEIDEN", "vestigingsnaam": "LEIDEN", "gemeente": "LEIDEN", "type": "Bo", "X_linear": 5.0,
+     "Y_linear": 200.0, "pupils_total": 80},
+]
+FACTS = {
+    "01AA00": [{"year": "2022-2023", "weight": 0.8, "pupils_total": 60, "vwo_share": 10.0, "woz_used": 310.0}],
+    "01AB00": [{"year": "2023-2024", "weight": 1.0, "pupils_total": 50, "vwo_share": 20.0, "woz_used": None}],
+}
+
+
+def test_build_school_details_skips_rows_without_facts() -> None:
+    details = build_school_details(ROWS, "po", FACTS)
+    assert sorted(details) == ["01AA00", "01AB00"]
+    assert details["01AA00"]["size"] == 100
+    assert details["01AA00"]["years"][0]["woz_used"] == 310.0
+
+    vo = build_school_details(
+        [dict(ROWS[0], candidates_total=10)],
+        "vo",
+        FACTS,
+        profile_years={"01AA00": {"2022-2023": {"NT": 6.12345}}},
+        profile_indices={"NT": {"01AA00": 6.5}, "EM": {}},
+    )
+    assert vo["01AA00"]["profiles"] == {"2022-2023": {"NT": 6.123}}
+    assert vo["01AA00"]["profile_indices"] == {"NT": 6.5}
+
+
+def test_export_detail_shards_content_addressed(tmp_path: Path) -> None:
+    details = build_school_details(ROWS, "po", FACTS)
+    index_path = tmp_path / "generated" / "po_details.json"
+    index = export_detail_shards(details, index_path, "po", prefix_length=4)
+    assert json.loads(index_path.read_text(encoding="utf-8")) == index
+    assert sorted(index["shards"]) == ["01AA", "01AB"]
+
+    entry = shard_for_brin(index, "01AB00")
+    body = (index_path.parent / entry["path"]).read_bytes()
+    assert entry["path"] == f"details/po/{hashlib.sha256(body).hexdigest()[:16]}.json"
+    assert json.loads(body)["01AB00"]["name"] == "B"
+    assert shard_for_brin(index, "99ZZ00") is None
+
+    # 内容不变则文件名不变；前缀变化后旧分片被清理
+    again = export_detail_shards(details, index_path, "po", prefix_length=4)
+    assert again["shards"] == index["shards"]
+    export_detail_shards(details, index_path, "po", prefix_length=2)
+    assert len(list((index_path.parent / "details" / "po").glob("*.json"))) == 1
+
+
+def test_vo_pipeline_writes_detail_shards(tiny_vo_data_root: Path) -> None:
+    effective = cfg.build_effective_config(overrides={"data_root": str(tiny_vo_data_root)})
+    effective["vo"]["output"]["export_detail_shards"] = True
+    _, stats = run_vo_pipeline(effective)
+    gen = tiny_vo_data_root / "generated"
+    meta = json.loads((gen / "schools_xy_coords_meta.json").read_text(encoding="utf-8"))
+    index = json.loads((gen / meta["details"]["index"]).read_text(encoding="utf-8"))
+    points = json.loads(Path(stats["points_path"]).read_text(encoding="utf-8"))
+    assert index["n_schools"] == len(points)
+    for p in points:
+        shard = json.loads((gen / shard_for_brin(index, p["brin"])["path"]).read_text(encoding="utf-8"))
+        assert shard[p["brin"]]["years"], p["brin"]
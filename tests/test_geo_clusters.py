@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+"""地图分层聚类索引（cluster_exporter）：逐级贪心半径聚类、parent 指针一致性与流水线集成测试。"""
+
+import json
+from pathlib import Path
+
+import alleschools.config as cfg
+from alleschools.exporters.cluster_exporter import build_cluster_index
+from alleschools.pipeline import run_vo_pipeline
+
+
+def _feature(brin: str, lon: float, lat: float, x: float, size: int) -> dict:
+    return {
+        "type": "Feature",
+        "properties": {"BRIN": brin, "X_linear": x, "Y_linear": 10.0, "pupils_total": size},
+        "geometry": {"type": "Point", "coordinates": [lon, lat]},
+    }
+
+
+FEATURES = [
+    _feature("A", 4.900, 52.370, 10.0, 100),
+    _feature("B", 4.901, 52.371, 30.0, 300),  # 与 A 相距约 130 米
+    _feature("C", 5.120, 52.090, 50.0, 50),  # Utrecht，与 A/B 相距约 40 公里
+    {"type": "Feature", "properties": {"BRIN": "D"}, "geometry": None},
+]
+
+
+def test_build_cluster_index_merges_by_zoom() -> None:
+    index = build_cluster_index(FEATURES, max_zoom=16)
+    levels = {lvl["zoom"]: lvl for lvl in index["levels"]}
+    assert index["n_points"] == 3
+    assert levels[17]["brin"] == ["A", "B", "C"]
+    assert levels[0]["n"] == 1 and levels[0]["count"] == [3]
+    assert levels[0]["size"] == [450.0] and levels[0]["x"] == [30.0]
+    # 城市级缩放：A/B 合并，C 单独
+    assert sorted(levels[10]["count"]) == [1, 2]
+    assert levels[16]["n"] == 3
+    # parent 指针：每级的学校数由下一级按 parent 汇总得到
+    for z in range(0, 17):
+        child = levels[z + 1]
+        totals = [0] * levels[z]["n"]
+        for i, p in enumerate(child["parent"]):
+            totals[p] += child["count"][i]
+        assert totals == levels[z]["count"]
+
+
+def test_vo_pipeline_writes_geo_clusters(tiny_vo_data_root: Path) -> None:
+    lookup = tiny_vo_data_root / "pc4.csv"
+    lookup.write_text("pc4,lat,lon\n", encoding="utf-8")
+    effective = cfg.build_effective_config(overrides={"data_root": str(tiny_vo_data_root)})
+    effective["vo"]["output"]["export_geo_clusters"] = True
+    effective["vo"]["output"]["pc4_centroids_path"] = "pc4.csv"
+    _, stats = run_vo_pipeline(effective)
+    gen = tiny_vo_data_root / "generated"
+    meta = json.loads((gen / "schools_xy_coords_meta.json").read_text(encoding="utf-8"))
+    doc = json.loads((gen / meta["geo_clusters"]["path"]).read_text(encoding="utf-8"))
+    assert Path(stats["geojson_path"]).parent == gen
+    assert doc["layer"] == "vo" and doc["n_points"] == meta["geo_clusters"]["n_points"]
+    assert len(doc["levels"]) == doc["max_zoom"] - doc["min_zoom"] + 2
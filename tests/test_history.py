@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+"""运行历史库（history）：只追加写入、滚动基线偏差检测与流水线集成测试。"""
+
+import json
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+import alleschools.config as cfg
+from alleschools import history
+from alleschools.cli import main as cli_main
+from alleschools.pipeline import run_vo_pipeline
+
+
+def _report(layer: str, duration: float, n_schools: int, load_seconds: float, status: str = "success") -> dict:
+    return {
+        "pipeline_type": layer,
+        "started_at": "2026-01-01T00:00:00+00:00",
+        "duration_seconds": duration,
+        "outputs": {layer: {"n_schools": n_schools, "n_excluded": 0}},
+        "summary": {"status": status},
+        "performance": {
+            "totals": {"peak_rss_mb": 50.0},
+            "stages": [
+                {"name": "load", "wall_seconds": load_seconds, "rows_out": n_schools},
+                {"name": "export.csv", "wall_seconds": 0.01, "rows_in": n_schools},
+            ],
+        },
+    }
+
+
+def test_record_and_load_runs_is_append_only(tmp_path: Path) -> None:
+    db = tmp_path / "history.sqlite"
+    run_id = history.record_run(
+        db,
+        _report("po", 1.0, 100, 0.5),
+        config_hash="abc",
+        inputs={"raw/a.csv": {"sha256": "00ff", "bytes": 3}},
+        git_commit="deadbeef",
+    )
+    runs = history.load_runs(db)
+    assert [r["id"] for r in runs] == [run_id]
+    assert runs[0]["git_commit"] == "deadbeef" and runs[0]["n_schools"] == 100
+    assert runs[0]["inputs"] == {"raw/a.csv": "00ff"}
+    assert runs[0]["stages"]["load"] == {"wall_seconds": 0.5, "rows_in": None, "rows_out": 100, "cached": False}
+    assert history.load_report(db, run_id)["duration_seconds"] == 1.0
+    conn = sqlite3.connect(str(db))
+    with pytest.raises(sqlite3.DatabaseError, match="append-only"):
+        conn.execute("DELETE FROM runs")
+    conn.close()
+
+
+def test_detect_anomalies_against_rolling_baseline(tmp_path: Path) -> None:
+    db = tmp_path / "history.sqlite"
+    for _ in range(3):
+        history.record_run(db, _report("vo", 1.0, 100, 0.5))
+    history.record_run(db, _report("vo", 9.0, 0, 0.0, status="error"))
+    history.record_run(db, _report("po", 5.0, 7, 4.0))
+    slow = history.record_run(db, _report("vo", 2.0, 100, 1.5))
+    fewer = history.record_run(db, _report("vo", 1.0, 40, 0.5))
+    runs = history.load_runs(db)
+    flagged = history.detect_anomalies(runs, window=5, threshold=0.5)
+    assert set(flagged) == {4, slow, fewer}  # 失败运行本身也与基线比较，但不进入基线
+    assert any(n.startswith("load ") for n in flagged[slow])
+    assert any(n.startswith("n_schools 40") for n in flagged[fewer])
+    assert history.baseline_ratio(runs, runs.index(next(r for r in runs if r["id"] == slow))) == pytest.approx(2.0)
+
+
+def test_cached_runs_stay_out_of_timing_baselines(tmp_path: Path) -> None:
+    """命中阶段缓存的阶段与运行不进入耗时基线；随后一次正常的未缓存运行不被标记为变慢。"""
+    db = tmp_path / "history.sqlite"
+    history.record_run(db, _report("vo", 1.0, 100, 0.5))
+    for _ in range(4):
+        cached = _report("vo", 0.02, 100, 0.001)
+        for stage in cached["performance"]["stages"]:
+            stage["cached"] = True
+        history.record_run(db, cached)
+    normal = history.record_run(db, _report("vo", 1.1, 100, 0.55))
+    runs = history.load_runs(db)
+    assert [r["cached"] for r in runs] == [False, True, True, True, True, False]
+    assert runs[1]["stages"]["load"]["cached"] is True
+    assert history.detect_anomalies(runs, window=3, threshold=0.5) == {}
+    assert history.baseline_ratio(runs, len(runs) - 1, window=3) == pytest.approx(1.1)
+    assert history.baseline_ratio(runs, 1) is None
+    assert normal == runs[-1]["id"]
+
+
+def test_config_hash_ignores_stage_cache_settings() -> None:
+    effective = cfg.build_effective_config()
+    forced = json.loads(json.dumps(effective))
+    forced["stage_cache"]["force"] = True
+    forced["stage_cache"]["enabled"] = False
+    assert history.config_hash(forced) == history.config_hash(effective)
+
+
+def test_vo_pipeline_appends_history(tiny_vo_data_root: Path, capsys: pytest.CaptureFixture) -> None:
+    effective = cfg.build_effective_config(overrides={"data_root": str(tiny_vo_data_root)})
+    run_vo_pipeline(effective)
+    run_vo_pipeline(effective)
+    report = json.loads((tiny_vo_data_root / "run_report_vo.json").read_text(encoding="utf-8"))[0]
+    assert report["history"] == {"path": "generated/run_history.sqlite", "run_id": 2}
+    runs = history.load_runs(tiny_vo_data_root / report["history"]["path"], layer="vo")
+    assert len(runs) == 2 and runs[0]["config_hash"] == history.config_hash(effective)
+    assert runs[1]["inputs"] and runs[1]["stages"]["load.duo_exams"]["rows_out"] == report["outputs"]["vo"]["n_schools"]
+    # 第二次运行全部命中阶段缓存
+    assert not runs[0]["cached"] and runs[1]["stages"]["load.duo_exams"]["cached"]
+
+    assert cli_main(["--data-root", str(tiny_vo_data_root), "history", "--check"]) == 0
+    assert "vo" in capsys.readouterr().out
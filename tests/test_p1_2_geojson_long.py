@@ -177,3 +177,60 @@ def test_run_po_pipeline_respects_export_long_table_false(pipeline_data_root):
     csv_path, stats = run_po_pipeline(effective)
     assert "geojson_path" in stats
     assert "long_table_path" not in stats
+
+
+def test_compute_po_xy_year_facts_and_star_tables(tmp_path: Path):
+    """compute_po_xy(year_facts=...) 保留逐年指标；star 模式写出维表（每 BRIN 一行）+ 逐年事实表。"""
+    from alleschools.compute import compute_po_xy
+
+    schools = {
+        "00AA": {
+            "naam": "A",
+            "gemeente": "G",
+            "postcode": "1234AB",
+            "pc4": "1234",
+            "soort_po": "Bo",
+            "years": {
+                ("2019", "2020"): {"total": 40, "vwo_equiv": 10.0},
+                ("2020", "2021"): {"total": 50, "vwo_equiv": 25.0},
+            },
+        },
+    }
+    woz = {("1234", 2019): 300.0}
+    year_facts: dict = {}
+    rows, _ = compute_po_xy(schools, woz, [2019], woz_strategy="drop", year_facts=year_facts)
+    facts = year_facts["00AA"]
+    assert [f["year"] for f in facts] == ["2019-2020", "2020-2021"]
+    assert facts[0]["vwo_share"] == 25.0
+    assert facts[1]["vwo_share"] == 50.0
+    assert facts[0]["woz_used"] == 300.0
+    assert facts[1]["woz_used"] is None
+
+    dim = tmp_path / "po_long_dim.csv"
+    fact = tmp_path / "po_long_fact.csv"
+    long_table_exporter.export_po_star_tables(rows, year_facts, dim, fact)
+    with dim.open(encoding="utf-8", newline="") as f:
+        dim_rows = list(csv.DictReader(f))
+    with fact.open(encoding="utf-8", newline="") as f:
+        fact_rows = list(csv.DictReader(f))
+    assert [r["BRIN"] for r in dim_rows] == ["00AA"]
+    assert "year" not in dim_rows[0]
+    assert len(fact_rows) == 2
+    assert list(fact_rows[0].keys()) == list(long_table_exporter.PO_FACT_FIELDNAMES)
+    assert fact_rows[1]["pupils_total"] == "50"
+
+
+def test_export_vo_star_tables_skips_brins_not_in_rows(tmp_path: Path):
+    """事实表只输出维表中存在的 BRIN（例如被隐私抑制的学校不应泄漏逐年明细）。"""
+    rows = [{"BRIN": "00VO", "vestigingsnaam": "VO A", "X_linear": 10.0, "Y_linear": 20.0}]
+    year_facts = {
+        "00VO": [{"year": "2019-2020", "candidates": 100, "vwo_share": 10.0, "science_share": 20.0}],
+        "99XX": [{"year": "2019-2020", "candidates": 3}],
+    }
+    dim = tmp_path / "vo_long_dim.csv"
+    fact = tmp_path / "vo_long_fact.csv"
+    long_table_exporter.export_vo_star_tables(rows, year_facts, dim, fact)
+    fact_lines = fact.read_text(encoding="utf-8").strip().splitlines()
+    assert len(fact_lines) == 2
+    assert fact_lines[1].startswith("00VO,2019-2020")
+    assert "99XX" not in fact.read_text(encoding="utf-8")
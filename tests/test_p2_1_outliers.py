@@ -78,3 +78,27 @@ def test_compute_vo_xy_outliers_clip_percentiles() -> None:
     assert xs[-1] < 100.0
     assert 0.0 <= xs[0] <= xs[-1] <= 100.0
 
+
+def test_compute_percentile_selection_matches_sorted_definition() -> None:
+    """基于选择的百分位数与“全排序 + 线性插值”定义逐值一致（含重复值与已排序输入）。"""
+    import random
+
+    from alleschools.compute.indicators import _compute_percentile
+
+    def by_sort(values, p):
+        vals = sorted(values)
+        k = (p / 100.0) * (len(vals) - 1)
+        i = int(k)
+        if i + 1 < len(vals):
+            return vals[i] + (k - i) * (vals[i + 1] - vals[i])
+        return vals[i]
+
+    rnd = random.Random(7)
+    for n in (1, 2, 33, 500):
+        for values in (
+            [round(rnd.uniform(0, 100), 2) for _ in range(n)],
+            [float(rnd.randint(0, 3)) for _ in range(n)],
+            sorted(rnd.uniform(0, 1) for _ in range(n)),
+        ):
+            for p in (1, 5, 37.5, 50, 95, 99):
+                assert _compute_percentile(values, p) == by_sort(values, p)
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+"""分阶段性能指标（perf.PerfRecorder）：阶段记录、合计、关闭模式、深度剖析产物与 run_report 集成测试。"""
+
+import json
+from pathlib import Path
+
+import alleschools.config as cfg
+from alleschools.cli import main
+from alleschools.perf import PerfRecorder
+from alleschools.pipeline import run_vo_pipeline
+
+
+def test_stage_records_and_totals(tmp_path: Path) -> None:
+    perf = PerfRecorder(trace_memory=True)
+    with perf.stage("load", rows_in=None) as st:
+        st.rows_out = 1000
+    out = tmp_path / "out.txt"
+    with perf.stage("export", rows_in=1000) as st:
+        out.write_text("x" * 4096, encoding="utf-8")
+        st.wrote(out)
+    report = perf.report()
+
+    assert [s["name"] for s in report["stages"]] == ["load", "export"]
+    load, export = report["stages"]
+    assert load["rows_out"] == 1000 and load["rows_in"] is None
+    assert load["wall_seconds"] >= 0 and load["cpu_seconds"] >= 0
+    assert export["bytes_written"] >= 4096
+    assert "py_alloc_peak_mb" in export
+    totals = report["totals"]
+    assert totals["n_stages"] == 2
+    assert totals["slowest_stage"] in ("load", "export")
+    assert totals["wall_seconds"] >= export["wall_seconds"]
+
+
+def test_disabled_recorder_skips_measurement() -> None:
+    perf = PerfRecorder.from_config({"performance": {"enabled": False, "tracemalloc": True}})
+    with perf.stage("load") as st:
+        st.rows_out = 3
+    report = perf.report()
+    assert report["enabled"] is False and report["tracemalloc"] is False
+    assert report["stages"] == [] and report["totals"]["slowest_stage"] is None
+
+
+def test_vo_run_report_includes_performance(tiny_vo_data_root: Path) -> None:
+    effective = cfg.build_effective_config(overrides={"data_root": str(tiny_vo_data_root)})
+    run_vo_pipeline(effective)
+    report = json.loads((tiny_vo_data_root / "run_report_vo.json").read_text(encoding="utf-8"))[0]
+    perf = report["performance"]
+    names = [s["name"] for s in perf["stages"]]
+    for name in ("load.duo_exams", "compute.vo_xy", "export.csv", "export.points", "meta"):
+        assert name in names
+    compute = next(s for s in perf["stages"] if s["name"] == "compute.vo_xy")
+    assert compute["rows_in"] >= compute["rows_out"] == report["outputs"]["vo"]["n_schools"]
+    assert perf["totals"]["n_stages"] == len(names)
+
+
+def _busy(n: int) -> list:
+    return [str(i) * 3 for i in range(n)]
+
+
+def test_profiling_writes_stage_artifacts(tmp_path: Path) -> None:
+    perf = PerfRecorder.from_config(
+        {"performance": {"profile_cpu": True, "profile_mem": True, "profile_top_n": 5}},
+        layer="po",
+        root=tmp_path,
+    )
+    with perf.stage("compute") as st:
+        kept = _busy(20000)
+        st.rows_out = len(kept)
+    report = perf.report()
+
+    files = report["stages"][0]["profile"]
+    assert files == {
+        "pstats": "generated/profile/po/01_compute.pstats",
+        "collapsed": "generated/profile/po/01_compute.collapsed.txt",
+        "alloc": "generated/profile/po/01_compute.alloc.txt",
+    }
+    assert report["collapsed_stacks"] == "generated/profile/po/po.collapsed.txt"
+    stacks = (tmp_path / files["collapsed"]).read_text(encoding="utf-8").splitlines()
+    assert any("_busy" in line for line in stacks)
+    for line in stacks:
+        frames, _, us = line.rpartition(" ")
+        assert frames and int(us) > 0
+    combined = (tmp_path / report["collapsed_stacks"]).read_text(encoding="utf-8").splitlines()
+    assert combined and all(line.startswith("compute;") for line in combined)
+    alloc = (tmp_path / files["alloc"]).read_text(encoding="utf-8").splitlines()
+    assert 1 < len(alloc) <= 6 and "test_perf.py:" in alloc[1]
+
+
+def test_cli_profile_flags_write_artifacts(tiny_vo_data_root: Path) -> None:
+    assert main(["--data-root", str(tiny_vo_data_root), "vo", "--profile-cpu"]) == 0
+    perf = json.loads((tiny_vo_data_root / "run_report_vo.json").read_text(encoding="utf-8"))[0]["performance"]
+    assert perf["profile_cpu"] is True and perf["profile_mem"] is False
+    for stage in perf["stages"]:
+        assert (tiny_vo_data_root / stage["profile"]["pstats"]).is_file()
+        assert "alloc" not in stage["profile"]
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+"""/api/points 点位索引：与前端过滤语义一致性、bbox/排序/分页与路由参数校验测试。"""
+
+import json
+import random
+
+from alleschools.web import PointIndex, PointsApi
+from alleschools.web.points_index import parse_terms, point_matches_search
+
+GEMEENTEN = ["AMSTERDAM", "UTRECHT", "AMSTELVEEN", "DEN HAAG", "ZWOLLE"]
+TYPES = ["HAVO/VWO", "VMBO", "BAO"]
+
+
+def _points(n: int = 300, seed: int = 7):
+    rng = random.Random(seed)
+    out = []
+    for i in range(n):
+        out.append(
+            {
+                "BRIN": f"{i:02d}AB",
+                "naam": f"{rng.choice(['Het', 'De', 'Sint'])} {rng.choice(['Lyceum', 'College', 'School'])} {i}",
+                "gemeente": rng.choice(GEMEENTEN),
+                "postcode": f"{1000 + i % 50} AB",
+                "type": rng.choice(TYPES),
+                "X_linear": round(rng.uniform(0, 60), 2),
+                "Y_linear": round(rng.uniform(0, 80), 2),
+                "size": rng.randint(0, 900),
+            }
+        )
+    return out
+
+
+def _brute(points, gemeente=(), types=(), terms=(), bbox=None):
+    ids = []
+    for i, p in enumerate(points):
+        if gemeente and not any(q in p["gemeente"].upper() for q in gemeente):
+            continue
+        if types and p["type"] not in types:
+            continue
+        if bbox and not (bbox[0] <= p["X_linear"] <= bbox[2] and bbox[1] <= p["Y_linear"] <= bbox[3]):
+            continue
+        if not point_matches_search(p, terms):
+            continue
+        ids.append(i)
+    return ids
+
+
+def test_query_matches_brute_force_filter() -> None:
+    points = _points()
+    index = PointIndex(points)
+    cases = [
+        {},
+        {"gemeente": ["AMST"]},
+        {"types": ["VMBO"], "bbox": (10.0, 20.0, 40.0, 50.0)},
+        {"terms": parse_terms("lyceum 1, zwol")},
+        {"terms": parse_terms("hl")},  # 首字母缩写，短于三元组
+        {"terms": parse_terms("1003ab"), "gemeente": ["UTRECHT", "HAAG"]},
+        {"terms": parse_terms("no such school")},
+    ]
+    for case in cases:
+        total, page = index.query(limit=10000, **case)
+        expected = _brute(points, case.get("gemeente", ()), case.get("types", ()), case.get("terms", ()), case.get("bbox"))
+        assert total == len(expected), case
+        assert [p["BRIN"] for p in page] == [points[i]["BRIN"] for i in expected], case
+
+
+def test_sort_and_pagination() -> None:
+    points = _points()
+    index = PointIndex(points)
+    total, page = index.query(sort="-size", limit=10, offset=5)
+    assert total == len(points)
+    sizes = sorted((p["size"] for p in points), reverse=True)
+    assert [p["size"] for p in page] == sizes[5:15]
+    _, by_x = index.query(gemeente=["UTRECHT"], sort="x", limit=10000)
+    xs = [p["X_linear"] for p in by_x]
+    assert xs == sorted(xs)
+
+
+def test_points_api_route() -> None:
+    api = PointsApi({"vo": PointIndex(_points())})
+    status, asset = api(None, "layer=vo&gemeente=amsterdam&limit=3&sort=brin")
+    assert status == 200
+    body = json.loads(asset.body)
+    assert body["limit"] == 3 and len(body["points"]) == 3
+    assert all(p["gemeente"] == "AMSTERDAM" for p in body["points"])
+    # 相同查询命中 LRU，返回同一资源（同一 ETag）
+    assert api(None, "layer=vo&gemeente=amsterdam&limit=3&sort=brin")[1] is asset
+
+    for bad in ("layer=xx", "layer=vo&bbox=1,2,3", "layer=vo&sort=color", "layer=vo&limit=abc"):
+        status, asset = api(None, bad)
+        assert status == 400
+        assert "error" in json.loads(asset.body)
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+"""发布步骤（alleschools.publish）：BRIN 哈希连接差分、补丁回放与版本链清单测试。"""
+
+import json
+from pathlib import Path
+
+import pytest
+
+import alleschools.config as cfg
+from alleschools.pipeline import run_vo_pipeline
+from alleschools.publish import apply_patch, diff_points, run_publish
+
+OLD = [
+    {"brin": "A", "x_linear": 1.0, "size": 10},
+    {"brin": "B", "x_linear": 2.0, "size": 20, "note": "x"},
+    {"brin": "C", "x_linear": 3.0, "size": 30},
+]
+
+
+def test_diff_points_roundtrip() -> None:
+    new = [
+        {"brin": "A", "x_linear": 1.0, "size": 10},
+        {"brin": "B", "x_linear": 2.5, "size": 20},
+        {"brin": "D", "x_linear": 4.0, "size": 40},
+    ]
+    patch = diff_points(OLD, new)
+    assert patch["added"] == [new[2]]
+    assert patch["removed"] == ["C"]
+    assert patch["changed"] == [{"key": "B", "set": {"x_linear": 2.5}, "unset": ["note"]}]
+    assert "order" not in patch
+    assert apply_patch(OLD, dict(patch, key="brin")) == new
+
+    # 顺序变化时补丁携带完整键序
+    reordered = list(reversed(new))
+    patch = diff_points(OLD, reordered)
+    assert patch["order"] == ["D", "B", "A"]
+    assert apply_patch(OLD, patch, key="brin") == reordered
+
+
+def test_diff_points_rejects_duplicate_keys() -> None:
+    with pytest.raises(ValueError):
+        diff_points(OLD, OLD + [OLD[0]])
+
+
+def test_run_publish_builds_version_chain(tiny_vo_data_root: Path) -> None:
+    effective = cfg.build_effective_config(overrides={"data_root": str(tiny_vo_data_root)})
+    _, stats = run_vo_pipeline(effective)
+    points_path = Path(stats["points_path"])
+    manifest_path, first = run_publish(effective, ["vo"])
+    entry = first["datasets"][points_path.stem]
+    assert entry["chain"] == [] and entry["key"] == "brin"
+    v1 = entry["latest"]
+
+    # 未变化时不产生新版本
+    _, again = run_publish(effective, ["vo"])
+    assert again["datasets"][points_path.stem]["latest"] == v1
+
+    points = json.loads(points_path.read_text(encoding="utf-8"))
+    updated = [dict(p, x_linear=p["x_linear"] + 1) if i == 0 else p for i, p in enumerate(points)][:-1]
+    points_path.write_text(json.dumps(updated), encoding="utf-8")
+    _, second = run_publish(effective, ["vo"])
+    entry = second["datasets"][points_path.stem]
+    link = entry["chain"][-1]
+    assert (link["from"], link["n_added"], link["n_removed"], link["n_changed"]) == (v1, 0, 1, 1)
+
+    out_dir = manifest_path.parent
+    assert not (out_dir / points_path.stem / f"{v1}.json").exists()
+    patch = json.loads((out_dir / link["patch"]).read_text(encoding="utf-8"))
+    assert apply_patch(points, patch) == json.loads((out_dir / entry["snapshot"]).read_text(encoding="utf-8"))
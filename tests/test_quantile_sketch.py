@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+"""可合并分位数草图（QuantileSketch）与基于草图的异常值截断测试。"""
+
+import random
+
+from alleschools.compute.indicators import _apply_outlier_clipping, _compute_percentile
+from alleschools.compute.quantile_sketch import QuantileSketch, clip_bounds_from_sketches
+
+
+def test_small_input_is_exact() -> None:
+    values = [float(v) for v in range(50)]
+    sketch = QuantileSketch(k=200)
+    sketch.extend(values)
+    assert sketch.is_exact
+    for p in (0, 1, 25, 50, 99, 100):
+        assert sketch.percentile(p) == _compute_percentile(values, p)
+
+
+def test_merged_shards_approximate_rank() -> None:
+    """分片构建后合并，百分位数的秩误差应在 O(1/k) 量级内。"""
+    rnd = random.Random(1)
+    values = [rnd.gauss(50, 15) for _ in range(50000)]
+    shards = [QuantileSketch(k=200, seed=i) for i in range(4)]
+    for i, v in enumerate(values):
+        shards[i % 4].update(v)
+    merged = shards[0]
+    for shard in shards[1:]:
+        merged.merge(shard)
+    assert merged.n == len(values)
+    assert not merged.is_exact
+    assert merged.percentile(0) == min(values)
+    assert merged.percentile(100) == max(values)
+    for p in (5, 50, 95):
+        q = merged.percentile(p)
+        rank = 100.0 * sum(1 for v in values if v <= q) / len(values)
+        assert abs(rank - p) < 2.0
+
+
+def test_to_dict_round_trip() -> None:
+    sketch = QuantileSketch(k=16)
+    sketch.extend(range(1000))
+    restored = QuantileSketch.from_dict(sketch.to_dict())
+    assert restored.n == sketch.n
+    assert restored.percentile(50) == sketch.percentile(50)
+
+
+def test_clipping_with_sketch_bounds() -> None:
+    """由草图得到的边界可直接传给 _apply_outlier_clipping，无需再收集全部数值。"""
+    rows = [{"X_linear": float(x), "Y_linear": float(100 - x)} for x in range(0, 101, 10)]
+    x_sketch, y_sketch = QuantileSketch(), QuantileSketch()
+    for r in rows:
+        x_sketch.update(r["X_linear"])
+        y_sketch.update(r["Y_linear"])
+    outliers = {"clip_percentiles": [10, 90]}
+    bounds = clip_bounds_from_sketches(x_sketch, y_sketch, outliers)
+    assert bounds == ((10.0, 90.0), (10.0, 90.0))
+    _apply_outlier_clipping(rows, "X_linear", "Y_linear", outliers, bounds=bounds)
+    assert min(r["X_linear"] for r in rows) == 10.0
+    assert max(r["Y_linear"] for r in rows) == 90.0
+    assert clip_bounds_from_sketches(x_sketch, y_sketch, {"clip_percentiles": [90, 10]}) is None
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+"""区域汇总（compute.rollup）与 privacy.max_detail_level 测试。"""
+
+import pytest
+
+from alleschools.compute.rollup import rollup_rows, rollup_to_wide_rows
+from alleschools.exporters.points_exporter import _po_row_to_point
+
+
+def _po_rows() -> list:
+    return [
+        {"BRIN": "01AA", "vestigingsnaam": "A", "gemeente": "DELFT", "postcode": "2611 AB", "type": "Bo",
+         "X_linear": 10.0, "Y_linear": 300.0, "pupils_total": 100, "years_covered": "2022-2023",
+         "has_full_woz": True},
+        {"BRIN": "02BB", "vestigingsnaam": "B", "gemeente": "DELFT", "postcode": "2612 CD", "type": "Bo",
+         "X_linear": 40.0, "Y_linear": 600.0, "pupils_total": 300, "years_covered": "2022-2023,2023-2024",
+         "has_full_woz": True},
+        {"BRIN": "03CC", "vestigingsnaam": "C", "gemeente": "LEIDEN", "postcode": "2311 EF", "type": "Sbo",
+         "X_linear": 20.0, "Y_linear": 400.0, "pupils_total": 0, "years_covered": "", "has_full_woz": False},
+    ]
+
+
+def test_rollup_gemeente_weighted_centroid_and_quantiles() -> None:
+    groups = rollup_rows(_po_rows(), "gemeente", "pupils_total", sum_keys=("has_full_woz",))
+    assert [g["key"] for g in groups] == ["DELFT", "LEIDEN"]
+    delft = groups[0]
+    assert delft["n_schools"] == 2
+    assert delft["size_total"] == 400
+    # 按 pupils_total 加权：(10*100 + 40*300) / 400
+    assert delft["x_centroid"] == pytest.approx(32.5)
+    assert delft["x_mean"] == pytest.approx(25.0)
+    assert delft["x_p50"] == pytest.approx(25.0)
+    assert delft["years_covered"] == ["2022-2023", "2023-2024"]
+    assert delft["sums"]["has_full_woz"] == 2
+    # 规模合计为 0 时退化为未加权均值
+    assert groups[1]["x_centroid"] == pytest.approx(20.0)
+
+
+def test_rollup_pc4_keys() -> None:
+    groups = rollup_rows(_po_rows(), "pc4", "pupils_total")
+    assert [g["key"] for g in groups] == ["2311", "2611", "2612"]
+    with pytest.raises(ValueError):
+        rollup_rows(_po_rows(), "province", "pupils_total")
+
+
+def test_rollup_to_wide_rows_po_shape() -> None:
+    groups = rollup_rows(_po_rows(), "gemeente", "pupils_total", sum_keys=("has_full_woz",))
+    rows = rollup_to_wide_rows(groups, "po")
+    delft = rows[0]
+    assert delft["BRIN"] == "GM:DELFT"
+    assert delft["type"] == "Bo"
+    assert delft["pupils_total"] == 400
+    assert delft["has_full_woz"] is True
+    assert delft["data_quality_flags"] == "rollup:gemeente;n_schools=2"
+    # 汇总行可直接走现有 points 导出
+    point = _po_row_to_point(delft)
+    assert point["id"] == "GM:DELFT"
+    assert point["size"] == 400
+
+
+def test_vo_pipeline_gemeente_detail_level(tiny_vo_data_root) -> None:
+    """privacy.max_detail_level=gemeente 时主产物为 gemeente 汇总行，并写出汇总文件。"""
+    import csv
+    import json
+    from pathlib import Path
+
+    import alleschools.config as cfg
+    from alleschools.pipeline import run_vo_pipeline
+
+    effective = cfg.build_effective_config(
+        overrides={
+            "data_root": str(tiny_vo_data_root),
+            "privacy": {"min_group_size": 0, "max_detail_level": "gemeente"},
+        }
+    )
+    csv_path, stats = run_vo_pipeline(effective)
+    with Path(csv_path).open(encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert [r["BRIN"] for r in rows] == ["GM:G", "GM:H"]
+    assert rows[1]["data_quality_flags"] == "rollup:gemeente;n_schools=2"
+
+    report = json.loads(Path(stats["run_report_path"]).read_text(encoding="utf-8"))[0]
+    assert report["privacy"]["max_detail_level"] == "gemeente"
+    rollup = report["outputs"]["vo"]["rollups"]["gemeente"]
+    assert rollup["n_groups"] == 2
+    artifact = json.loads((tiny_vo_data_root / rollup["path"]).read_text(encoding="utf-8"))
+    assert artifact["level"] == "gemeente"
+    assert sum(g["n_schools"] for g in artifact["groups"]) == 5
+
+
+def test_vo_pipeline_skips_rollup_levels_finer_than_detail_level(tiny_vo_data_root) -> None:
+    """max_detail_level=gemeente 时不写出 pc4 汇总文件，只保留 gemeente 级别。"""
+    import json
+    from pathlib import Path
+
+    import alleschools.config as cfg
+    from alleschools.pipeline import run_vo_pipeline
+
+    effective = cfg.build_effective_config(
+        overrides={
+            "data_root": str(tiny_vo_data_root),
+            "privacy": {"min_group_size": 0, "max_detail_level": "gemeente"},
+            "vo": {"output": {"rollup_levels": ["gemeente", "pc4"]}},
+        }
+    )
+    _, stats = run_vo_pipeline(effective)
+    report = json.loads(Path(stats["run_report_path"]).read_text(encoding="utf-8"))[0]
+    rollups = report["outputs"]["vo"]["rollups"]
+    assert sorted(rollups) == ["gemeente"]
+    assert not list(tiny_vo_data_root.rglob("*_rollup_pc4.json"))
+
+
+def test_export_rollups_drops_single_school_groups(tmp_path) -> None:
+    """max_detail_level 高于 school 时，单校分组等同学校行，不写入汇总文件。"""
+    import json
+    from pathlib import Path
+
+    from alleschools.pipeline import _export_rollups
+
+    written = _export_rollups(
+        _po_rows(), "po", "pupils_total", ["gemeente"], tmp_path, Path("generated"), "po",
+        min_group_size=0, max_detail_level="gemeente",
+    )
+    assert written["gemeente"]["n_groups"] == 1
+    assert written["gemeente"]["n_suppressed"] == 1
+    artifact = json.loads((tmp_path / written["gemeente"]["path"]).read_text(encoding="utf-8"))
+    assert [g["key"] for g in artifact["groups"]] == ["DELFT"]
+
+    # school 级别允许发布时，单校分组保留
+    written = _export_rollups(
+        _po_rows(), "po", "pupils_total", ["gemeente"], tmp_path, Path("generated"), "po",
+        min_group_size=0, max_detail_level="school",
+    )
+    assert written["gemeente"]["n_groups"] == 2
+
+
+def test_vo_pipeline_gemeente_detail_level_suppresses_single_school_groups(tiny_vo_data_root) -> None:
+    """max_detail_level=gemeente 时只有一所学校的 gemeente 不发布，并计入隐私抑制。"""
+    import csv
+    import json
+    from pathlib import Path
+
+    import alleschools.config as cfg
+    from alleschools.pipeline import run_vo_pipeline
+
+    # 复制一所学校到只有它一所学校的 gemeente K
+    raw = tiny_vo_data_root / "raw_data" / "duo_examen_raw_all.csv"
+    with raw.open(encoding="utf-8", newline="") as f:
+        lines = list(csv.reader(f, delimiter=";"))
+    extra = [["99ZZ", "99ZZ00", "Solo College", "K"] + r[4:] for r in lines[1:] if r[1] == "00VO00"]
+    with raw.open("a", encoding="utf-8", newline="") as f:
+        csv.writer(f, delimiter=";").writerows(extra)
+
+    effective = cfg.build_effective_config(
+        overrides={
+            "data_root": str(tiny_vo_data_root),
+            "privacy": {"min_group_size": 0, "max_detail_level": "gemeente"},
+        }
+    )
+    csv_path, stats = run_vo_pipeline(effective)
+    with Path(csv_path).open(encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert [r["BRIN"] for r in rows] == ["GM:G", "GM:H"]
+
+    report = json.loads(Path(stats["run_report_path"]).read_text(encoding="utf-8"))[0]
+    assert report["privacy"]["n_suppressed"] == 1
+    assert report["data_quality"]["privacy_suppressed"] == {"count": 1, "brins": ["GM:K"]}
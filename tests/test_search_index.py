@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+"""导出阶段搜索索引（search_index_exporter）：差分编码、前缀表、三元组候选与流水线产物测试。"""
+
+import json
+from bisect import bisect_left
+from pathlib import Path
+
+import alleschools.config as cfg
+from alleschools.exporters.search_index_exporter import build_search_index, delta_decode, delta_encode
+from alleschools.pipeline import run_vo_pipeline
+from alleschools.web.points_index import parse_terms, point_matches_search
+
+ROWS = [
+    {"BRIN": "00AA", "vestigingsnaam": "Het Wellantcollege", "gemeente": "Utrecht", "postcode": "3511 AB"},
+    {"BRIN": "01BB", "vestigingsnaam": "Stedelijk Gymnasium", "gemeente": "Leiden", "postcode": "2312 CD"},
+    {"BRIN": "02CC", "vestigingsnaam": "Het Utrechts Lyceum", "gemeente": "Utrecht", "postcode": "3581 EF"},
+]
+
+
+def _postings(table: dict, key: str) -> list:
+    i = bisect_left(table["keys"], key)
+    if i < len(table["keys"]) and table["keys"][i] == key:
+        return delta_decode(table["postings"][i])
+    return []
+
+
+def test_delta_roundtrip() -> None:
+    ids = [0, 3, 4, 10, 250]
+    assert delta_encode(ids) == [0, 3, 1, 6, 240]
+    assert delta_decode(delta_encode(ids)) == ids
+
+
+def test_prefix_and_trigram_tables() -> None:
+    index = build_search_index(ROWS, "vo")
+    assert index["n_docs"] == 3
+    assert index["acronyms"] == ["HW", "SG", "HUL"]
+    assert index["prefix"]["keys"] == sorted(index["prefix"]["keys"])
+    assert _postings(index["prefix"], "UTRECHT") == [0, 2]
+    assert _postings(index["prefix"], "HUL") == [2]
+
+    points = [{"naam": r["vestigingsnaam"], "BRIN": r["BRIN"], "gemeente": r["gemeente"], "postcode": r["postcode"]} for r in ROWS]
+    for raw in ("lant", "utrecht", "3581 ef", "gymn", "hul"):
+        (term,) = parse_terms(raw)
+        variants = {term, term.replace(" ", "")}
+        cand = set()
+        for v in variants:
+            grams = {v[i : i + 3] for i in range(len(v) - 2)}
+            hit = set(range(len(ROWS)))
+            for g in grams:
+                hit &= set(_postings(index["trigrams"], g))
+            cand |= hit
+        expected = {i for i, p in enumerate(points) if point_matches_search(p, [term])}
+        assert expected <= cand, raw
+
+
+def test_vo_pipeline_writes_search_index(tiny_vo_data_root: Path) -> None:
+    effective = cfg.build_effective_config(overrides={"data_root": str(tiny_vo_data_root)})
+    _, stats = run_vo_pipeline(effective)
+    report = json.loads((tiny_vo_data_root / "run_report_vo.json").read_text(encoding="utf-8"))[0]
+    rel = report["outputs"]["vo"]["search_index_path"]
+    assert rel == "generated/schools_xy_coords_search.json"
+    index = json.loads((tiny_vo_data_root / rel).read_text(encoding="utf-8"))
+    points = json.loads(Path(stats["points_path"]).read_text(encoding="utf-8"))
+    # 文档编号与 points JSON 行顺序一致
+    assert index["brins"] == [p["brin"] for p in points]
+
+
+def test_viewer_payloads_inject_search_index() -> None:
+    """view_xy_server 将搜索索引注入 view_xy.html 的 __INJECT_SEARCH_*__；缺失时注入 null。"""
+    import view_xy_server
+    from alleschools.web.template import compile_template
+
+    index = build_search_index(ROWS, "vo")
+    payloads = view_xy_server.html_payloads([], [], [], [], search_vo=index)
+    template = compile_template(Path(view_xy_server.HTML_PATH))
+    assert {"SEARCH_VO", "SEARCH_PO"} <= set(template.placeholders) <= set(payloads)
+
+    html = template.render(payloads)
+    assert "__INJECT_" not in html
+    assert "const searchIndexVO = " + json.dumps(index, ensure_ascii=False) in html
+    assert "const searchIndexPO = null;" in html
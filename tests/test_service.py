@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+"""ETL 作业服务：HTTP 提交作业、状态与 run_report，重复作业跳过加载阶段，无效请求返回 400。"""
+
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+from alleschools.service import JobService, make_service_server
+
+
+@pytest.fixture
+def service_url(tiny_vo_data_root: Path):
+    service = JobService(base_overrides={"data_root": str(tiny_vo_data_root)}, workers=2).start()
+    server = make_service_server(service, "127.0.0.1", 0, quiet=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+        service.close()
+
+
+def _call(url: str, body: dict = None) -> tuple:
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=10) as resp:
+            return resp.status, json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def _wait(base: str, job_id: int) -> dict:
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        _, job = _call(f"{base}/jobs/{job_id}")
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_jobs_run_and_repeat_jobs_skip_loading(service_url: str) -> None:
+    status, job = _call(f"{service_url}/jobs", {"layers": ["vo"]})
+    assert status == 202 and job["status"] in ("queued", "running")
+    first = _wait(service_url, job["id"])
+    assert first["status"] == "succeeded", first["error"]
+    assert first["results"]["vo"]["load_skipped"] is False and first["results"]["vo"]["n_schools"] == 5
+
+    _, job = _call(f"{service_url}/jobs", {"layers": ["vo"], "artifacts": ["points_json"]})
+    second = _wait(service_url, job["id"])["results"]["vo"]
+    assert second["load_skipped"] is True
+    assert "export.geojson" not in second["stages_cached"] + second["stages_run"]
+
+    _, report = _call(f"{service_url}/jobs/{job['id']}/report")
+    assert report["reports"]["vo"]["stage_cache"]["hits"] == second["stages_cached"]
+    _, jobs = _call(f"{service_url}/jobs")
+    assert [j["id"] for j in jobs] == [job["id"], first["id"]]
+    _, health = _call(f"{service_url}/health")
+    assert health["status"] == "ok" and health["cached_stages"] > 0
+
+
+def test_invalid_requests_are_rejected(service_url: str) -> None:
+    assert _call(f"{service_url}/jobs", {"layers": ["mbo"]})[0] == 400
+    assert _call(f"{service_url}/jobs", {"profile": "no-such-profile"})[0] == 400
+    status, body = _call(f"{service_url}/jobs", {"artifacts": ["pdf"]})
+    assert status == 400 and "unknown artifacts" in body["error"]
+    assert _call(f"{service_url}/jobs/999")[0] == 404
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+"""按 gemeente 分片导出（shard_exporter）：分片内容、哈希、bbox 与 meta 引用测试。"""
+
+import hashlib
+import json
+from pathlib import Path
+
+import alleschools.config as cfg
+from alleschools.exporters.shard_exporter import export_gemeente_shards, gemeente_slug
+from alleschools.pipeline import run_vo_pipeline
+
+
+def test_gemeente_slug() -> None:
+    assert gemeente_slug("'s-Gravenhage") == "s-gravenhage"
+    assert gemeente_slug("Súdwest-Fryslân") == "sudwest-fryslan"
+    assert gemeente_slug("") == "unknown"
+
+
+def test_export_gemeente_shards(tmp_path: Path) -> None:
+    points = [
+        {"brin": "01AA", "municipality": "Delft", "x_linear": 10.0, "y_linear": 300.0},
+        {"brin": "02BB", "municipality": "Delft", "x_linear": 40.0, "y_linear": 200.0},
+        {"brin": "03CC", "municipality": "Leiden", "x_linear": 20.0, "y_linear": None},
+    ]
+    manifest_path = tmp_path / "generated" / "po_shards.json"
+    stale = tmp_path / "generated" / "shards" / "po" / "old.0000.json"
+    stale.parent.mkdir(parents=True)
+    stale.write_text("[]", encoding="utf-8")
+
+    manifest = export_gemeente_shards({"po": {"points": points, "key_field": "municipality"}}, manifest_path, "po")
+    assert json.loads(manifest_path.read_text(encoding="utf-8")) == manifest
+    ds = manifest["datasets"]["po"]
+    assert ds["n_points"] == 3
+    assert [s["gemeente"] for s in ds["shards"]] == ["Delft", "Leiden"]
+    delft, leiden = ds["shards"]
+    assert delft["count"] == 2 and delft["bbox"] == [10.0, 200.0, 40.0, 300.0]
+    assert leiden["bbox"] is None
+    assert ds["bbox"] == [10.0, 200.0, 40.0, 300.0]
+
+    body = (manifest_path.parent / delft["path"]).read_bytes()
+    assert hashlib.sha256(body).hexdigest() == delft["sha256"]
+    assert delft["path"].endswith(f"delft.{delft['sha256'][:12]}.json")
+    assert [p["brin"] for p in json.loads(body)] == ["01AA", "02BB"]
+    assert not stale.exists()
+
+
+def test_vo_pipeline_shards_referenced_from_meta(tiny_vo_data_root: Path) -> None:
+    effective = cfg.build_effective_config(overrides={"data_root": str(tiny_vo_data_root)})
+    effective["vo"]["output"]["export_shards"] = True
+    run_vo_pipeline(effective)
+    gen = tiny_vo_data_root / "generated"
+    meta = json.loads((gen / "schools_xy_coords_meta.json").read_text(encoding="utf-8"))
+    assert meta["shards"]["manifest"] == "schools_xy_coords_shards.json"
+    manifest = json.loads((gen / meta["shards"]["manifest"]).read_text(encoding="utf-8"))
+    total = sum(s["count"] for s in manifest["datasets"]["vo"]["shards"])
+    points = json.loads((gen / "schools_xy_coords.json").read_text(encoding="utf-8"))
+    assert total == len(points)
+    assert {s["gemeente"] for s in manifest["datasets"]["vo"]["shards"]} == {p["municipality"] for p in points}
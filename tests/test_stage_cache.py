@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+"""阶段缓存（stage_cache）：重跑命中、只重算受影响阶段、输出被删时重算、崩溃后从已完成阶段继续。"""
+
+import copy
+import json
+from pathlib import Path
+
+import pytest
+
+import alleschools.config as cfg
+from alleschools.cli import build_parser, make_effective_config
+from alleschools.exporters import csv_exporter
+from alleschools.pipeline import run_vo_pipeline
+
+
+def _run(config: dict, data_root: Path) -> dict:
+    run_vo_pipeline(config)
+    report = json.loads((data_root / "run_report_vo.json").read_text(encoding="utf-8"))[0]
+    cached = {s["name"] for s in report["performance"]["stages"] if s.get("cached")}
+    assert set(report["stage_cache"]["hits"]) == cached
+    return report["stage_cache"]
+
+
+def test_second_run_hits_every_stage(tiny_vo_data_root: Path) -> None:
+    effective = cfg.build_effective_config(overrides={"data_root": str(tiny_vo_data_root)})
+    first = _run(effective, tiny_vo_data_root)
+    assert first["hits"] == [] and "export.csv" in first["misses"]
+    csv_path = tiny_vo_data_root / effective["vo"]["output"]["csv"]
+    before = csv_path.stat().st_mtime_ns
+
+    second = _run(effective, tiny_vo_data_root)
+    assert second["misses"] == [] and set(second["hits"]) == set(first["misses"])
+    assert csv_path.stat().st_mtime_ns == before  # 命中时不重写输出
+
+    forced = copy.deepcopy(effective)
+    forced["stage_cache"] = {**effective["stage_cache"], "force": True}
+    assert _run(forced, tiny_vo_data_root)["hits"] == []
+
+
+def test_changed_option_or_deleted_output_reruns_only_affected_stages(tiny_vo_data_root: Path) -> None:
+    effective = cfg.build_effective_config(overrides={"data_root": str(tiny_vo_data_root)})
+    _run(effective, tiny_vo_data_root)
+
+    changed = copy.deepcopy(effective)
+    changed["vo"]["output"]["include_meta_columns"] = False
+    misses = set(_run(changed, tiny_vo_data_root)["misses"])
+    assert {"export.csv", "export.long_table"} <= misses
+    assert not misses & {"load.duo_exams", "compute.vo_xy", "privacy", "export.points", "export.geojson"}
+
+    points_path = (tiny_vo_data_root / changed["vo"]["output"]["csv"]).with_suffix(".json")
+    points_path.unlink()
+    report = _run(changed, tiny_vo_data_root)
+    assert "export.points" in report["misses"] and "export.csv" in report["hits"]
+    assert points_path.is_file()
+
+
+def test_rerun_after_crash_resumes_from_completed_stages(
+    tiny_vo_data_root: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    effective = cfg.build_effective_config(overrides={"data_root": str(tiny_vo_data_root)})
+
+    def crash(*args, **kwargs):
+        raise RuntimeError("simulated crash")
+
+    with monkeypatch.context() as m:
+        m.setattr(csv_exporter, "export_vo_csv", crash)
+        with pytest.raises(RuntimeError, match="simulated crash"):
+            run_vo_pipeline(effective)
+
+    report = _run(effective, tiny_vo_data_root)
+    assert {"load.duo_exams", "compute.vo_xy", "privacy"} <= set(report["hits"])
+    assert "export.csv" in report["misses"]
+
+
+def test_cli_force_and_disabled_cache(tiny_vo_data_root: Path) -> None:
+    args = build_parser().parse_args(["--data-root", str(tiny_vo_data_root), "vo", "--force"])
+    assert make_effective_config(args)["stage_cache"]["force"] is True
+
+    disabled = cfg.build_effective_config(overrides={"data_root": str(tiny_vo_data_root)})
+    disabled["stage_cache"] = {"enabled": False}
+    assert _run(disabled, tiny_vo_data_root) == {
+        "enabled": False, "force": False, "dir": None, "hits": [], "misses": [], "changed": [],
+    }
+    assert not (tiny_vo_data_root / "generated" / ".stage_cache").exists()
+
+
+def test_changed_output_dir_rewrites_every_export(tiny_vo_data_root: Path) -> None:
+    """只改 output.csv 的目录时，各导出阶段不得命中旧目录下的缓存。"""
+    effective = cfg.build_effective_config(overrides={"data_root": str(tiny_vo_data_root)})
+    effective["vo"]["output"]["csv"] = "out2/schools_xy_coords.csv"
+    _run(effective, tiny_vo_data_root)
+
+    moved = copy.deepcopy(effective)
+    moved["vo"]["output"]["csv"] = "out3/schools_xy_coords.csv"
+    misses = set(_run(moved, tiny_vo_data_root)["misses"])
+    assert {"export.long_table", "export.rollups"} <= misses
+    report = json.loads((tiny_vo_data_root / "run_report_vo.json").read_text(encoding="utf-8"))[0]
+    outputs = report["outputs"]["vo"]
+    assert (tiny_vo_data_root / "out3" / "schools_xy_coords_long.csv").is_file()
+    assert outputs["rollups"]["gemeente"]["path"].startswith("out3")
+    assert (tiny_vo_data_root / outputs["rollups"]["gemeente"]["path"]).is_file()
+
+
+def test_deleted_or_edited_shard_file_reruns_shard_stages(tiny_vo_data_root: Path) -> None:
+    """gemeente 分片与明细分片均登记为阶段输出：删除或改动任一分片文件时重算并重写。"""
+    effective = cfg.build_effective_config(overrides={"data_root": str(tiny_vo_data_root)})
+    effective["vo"]["output"]["export_shards"] = True
+    effective["vo"]["output"]["export_detail_shards"] = True
+    _run(effective, tiny_vo_data_root)
+
+    out_dir = (tiny_vo_data_root / effective["vo"]["output"]["csv"]).parent
+    shard = sorted((out_dir / "shards" / "vo").glob("*.json"))[0]
+    detail = sorted((out_dir / "details" / "vo").glob("*.json"))[0]
+    shard.unlink()
+    detail.write_text("[]", encoding="utf-8")
+
+    misses = set(_run(effective, tiny_vo_data_root)["misses"])
+    assert {"export.shards", "export.details"} <= misses
+    assert shard.is_file()
+    assert detail.read_text(encoding="utf-8") != "[]"
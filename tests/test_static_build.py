@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+"""内容哈希静态构建（alleschools.web.static_build）：哈希文件名、外壳引用、资源清单与 vercel.json 合并测试。"""
+
+import hashlib
+import json
+from pathlib import Path
+
+from alleschools.web.static_build import (
+    GLOBAL_NAME,
+    IMMUTABLE_CACHE_CONTROL,
+    build_hashed_site,
+    update_vercel_config,
+)
+
+TEMPLATE = (
+    "<html><head><script>var theme = 1;</script></head><body>\n"
+    "  <script>\n"
+    "const DATA_VO = __INJECT_DATA_VO__;\n"
+    "const META_VO = __INJECT_META_VO__;\n"
+    "// " + "x" * 200 + "\n"
+    "</script>\n"
+    "</body></html>\n"
+)
+
+
+def _build(tmp_path: Path, payloads: dict) -> dict:
+    template = tmp_path / "view.html"
+    template.write_text(TEMPLATE, encoding="utf-8")
+    return build_hashed_site(template, payloads, tmp_path / "public", inline_limit=100)
+
+
+def test_build_hashed_site_writes_hashed_assets(tmp_path: Path) -> None:
+    manifest = _build(tmp_path, {"DATA_VO": [{"naam": "Één"}], "META_VO": {"layer": "vo"}})
+    out = tmp_path / "public"
+    assert json.loads((out / "asset-manifest.json").read_text(encoding="utf-8")) == manifest
+    assert sorted(manifest["datasets"]) == ["DATA_VO", "META_VO"]
+    for path in list(manifest["datasets"].values()) + manifest["scripts"]:
+        body = (out / path).read_bytes()
+        assert path.endswith(f".{hashlib.sha256(body).hexdigest()[:12]}.js")
+    assert "Één" in (out / manifest["datasets"]["DATA_VO"]).read_text(encoding="utf-8")
+
+    shell = (out / "index.html").read_text(encoding="utf-8")
+    assert "__INJECT_" not in shell
+    assert "var theme = 1;" in shell  # 小脚本保持内联
+    assert len(manifest["scripts"]) == 1
+    app = (out / manifest["scripts"][0]).read_text(encoding="utf-8")
+    assert f'window.{GLOBAL_NAME}["DATA_VO"]' in app
+    # 数据脚本先于引用它们的应用脚本加载
+    positions = [shell.index(p) for p in list(manifest["datasets"].values()) + manifest["scripts"]]
+    assert positions == sorted(positions)
+
+
+def test_build_hashed_site_only_changed_dataset_changes_hash(tmp_path: Path) -> None:
+    first = _build(tmp_path, {"DATA_VO": [1], "META_VO": {"v": 1}})
+    second = _build(tmp_path, {"DATA_VO": [1], "META_VO": {"v": 2}})
+    assert first["datasets"]["DATA_VO"] == second["datasets"]["DATA_VO"]
+    assert first["datasets"]["META_VO"] != second["datasets"]["META_VO"]
+    assert first["scripts"] == second["scripts"]
+    # 旧哈希文件被清理
+    assert len(list((tmp_path / "public" / "assets").glob("*.js"))) == 3
+
+
+def test_update_vercel_config_merges_headers(tmp_path: Path) -> None:
+    path = tmp_path / "vercel.json"
+    path.write_text(
+        json.dumps({"outputDirectory": "public", "headers": [{"source": "/api/(.*)", "headers": []}]}),
+        encoding="utf-8",
+    )
+    assert update_vercel_config(path) is True
+    config = json.loads(path.read_text(encoding="utf-8"))
+    assert config["outputDirectory"] == "public"
+    sources = [rule["source"] for rule in config["headers"]]
+    assert sources[0] == "/assets/(.*)" and "/api/(.*)" in sources
+    assert config["headers"][0]["headers"][0]["value"] == IMMUTABLE_CACHE_CONTROL
+    assert update_vercel_config(path) is False
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+"""参数扫描（alleschools sweep）：网格展开、精简查询与端到端输出测试。"""
+
+import json
+from pathlib import Path
+
+import pytest
+
+from alleschools import config as config_mod
+from alleschools import sweep as sweep_mod
+from alleschools.compute.year_cube import build_vo_year_cube, query_xy, query_xy_values
+
+
+def test_expand_grid_cartesian_and_unknown() -> None:
+    sets = sweep_mod.expand_grid({"min_havo_vwo_total": [0, 20], "window": [None, "2021-2024"]}, "vo")
+    assert len(sets) == 4
+    assert sets[0] == {"min_havo_vwo_total": 0, "window": None}
+    assert sweep_mod.expand_grid({}, "po") == [{}]
+    with pytest.raises(ValueError):
+        sweep_mod.expand_grid({"woz_strategy": ["drop"]}, "vo")
+
+
+def test_parse_param_arg() -> None:
+    assert sweep_mod.parse_param_arg("min_pupils_total=5,10") == ("min_pupils_total", [5, 10])
+    assert sweep_mod.parse_param_arg("woz_strategy=drop,pc4_mean") == ("woz_strategy", ["drop", "pc4_mean"])
+    assert sweep_mod.parse_param_arg("clip_percentiles=null") == ("clip_percentiles", [None])
+    with pytest.raises(ValueError):
+        sweep_mod.parse_param_arg("min_pupils_total")
+
+
+def test_query_xy_values_matches_query_xy() -> None:
+    """精简查询与完整行查询的 X/Y（含截断）一致。"""
+    year_cols = [[0, 1, "2019-2020", 1.0], [2, 3, "2020-2021", 2.0]]
+    schools = {}
+    for i in range(6):
+        hw = {y: {"vwo": float(i + j), "havo": 5.0, "science": float(2 * i), "total": 30.0}
+              for j, y in enumerate(["2019-2020", "2020-2021"])}
+        schools[f"0{i}XX"] = {
+            "naam": f"S{i}",
+            "gemeente": "G",
+            "havo_vwo": hw,
+            "vmbo": {y: {"techniek": 0.0, "total": 0.0} for y in hw},
+            "all_kand": {y: 30.0 for y in hw},
+        }
+    cube = build_vo_year_cube(schools, {}, year_cols)
+    outliers = {"clip_percentiles": [10, 90]}
+    rows, excluded = query_xy(cube, weights=[1.0, 3.0], outliers=outliers)
+    brins, xs, ys, n_excluded = query_xy_values(cube, weights=[1.0, 3.0], outliers=outliers)
+    assert brins == [r["BRIN"] for r in rows]
+    assert xs == [r["X_linear"] for r in rows]
+    assert ys == [r["Y_linear"] for r in rows]
+    assert n_excluded == len(excluded)
+
+
+def test_run_sweep_writes_summary(tiny_vo_data_root: Path) -> None:
+    cfg = config_mod.build_effective_config(overrides={"data_root": str(tiny_vo_data_root)})
+    out_path, result = sweep_mod.run_sweep(
+        cfg,
+        "vo",
+        {"min_havo_vwo_total": [20, 10000], "weights": [None, [1, 1, 1, 1, 1]]},
+    )
+    assert out_path == tiny_vo_data_root / "generated" / "sweep_vo.json"
+    on_disk = json.loads(out_path.read_text(encoding="utf-8"))
+    assert on_disk["n_param_sets"] == 4
+    assert on_disk["baseline"]["n_schools"] == 5
+
+    by_params = {(r["params"]["min_havo_vwo_total"], r["params"]["weights"] is None): r for r in result["results"]}
+    same = by_params[(20, True)]
+    assert same["rank_change"]["x_max_abs"] == 0
+    assert same["shift"]["x_mean"] == 0
+    # 阈值过高：HAVO/VWO 学校全部被排除，仅剩纯 VMBO 学校
+    strict = by_params[(10000, True)]
+    assert strict["n_schools"] == 1
+    assert strict["n_removed"] == 4
+
+
+def test_run_sweep_missing_input(tmp_path: Path) -> None:
+    cfg = config_mod.build_effective_config(overrides={"data_root": str(tmp_path)})
+    out_path, result = sweep_mod.run_sweep(cfg, "vo", {})
+    assert out_path is None
+    assert result["status"] == "error"
+
+
+def test_cli_sweep_bad_grid_or_param_exits_1(tmp_path: Path, capsys: pytest.CaptureFixture) -> None:
+    from alleschools.cli import main
+
+    grid = tmp_path / "grid.json"
+    grid.write_text("[1, 2]", encoding="utf-8")
+    base = ["--data-root", str(tmp_path), "sweep", "--layer", "vo"]
+    assert main(base + ["--grid", str(grid)]) == 1
+    assert "must contain a mapping" in capsys.readouterr().out
+    assert main(base + ["--param", "min_havo_vwo_total"]) == 1
+    assert "Invalid --param" in capsys.readouterr().out
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+"""HTML 模板编译（alleschools.web.template）：占位符切分、与逐个 replace 的等价性及 mtime 缓存测试。"""
+
+import json
+import os
+from pathlib import Path
+
+from alleschools.web.template import compile_source, compile_template
+
+SOURCE = (
+    "<script>const a = __INJECT_DATA_VO__;\n"
+    "const p = __INJECT_DATA_VO_PROFILES__; const m = __INJECT_META_PO__;"
+    " const u = __INJECT_UNKNOWN__;</script>"
+)
+
+
+def test_compile_source_splits_placeholders() -> None:
+    compiled = compile_source(SOURCE)
+    assert compiled.placeholders == ("DATA_VO", "DATA_VO_PROFILES", "META_PO", "UNKNOWN")
+    assert len(compiled.parts) == 9
+
+
+def test_render_matches_sequential_replace() -> None:
+    payloads = {
+        "DATA_VO": [{"naam": "Één", "X_linear": 1.5}],
+        "DATA_VO_PROFILES": {"NT": []},
+        # 数据中出现占位符文本时不会被二次替换
+        "META_PO": {"note": "__INJECT_DATA_VO__"},
+    }
+    expected = SOURCE
+    for name in ("DATA_VO_PROFILES", "DATA_VO"):
+        expected = expected.replace(f"__INJECT_{name}__", json.dumps(payloads[name], ensure_ascii=False))
+    expected = expected.replace("__INJECT_META_PO__", json.dumps(payloads["META_PO"], ensure_ascii=False))
+
+    compiled = compile_source(SOURCE)
+    assert compiled.render(payloads) == expected
+    assert "__INJECT_UNKNOWN__" in compiled.render(payloads)
+    assert compiled.render_bytes(payloads) == expected.encode("utf-8")
+
+
+def test_compile_template_cache_and_reload(tmp_path: Path) -> None:
+    path = tmp_path / "t.html"
+    path.write_text("a __INJECT_X__ b", encoding="utf-8")
+    first = compile_template(path)
+    assert compile_template(path) is first
+
+    path.write_text("changed __INJECT_X__ __INJECT_Y__", encoding="utf-8")
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    second = compile_template(path)
+    assert second.placeholders == ("X", "Y")
+
+    out = tmp_path / "out.html"
+    second.render_to_file(out, {"X": [1], "Y": None})
+    assert out.read_text(encoding="utf-8") == "changed [1] null"
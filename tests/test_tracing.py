@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+"""span 追踪（tracing）：完整事件嵌套、多线程、计数器、关闭时空操作，以及 fetch / CLI 集成测试。"""
+
+import json
+import threading
+from pathlib import Path
+
+import pytest
+
+from alleschools import etl, tracing
+from alleschools.cli import main
+
+
+@pytest.fixture(autouse=True)
+def _reset_tracer():
+    yield
+    tracing.stop()
+
+
+@tracing.traced(cat="test")
+def _work(n: int) -> int:
+    return sum(range(n))
+
+
+def test_spans_threads_and_counters(tmp_path: Path) -> None:
+    tracing.start()
+    with tracing.span("outer", cat="test", layer="po") as sp:
+        assert _work(1000) == 499500
+        sp.args["rows_out"] = 3
+    worker = threading.Thread(target=_work, args=(10,), name="worker-1")
+    worker.start()
+    worker.join()
+    tracing.counter("rows_processed", cumulative=True, po=3)
+    tracing.counter("rows_processed", cumulative=True, po=4, vo=1)
+    doc = json.loads(tracing.stop(tmp_path / "trace.json").read_text(encoding="utf-8"))
+
+    events = doc["traceEvents"]
+    outer = next(e for e in events if e["ph"] == "X" and e["name"] == "outer")
+    inner = [e for e in events if e["ph"] == "X" and e["name"] == "test_tracing._work"]
+    assert outer["args"] == {"layer": "po", "rows_out": 3}
+    assert len(inner) == 2 and len({e["tid"] for e in inner}) == 2
+    main_inner = next(e for e in inner if e["tid"] == outer["tid"])
+    assert outer["ts"] <= main_inner["ts"] and main_inner["ts"] + main_inner["dur"] <= outer["ts"] + outer["dur"]
+    names = {e["args"]["name"] for e in events if e["ph"] == "M" and e["name"] == "thread_name"}
+    assert "worker-1" in names
+    counters = [e["args"] for e in events if e["ph"] == "C"]
+    assert counters == [{"po": 3}, {"po": 7, "vo": 1}]
+
+
+def test_disabled_tracing_records_nothing() -> None:
+    assert not tracing.is_enabled()
+    with tracing.span("noop") as sp:
+        sp.args["x"] = 1
+    tracing.counter("rows_processed", po=1)
+    assert _work(3) == 3
+    assert tracing.stop(Path("unused.json")) is None
+
+
+def test_download_counts_bytes(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    def fake_urlretrieve(url: str, out_path: Path) -> None:
+        Path(out_path).write_bytes(b"x" * 128)
+
+    monkeypatch.setattr(etl.urllib.request, "urlretrieve", fake_urlretrieve)
+    tracing.start()
+    etl.fetch_vo_exams(tmp_path)
+    etl.fetch_vo_vestigingen(tmp_path)
+    events = tracing.start().events()
+    downloads = [e for e in events if e.get("name") == "fetch.download"]
+    assert [e["args"]["bytes"] for e in downloads] == [128, 128]
+    assert [e["args"]["total"] for e in events if e["ph"] == "C"] == [128, 256]
+
+
+def test_cli_trace_covers_pipeline_stages(tiny_vo_data_root: Path, tmp_path: Path) -> None:
+    out = tmp_path / "trace.json"
+    assert main(["--data-root", str(tiny_vo_data_root), "--trace-path", str(out), "etl", "--vo"]) == 0
+    events = json.loads(out.read_text(encoding="utf-8"))["traceEvents"]
+    spans = {e["name"]: e for e in events if e["ph"] == "X"}
+    for name in ("cli.etl", "etl.vo", "load.duo_exams", "vo_loader.load_exam_schools", "export.csv"):
+        assert name in spans
+    assert spans["compute.vo_xy"]["cat"] == "vo" and "rows_out" in spans["compute.vo_xy"]["args"]
+    assert spans["cli.etl"]["dur"] >= spans["etl.vo"]["dur"]
+    assert any(e["ph"] == "C" and e["name"] == "rows_processed" for e in events)
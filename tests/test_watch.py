@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+"""watch 模式：按变化的输入 / 配置小节只重建受影响的层，且只报告内容真正变化的产物。"""
+
+import os
+from pathlib import Path
+
+import yaml
+
+import alleschools.config as cfg
+from alleschools.watch import Watcher
+
+
+def _bump(path: Path) -> None:
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 2_000_000_000))
+
+
+def test_watch_rebuilds_only_affected_layer_and_artifacts(tiny_vo_data_root: Path) -> None:
+    config_path = tiny_vo_data_root / "config.yaml"
+    raw_config = yaml.safe_load((Path(cfg.PROJECT_ROOT) / "config.yaml").read_text(encoding="utf-8"))
+    config_path.write_text(yaml.safe_dump(raw_config), encoding="utf-8")
+    log: list = []
+    watcher = Watcher(
+        lambda: cfg.build_effective_config(
+            overrides={"data_root": str(tiny_vo_data_root)}, config_path=config_path
+        ),
+        layers=["vo"],
+        log=log.append,
+    )
+    watcher.run(max_cycles=0)
+    assert (tiny_vo_data_root / "generated" / "schools_xy_coords.csv").is_file()
+    assert watcher.poll() is None
+
+    # 只改 PO 小节：VO 不重建
+    raw_config["defaults"]["po"]["output"]["include_meta_columns"] = False
+    config_path.write_text(yaml.safe_dump(raw_config), encoding="utf-8")
+    _bump(config_path)
+    assert watcher.poll() is None
+
+    # VO 导出选项变化：只重算相关导出阶段，原始数据不重新解析
+    raw_config["defaults"]["vo"]["output"]["include_meta_columns"] = False
+    config_path.write_text(yaml.safe_dump(raw_config), encoding="utf-8")
+    _bump(config_path)
+    vo = watcher.poll()["vo"]
+    assert "export.csv" in vo["recomputed"] and "load.duo_exams" not in vo["recomputed"]
+    assert "generated/schools_xy_coords.csv" in vo["changed"]
+    assert "generated/schools_xy_coords.json" not in vo["changed"]
+
+    # 原始文件被重新保存但内容不变：重新解析，但没有产物内容变化，产物 mtime 不变
+    csv_path = tiny_vo_data_root / "generated" / "schools_xy_coords.csv"
+    before = csv_path.stat().st_mtime_ns
+    _bump(tiny_vo_data_root / "raw_data" / "duo_examen_raw_all.csv")
+    vo = watcher.poll()["vo"]
+    assert "load.duo_exams" in vo["recomputed"] and vo["changed"] == []
+    assert csv_path.stat().st_mtime_ns == before
+    assert any("重建 vo" in line for line in log)
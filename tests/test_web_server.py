@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+"""生产模式服务（alleschools.web）：缓存、gzip、ETag/304 与 Range 测试。"""
+
+import gzip
+import http.client
+import threading
+from pathlib import Path
+
+import pytest
+
+from alleschools.web import AssetCache, accepts_gzip, etag_matches, make_asset, parse_range
+from alleschools.web.server import make_handler, make_server
+
+
+def test_parse_range() -> None:
+    assert parse_range(None, 100) is None
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=50-500", 100) == (50, 99)
+    assert parse_range("bytes=0-1,5-6", 100) is None
+    assert parse_range("bytes=9-0", 100) is None
+    assert parse_range("items=0-1", 100) is None
+    with pytest.raises(ValueError):
+        parse_range("bytes=100-", 100)
+
+
+def test_etag_and_gzip_negotiation() -> None:
+    asset = make_asset(b"{}" * 2000, "application/json")
+    assert asset.gzip_body is not None and len(asset.gzip_body) < asset.size
+    assert asset.gzip_etag != asset.etag
+    assert etag_matches(asset.etag, asset.etag)
+    assert etag_matches(f'"x", W/{asset.etag}', asset.etag)
+    assert not etag_matches('"other"', asset.etag)
+    assert accepts_gzip("br, gzip;q=0.8")
+    assert not accepts_gzip("gzip;q=0")
+    assert not accepts_gzip("identity")
+    # 过小的内容不压缩
+    assert make_asset(b"tiny", "application/json").gzip_body is None
+
+
+def test_asset_cache_reloads_changed_file(tmp_path: Path) -> None:
+    path = tmp_path / "a.json"
+    path.write_text("[1]", encoding="utf-8")
+    cache = AssetCache()
+    first = cache.get_file(str(path))
+    assert cache.get_file(str(path)) is first
+    path.write_text("[1, 2]", encoding="utf-8")
+    second = cache.get_file(str(path))
+    assert second is not None and second.body == b"[1, 2]"
+    assert cache.get_file(str(tmp_path / "missing.json")) is None
+
+
+@pytest.fixture
+def running_server(tmp_path: Path):
+    (tmp_path / "data.json").write_text("[" + ",".join(str(i) for i in range(2000)) + "]", encoding="utf-8")
+    cache = AssetCache()
+    cache.put("index", ("<html>" + "x" * 5000 + "</html>").encode("utf-8"), "text/html; charset=utf-8")
+    handler = make_handler(cache, str(tmp_path), html_routes={"/view_xy.html": "index"})
+    server = make_server("127.0.0.1", 0, handler, quiet=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server.server_address[1]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _get(port: int, path: str, headers=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    conn.request("GET", path, headers=headers or {})
+    resp = conn.getresponse()
+    body = resp.read()
+    conn.close()
+    return resp, body
+
+
+def test_server_gzip_304_and_range(running_server: int) -> None:
+    port = running_server
+    resp, body = _get(port, "/view_xy.html", {"Accept-Encoding": "gzip"})
+    assert resp.status == 200
+    assert resp.getheader("Content-Encoding") == "gzip"
+    assert gzip.decompress(body).startswith(b"<html>")
+    etag = resp.getheader("ETag")
+
+    resp, body = _get(port, "/view_xy.html", {"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert resp.status == 304
+    assert body == b""
+
+    resp, body = _get(port, "/data.json", {"Range": "bytes=0-4"})
+    assert resp.status == 206
+    assert body == b"[0,1,"
+    assert resp.getheader("Content-Range").endswith("/" + str(len("[" + ",".join(str(i) for i in range(2000)) + "]")))
+
+    resp, _ = _get(port, "/data.json", {"Range": "bytes=999999-"})
+    assert resp.status == 416
+
+    resp, _ = _get(port, "/../secret")
+    assert resp.status == 404
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+"""年度立方体（prefix-sum year cube）：任意学年窗口 X/Y 查询测试。"""
+
+import pytest
+
+from alleschools.compute.indicators import compute_po_xy, compute_vo_xy
+from alleschools.compute.year_cube import (
+    build_po_year_cube,
+    build_vo_year_cube,
+    parse_window,
+    query_xy,
+)
+from alleschools.config import SCHOOLJARS, WOZ_YEARS
+
+
+def _po_schools() -> dict:
+    schools = {}
+    for i in range(4):
+        years = {}
+        for j, key in enumerate(SCHOOLJARS):
+            if (i + j) % 3 == 0:
+                continue  # 留出缺失学年
+            years[key] = {"total": 20 + 5 * i + j, "vwo_equiv": float(3 * i + j)}
+        schools[f"00P{i}"] = {
+            "naam": f"P{i}",
+            "gemeente": "G",
+            "postcode": f"12{i}0AB",
+            "pc4": f"12{i}0",
+            "soort_po": "Bo",
+            "years": years,
+        }
+    return schools
+
+
+def _po_woz() -> dict:
+    # 只有部分年份有 WOZ，覆盖 nearest_year / pc4_mean 的补值逻辑
+    return {(f"12{i}0", y): 200.0 + 10 * i + (y - 2019) for i in range(4) for y in WOZ_YEARS[::2]}
+
+
+def _vo_schools(year_cols: list) -> dict:
+    labels = [y[2] for y in year_cols]
+    schools = {}
+    for i in range(3):
+        hw, vmbo, all_kand = {}, {}, {}
+        for j, year in enumerate(labels):
+            total = 30.0 + 10 * i + j
+            hw[year] = {"vwo": 5.0 + i + j, "havo": 10.0, "science": 4.0 + j, "total": total}
+            vmbo[year] = {"techniek": 0.0, "total": 0.0}
+            all_kand[year] = total
+        schools[f"00V{i}"] = {"naam": f"V{i}", "gemeente": "G", "havo_vwo": hw, "vmbo": vmbo, "all_kand": all_kand}
+    # 纯 VMBO 学校：走 compute_vo_xy 的 VMBO 分支
+    schools["00VM"] = {
+        "naam": "VM",
+        "gemeente": "G",
+        "havo_vwo": {y: {"vwo": 0.0, "havo": 0.0, "science": 0.0, "total": 0.0} for y in labels},
+        "vmbo": {y: {"techniek": 6.0 + j, "total": 25.0} for j, y in enumerate(labels)},
+        "all_kand": {y: 25.0 for y in labels},
+    }
+    return schools
+
+
+_VO_YEAR_COLS = [[0, 1, "2019-2020", 1.0], [2, 3, "2020-2021", 2.0], [4, 5, "2021-2022", 3.0]]
+
+
+def _by_brin(rows: list) -> dict:
+    return {r["BRIN"]: r for r in rows}
+
+
+@pytest.mark.parametrize("strategy", ["nearest_year", "drop", "pc4_mean"])
+def test_po_full_window_matches_compute(strategy: str) -> None:
+    """不指定窗口时，立方体查询结果与 compute_po_xy 一致。"""
+    schools, woz = _po_schools(), _po_woz()
+    expected, expected_excl = compute_po_xy(schools, woz, WOZ_YEARS, woz_strategy=strategy)
+    cube = build_po_year_cube(schools, woz, WOZ_YEARS, woz_strategy=strategy)
+    rows, excluded = query_xy(cube)
+    assert len(excluded) == len(expected_excl)
+    exp = _by_brin(expected)
+    got = _by_brin(rows)
+    assert got.keys() == exp.keys()
+    for brin, row in exp.items():
+        assert got[brin]["X_linear"] == pytest.approx(row["X_linear"])
+        assert got[brin]["Y_linear"] == pytest.approx(row["Y_linear"])
+        assert got[brin]["pupils_total"] == row["pupils_total"]
+
+
+def test_vo_full_window_matches_compute() -> None:
+    """VO（含纯 VMBO 学校）全窗口查询与 compute_vo_xy 一致。"""
+    schools = _vo_schools(_VO_YEAR_COLS)
+    expected, _ = compute_vo_xy(schools, {}, _VO_YEAR_COLS, min_havo_vwo_total=20)
+    cube = build_vo_year_cube(schools, {}, _VO_YEAR_COLS)
+    rows, _ = query_xy(cube, min_havo_vwo_total=20)
+    exp = _by_brin(expected)
+    got = _by_brin(rows)
+    assert "00VM" in got
+    assert got.keys() == exp.keys()
+    for brin, row in exp.items():
+        assert got[brin]["X_linear"] == pytest.approx(row["X_linear"])
+        assert got[brin]["Y_linear"] == pytest.approx(row["Y_linear"])
+
+
+def test_vo_window_matches_compute_on_sliced_years() -> None:
+    """窗口查询等价于只保留窗口内学年后重新计算。"""
+    schools = _vo_schools(_VO_YEAR_COLS)
+    sliced = _VO_YEAR_COLS[1:]
+    expected, _ = compute_vo_xy(schools, {}, sliced, min_havo_vwo_total=20)
+    cube = build_vo_year_cube(schools, {}, _VO_YEAR_COLS)
+    rows, _ = query_xy(cube, parse_window("2020-2022"), min_havo_vwo_total=20)
+    exp = _by_brin(expected)
+    got = _by_brin(rows)
+    assert got.keys() == exp.keys()
+    for brin, row in exp.items():
+        assert got[brin]["X_linear"] == pytest.approx(row["X_linear"])
+        assert got[brin]["Y_linear"] == pytest.approx(row["Y_linear"])
+
+
+def test_custom_weights_change_result() -> None:
+    """显式权重向量生效：只给最后一年权重时等价于单年窗口。"""
+    schools = _vo_schools(_VO_YEAR_COLS)
+    cube = build_vo_year_cube(schools, {}, _VO_YEAR_COLS)
+    last_only, _ = query_xy(cube, weights=[0.0, 0.0, 1.0], min_havo_vwo_total=0)
+    window, _ = query_xy(cube, parse_window("2021-2022"), min_havo_vwo_total=0)
+    got, exp = _by_brin(last_only), _by_brin(window)
+    for brin, row in exp.items():
+        assert got[brin]["X_linear"] == pytest.approx(row["X_linear"])
+
+
+def test_parse_window_and_errors() -> None:
+    assert parse_window("2021-2024") == (2021, 2024)
+    for bad in ("2021", "abc-def", "2024-2021", ""):
+        with pytest.raises(ValueError):
+            parse_window(bad)
+    cube = build_vo_year_cube(_vo_schools(_VO_YEAR_COLS), {}, _VO_YEAR_COLS)
+    with pytest.raises(ValueError):
+        query_xy(cube, parse_window("2010-2015"))
@@ -206,3 +206,151 @@ describe('getMetricFromMeta', function () {
     assert.strictEqual(m, null);
   });
 });
+
+describe('search index (prefix + trigram)', function () {
+  // 与 search_index_exporter.build_search_index 相同的结构，在测试中直接构造
+  function buildIndex(points) {
+    const prefix = {};
+    const trigrams = {};
+    function add(table, key, doc) {
+      (table[key] = table[key] || new Set()).add(doc);
+    }
+    points.forEach(function (p, doc) {
+      const naam = p.label.toUpperCase();
+      const acr = VIEW_XY.acronymFromName(p.label);
+      const fields = [naam, acr, p.brin.toUpperCase(), p.gemeente.toUpperCase(), p.postcode.toUpperCase().replace(/\s/g, '')];
+      naam.split(/\s+/).concat(p.gemeente.toUpperCase().split(/\s+/), [p.brin.toUpperCase(), acr]).forEach(function (tok) {
+        if (tok) add(prefix, tok, doc);
+      });
+      fields.forEach(function (f) {
+        for (let i = 0; i + 3 <= f.length; i++) add(trigrams, f.slice(i, i + 3), doc);
+      });
+    });
+    function table(t) {
+      const keys = Object.keys(t).sort();
+      return {
+        keys: keys,
+        postings: keys.map(function (k) {
+          const ids = Array.from(t[k]).sort(function (a, b) { return a - b; });
+          return ids.map(function (id, i) { return i === 0 ? id : id - ids[i - 1]; });
+        }),
+      };
+    }
+    return { version: 1, n_docs: points.length, prefix: table(prefix), trigrams: table(trigrams) };
+  }
+
+  const points = [
+    { label: 'Het Wellantcollege', brin: '00AA', gemeente: 'Utrecht', postcode: '3511 AB' },
+    { label: 'Stedelijk Gymnasium', brin: '01BB', gemeente: 'Leiden', postcode: '2312 CD' },
+    { label: 'Het Utrechts Lyceum', brin: '02CC', gemeente: 'Utrecht', postcode: '3581 EF' },
+  ];
+  const index = buildIndex(points);
+
+  it('decodes delta-encoded postings', function () {
+    assert.deepStrictEqual(VIEW_XY.decodeDeltas([3, 1, 4]), [3, 4, 8]);
+    assert.deepStrictEqual(VIEW_XY.decodeDeltas([]), []);
+  });
+
+  it('finds documents by token prefix', function () {
+    assert.deepStrictEqual(VIEW_XY.searchIndexPrefix(index, 'UTR'), [0, 2]);
+    assert.deepStrictEqual(VIEW_XY.searchIndexPrefix(index, 'GYM'), [1]);
+    assert.deepStrictEqual(VIEW_XY.searchIndexPrefix(index, 'ZZZ'), []);
+  });
+
+  it('trigram candidates cover every pointMatchesSearch hit', function () {
+    ['LANT', 'UTRECHT, GYM', '3581 EF', 'HUL', 'NOPE'].forEach(function (raw) {
+      const terms = VIEW_XY.parseSearchTerms(raw);
+      const cand = VIEW_XY.searchIndexCandidates(index, terms);
+      const expected = points.map(function (p, i) { return VIEW_XY.pointMatchesSearch(p, terms) ? i : -1; })
+        .filter(function (i) { return i >= 0; });
+      expected.forEach(function (i) { assert.ok(cand.includes(i), raw); });
+    });
+    assert.deepStrictEqual(VIEW_XY.searchIndexCandidates(index, ['LANT']), [0]);
+  });
+
+  it('returns null for terms shorter than a trigram', function () {
+    assert.strictEqual(VIEW_XY.searchIndexCandidates(index, ['HW']), null);
+  });
+});
+
+describe('published dataset patches', function () {
+  const v1 = [
+    { brin: 'A', x_linear: 1, size: 10 },
+    { brin: 'B', x_linear: 2, size: 20, note: 'x' },
+    { brin: 'C', x_linear: 3, size: 30 },
+  ];
+  const patch = {
+    key: 'brin',
+    added: [{ brin: 'D', x_linear: 4, size: 40 }],
+    removed: ['C'],
+    changed: [{ key: 'B', set: { x_linear: 2.5 }, unset: ['note'] }],
+  };
+
+  it('applies added, removed and changed entries', function () {
+    assert.deepStrictEqual(VIEW_XY.applyPointsPatch(v1, patch), [
+      { brin: 'A', x_linear: 1, size: 10 },
+      { brin: 'B', x_linear: 2.5, size: 20 },
+      { brin: 'D', x_linear: 4, size: 40 },
+    ]);
+    assert.strictEqual(v1[1].x_linear, 2);
+    const reordered = VIEW_XY.applyPointsPatch(v1, Object.assign({ order: ['D', 'B', 'A'] }, patch));
+    assert.deepStrictEqual(reordered.map(function (p) { return p.brin; }), ['D', 'B', 'A']);
+  });
+
+  it('resolves the patch chain from a cached version', function () {
+    const entry = {
+      latest: 'v3',
+      chain: [{ from: 'v1', to: 'v2', patch: 'p12' }, { from: 'v2', to: 'v3', patch: 'p23' }],
+    };
+    assert.deepStrictEqual(VIEW_XY.patchChain(entry, 'v1').map(function (c) { return c.patch; }), ['p12', 'p23']);
+    assert.deepStrictEqual(VIEW_XY.patchChain(entry, 'v3'), []);
+    assert.strictEqual(VIEW_XY.patchChain(entry, 'v0'), null);
+  });
+});
+
+describe('density pyramid', function () {
+  const dataset = {
+    extent: [0, 0, 100, 100],
+    types: ['Bo', 'Sbo'],
+    levels: [
+      { level: 0, bins: 2, n_cells: 2, ix: [0, 1], iy: [0, 1], count: [3, 1], size_sum: [30, 5], type: [0, 1] },
+      { level: 1, bins: 4, n_cells: 3, ix: [0, 1, 3], iy: [0, 1, 3], count: [2, 1, 1], size_sum: [20, 10, 5], type: [0, 0, 1] },
+    ],
+  };
+
+  it('picks the finest level that fits the cell budget', function () {
+    assert.strictEqual(VIEW_XY.densityLevelForView(dataset, [0, 100], [0, 100], 4), 0);
+    assert.strictEqual(VIEW_XY.densityLevelForView(dataset, [0, 100], [0, 100], 16), 1);
+    assert.strictEqual(VIEW_XY.densityLevelForView(dataset, [0, 50], [0, 50], 4), 1);
+    assert.strictEqual(VIEW_XY.densityLevelForView({ levels: [] }, [0, 1], [0, 1], 4), -1);
+  });
+
+  it('returns only cells intersecting the view', function () {
+    const cells = VIEW_XY.densityCellsInView(dataset, 1, [0, 40], [0, 40]);
+    assert.deepStrictEqual(cells.map(function (c) { return c.count; }), [2, 1]);
+    assert.deepStrictEqual(cells[0], { x0: 0, y0: 0, x1: 25, y1: 25, count: 2, sizeSum: 20, type: 'Bo' });
+  });
+});
+
+describe('geo cluster index', function () {
+  const index = {
+    min_zoom: 0,
+    max_zoom: 0,
+    levels: [
+      { zoom: 0, n: 1, lon: [5], lat: [52], count: [2], x: [30], y: [400], size: [300], parent: undefined },
+      { zoom: 1, n: 2, lon: [4.9, 5.1], lat: [52, 52], count: [1, 1], x: [20, 40], y: [300, 500],
+        size: [100, 200], parent: [0, 0], brin: ['01AA', '02BB'] },
+    ],
+  };
+
+  it('looks up clusters for a zoom level and viewport', function () {
+    assert.deepStrictEqual(VIEW_XY.geoClustersInView(index, 0.5, [3, 50, 7, 54]).map(function (c) { return c.count; }), [2]);
+    assert.deepStrictEqual(VIEW_XY.geoClustersInView(index, 9, [5, 50, 7, 54]).map(function (c) { return c.brin; }), ['02BB']);
+  });
+
+  it('expands a cluster into its children', function () {
+    const kids = VIEW_XY.geoClusterChildren(index, 0, 0);
+    assert.deepStrictEqual(kids.map(function (c) { return c.brin; }), ['01AA', '02BB']);
+    assert.deepStrictEqual(VIEW_XY.geoClusterChildren(index, 1, 0), []);
+  });
+});
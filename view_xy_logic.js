@@ -150,6 +150,211 @@
     });
   }
 
+  /** 差分编码的 postings（首项为绝对值）还原为升序文档编号 */
+  function decodeDeltas(deltas) {
+    const out = new Array(deltas ? deltas.length : 0);
+    let acc = 0;
+    for (let i = 0; i < out.length; i++) {
+      acc += deltas[i];
+      out[i] = acc;
+    }
+    return out;
+  }
+
+  /** 有序字符串数组中第一个 >= s 的位置 */
+  function lowerBound(keys, s) {
+    let lo = 0;
+    let hi = keys.length;
+    while (lo < hi) {
+      const mid = (lo + hi) >>> 1;
+      if (keys[mid] < s) lo = mid + 1;
+      else hi = mid;
+    }
+    return lo;
+  }
+
+  /** 两个升序数组的交集 */
+  function intersectSorted(a, b) {
+    const out = [];
+    let i = 0;
+    let j = 0;
+    while (i < a.length && j < b.length) {
+      if (a[i] === b[j]) { out.push(a[i]); i++; j++; }
+      else if (a[i] < b[j]) i++;
+      else j++;
+    }
+    return out;
+  }
+
+  /** 多个升序数组的并集（去重、升序） */
+  function unionSorted(lists) {
+    const seen = new Set();
+    lists.forEach(function (lst) { lst.forEach(function (id) { seen.add(id); }); });
+    return Array.from(seen).sort(function (a, b) { return a - b; });
+  }
+
+  /**
+   * 搜索索引（{stem}_search.json）前缀查询：返回前缀表中以 prefix（已大写）开头的词所覆盖的文档编号（升序）。
+   * 适合自动补全；不等价于 pointMatchesSearch 的子串语义。
+   */
+  function searchIndexPrefix(index, prefix) {
+    if (!index || !index.prefix || !prefix) return [];
+    const keys = index.prefix.keys;
+    const lists = [];
+    for (let i = lowerBound(keys, prefix); i < keys.length && keys[i].startsWith(prefix); i++) {
+      lists.push(decodeDeltas(index.prefix.postings[i]));
+    }
+    return unionSorted(lists);
+  }
+
+  function trigramCandidates(index, s) {
+    if (s.length < 3) return null;
+    const keys = index.trigrams.keys;
+    const grams = new Set();
+    for (let i = 0; i + 3 <= s.length; i++) grams.add(s.slice(i, i + 3));
+    const lists = [];
+    for (const g of grams) {
+      const k = lowerBound(keys, g);
+      if (k >= keys.length || keys[k] !== g) return [];
+      lists.push(index.trigrams.postings[k]);
+    }
+    lists.sort(function (a, b) { return a.length - b.length; });
+    let hit = decodeDeltas(lists[0]);
+    for (let i = 1; i < lists.length && hit.length; i++) hit = intersectSorted(hit, decodeDeltas(lists[i]));
+    return hit;
+  }
+
+  /**
+   * 用三元组倒排求 searchTerms（parseSearchTerms 的输出）的候选文档编号（升序），
+   * 结果是 pointMatchesSearch 命中集合的超集，调用方只需对候选点逐个校验。
+   * 任一搜索词（或其去空白形式）短于 3 个字符时返回 null，表示需回退为线性扫描。
+   */
+  function searchIndexCandidates(index, searchTerms) {
+    if (!index || !index.trigrams || !searchTerms || searchTerms.length === 0) return null;
+    const lists = [];
+    for (let t = 0; t < searchTerms.length; t++) {
+      const term = searchTerms[t];
+      const norm = term.replace(/\s/g, '');
+      const a = trigramCandidates(index, term);
+      const b = norm === term ? a : trigramCandidates(index, norm);
+      if (a === null || b === null) return null;
+      lists.push(a, b);
+    }
+    return unionSorted(lists);
+  }
+
+  /**
+   * 发布清单（generated/published/manifest.json）中某数据集从 cachedVersion 升级到 latest 所需的补丁链。
+   * 已是最新时返回 []；cachedVersion 不在链中（过旧或未知）时返回 null，表示应下载完整快照。
+   */
+  function patchChain(datasetEntry, cachedVersion) {
+    if (!datasetEntry || !cachedVersion) return null;
+    if (cachedVersion === datasetEntry.latest) return [];
+    const chain = datasetEntry.chain || [];
+    for (let i = 0; i < chain.length; i++) {
+      if (chain[i].from === cachedVersion) return chain.slice(i);
+    }
+    return null;
+  }
+
+  /** 将 alleschools publish 生成的补丁（added / removed / changed / order）应用到 points 数组，返回新数组 */
+  function applyPointsPatch(points, patch) {
+    const key = patch.key || 'brin';
+    const removed = new Set(patch.removed || []);
+    const changes = new Map();
+    (patch.changed || []).forEach(function (c) { changes.set(c.key, c); });
+    let out = [];
+    (points || []).forEach(function (p) {
+      if (removed.has(p[key])) return;
+      const q = Object.assign({}, p);
+      const c = changes.get(p[key]);
+      if (c) {
+        Object.assign(q, c.set || {});
+        (c.unset || []).forEach(function (f) { delete q[f]; });
+      }
+      out.push(q);
+    });
+    (patch.added || []).forEach(function (p) { out.push(Object.assign({}, p)); });
+    if (patch.order) {
+      const byKey = new Map(out.map(function (p) { return [p[key], p]; }));
+      out = patch.order.map(function (k) { return byKey.get(k); });
+    }
+    return out;
+  }
+
+  /**
+   * 密度金字塔（{stem}_density.json 的某个数据集）中适合当前视口的级别：
+   * 返回视口覆盖的箱数（每轴箱数之积）不超过 maxCells 的最细一级下标；无级别时返回 -1。
+   */
+  function densityLevelForView(dataset, xRange, yRange, maxCells) {
+    if (!dataset || !dataset.levels || dataset.levels.length === 0 || !dataset.extent) return -1;
+    const e = dataset.extent;
+    const fx = Math.min(1, Math.max(0, (xRange[1] - xRange[0]) / (e[2] - e[0])));
+    const fy = Math.min(1, Math.max(0, (yRange[1] - yRange[0]) / (e[3] - e[1])));
+    let best = 0;
+    for (let i = 0; i < dataset.levels.length; i++) {
+      const n = dataset.levels[i].bins;
+      if (Math.ceil(n * fx) * Math.ceil(n * fy) <= maxCells) best = i;
+    }
+    return best;
+  }
+
+  /** 密度金字塔某级中与视口相交的非空箱：[{x0, y0, x1, y1, count, sizeSum, type}] */
+  function densityCellsInView(dataset, levelIndex, xRange, yRange) {
+    const level = dataset && dataset.levels ? dataset.levels[levelIndex] : null;
+    if (!level) return [];
+    const e = dataset.extent;
+    const w = (e[2] - e[0]) / level.bins;
+    const h = (e[3] - e[1]) / level.bins;
+    const out = [];
+    for (let i = 0; i < level.n_cells; i++) {
+      const x0 = e[0] + level.ix[i] * w;
+      const y0 = e[1] + level.iy[i] * h;
+      if (x0 > xRange[1] || x0 + w < xRange[0] || y0 > yRange[1] || y0 + h < yRange[0]) continue;
+      out.push({
+        x0: x0, y0: y0, x1: x0 + w, y1: y0 + h,
+        count: level.count[i],
+        sizeSum: level.size_sum[i],
+        type: dataset.types[level.type[i]],
+      });
+    }
+    return out;
+  }
+
+  /** 聚类索引某级的第 i 个条目 → {zoom, index, lon, lat, count, x, y, size[, brin]} */
+  function geoClusterEntry(level, i) {
+    const out = {
+      zoom: level.zoom, index: i, lon: level.lon[i], lat: level.lat[i],
+      count: level.count[i], x: level.x[i], y: level.y[i], size: level.size[i],
+    };
+    if (level.brin) out.brin = level.brin[i];
+    return out;
+  }
+
+  /** 地图聚类索引（{stem}_geo_clusters.json）中 zoom 级落在 bbox = [west, south, east, north] 内的聚类 */
+  function geoClustersInView(index, zoom, bbox) {
+    if (!index || !index.levels || index.levels.length === 0) return [];
+    const z = Math.max(index.min_zoom, Math.min(index.max_zoom + 1, Math.floor(zoom)));
+    const level = index.levels[z - index.min_zoom];
+    const out = [];
+    for (let i = 0; i < level.n; i++) {
+      if (level.lon[i] < bbox[0] || level.lon[i] > bbox[2] || level.lat[i] < bbox[1] || level.lat[i] > bbox[3]) continue;
+      out.push(geoClusterEntry(level, i));
+    }
+    return out;
+  }
+
+  /** 展开聚类：zoom 级第 i 个聚类在 zoom + 1 级中的子条目 */
+  function geoClusterChildren(index, zoom, i) {
+    const child = index && index.levels ? index.levels[zoom + 1 - index.min_zoom] : null;
+    if (!child || !child.parent) return [];
+    const out = [];
+    for (let j = 0; j < child.n; j++) {
+      if (child.parent[j] === i) out.push(geoClusterEntry(child, j));
+    }
+    return out;
+  }
+
   const VIEW_XY = {
     parseSearchTerms: parseSearchTerms,
     parseGemeenteFilter: parseGemeenteFilter,
@@ -162,6 +367,15 @@
     sizeToRadius: sizeToRadius,
     filterPointsByGemeenteText: filterPointsByGemeenteText,
     getMetricFromMeta: getMetricFromMeta,
+    decodeDeltas: decodeDeltas,
+    searchIndexPrefix: searchIndexPrefix,
+    searchIndexCandidates: searchIndexCandidates,
+    patchChain: patchChain,
+    applyPointsPatch: applyPointsPatch,
+    densityLevelForView: densityLevelForView,
+    densityCellsInView: densityCellsInView,
+    geoClustersInView: geoClustersInView,
+    geoClusterChildren: geoClusterChildren,
   };
 
   if (typeof module !== 'undefined' && module.exports) {
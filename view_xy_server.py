@@ -4,12 +4,20 @@
 浏览器打开后显示：横轴 VWO 通过人数占比，纵轴 理科占比；可切换线性/对数坐标。
 """
 import argparse
+import atexit
 import csv
 import json
 import os
+import signal
 import sys
+import threading
 import webbrowser
 from http.server import HTTPServer, SimpleHTTPRequestHandler
+from pathlib import Path
+
+from alleschools.web import AssetCache, PointsApi, build_point_indexes, make_handler, make_server
+from alleschools.web.static_build import build_hashed_site, update_vercel_config
+from alleschools.web.template import compile_template
 
 BASE = os.path.dirname(os.path.abspath(__file__))
 CSV_PATH = os.path.join(BASE, "schools_xy_coords.csv")
@@ -20,6 +28,7 @@ RUN_REPORT_PO = os.path.join(BASE, "run_report_po.json")
 RUN_REPORT_VO = os.path.join(BASE, "run_report_vo.json")
 HTML_PATH = os.path.join(BASE, "view_xy.html")
 PUBLIC_INDEX = os.path.join(BASE, "public", "index.html")
+VERCEL_JSON = os.path.join(BASE, "vercel.json")
 DEMO_DIR = os.path.join(BASE, "demo")
 DEMO_INDEX = os.path.join(DEMO_DIR, "datasets_index.json")
 PORT = 8082
@@ -78,6 +87,7 @@ def _get_vo_paths():
         "excluded_path": excluded_path,
         "points_path": d.get("points_path") or None,
         "meta_path": d.get("meta_path") or None,
+        "search_index_path": d.get("search_index_path") or None,
         # VO profiel 相关输出：在 run_report_vo.json 中存在时才会被前端使用
         "profiles_points_paths": profiles_points_paths,
         "profiles_meta_path": profiles_meta_path,
@@ -111,6 +121,7 @@ def _get_po_paths():
         "excluded_path": excluded_path,
         "points_path": d.get("points_path") or None,
         "meta_path": d.get("meta_path") or None,
+        "search_index_path": d.get("search_index_path") or None,
     }
 
 
@@ -124,6 +135,23 @@ def load_excluded(path=EXCLUDED_PATH):
         return []
 
 
+def load_search_index(rel):
+    """
+    加载导出阶段写出的搜索索引 {stem}_search.json（路径相对于 BASE）。
+    未导出或读取失败时返回 None，前端搜索框回退为线性扫描。
+    """
+    if not rel:
+        return None
+    path = rel if os.path.isabs(rel) else os.path.join(BASE, rel)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+
 def load_data_vo():
     """从正式 VO CSV 加载图表数据。"""
     paths = _get_vo_paths()
@@ -310,6 +338,36 @@ def load_demo_data():
     return data_vo, [], data_po, [], vo_meta, po_meta, vo_profiles, vo_profiles_meta
 
 
+def html_payloads(
+    data_vo,
+    excluded_vo,
+    data_po,
+    excluded_po,
+    meta_vo=None,
+    meta_po=None,
+    data_vo_profiles=None,
+    meta_vo_profiles=None,
+    search_vo=None,
+    search_po=None,
+):
+    """view_xy.html 中各 __INJECT_*__ 占位符对应的数据（占位符名 -> 可 JSON 序列化对象）。"""
+    return {
+        "DATA_VO": data_vo,
+        "DATA_PO": data_po,
+        "EXCLUDED_VO": excluded_vo if excluded_vo is not None else [],
+        "EXCLUDED_PO": excluded_po if excluded_po is not None else [],
+        "META_VO": meta_vo if meta_vo is not None else {},
+        "META_PO": meta_po if meta_po is not None else {},
+        "DATA_VO_PROFILES": (
+            data_vo_profiles if data_vo_profiles is not None else {"NT": [], "NG": [], "EM": [], "CM": []}
+        ),
+        "META_VO_PROFILES": meta_vo_profiles if meta_vo_profiles is not None else {},
+        # 搜索索引文档编号与 DATA_VO / DATA_PO 行顺序一致；None 注入为 null
+        "SEARCH_VO": search_vo,
+        "SEARCH_PO": search_po,
+    }
+
+
 def build_html(
     html_path,
     data_vo,
@@ -320,52 +378,46 @@ def build_html(
     meta_po=None,
     data_vo_profiles=None,
     meta_vo_profiles=None,
+    search_vo=None,
+    search_po=None,
 ):
-    excluded_vo = excluded_vo if excluded_vo is not None else []
-    excluded_po = excluded_po if excluded_po is not None else []
-    meta_vo = meta_vo if meta_vo is not None else {}
-    meta_po = meta_po if meta_po is not None else {}
-    data_vo_profiles = data_vo_profiles if data_vo_profiles is not None else {"NT": [], "NG": [], "EM": [], "CM": []}
-    meta_vo_profiles = meta_vo_profiles if meta_vo_profiles is not None else {}
-    data_vo_js = json.dumps(data_vo, ensure_ascii=False)
-    data_po_js = json.dumps(data_po, ensure_ascii=False)
-    excluded_vo_js = json.dumps(excluded_vo, ensure_ascii=False)
-    excluded_po_js = json.dumps(excluded_po, ensure_ascii=False)
-    meta_vo_js = json.dumps(meta_vo, ensure_ascii=False)
-    meta_po_js = json.dumps(meta_po, ensure_ascii=False)
-    data_vo_profiles_js = json.dumps(data_vo_profiles, ensure_ascii=False)
-    meta_vo_profiles_js = json.dumps(meta_vo_profiles, ensure_ascii=False)
+    """返回注入数据后的完整 HTML 字符串（大文件请用 compile_template(...).render_to_file 流式写出）。"""
     print(f"[view_xy_server] 使用 HTML 模板: {html_path}", file=sys.stderr)
-    with open(html_path, "r", encoding="utf-8") as f:
-        html = f.read()
-    html = html.replace("__INJECT_DATA_VO__", data_vo_js)
-    html = html.replace("__INJECT_DATA_PO__", data_po_js)
-    html = html.replace("__INJECT_EXCLUDED_VO__", excluded_vo_js)
-    html = html.replace("__INJECT_EXCLUDED_PO__", excluded_po_js)
-    html = html.replace("__INJECT_META_VO__", meta_vo_js)
-    html = html.replace("__INJECT_META_PO__", meta_po_js)
-    html = html.replace("__INJECT_DATA_VO_PROFILES__", data_vo_profiles_js)
-    html = html.replace("__INJECT_META_VO_PROFILES__", meta_vo_profiles_js)
-    return html
+    payloads = html_payloads(
+        data_vo,
+        excluded_vo,
+        data_po,
+        excluded_po,
+        meta_vo,
+        meta_po,
+        data_vo_profiles,
+        meta_vo_profiles,
+        search_vo=search_vo,
+        search_po=search_po,
+    )
+    return compile_template(html_path).render(payloads)
 
 
-def main():
-    parser = argparse.ArgumentParser(
-        description="Generate school map HTML and optionally serve locally."
-    )
-    parser.add_argument(
-        "--static",
-        action="store_true",
-        help="Build only: write to public/index.html and exit (for Vercel static deploy).",
-    )
-    parser.add_argument(
-        "--demo",
-        action="store_true",
-        help="Use demo JSON datasets from demo/ (following refactor/SCHEMA.md) instead of CSV.",
-    )
-    args = parser.parse_args()
+def build_points_api(data_vo, data_po, data_vo_profiles=None):
+    """
+    为 /api/points 构建各层点位索引：vo / po 以及 VO profiel 层 vo_nt / vo_ng / vo_em / vo_cm
+    （profiel 点的坐标列为 X_profile / Y_vwo_share，规模列为 candidates_total）。
+    """
+    layers = {"vo": data_vo or [], "po": data_po or []}
+    axis_keys = {}
+    for prof, points in (data_vo_profiles or {}).items():
+        name = f"vo_{prof.lower()}"
+        layers[name] = points or []
+        axis_keys[name] = ("X_profile", "Y_vwo_share", "candidates_total")
+    return PointsApi(build_point_indexes(layers, axis_keys=axis_keys))
 
-    if args.demo:
+
+def load_payloads(demo=False):
+    """
+    读取数据集，返回 (payloads, datasets)；datasets = (data_vo, data_po, data_vo_profiles)，供 /api/points 建索引。
+    启动时调用一次；收到 SIGHUP（alleschools watch --reload-server）时再次调用以重新加载。
+    """
+    if demo:
         try:
             (
                 data_vo,
@@ -378,18 +430,21 @@ def main():
                 meta_vo_profiles,
             ) = load_demo_data()
         except Exception as e:  # pragma: no cover - 简单错误提示即可
-            print(f"加载 demo 数据失败: {e}", file=sys.stderr)
-            return 1
+            raise RuntimeError(f"加载 demo 数据失败: {e}") from e
+        # demo 数据集不附带搜索索引，前端回退为线性扫描
+        search_vo = None
+        search_po = None
     else:
         vo_paths = _get_vo_paths()
         vo_csv = vo_paths["csv_path"]
         if not os.path.exists(vo_csv):
-            print(f"找不到 {vo_csv}，请先运行 python -m alleschools.cli vo", file=sys.stderr)
-            return 1
+            raise FileNotFoundError(f"找不到 {vo_csv}，请先运行 python -m alleschools.cli vo")
         data_vo = load_data_vo()
         excluded_vo = load_excluded(_get_vo_paths()["excluded_path"])
         data_po = load_data_po()
         excluded_po = load_excluded(_get_po_paths()["excluded_path"])
+        search_vo = load_search_index(vo_paths.get("search_index_path"))
+        search_po = load_search_index(_get_po_paths().get("search_index_path"))
         # 在非 demo 模式下，尝试从 run_report 中加载 VO/PO/meta 与 VO profiel meta。
         meta_vo = {}
         meta_po = {}
@@ -427,8 +482,7 @@ def main():
                 except Exception:
                     meta_vo_profiles = {}
 
-    html = build_html(
-        HTML_PATH,
+    payloads = html_payloads(
         data_vo,
         excluded_vo,
         data_po,
@@ -437,36 +491,156 @@ def main():
         meta_po,
         data_vo_profiles=data_vo_profiles,
         meta_vo_profiles=meta_vo_profiles,
+        search_vo=search_vo,
+        search_po=search_po,
+    )
+    return payloads, (data_vo, data_po, data_vo_profiles)
+
+
+def _write_pid_file(path):
+    """写出当前进程 pid，退出时删除。"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(str(os.getpid()))
+    atexit.register(lambda: os.path.exists(path) and os.remove(path))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate school map HTML and optionally serve locally."
+    )
+    parser.add_argument(
+        "--static",
+        action="store_true",
+        help="Build only: write to public/index.html and exit (for Vercel static deploy).",
+    )
+    parser.add_argument(
+        "--hashed",
+        action="store_true",
+        help="With --static: emit datasets and large scripts as content-hashed files under public/assets/ "
+        "behind a small HTML shell, and sync immutable Cache-Control rules into vercel.json.",
     )
+    parser.add_argument(
+        "--demo",
+        action="store_true",
+        help="Use demo JSON datasets from demo/ (following refactor/SCHEMA.md) instead of CSV.",
+    )
+    parser.add_argument(
+        "--production",
+        action="store_true",
+        help="Threaded server with in-memory gzip cache, strong ETags/304 and Range support.",
+    )
+    parser.add_argument("--host", default="", help="Bind address (default: all interfaces).")
+    parser.add_argument("--port", type=int, default=PORT, help=f"Port to listen on (default: {PORT}).")
+    parser.add_argument("--no-browser", action="store_true", help="Do not open a browser window.")
+    parser.add_argument(
+        "--pid-file",
+        default=None,
+        help="Write the server pid here; `alleschools watch --reload-server PID_FILE` then sends SIGHUP "
+        "to reload the datasets after a rebuild.",
+    )
+    args = parser.parse_args()
+
+    try:
+        payloads, datasets = load_payloads(args.demo)
+    except (FileNotFoundError, RuntimeError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(f"[view_xy_server] 使用 HTML 模板: {HTML_PATH}", file=sys.stderr)
 
     if args.static:
         out_dir = os.path.dirname(PUBLIC_INDEX)
         os.makedirs(out_dir, exist_ok=True)
-        with open(PUBLIC_INDEX, "w", encoding="utf-8") as f:
-            f.write(html)
+        if args.hashed:
+            manifest = build_hashed_site(Path(HTML_PATH), payloads, Path(out_dir))
+            if update_vercel_config(Path(VERCEL_JSON)):
+                print(f"已更新 {VERCEL_JSON} 的 Cache-Control 规则")
+            print(
+                f"已生成: {PUBLIC_INDEX}（外壳 {manifest['shell_bytes']} 字节，"
+                f"{len(manifest['datasets'])} 个数据文件 + {len(manifest['scripts'])} 个脚本位于 public/assets/）"
+            )
+            return 0
+        # 流式写出：模板片段与各数据集 JSON 依次写入文件，不在内存中拼接整份文档
+        compile_template(HTML_PATH).render_to_file(PUBLIC_INDEX, payloads)
         print(f"已生成: {PUBLIC_INDEX}")
         return 0
 
+    # /api/points：服务端过滤与分页，客户端只需取回当前视图中的点
+    state = {"payloads": payloads, "points_api": build_points_api(*datasets)}
+    cache = AssetCache() if args.production else None
+
+    def points_api(handler, query):
+        return state["points_api"](handler, query)
+
+    def reload_data():
+        try:
+            new_payloads, new_datasets = load_payloads(args.demo)
+        except Exception as e:  # 数据写到一半等情况：保留旧数据，等待下一次通知
+            print(f"[view_xy_server] 重新加载失败，继续使用旧数据: {e}", file=sys.stderr)
+            return
+        state.update(payloads=new_payloads, points_api=build_points_api(*new_datasets))
+        if cache is not None:
+            cache.put("index", compile_template(HTML_PATH).render_bytes(new_payloads), "text/html; charset=utf-8")
+        print("[view_xy_server] 数据已重新加载", file=sys.stderr)
+
+    if args.pid_file:
+        _write_pid_file(args.pid_file)
+    if hasattr(signal, "SIGHUP"):
+        # alleschools watch --reload-server 在产物变化后发送 SIGHUP；在后台线程加载，不阻塞正在服务的请求
+        signal.signal(signal.SIGHUP, lambda signum, frame: threading.Thread(target=reload_data, daemon=True).start())
+
+    if cache is not None:
+        # 生产模式：注入后的 HTML 只编码/压缩一次，其余文件按 mtime 缓存在内存中
+        cache.put("index", compile_template(HTML_PATH).render_bytes(payloads), "text/html; charset=utf-8")
+        handler = make_handler(
+            cache,
+            BASE,
+            html_routes={"/view_xy.html": "index", "/": "index"},
+            routes={"/api/points": points_api},
+        )
+        server = make_server(args.host, args.port, handler)
+        url = f"http://127.0.0.1:{args.port}/view_xy.html"
+        mode = "demo JSON" if args.demo else "CSV"
+        print(f"生产模式服务: {url} （数据来源: {mode}，多线程 + gzip/ETag/Range）")
+        if not args.no_browser:
+            webbrowser.open(url)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        return 0
+
     os.chdir(BASE)
-    injected_html = html
 
     class Handler(SimpleHTTPRequestHandler):
         def do_GET(self):
             # 忽略查询参数，仅按路径匹配，确保带 ? 的 URL 也能得到注入后的 HTML
             path_only = self.path.split("?", 1)[0].rstrip("/")
             if path_only == "/view_xy.html":
+                # 模板按 mtime 缓存编译结果：编辑 view_xy.html 后刷新即可生效，无需重启
                 self.send_response(200)
                 self.send_header("Content-type", "text/html; charset=utf-8")
                 self.end_headers()
-                self.wfile.write(injected_html.encode("utf-8"))
+                for chunk in compile_template(HTML_PATH).iter_chunks(state["payloads"]):
+                    self.wfile.write(chunk.encode("utf-8"))
+            elif path_only == "/api/points":
+                status, asset = points_api(self, self.path.partition("?")[2])
+                self.send_response(status)
+                self.send_header("Content-type", asset.content_type)
+                self.send_header("Content-Length", str(asset.size))
+                self.end_headers()
+                self.wfile.write(asset.body)
             else:
                 super().do_GET()
 
-    server = HTTPServer(("", PORT), Handler)
-    url = f"http://127.0.0.1:{PORT}/view_xy.html"
+    server = HTTPServer((args.host, args.port), Handler)
+    url = f"http://127.0.0.1:{args.port}/view_xy.html"
     mode = "demo JSON" if args.demo else "CSV"
     print(f"本地服务: {url} （数据来源: {mode}）")
-    webbrowser.open(url)
+    if not args.no_browser:
+        webbrowser.open(url)
     server.serve_forever()
     return 0
 